@@ -16,6 +16,11 @@ BASE_DIR = Path(__file__).parent.parent  # backend/
 ASSETS_DIR = BASE_DIR / "assets"
 ASSETS_CATALOG_DIR = ASSETS_DIR / "catalog"
 ASSETS_CACHE_DIR = ASSETS_DIR / "cache"
+ASSET_MANIFEST_PATH = ASSETS_DIR / "asset_manifest.json"
+# Cada cuánto se re-verifica el manifiesto contra el filesystem (0 = solo al arrancar)
+ASSET_MANIFEST_REFRESH_INTERVAL_SECONDS = int(os.getenv("ASSET_MANIFEST_REFRESH_INTERVAL_SECONDS", "60"))
+# Derivados (thumbnail/medium/WebP) dentro de catalog/ para viajar con el volumen montado
+ASSET_DERIVATIVES_DIR = ASSETS_CATALOG_DIR / "_derivatives"
 OUTBOX_DIR = BASE_DIR.parent / "outbox"
 
 # Crear directorios si no existen
@@ -80,6 +85,23 @@ WHATSAPP_VERIFY_TOKEN = os.getenv("WHATSAPP_VERIFY_TOKEN", "luisa-verify-token-2
 WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
 WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
 WHATSAPP_API_VERSION = os.getenv("WHATSAPP_API_VERSION", "v18.0")
+# Media subida a WhatsApp se conserva 30 días: reusar el media_id un poco menos
+WHATSAPP_MEDIA_TTL_HOURS = int(os.getenv("WHATSAPP_MEDIA_TTL_HOURS", str(29 * 24)))
+
+# Cola de salida (ver app/services/outbound_queue.py)
+# Meta permite ~80 msg/s por número por defecto; se deja margen
+WHATSAPP_SEND_RATE_PER_SECOND = float(os.getenv("WHATSAPP_SEND_RATE_PER_SECOND", "20"))
+WHATSAPP_SEND_BURST = int(os.getenv("WHATSAPP_SEND_BURST", "20"))
+WHATSAPP_SEND_MAX_RETRIES = int(os.getenv("WHATSAPP_SEND_MAX_RETRIES", "5"))
+WHATSAPP_SEND_BACKOFF_BASE_SECONDS = float(os.getenv("WHATSAPP_SEND_BACKOFF_BASE_SECONDS", "2"))
+WHATSAPP_SEND_BACKOFF_MAX_SECONDS = float(os.getenv("WHATSAPP_SEND_BACKOFF_MAX_SECONDS", "300"))
+# Cada cuánto se despachan los envíos pendientes (0 = deshabilitado)
+WHATSAPP_OUTBOUND_DISPATCH_INTERVAL_SECONDS = float(os.getenv("WHATSAPP_OUTBOUND_DISPATCH_INTERVAL_SECONDS", "1"))
+
+# Statuses de entrega (ver app/services/status_ingest.py): se acumulan en memoria
+# y se escriben en lote cada intervalo o al llegar a WHATSAPP_STATUS_FLUSH_BATCH
+WHATSAPP_STATUS_FLUSH_INTERVAL_SECONDS = float(os.getenv("WHATSAPP_STATUS_FLUSH_INTERVAL_SECONDS", "2"))
+WHATSAPP_STATUS_FLUSH_BATCH = int(os.getenv("WHATSAPP_STATUS_FLUSH_BATCH", "500"))
 
 # Números para notificaciones internas (solo notificaciones, no conversaciones)
 # LUISA humana recibe notificaciones comerciales
@@ -90,6 +112,15 @@ TECNICO_NOTIFY_NUMBER = os.getenv("TECNICO_NOTIFY_NUMBER", "")
 # DEPRECATED: usar LUISA_HUMAN_NOTIFY_NUMBER
 TEST_NOTIFY_NUMBER = LUISA_HUMAN_NOTIFY_NUMBER
 
+# Entrega de notificaciones internas (ver app/services/notification_worker.py)
+# Cada cuánto se entregan las pendientes (0 = deshabilitado)
+NOTIFICATION_WORKER_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_WORKER_INTERVAL_SECONDS", "2"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+# Varias notificaciones al mismo destino viajan en un mensaje (límite de WhatsApp: 4096)
+NOTIFICATION_BATCH_MAX_CHARS = int(os.getenv("NOTIFICATION_BATCH_MAX_CHARS", "3500"))
+# Log de solo agregado con cada handoff y su entrega (reemplaza los JSON de outbox/)
+HANDOFF_LOG_PATH = Path(os.getenv("HANDOFF_LOG_PATH", str(OUTBOX_DIR / "handoffs.jsonl")))
+
 # ============================================================================
 # HORARIO DE TRABAJO (Solo si se usa número personal - NO RECOMENDADO)
 # ============================================================================
@@ -115,6 +146,15 @@ PERSONAL_MESSAGES_MODE = os.getenv("PERSONAL_MESSAGES_MODE", "silent").lower()
 # Solo se usa si OPENAI_ENABLED=true y hay dudas sobre si es mensaje personal o del negocio
 ENHANCED_FILTERING_WITH_LLM = os.getenv("ENHANCED_FILTERING_WITH_LLM", "true").lower() == "true"  # Habilitado por defecto
 
+# ============================================================================
+# CLASIFICADOR LOCAL (antes de los clasificadores con LLM)
+# ============================================================================
+# Modelos de scripts/train_local_classifier.py; sin modelo entrenado se escala al LLM como siempre
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "true").lower() == "true"
+LOCAL_CLASSIFIER_MODEL_DIR = Path(os.getenv("LOCAL_CLASSIFIER_MODEL_DIR", str(BASE_DIR / "models")))
+# Confianza calibrada mínima para no llamar al LLM
+LOCAL_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("LOCAL_CLASSIFIER_MIN_CONFIDENCE", "0.85"))
+
 # ============================================================================
 # MODO SOMBRA (Shadow Mode)
 # ============================================================================
@@ -144,6 +184,35 @@ if PRODUCTION_MODE:
     if LOG_LEVEL.upper() == "DEBUG":
         LOG_LEVEL = "INFO"
 
+# ============================================================================
+# RETENCIÓN Y ROLLUPS DE TRAZAS
+# ============================================================================
+# Trazas crudas (texto completo) se borran pasado este plazo, ya agregadas en rollups
+TRACE_RETENTION_DAYS = int(os.getenv("TRACE_RETENTION_DAYS", "30"))
+TRACE_ROLLUP_MINUTE_RETENTION_HOURS = int(os.getenv("TRACE_ROLLUP_MINUTE_RETENTION_HOURS", "48"))
+TRACE_ROLLUP_HOUR_RETENTION_DAYS = int(os.getenv("TRACE_ROLLUP_HOUR_RETENTION_DAYS", "400"))
+# Cada cuánto corre el mantenimiento en segundo plano (0 = solo vía scripts/maintain_traces.py)
+TRACE_MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("TRACE_MAINTENANCE_INTERVAL_SECONDS", "300"))
+# Fracción de trazas que guardan tiempos por etapa (0 = ninguna; /metrics los sigue recibiendo)
+TRACE_SPAN_SAMPLE_RATE = float(os.getenv("TRACE_SPAN_SAMPLE_RATE", "1.0"))
+# Destino de scripts/export_analytics.py (Parquet/Arrow particionado por día)
+ANALYTICS_EXPORT_DIR = Path(os.getenv("ANALYTICS_EXPORT_DIR", str(BASE_DIR.parent / "exports")))
+
+# ============================================================================
+# MÉTRICAS EN MEMORIA (ventana reciente para /api/ops/snapshot)
+# ============================================================================
+LIVE_METRICS_WINDOW_MINUTES = int(os.getenv("LIVE_METRICS_WINDOW_MINUTES", "60"))
+# Tope de decision_path distintos en la ventana (el resto se agrupa en "other")
+LIVE_METRICS_MAX_SERIES = int(os.getenv("LIVE_METRICS_MAX_SERIES", "200"))
+# Cada cuánto se guarda la ventana en la DB para sobrevivir reinicios (0 = solo al apagar)
+LIVE_METRICS_PERSIST_INTERVAL_SECONDS = int(os.getenv("LIVE_METRICS_PERSIST_INTERVAL_SECONDS", "60"))
+
+# ============================================================================
+# ARRANQUE (warm-up antes de declararse listo en /health)
+# ============================================================================
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("WARMUP_CONNECT_TIMEOUT_SECONDS", "3"))
+
 # ============================================================================
 # BUSINESS CONFIGURATION
 # ============================================================================
@@ -163,6 +232,10 @@ N8N_HANDOFF_WEBHOOK_URL = os.getenv("N8N_HANDOFF_WEBHOOK_URL", "")
 ASSET_PROVIDER = os.getenv("ASSET_PROVIDER", "local")  # "local" | "drive"
 GOOGLE_DRIVE_FOLDER_ID = os.getenv("GOOGLE_DRIVE_FOLDER_ID", "")
 GOOGLE_SERVICE_ACCOUNT_JSON_PATH = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON_PATH", "")
+GOOGLE_DRIVE_API_URL = os.getenv("GOOGLE_DRIVE_API_URL", "https://www.googleapis.com/drive/v3")
+# Cache en disco de archivos de Drive: presupuesto en bytes (LRU) y TTL
+DRIVE_CACHE_MAX_BYTES = int(os.getenv("DRIVE_CACHE_MAX_MB", "512")) * 1024 * 1024
+DRIVE_CACHE_TTL_HOURS = int(os.getenv("DRIVE_CACHE_TTL_HOURS", "24"))
 
 
 def validate_config():
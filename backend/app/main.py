@@ -2,13 +2,56 @@
 Módulo principal de la aplicación LUISA.
 Crea la aplicación FastAPI y monta los routers.
 """
+import time
+from contextlib import asynccontextmanager
+
+from app.startup import (
+    startup_phase,
+    record_phase,
+    mark_startup_complete,
+    get_startup_report,
+    is_ready,
+    start_background_tasks,
+    stop_background_tasks,
+)
+
+_imports_start = time.perf_counter()
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
-from app.config import validate_config, WHATSAPP_ENABLED
+from app import config
+from app.config import validate_config
 from app.models.database import init_db
-from app.routers import api, whatsapp
+from app.services.asset_manifest import init_asset_manifest
+from app.routers import api
 from app.logging_config import logger
+record_phase("imports", _imports_start)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Fases de arranque que no hacen falta para importar la app, y warm-up."""
+    # Manifiesto de assets (ruta, MIME, hash y ETag precomputados).
+    # Si se sirve un asset antes, get_asset_entry lo inicializa bajo demanda.
+    with startup_phase("asset_manifest"):
+        init_asset_manifest()
+    
+    warmup_report = None
+    if config.WARMUP_ENABLED:
+        from app.services.warmup import run_warmup
+        warmup_report = await run_warmup()
+    mark_startup_complete(warmup_report)
+    
+    # Ventana de /api/ops/snapshot guardada antes del último apagado
+    from app.services.live_metrics import restore_live_metrics
+    restore_live_metrics()
+    
+    tasks = start_background_tasks(config.WHATSAPP_ENABLED)
+    
+    yield
+    
+    await stop_background_tasks(tasks)
 
 
 def create_app() -> FastAPI:
@@ -18,6 +61,9 @@ def create_app() -> FastAPI:
     Returns:
         FastAPI app configurada
     """
+    # Leído al crear la app (no al importar el módulo) para respetar recargas de config
+    whatsapp_enabled = config.WHATSAPP_ENABLED
+    
     # Validar configuración
     warnings = validate_config()
     for warning in warnings:
@@ -27,7 +73,8 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title="LUISA - Asistente El Sastre",
         description="API del asistente comercial para Almacén y Taller El Sastre",
-        version="2.0.0"
+        version="2.0.0",
+        lifespan=lifespan
     )
     
     # CORS
@@ -39,26 +86,42 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
-    # Inicializar base de datos
-    init_db()
+    # Inicializar base de datos (con el esquema al día es una lectura de PRAGMA)
+    with startup_phase("init_db"):
+        init_db()
     
     # Montar routers
-    app.include_router(api.router)
-    
-    if WHATSAPP_ENABLED:
-        app.include_router(whatsapp.router)
-        logger.info("WhatsApp webhook habilitado")
+    with startup_phase("routers"):
+        app.include_router(api.router)
+        
+        if whatsapp_enabled:
+            from app.routers import whatsapp
+            app.include_router(whatsapp.router)
+            logger.info("WhatsApp webhook habilitado")
     
     # Health check
     @app.get("/health")
     async def health_check():
+        # 503 hasta terminar el warm-up: healthchecks y deploy esperan a que esté lista
+        if not is_ready():
+            return JSONResponse(
+                status_code=503,
+                content={"status": "warming_up", "service": "luisa", "startup": get_startup_report()}
+            )
         return {
             "status": "healthy",
             "service": "luisa",
             "version": "2.0.0",
-            "whatsapp_enabled": WHATSAPP_ENABLED
+            "whatsapp_enabled": whatsapp_enabled,
+            "startup": get_startup_report()
         }
     
+    # Exposición Prometheus (labels acotados, sin datos de clientes)
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        from app.services.metrics import render_metrics, CONTENT_TYPE
+        return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+    
     logger.info("Aplicación LUISA iniciada", version="2.0.0")
     
     return app
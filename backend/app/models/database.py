@@ -3,11 +3,14 @@ Gestión de base de datos SQLite para LUISA.
 Incluye tablas legacy + nuevas (trazas, notificaciones, modo sombra).
 """
 import sqlite3
+import sys
+import time
 from contextlib import contextmanager
-from typing import Generator, Optional, List, Dict, Any
+from typing import Generator, Optional, List, Dict, Any, Set, Tuple
 from datetime import datetime
 
 from app.config import DB_PATH
+from app.services.metrics import DB_QUERY_SECONDS
 
 
 def get_connection(timeout: float = 10.0) -> sqlite3.Connection:
@@ -20,6 +23,9 @@ def get_connection(timeout: float = 10.0) -> sqlite3.Connection:
 @contextmanager
 def get_db() -> Generator[sqlite3.Connection, None, None]:
     """Context manager para conexiones de base de datos."""
+    # Función que abrió el bloque (label acotado de luisa_db_query_seconds)
+    operation = sys._getframe(2).f_code.co_name
+    start = time.perf_counter()
     conn = get_connection()
     try:
         yield conn
@@ -29,350 +35,21 @@ def get_db() -> Generator[sqlite3.Connection, None, None]:
         raise
     finally:
         conn.close()
+        DB_QUERY_SECONDS.observe(time.perf_counter() - start, operation)
 
 
 def init_db():
-    """Inicializa todas las tablas de la base de datos."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        
-        # ================================================================
-        # TABLAS LEGACY (mantener compatibilidad)
-        # ================================================================
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS conversations (
-                conversation_id TEXT PRIMARY KEY,
-                customer_name TEXT,
-                customer_phone TEXT,
-                status TEXT DEFAULT 'active',
-                conversation_mode TEXT DEFAULT 'AI_ACTIVE',
-                mode_updated_at TIMESTAMP,
-                channel TEXT DEFAULT 'api',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id TEXT,
-                text TEXT,
-                sender TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (conversation_id) REFERENCES conversations(conversation_id)
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS handoffs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id TEXT,
-                reason TEXT,
-                priority TEXT,
-                summary TEXT,
-                suggested_response TEXT,
-                customer_name TEXT,
-                routed_team TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (conversation_id) REFERENCES conversations(conversation_id)
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS catalog_items (
-                image_id TEXT PRIMARY KEY,
-                title TEXT,
-                category TEXT,
-                brand TEXT,
-                model TEXT,
-                represents TEXT,
-                conversation_role TEXT,
-                priority INTEGER,
-                send_when_customer_says TEXT,
-                meta_json TEXT,
-                drive_file_id TEXT,
-                drive_mime_type TEXT,
-                asset_provider TEXT DEFAULT 'local',
-                file_name TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS cache_metadata (
-                cache_key TEXT PRIMARY KEY,
-                file_path TEXT,
-                drive_file_id TEXT,
-                mime_type TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP
-            )
-        """)
-        
-        # ================================================================
-        # NUEVAS TABLAS
-        # ================================================================
-        
-        # Tabla de trazas de interacciones
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS interaction_traces (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                request_id TEXT,
-                conversation_id TEXT,
-                channel TEXT,
-                customer_phone_hash TEXT,
-                raw_text TEXT,
-                normalized_text TEXT,
-                business_related INTEGER,
-                intent TEXT,
-                routed_team TEXT,
-                selected_asset_id TEXT,
-                openai_called INTEGER DEFAULT 0,
-                prompt_version TEXT,
-                cache_hit INTEGER DEFAULT 0,
-                response_text TEXT,
-                latency_ms REAL,
-                latency_us INTEGER DEFAULT 0,
-                decision_path TEXT,
-                response_len_chars INTEGER DEFAULT 0,
-                error_message TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Tabla de notificaciones internas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS notifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id TEXT,
-                team TEXT,
-                notification_text TEXT,
-                destination_number TEXT,
-                sent_at TIMESTAMP,
-                delivery_status TEXT DEFAULT 'pending',
-                error TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Índices para mejor rendimiento
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_messages_conversation 
-            ON messages(conversation_id)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_traces_conversation 
-            ON interaction_traces(conversation_id)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_traces_created 
-            ON interaction_traces(created_at)
-        """)
-
-        # Agregar columnas nuevas a tablas existentes si no existen
-        try:
-            cursor.execute("ALTER TABLE conversations ADD COLUMN conversation_mode TEXT DEFAULT 'AI_ACTIVE'")
-        except sqlite3.OperationalError:
-            pass  # Columna ya existe
-
-        try:
-            cursor.execute("ALTER TABLE conversations ADD COLUMN mode_updated_at TIMESTAMP")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE conversations ADD COLUMN customer_phone TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE conversations ADD COLUMN channel TEXT DEFAULT 'api'")
-        except sqlite3.OperationalError:
-            pass
-
-        # Columna para TTL HUMAN_ACTIVE (P0-3): mode_updated_at_epoch (INTEGER, UTC epoch)
-        try:
-            cursor.execute("ALTER TABLE conversations ADD COLUMN mode_updated_at_epoch INTEGER")
-        except sqlite3.OperationalError:
-            pass
-
-        # Columnas para tracking de llamadas OpenAI
-        try:
-            cursor.execute("ALTER TABLE conversations ADD COLUMN openai_calls_count INTEGER DEFAULT 0")
-        except sqlite3.OperationalError:
-            pass  # Columna ya existe
-        
-        try:
-            cursor.execute("ALTER TABLE conversations ADD COLUMN first_openai_call_at TIMESTAMP")
-        except sqlite3.OperationalError:
-            pass  # Columna ya existe
-        
-        try:
-            cursor.execute("ALTER TABLE conversations ADD COLUMN last_openai_call_at TIMESTAMP")
-        except sqlite3.OperationalError:
-            pass  # Columna ya existe
-
-        try:
-            cursor.execute("ALTER TABLE handoffs ADD COLUMN routed_team TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        # Migraciones adicionales para interaction_traces
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN error_message TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN customer_phone_hash TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN normalized_text TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN selected_asset_id TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN prompt_version TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN decision_path TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN response_len_chars INTEGER DEFAULT 0")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN latency_us INTEGER DEFAULT 0")
-        except sqlite3.OperationalError:
-            pass
-
-        # Campos para hardening de envío WhatsApp (P0-2)
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN whatsapp_send_success INTEGER")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN whatsapp_send_latency_ms REAL")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN whatsapp_send_error_code TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        # Campos para clasificación persistida (P0-4)
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN classification TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN is_personal INTEGER")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN classification_score REAL")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN classification_reasons TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN classifier_version TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        # Campos para OpenAI Canary (P0-6)
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN openai_canary_allowed INTEGER")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN openai_latency_ms REAL")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN openai_error TEXT")
-        except sqlite3.OperationalError:
-            pass
-
-        try:
-            cursor.execute("ALTER TABLE interaction_traces ADD COLUMN openai_fallback_used INTEGER")
-        except sqlite3.OperationalError:
-            pass
-
-        # Tabla para idempotencia de mensajes WhatsApp
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS wa_processed_messages (
-                message_id TEXT PRIMARY KEY,
-                received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                phone_from TEXT,
-                text_preview TEXT
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_wa_processed_received 
-            ON wa_processed_messages(received_at)
-        """)
-        
-        # Tabla para deduplicación de outbox (anti-spam)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS wa_outbox_dedup (
-                dedup_key TEXT PRIMARY KEY,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                ttl_seconds INTEGER DEFAULT 120,
-                phone_to TEXT,
-                text_preview TEXT
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_wa_outbox_created 
-            ON wa_outbox_dedup(created_at)
-        """)
-        
-        # Tabla para estado conversacional (Sales Dialogue Manager)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS wa_conversations (
-                phone_from TEXT PRIMARY KEY,
-                state_json TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_wa_conversations_updated 
-            ON wa_conversations(updated_at)
-        """)
-        
-        # Configurar SQLite para mejor concurrencia
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.execute("PRAGMA busy_timeout=3000")
+    """
+    Aplica las migraciones de esquema pendientes (ver app/models/migrations.py).
+    Con el esquema al día es una sola lectura de PRAGMA user_version.
+    """
+    from app.models.migrations import migrate
+    
+    conn = get_connection()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
 
 
 # ============================================================================
@@ -570,6 +247,14 @@ def save_message(conversation_id: str, text: str, sender: str) -> None:
         """, (conversation_id, text, sender))
 
 
+def delete_conversation_data(conversation_id: str) -> None:
+    """Borra una conversación con sus mensajes, trazas, handoffs y notificaciones."""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        for table in ("messages", "interaction_traces", "handoffs", "notifications", "conversations"):
+            cursor.execute(f"DELETE FROM {table} WHERE conversation_id = ?", (conversation_id,))
+
+
 def save_trace(
     request_id: str,
     conversation_id: str,
@@ -602,9 +287,17 @@ def save_trace(
     openai_canary_allowed: Optional[int] = None,
     openai_latency_ms: Optional[float] = None,
     openai_error: Optional[str] = None,
-    openai_fallback_used: Optional[int] = None
+    openai_fallback_used: Optional[int] = None,
+    stage_timings: Optional[str] = None,
+    whatsapp_message_id: Optional[str] = None,
+    inbound_at: Optional[float] = None
 ) -> None:
-    """Guarda una traza de interacción."""
+    """
+    Guarda una traza de interacción (stage_timings: JSON {etapa: µs}).
+
+    whatsapp_message_id (wamid de la respuesta) une la traza con wa_message_status;
+    inbound_at es el timestamp de Meta del mensaje del cliente.
+    """
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
@@ -616,8 +309,9 @@ def save_trace(
                 decision_path, response_len_chars, error_message,
                 whatsapp_send_success, whatsapp_send_latency_ms, whatsapp_send_error_code,
                 classification, is_personal, classification_score, classification_reasons, classifier_version,
-                openai_canary_allowed, openai_latency_ms, openai_error, openai_fallback_used
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                openai_canary_allowed, openai_latency_ms, openai_error, openai_fallback_used,
+                stage_timings, whatsapp_message_id, inbound_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             request_id, conversation_id, channel, customer_phone_hash,
             raw_text, normalized_text, int(business_related), intent,
@@ -626,7 +320,8 @@ def save_trace(
             decision_path, response_len_chars, error_message,
             whatsapp_send_success, whatsapp_send_latency_ms, whatsapp_send_error_code,
             classification, is_personal, classification_score, classification_reasons, classifier_version,
-            openai_canary_allowed, openai_latency_ms, openai_error, openai_fallback_used
+            openai_canary_allowed, openai_latency_ms, openai_error, openai_fallback_used,
+            stage_timings, whatsapp_message_id, inbound_at
         ))
 
 
@@ -713,6 +408,31 @@ def mark_wa_message_processed(message_id: str, phone_from: str, text_preview: st
         return cursor.rowcount > 0
 
 
+def mark_wa_messages_processed(messages: List[Tuple[str, str, str]]) -> Set[str]:
+    """
+    Versión en lote de mark_wa_message_processed: una sola transacción.
+
+    Args:
+        messages: (message_id, phone_from, text_preview) por mensaje
+
+    Returns:
+        message_ids nuevos (los duplicados, también dentro del lote, quedan fuera)
+    """
+    new_ids = set()
+    with get_db() as conn:
+        cursor = conn.cursor()
+        for message_id, phone_from, text_preview in messages:
+            if not message_id:
+                continue
+            cursor.execute("""
+                INSERT OR IGNORE INTO wa_processed_messages (message_id, phone_from, text_preview)
+                VALUES (?, ?, ?)
+            """, (message_id, phone_from[-4:] if phone_from else "", text_preview[:50] if text_preview else ""))
+            if cursor.rowcount > 0:
+                new_ids.add(message_id)
+    return new_ids
+
+
 def is_wa_message_processed(message_id: str) -> bool:
     """Verifica si un mensaje ya fue procesado."""
     if not message_id:
@@ -777,6 +497,55 @@ def check_outbox_dedup(phone_to: str, text: str, ttl_seconds: int = 120) -> bool
         return False  # Es nuevo, puede enviar
 
 
+def get_wa_media_id(content_hash: str, phone_number_id: str) -> Optional[str]:
+    """
+    Obtiene el media_id de WhatsApp para un archivo ya subido (si no expiró).
+    
+    Args:
+        content_hash: SHA-256 del contenido del archivo
+        phone_number_id: Número de negocio al que pertenece la media
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT media_id FROM wa_media_cache
+            WHERE content_hash = ? AND phone_number_id = ?
+            AND expires_at > ?
+        """, (content_hash, phone_number_id, datetime.utcnow().isoformat()))
+        row = cursor.fetchone()
+        return row["media_id"] if row else None
+
+
+def save_wa_media_id(
+    content_hash: str,
+    phone_number_id: str,
+    media_id: str,
+    mime_type: str,
+    ttl_seconds: int
+) -> None:
+    """Guarda el media_id de un archivo subido a WhatsApp con su expiración."""
+    from datetime import timedelta
+    
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO wa_media_cache
+            (content_hash, phone_number_id, media_id, mime_type, uploaded_at, expires_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+        """, (content_hash, phone_number_id, media_id, mime_type, expires_at.isoformat()))
+
+
+def delete_wa_media_id(content_hash: str, phone_number_id: str) -> None:
+    """Invalida un media_id (ej: WhatsApp lo rechazó por expirado)."""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM wa_media_cache WHERE content_hash = ? AND phone_number_id = ?",
+            (content_hash, phone_number_id)
+        )
+
+
 def cleanup_expired_outbox_dedup():
     """Limpia registros expirados de outbox_dedup (ejecutar periódicamente)."""
     with get_db() as conn:
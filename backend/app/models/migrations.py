@@ -0,0 +1,464 @@
+"""
+Migraciones versionadas del esquema SQLite.
+
+La versión aplicada se guarda en `PRAGMA user_version`. Cada migración tiene un
+número, corre una sola vez y todas las pendientes se aplican en una transacción:
+si una falla, el esquema y user_version quedan como estaban.
+
+En un arranque con el esquema al día, migrate() es una sola lectura de pragma.
+
+Para agregar una migración: escribir una función `_mNNN_descripcion(cursor)` y
+agregarla al final de MIGRATIONS con el siguiente número. Nunca modificar una
+migración ya publicada. Los pasos deben ser idempotentes (bases de datos
+anteriores a este sistema llegan con user_version=0 y esquemas parciales).
+"""
+import sqlite3
+from typing import Callable, List, Tuple
+
+from app.logging_config import logger
+
+
+Migration = Tuple[int, str, Callable[[sqlite3.Cursor], None]]
+
+
+def _column_names(cursor: sqlite3.Cursor, table: str) -> set:
+    return {row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def add_column_if_missing(cursor: sqlite3.Cursor, table: str, column: str, definition: str) -> None:
+    """ALTER TABLE ADD COLUMN solo si la columna no existe (sin probes que fallan)."""
+    if column not in _column_names(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# ============================================================================
+# MIGRACIONES
+# ============================================================================
+
+def _m001_esquema_base(cursor: sqlite3.Cursor) -> None:
+    """Tablas legacy + nuevas y columnas agregadas antes de versionar el esquema."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS conversations (
+            conversation_id TEXT PRIMARY KEY,
+            customer_name TEXT,
+            customer_phone TEXT,
+            status TEXT DEFAULT 'active',
+            conversation_mode TEXT DEFAULT 'AI_ACTIVE',
+            mode_updated_at TIMESTAMP,
+            channel TEXT DEFAULT 'api',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT,
+            text TEXT,
+            sender TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conversation_id) REFERENCES conversations(conversation_id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS handoffs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT,
+            reason TEXT,
+            priority TEXT,
+            summary TEXT,
+            suggested_response TEXT,
+            customer_name TEXT,
+            routed_team TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (conversation_id) REFERENCES conversations(conversation_id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_items (
+            image_id TEXT PRIMARY KEY,
+            title TEXT,
+            category TEXT,
+            brand TEXT,
+            model TEXT,
+            represents TEXT,
+            conversation_role TEXT,
+            priority INTEGER,
+            send_when_customer_says TEXT,
+            meta_json TEXT,
+            drive_file_id TEXT,
+            drive_mime_type TEXT,
+            asset_provider TEXT DEFAULT 'local',
+            file_name TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cache_metadata (
+            cache_key TEXT PRIMARY KEY,
+            file_path TEXT,
+            drive_file_id TEXT,
+            mime_type TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS interaction_traces (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            request_id TEXT,
+            conversation_id TEXT,
+            channel TEXT,
+            customer_phone_hash TEXT,
+            raw_text TEXT,
+            normalized_text TEXT,
+            business_related INTEGER,
+            intent TEXT,
+            routed_team TEXT,
+            selected_asset_id TEXT,
+            openai_called INTEGER DEFAULT 0,
+            prompt_version TEXT,
+            cache_hit INTEGER DEFAULT 0,
+            response_text TEXT,
+            latency_ms REAL,
+            latency_us INTEGER DEFAULT 0,
+            decision_path TEXT,
+            response_len_chars INTEGER DEFAULT 0,
+            error_message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT,
+            team TEXT,
+            notification_text TEXT,
+            destination_number TEXT,
+            sent_at TIMESTAMP,
+            delivery_status TEXT DEFAULT 'pending',
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_traces_conversation ON interaction_traces(conversation_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_traces_created ON interaction_traces(created_at)")
+
+    # Columnas que llegaron después de crear las tablas (DBs existentes)
+    for column, definition in [
+        ("customer_phone", "TEXT"),
+        ("conversation_mode", "TEXT DEFAULT 'AI_ACTIVE'"),
+        ("mode_updated_at", "TIMESTAMP"),
+        ("channel", "TEXT DEFAULT 'api'"),
+        ("mode_updated_at_epoch", "INTEGER"),  # TTL HUMAN_ACTIVE (P0-3)
+        ("openai_calls_count", "INTEGER DEFAULT 0"),
+        ("first_openai_call_at", "TIMESTAMP"),
+        ("last_openai_call_at", "TIMESTAMP"),
+    ]:
+        add_column_if_missing(cursor, "conversations", column, definition)
+
+    add_column_if_missing(cursor, "handoffs", "routed_team", "TEXT")
+
+    for column, definition in [
+        ("error_message", "TEXT"),
+        ("customer_phone_hash", "TEXT"),
+        ("normalized_text", "TEXT"),
+        ("selected_asset_id", "TEXT"),
+        ("prompt_version", "TEXT"),
+        ("decision_path", "TEXT"),
+        ("response_len_chars", "INTEGER DEFAULT 0"),
+        ("latency_us", "INTEGER DEFAULT 0"),
+        # Hardening de envío WhatsApp (P0-2)
+        ("whatsapp_send_success", "INTEGER"),
+        ("whatsapp_send_latency_ms", "REAL"),
+        ("whatsapp_send_error_code", "TEXT"),
+        # Clasificación persistida (P0-4)
+        ("classification", "TEXT"),
+        ("is_personal", "INTEGER"),
+        ("classification_score", "REAL"),
+        ("classification_reasons", "TEXT"),
+        ("classifier_version", "TEXT"),
+        # OpenAI Canary (P0-6)
+        ("openai_canary_allowed", "INTEGER"),
+        ("openai_latency_ms", "REAL"),
+        ("openai_error", "TEXT"),
+        ("openai_fallback_used", "INTEGER"),
+    ]:
+        add_column_if_missing(cursor, "interaction_traces", column, definition)
+
+    # Idempotencia de mensajes WhatsApp
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wa_processed_messages (
+            message_id TEXT PRIMARY KEY,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            phone_from TEXT,
+            text_preview TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_wa_processed_received ON wa_processed_messages(received_at)")
+
+    # Deduplicación de outbox (anti-spam)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wa_outbox_dedup (
+            dedup_key TEXT PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ttl_seconds INTEGER DEFAULT 120,
+            phone_to TEXT,
+            text_preview TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_wa_outbox_created ON wa_outbox_dedup(created_at)")
+
+    # Estado conversacional (Sales Dialogue Manager)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wa_conversations (
+            phone_from TEXT PRIMARY KEY,
+            state_json TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_wa_conversations_updated ON wa_conversations(updated_at)")
+
+
+def _m002_cache_drive_lru(cursor: sqlite3.Cursor) -> None:
+    """Tamaño y último acceso para el desalojo LRU del cache de Drive."""
+    add_column_if_missing(cursor, "cache_metadata", "size_bytes", "INTEGER DEFAULT 0")
+    add_column_if_missing(cursor, "cache_metadata", "last_accessed_at", "REAL")
+
+
+def _m003_wa_media_cache(cursor: sqlite3.Cursor) -> None:
+    """Cache de media subida a WhatsApp: hash de contenido -> media_id."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wa_media_cache (
+            content_hash TEXT,
+            phone_number_id TEXT,
+            media_id TEXT NOT NULL,
+            mime_type TEXT,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            PRIMARY KEY (content_hash, phone_number_id)
+        )
+    """)
+
+
+def _m004_traces_message_type(cursor: sqlite3.Cursor) -> None:
+    """save_trace() inserta message_type pero la columna nunca se creó."""
+    add_column_if_missing(cursor, "interaction_traces", "message_type", "TEXT")
+
+
+def _m005_trace_rollups(cursor: sqlite3.Cursor) -> None:
+    """Rollups por minuto/hora de interaction_traces (ver app/services/trace_rollups.py)."""
+    for table in ("trace_rollup_minute", "trace_rollup_hour"):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket_start TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                msgs INTEGER DEFAULT 0,
+                personal INTEGER DEFAULT 0,
+                handoffs INTEGER DEFAULT 0,
+                openai_calls INTEGER DEFAULT 0,
+                openai_fallbacks INTEGER DEFAULT 0,
+                openai_unauthorized INTEGER DEFAULT 0,
+                openai_latency_count INTEGER DEFAULT 0,
+                openai_latency_sum_ms REAL DEFAULT 0,
+                errors INTEGER DEFAULT 0,
+                latency_count INTEGER DEFAULT 0,
+                latency_sum_ms REAL DEFAULT 0,
+                latency_hist TEXT DEFAULT '{{}}',
+                PRIMARY KEY (bucket_start, channel)
+            )
+        """)
+    # Conjunto de conversaciones por hora: COUNT(DISTINCT) no se puede sumar entre buckets
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS trace_rollup_conversations (
+            bucket_start TEXT NOT NULL,
+            conversation_id TEXT NOT NULL,
+            PRIMARY KEY (bucket_start, conversation_id)
+        )
+    """)
+    # Marca de agua: último interaction_traces.id ya agregado
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS trace_rollup_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+
+
+def _m006_live_metrics_state(cursor: sqlite3.Cursor) -> None:
+    """Ventana de métricas en memoria persistida (ver app/services/live_metrics.py)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS live_metrics_state (
+            key TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _m007_trace_stage_timings(cursor: sqlite3.Cursor) -> None:
+    """Tiempos por etapa de cada traza muestreada, JSON compacto {etapa: µs}."""
+    add_column_if_missing(cursor, "interaction_traces", "stage_timings", "TEXT")
+
+
+def _m008_export_state(cursor: sqlite3.Cursor) -> None:
+    """Marca de agua por tabla de la exportación columnar (ver app/services/analytics_export.py)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS export_state (
+            table_name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            exported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _m009_wa_outbound_queue(cursor: sqlite3.Cursor) -> None:
+    """Envíos de WhatsApp pendientes de reintento (ver app/services/outbound_queue.py)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wa_outbound_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            phone_number_id TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            conversation_id TEXT,
+            trace_request_id TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            next_attempt_at REAL NOT NULL,
+            enqueued_at REAL NOT NULL,
+            last_error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_wa_outbound_recipient ON wa_outbound_queue(status, recipient, id)")
+    # El resultado diferido de un envío se escribe en la traza por request_id
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_traces_request_id ON interaction_traces(request_id)")
+
+
+def _m010_notifications_delivery_queue(cursor: sqlite3.Cursor) -> None:
+    """notifications pasa a ser la cola del worker de entrega (ver app/services/notification_worker.py)."""
+    add_column_if_missing(cursor, "notifications", "attempts", "INTEGER NOT NULL DEFAULT 0")
+    add_column_if_missing(cursor, "notifications", "next_attempt_at", "REAL NOT NULL DEFAULT 0")
+    # Antes el estado nunca se actualizaba: las históricas quedaron en 'pending'
+    # aunque se enviaron en línea. No deben reenviarse al activar el worker.
+    cursor.execute("UPDATE notifications SET delivery_status = 'legacy' WHERE delivery_status = 'pending'")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_notifications_delivery ON notifications(delivery_status, next_attempt_at)"
+    )
+
+
+def _m011_wa_message_status(cursor: sqlite3.Cursor) -> None:
+    """Statuses de Meta por wamid, unidos a la traza que generó el envío (ver app/services/status_ingest.py)."""
+    add_column_if_missing(cursor, "interaction_traces", "whatsapp_message_id", "TEXT")
+    # Timestamp (epoch, reloj de Meta) del mensaje del cliente que originó la respuesta
+    add_column_if_missing(cursor, "interaction_traces", "inbound_at", "REAL")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_traces_whatsapp_message_id ON interaction_traces(whatsapp_message_id)"
+    )
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS wa_message_status (
+            wamid TEXT PRIMARY KEY,
+            sent_at REAL,
+            delivered_at REAL,
+            read_at REAL,
+            failed_at REAL,
+            error_code INTEGER,
+            error_title TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_wa_message_status_updated ON wa_message_status(updated_at)")
+
+
+def _m012_trace_rollup_send_failures(cursor: sqlite3.Cursor) -> None:
+    """Envíos de WhatsApp fallidos en los rollups, también los que fallan después en la cola de salida."""
+    for table in ("trace_rollup_minute", "trace_rollup_hour"):
+        add_column_if_missing(cursor, table, "send_failures", "INTEGER DEFAULT 0")
+
+
+MIGRATIONS: List[Migration] = [
+    (1, "esquema_base", _m001_esquema_base),
+    (2, "cache_drive_lru", _m002_cache_drive_lru),
+    (3, "wa_media_cache", _m003_wa_media_cache),
+    (4, "traces_message_type", _m004_traces_message_type),
+    (5, "trace_rollups", _m005_trace_rollups),
+    (6, "live_metrics_state", _m006_live_metrics_state),
+    (7, "trace_stage_timings", _m007_trace_stage_timings),
+    (8, "export_state", _m008_export_state),
+    (9, "wa_outbound_queue", _m009_wa_outbound_queue),
+    (10, "notifications_delivery_queue", _m010_notifications_delivery_queue),
+    (11, "wa_message_status", _m011_wa_message_status),
+    (12, "trace_rollup_send_failures", _m012_trace_rollup_send_failures),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ============================================================================
+# EJECUCIÓN
+# ============================================================================
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Versión de esquema aplicada (PRAGMA user_version)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, migrations: List[Migration] = MIGRATIONS) -> int:
+    """
+    Aplica las migraciones pendientes en una sola transacción.
+
+    Args:
+        conn: conexión SQLite
+        migrations: lista ordenada de (versión, nombre, función)
+
+    Returns:
+        Cantidad de migraciones aplicadas (0 si el esquema estaba al día)
+    """
+    latest = migrations[-1][0] if migrations else 0
+    if get_schema_version(conn) >= latest:
+        return 0
+
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None  # Control explícito de la transacción (DDL incluido)
+    applied = []
+    try:
+        # IMMEDIATE: toma el lock de escritura antes de releer la versión, así dos
+        # procesos arrancando a la vez no aplican la misma migración dos veces
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = get_schema_version(conn)
+            cursor = conn.cursor()
+            for version, name, step in migrations:
+                if version <= current:
+                    continue
+                step(cursor)
+                cursor.execute(f"PRAGMA user_version = {int(version)}")
+                applied.append(name)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if applied:
+            # WAL es persistente en el archivo: basta con fijarlo al migrar
+            conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        conn.isolation_level = previous_isolation
+
+    if applied:
+        logger.info(
+            "Migraciones de esquema aplicadas",
+            from_version=current,
+            to_version=get_schema_version(conn),
+            migrations=applied
+        )
+    return len(applied)
@@ -10,6 +10,7 @@ Mantiene compatibilidad con endpoints existentes:
 from fastapi import APIRouter, HTTPException, Header, Request
 from fastapi.responses import FileResponse, StreamingResponse
 from typing import Optional
+import asyncio
 import io
 
 from app.models.schemas import (
@@ -29,12 +30,12 @@ from app.models.database import (
 from app.services.asset_service import (
     get_all_catalog_items,
     find_local_asset_file,
-    get_asset_mime_type,
-    get_promo_image_path,
-    validate_image_file,
     select_catalog_asset,
     get_catalog_item
 )
+from app.services.asset_manifest import get_asset_entry, describe_asset_file
+from app.services.asset_delivery import build_asset_response
+from app.services.asset_derivatives import select_asset_variant
 from app.services.context_service import extract_context_from_history
 from app.services.intent_service import analyze_intent
 from app.services.handoff_service import should_handoff, generate_handoff_message
@@ -58,31 +59,34 @@ async def get_catalog_items():
 
 
 @router.get("/assets/{image_id}")
-async def get_asset(image_id: str):
-    """Sirve un asset (imagen o video) del catálogo."""
-    # Caso especial: promoción navideña
-    if image_id == "promo_navidad":
-        promo_path = get_promo_image_path()
-        if promo_path and promo_path.exists():
-            return FileResponse(
-                promo_path,
-                media_type="image/png",
-                filename="promocion_navidad_2024.png"
-            )
-        raise HTTPException(status_code=404, detail="Promoción no encontrada")
-    
-    # Buscar archivo local
-    asset_file = find_local_asset_file(image_id)
+async def get_asset(image_id: str, request: Request, size: Optional[str] = None):
+    """
+    Sirve un asset (imagen o video) del catálogo desde el manifiesto precomputado.
+    Soporta ETag/304, Cache-Control inmutable con ?v=<hash> y Range (206).
+    Con ?size=thumb|medium y/o Accept: image/webp sirve un derivado pre-generado.
+    """
+    entry = get_asset_entry(image_id)
     
-    if not asset_file or not asset_file.exists():
-        raise HTTPException(status_code=404, detail=f"Asset {image_id} no encontrado")
+    if not entry:
+        # Archivo agregado después del último refresh del manifiesto: entrada bajo
+        # demanda (hashea el archivo, fuera del event loop)
+        asset_file = await asyncio.to_thread(find_local_asset_file, image_id)
+        if not asset_file:
+            raise HTTPException(status_code=404, detail=f"Asset {image_id} no encontrado")
+        entry = await asyncio.to_thread(describe_asset_file, image_id, asset_file)
     
-    mime_type = get_asset_mime_type(asset_file)
+    if not entry.valid:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Imagen placeholder detectada - agregar imagen real para {image_id}"
+        )
     
-    return FileResponse(
-        asset_file,
-        media_type=mime_type,
-        filename=asset_file.name
+    variant = select_asset_variant(entry, size, request.headers.get("accept"))
+    return build_asset_response(
+        variant,
+        request,
+        version=entry.version,
+        vary="Accept" if entry.variants else None
     )
 
 
@@ -100,19 +104,21 @@ async def cache_stats():
 
 
 @router.get("/ops/snapshot")
-async def ops_snapshot():
+async def ops_snapshot(detail: bool = False):
     """
     Obtiene snapshot de métricas operacionales.
     
     Retorna métricas de las últimas 60 minutos:
     - total_msgs_60m: Total de mensajes procesados
+    - msgs_per_min: Tasa de mensajes por minuto
     - pct_personal: Porcentaje de mensajes personales
     - pct_handoff: Porcentaje de handoffs
     - pct_openai: Porcentaje de llamadas a OpenAI
     - errores_count: Cantidad de errores
-    - p95_latency_ms: Percentil 95 de latencia
+    - p50/p95/p99_latency_ms: Percentiles de latencia
+    - series (con ?detail=true): percentiles por decision_path, canal y etapa
     """
-    return get_ops_snapshot()
+    return get_ops_snapshot(detail=detail)
 
 
 @router.post("/catalog/sync")
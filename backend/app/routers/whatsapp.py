@@ -21,19 +21,19 @@ from app.models.database import (
     get_conversation_mode,
     set_conversation_mode,
     get_conversation,
-    mark_wa_message_processed,
+    mark_wa_messages_processed,
     is_wa_message_processed,
     get_conversation_state,
     save_conversation_state
 )
 from app.services.whatsapp_service import (
-    parse_webhook_message,
-    is_status_update,
     send_whatsapp_message,
-    send_internal_notification,
-    get_phone_conversation_id,
-    analyze_webhook_event
+    send_whatsapp_media,
+    get_phone_conversation_id
 )
+from app.services.webhook_parser import decode_webhook
+from app.services.outbound_queue import SEND_QUEUED
+from app.services.status_ingest import record_statuses, flush_statuses, parse_meta_timestamp
 from app.services.sales_dialogue import next_action
 from app.services.humanizer import humanize_response_sync
 from app.services.sales_brain import process_with_salesbrain
@@ -46,6 +46,7 @@ from app.services.trace_service import trace_interaction
 from app.rules.business_guardrails import is_business_related, get_off_topic_response
 from app.rules.keywords import select_variant, HUMAN_ACTIVE_VARIANTES
 from app.logging_config import logger
+from app.services.metrics import WEBHOOK_ACK_SECONDS, WEBHOOK_QUEUE_WAIT_SECONDS
 
 
 router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
@@ -83,32 +84,55 @@ async def receive_webhook(request: Request, background_tasks: BackgroundTasks):
     ACK rápido (<1s) con procesamiento en background.
     """
     start_time = time.perf_counter()
-    
+    result = await _handle_webhook(request, background_tasks, start_time)
+    WEBHOOK_ACK_SECONDS.observe(time.perf_counter() - start_time, _ack_outcome(result))
+    return result
+
+
+def _ack_outcome(result) -> str:
+    """Resultado del ACK como label acotado de luisa_webhook_ack_seconds."""
+    if isinstance(result, Response):
+        return "rate_limited" if result.status_code == 429 else f"http_{result.status_code}"
+    if result.get("queued"):
+        return "queued"
+    if result.get("dedup"):
+        return "dedup"
+    if result.get("status") == "disabled":
+        return "disabled"
+    return "ignored"
+
+
+async def _handle_webhook(request: Request, background_tasks: BackgroundTasks, start_time: float):
+    """Valida, deduplica y encola el mensaje; retorna la respuesta del ACK."""
     if not WHATSAPP_ENABLED:
         return {"status": "disabled"}
     
     try:
-        body = await request.json()
-    except:
+        batch = decode_webhook(await request.body())
+    except ValueError:
         logger.warning("Webhook recibido sin JSON válido")
         return {"status": "ok"}
     
-    # INSTRUMENTACIÓN FORENSE
-    event_kind, has_messages, has_statuses, msg_ids, status_ids, phone_from, wa_phone_number_id = _analyze_webhook_event(body)
+    event_kind = batch.event_kind
+    
+    # Statuses (sent/delivered/read/failed): solo se acumulan en memoria;
+    # se escriben en lote fuera del ACK
+    if batch.statuses and record_statuses(batch.statuses):
+        background_tasks.add_task(flush_statuses)
     
     # FIX P0: NO procesar eventos que no son mensajes del usuario
-    if has_statuses and not has_messages:
+    if batch.statuses and not batch.messages:
         elapsed_ms = (time.perf_counter() - start_time) * 1000
         logger.info(
-            "Webhook ignorado (solo statuses)",
+            "Webhook de statuses registrado (sin messages)",
             event_kind=event_kind,
-            status_ids=status_ids[:3] if status_ids else [],
+            statuses_count=len(batch.statuses),
             elapsed_ms=round(elapsed_ms, 1),
-            decision_path="ignore_status_event"
+            decision_path="status_event_recorded"
         )
         return {"status": "ok"}
     
-    if not has_messages:
+    if not batch.messages:
         elapsed_ms = (time.perf_counter() - start_time) * 1000
         logger.info(
             "Webhook ignorado (sin messages)",
@@ -118,87 +142,110 @@ async def receive_webhook(request: Request, background_tasks: BackgroundTasks):
         )
         return {"status": "ok"}
     
-    # Parsear mensaje
-    parsed = parse_webhook_message(body)
-    if not parsed:
+    # Solo mensajes de texto por ahora
+    messages = batch.text_messages
+    if len(messages) < len(batch.messages):
+        logger.info(
+            "Mensajes no de texto ignorados",
+            types=sorted({m.type for m in batch.messages if not m.is_text}),
+            count=len(batch.messages) - len(messages)
+        )
+    if not messages:
         elapsed_ms = (time.perf_counter() - start_time) * 1000
         logger.info(
-            "Webhook ignorado (parse falló)",
+            "Webhook ignorado (sin mensajes de texto)",
             event_kind=event_kind,
-            msg_ids=msg_ids[:3] if msg_ids else [],
+            msg_ids=[m.message_id[:30] for m in batch.messages[:3]],
             elapsed_ms=round(elapsed_ms, 1),
             decision_path="parse_failed_skip"
         )
         return {"status": "ok"}
     
-    message_id = parsed.get("message_id", "")
-    phone_from = parsed["phone_from"]
-    text = parsed["text"]
-    contact_name = parsed.get("contact_name")
-    timestamp = parsed.get("timestamp", "")
-    
-    # IDEMPOTENCIA: Verificar si ya procesamos este message_id
-    if message_id:
-        if is_wa_message_processed(message_id):
-            elapsed_ms = (time.perf_counter() - start_time) * 1000
-            logger.info(
-                "Mensaje WhatsApp duplicado (dedup)",
-                message_id=message_id[:20] if message_id else "unknown",
+    accepted = []
+    dedup = rate_limited = 0
+    for message in messages:
+        message_id = message.message_id
+        phone_from = message.phone_from
+        if message_id and is_wa_message_processed(message_id):
+            dedup += 1
+            _log_duplicate(message_id, phone_from)
+            continue
+        
+        # Rate limit por número (ventana 60s)
+        rate_key = f"wa:{phone_from}"
+        if not rl_allow(rate_key, limit_per_minute=20):
+            rate_limited += 1
+            logger.warning(
+                "Rate limit WhatsApp",
                 phone=phone_from[-4:],
-                elapsed_ms=round(elapsed_ms, 1),
-                decision_path="dedup_skip"
+                remaining=rl_remaining(rate_key, 20),
+                message_id=message_id[:20] if message_id else "unknown"
             )
-            return {"status": "ok", "dedup": True}
+            continue
+        accepted.append(message)
     
-    # Marcar como procesado ANTES de encolar (idempotencia)
-    is_new = mark_wa_message_processed(message_id, phone_from, text[:50] if text else "")
+    # IDEMPOTENCIA: marcar como procesado solo lo que se encola (una transacción),
+    # antes de encolar. Los limitados quedan sin marcar para que Meta los reenvíe.
+    # Los mensajes sin id no se pueden deduplicar y se encolan igual.
+    new_ids = mark_wa_messages_processed(
+        [(m.message_id, m.phone_from, m.text[:50]) for m in accepted]
+    )
     
-    if not is_new and message_id:
-        # Race condition: otro proceso ya lo procesó
-        elapsed_ms = (time.perf_counter() - start_time) * 1000
+    queued = 0
+    for message in accepted:
+        message_id = message.message_id
+        if message_id and message_id not in new_ids:
+            # Repetido dentro del lote o entregado en paralelo por otra request
+            dedup += 1
+            _log_duplicate(message_id, message.phone_from)
+            continue
+        
+        # ACK RÁPIDO: Encolar procesamiento en background (en orden de llegada)
+        background_tasks.add_task(
+            _process_whatsapp_message,
+            message_id=message_id,
+            phone_from=message.phone_from,
+            text=message.text,
+            contact_name=message.contact_name,
+            timestamp=message.timestamp,
+            queued_at=time.perf_counter()
+        )
+        queued += 1
+    
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    if queued:
         logger.info(
-            "Mensaje WhatsApp duplicado (race condition)",
-            message_id=message_id[:20] if message_id else "unknown",
-            phone=phone_from[-4:],
+            "Mensajes WhatsApp recibidos (queued)",
+            event_kind=event_kind,
+            queued=queued,
+            dedup=dedup,
+            rate_limited=rate_limited,
+            statuses_count=len(batch.statuses),
             elapsed_ms=round(elapsed_ms, 1),
-            decision_path="dedup_skip"
+            decision_path="queued_processing",
+            msg_ids=[m.message_id[:30] for m in messages[:3]]
         )
-        return {"status": "ok", "dedup": True}
     
-    # Rate limit por número (ventana 60s)
-    rate_key = f"wa:{phone_from}"
-    if not rl_allow(rate_key, limit_per_minute=20):
-        logger.warning(
-            "Rate limit WhatsApp",
-            phone=phone_from[-4:],
-            remaining=rl_remaining(rate_key, 20),
-            message_id=message_id[:20] if message_id else "unknown"
+    # Con algún mensaje limitado, 429 aunque se haya encolado el resto: Meta reenvía
+    # el lote y los ya encolados quedan en dedup
+    if rate_limited:
+        return Response(
+            status_code=429,
+            content=json.dumps({"status": "rate_limited", "queued_count": queued}),
+            media_type="application/json"
         )
-        return Response(status_code=429, content=json.dumps({"status": "rate_limited"}), media_type="application/json")
-    
-    # ACK RÁPIDO: Encolar procesamiento en background
-    background_tasks.add_task(
-        _process_whatsapp_message,
-        message_id=message_id,
-        phone_from=phone_from,
-        text=text,
-        contact_name=contact_name,
-        timestamp=timestamp
-    )
-    
-    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    if not queued:
+        return {"status": "ok", "dedup": True}
+    return {"status": "ok", "queued": True, "queued_count": queued}
+
+
+def _log_duplicate(message_id: str, phone_from: str) -> None:
     logger.info(
-        "Mensaje WhatsApp recibido (queued)",
-        event_kind=event_kind,
-        message_id=message_id[:20] if message_id else "unknown",
-        phone=phone_from[-4:] if phone_from else "unknown",
-        text_length=len(text),
-        elapsed_ms=round(elapsed_ms, 1),
-        decision_path="queued_processing",
-        msg_ids=msg_ids[:3] if msg_ids else []
+        "Mensaje WhatsApp duplicado (dedup)",
+        message_id=message_id[:20],
+        phone=phone_from[-4:],
+        decision_path="dedup_skip"
     )
-    
-    return {"status": "ok", "queued": True}
 
 
 def _sanitize_error(error_msg: Optional[str]) -> str:
@@ -227,50 +274,9 @@ def _sanitize_error(error_msg: Optional[str]) -> str:
     return error_str
 
 
-def _analyze_webhook_event(body: dict) -> tuple:
-    """
-    Analiza el webhook para instrumentación forense.
-    Returns: (event_kind, has_messages, has_statuses, msg_ids, status_ids, phone_from, wa_phone_number_id)
-    """
-    try:
-        entry = body.get("entry", [])
-        if not entry:
-            return ("unknown", False, False, [], [], None, None)
-        
-        changes = entry[0].get("changes", [])
-        if not changes:
-            return ("unknown", False, False, [], [], None, None)
-        
-        value = changes[0].get("value", {})
-        metadata = value.get("metadata", {})
-        wa_phone_number_id = metadata.get("phone_number_id")
-        
-        messages = value.get("messages", [])
-        statuses = value.get("statuses", [])
-        
-        has_messages = bool(messages)
-        has_statuses = bool(statuses)
-        
-        if has_statuses and not has_messages:
-            event_kind = "statuses"
-        elif has_messages and not has_statuses:
-            event_kind = "messages"
-        elif has_messages and has_statuses:
-            event_kind = "mixed"
-        else:
-            event_kind = "unknown"
-        
-        msg_ids = [msg.get("id", "")[:30] for msg in messages[:3] if msg.get("id")]
-        status_ids = [st.get("id", "")[:30] for st in statuses[:3] if st.get("id")]
-        
-        phone_from = None
-        if messages:
-            phone_from = messages[0].get("from", "")
-        
-        return (event_kind, has_messages, has_statuses, msg_ids, status_ids, phone_from, wa_phone_number_id)
-    except Exception as e:
-        logger.error("Error analizando webhook event", error=str(e))
-        return ("error", False, False, [], [], None, None)
+def _observe_queue_wait(queued_at: float) -> None:
+    # Fuera de _process_whatsapp_message: ahí `time` se reimporta como local
+    WEBHOOK_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued_at)
 
 
 async def _process_whatsapp_message(
@@ -278,12 +284,15 @@ async def _process_whatsapp_message(
     phone_from: str,
     text: str,
     contact_name: Optional[str],
-    timestamp: str
+    timestamp: str,
+    queued_at: Optional[float] = None
 ):
     """
     Procesa un mensaje de WhatsApp en background.
     Esta función se ejecuta después de responder 200 OK al webhook.
     """
+    if queued_at is not None:
+        _observe_queue_wait(queued_at)
     try:
         # Obtener o crear conversación
         conversation_id = get_phone_conversation_id(phone_from)
@@ -537,6 +546,7 @@ async def _process_whatsapp_message(
         with trace_interaction(conversation_id, "whatsapp", phone_from) as tracer:
             tracer.raw_text = text
             tracer.normalized_text = text.lower().strip()
+            tracer.inbound_at = parse_meta_timestamp(timestamp)
             
             # Log de mensaje entrante con todos los campos requeridos
             logger.info(
@@ -549,17 +559,19 @@ async def _process_whatsapp_message(
             )
             
             # Verificar si es del negocio (con filtrado mejorado si está habilitado)
-            is_business_heuristic, reason_heuristic, score_heuristic, reasons_list_heuristic = is_business_related(text)
+            with tracer.span("guardrail"):
+                is_business_heuristic, reason_heuristic, score_heuristic, reasons_list_heuristic = is_business_related(text)
             
             # Si está habilitado el filtrado mejorado con LLM, usar para casos ambiguos
             from app.config import ENHANCED_FILTERING_WITH_LLM
             import json
             if ENHANCED_FILTERING_WITH_LLM:
                 from app.rules.enhanced_filtering import enhanced_is_business_related
-                is_business, reason, score, reasons_list = await enhanced_is_business_related(
-                    text, 
-                    (is_business_heuristic, reason_heuristic, score_heuristic, reasons_list_heuristic)
-                )
+                with tracer.span("guardrail_llm"):
+                    is_business, reason, score, reasons_list = await enhanced_is_business_related(
+                        text, 
+                        (is_business_heuristic, reason_heuristic, score_heuristic, reasons_list_heuristic)
+                    )
                 classifier_version = "v1_enhanced"
             else:
                 is_business, reason, score, reasons_list = is_business_heuristic, reason_heuristic, score_heuristic, reasons_list_heuristic
@@ -616,18 +628,22 @@ async def _process_whatsapp_message(
                     return
             
             # Obtener historial
-            history = get_conversation_history(conversation_id)
+            with tracer.span("history"):
+                history = get_conversation_history(conversation_id)
             
             # Analizar intención
-            intent_result = analyze_intent(text, history)
+            with tracer.span("intent"):
+                intent_result = analyze_intent(text, history)
             tracer.intent = intent_result.get("intent")
             intent = tracer.intent or ""
             
             # Extraer contexto
-            context = extract_context_from_history(history)
+            with tracer.span("context"):
+                context = extract_context_from_history(history)
             
             # Obtener estado conversacional
-            state = get_conversation_state(phone_from)
+            with tracer.span("state_load"):
+                state = get_conversation_state(phone_from)
             # Agregar conversation_id y phone_from al state para selección determinística de variantes
             state["conversation_id"] = conversation_id
             state["phone_from"] = phone_from
@@ -828,20 +844,17 @@ async def _process_whatsapp_message(
                     conversation_id
                 )
                 
-                # Procesar handoff (notificación interna)
-                _, notification_text, _ = process_handoff(
-                    conversation_id=conversation_id,
-                    text=text,
-                    context=context,
-                    customer_phone=phone_from,
-                    customer_name=contact_name,
-                    history=history
-                )
-                
-                # Enviar notificación interna según el equipo (SOLO notificaciones unidireccionales, NO al cliente)
-                if notification_text:
-                    team_value = decision.team.value if decision.team else "comercial"
-                    await send_internal_notification(notification_text, team=team_value)
+                # Procesar handoff: la notificación interna queda en la tabla
+                # notifications y la entrega el worker (no demora la respuesta)
+                with tracer.span("handoff"):
+                    process_handoff(
+                        conversation_id=conversation_id,
+                        text=text,
+                        context=context,
+                        customer_phone=phone_from,
+                        customer_name=contact_name,
+                        history=history
+                    )
                 
                 # Limpiar estado de recolección
                 if state.get("collecting_lead_data"):
@@ -873,12 +886,13 @@ async def _process_whatsapp_message(
                     state["phone_from"] = phone_from
                     state["humanize_enabled"] = True  # Activar humanizer si está configurado
                     
-                    brain_result = process_with_salesbrain(
-                        text=text,
-                        state=state,
-                        history=history,
-                        context=context
-                    )
+                    with tracer.span("dialogue"):
+                        brain_result = process_with_salesbrain(
+                            text=text,
+                            state=state,
+                            history=history,
+                            context=context
+                        )
                     
                     response_text = brain_result.get("reply_text", "")
                     reply_assets = brain_result.get("reply_assets")
@@ -886,13 +900,14 @@ async def _process_whatsapp_message(
                     decision_path = brain_result.get("decision_path", "salesbrain_handled")
                 else:
                     # Fallback a Sales Dialogue Manager normal
-                    dialogue_result = next_action(
-                        user_text=text,
-                        intent=intent,
-                        state=state,
-                        history=history,
-                        context=context
-                    )
+                    with tracer.span("dialogue"):
+                        dialogue_result = next_action(
+                            user_text=text,
+                            intent=intent,
+                            state=state,
+                            history=history,
+                            context=context
+                        )
                     
                     response_text = dialogue_result.get("reply_text", "")
                     reply_assets = dialogue_result.get("reply_assets")
@@ -900,7 +915,8 @@ async def _process_whatsapp_message(
                     decision_path = dialogue_result.get("decision_path", "dialogue_handled")
                     
                     # HUMANIZER: Opcionalmente humanizar la respuesta
-                    humanized_text, humanize_meta = humanize_response_sync(response_text, updated_state if 'updated_state' in locals() else state)
+                    with tracer.span("humanize"):
+                        humanized_text, humanize_meta = humanize_response_sync(response_text, updated_state if 'updated_state' in locals() else state)
                     if humanize_meta.get("humanized"):
                         response_text = humanized_text
                         decision_path = f"{decision_path}->humanized"
@@ -909,11 +925,11 @@ async def _process_whatsapp_message(
                 updated_state = {**state, **state_updates}
                 updated_state["last_message_ts"] = timestamp
                 updated_state["last_intent"] = intent
-                save_conversation_state(phone_from, updated_state)
+                with tracer.span("state_save"):
+                    save_conversation_state(phone_from, updated_state)
                 
                 tracer.decision_path = decision_path
                 
-                # Si hay assets, prepararlos para envío (TODO: implementar envío de imágenes)
                 if reply_assets:
                     logger.info(
                         "Assets seleccionados para respuesta",
@@ -924,23 +940,49 @@ async def _process_whatsapp_message(
             tracer.response_text = response_text
             
             # Enviar respuesta
-            success, msg_id = await send_whatsapp_message(
-                phone_from, 
-                response_text,
-                conversation_id=conversation_id,
-                message_id=message_id
-            )
+            with tracer.span("send"):
+                success, msg_id = await send_whatsapp_message(
+                    phone_from, 
+                    response_text,
+                    conversation_id=conversation_id,
+                    message_id=message_id
+                )
             
             # Guardar resultado en tracer para persistencia
-            if success:
+            if success and msg_id == SEND_QUEUED:
+                # En la cola de salida: el despacho diferido completa whatsapp_send_* de la traza
+                tracer.whatsapp_send_error_code = SEND_QUEUED
+            elif success:
                 tracer.whatsapp_send_success = 1
-                # La latencia ya está en el log, pero podemos extraerla si es necesario
+                # Los statuses de Meta (delivered/read/failed) se unen por este wamid
+                tracer.whatsapp_message_id = msg_id
             else:
                 tracer.whatsapp_send_success = 0
                 tracer.whatsapp_send_error_code = msg_id if msg_id else "unknown_error"
             
             if success:
-                save_message(conversation_id, response_text, "luisa")
+                with tracer.span("persist"):
+                    save_message(conversation_id, response_text, "luisa")
+                
+                # Enviar fotos/videos del catálogo después del texto (media_id cacheado)
+                for asset in (reply_assets or [])[:3]:
+                    asset_id = asset.get("image_id")
+                    if not asset_id:
+                        continue
+                    with tracer.span("media"):
+                        media_ok, media_result = await send_whatsapp_media(
+                            phone_from,
+                            asset_id,
+                            conversation_id=conversation_id,
+                            message_id=message_id
+                        )
+                    if not media_ok:
+                        logger.warning(
+                            "No se pudo enviar asset por WhatsApp",
+                            image_id=asset_id,
+                            error=media_result
+                        )
+                
                 # Obtener stage actualizado para logging
                 current_stage = state.get("stage", "unknown")
                 if 'updated_state' in locals():
@@ -0,0 +1,44 @@
+"""
+Clasificación por lotes para re-etiquetar tráfico histórico (validate_filtering,
+rescore_traces) sin un loop de llamadas sueltas.
+
+Cada texto se normaliza una vez (normalize_text) y los textos repetidos se
+clasifican una sola vez: en el histórico "hola", "gracias" y "ok" son una
+fracción grande. Con workers > 1 y suficientes textos distintos, los textos se
+reparten en un pool de procesos (las reglas son CPU puro y el GIL no deja
+paralelizar con hilos).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, TypeVar
+
+from app.rules.keywords import normalize_text
+
+T = TypeVar("T")
+
+# Por debajo de esto, arrancar procesos cuesta más que clasificar en línea
+PARALLEL_MIN_TEXTS = 2000
+
+
+def classify_batch(
+    classify_normalized: Callable[[str], T],
+    texts: Iterable[str],
+    workers: int = 0
+) -> List[T]:
+    """
+    Aplica classify_normalized (función de módulo que recibe texto normalizado)
+    a cada texto y devuelve los resultados en el mismo orden.
+
+    Los textos con la misma normalización comparten el mismo objeto de resultado.
+    """
+    normalized = [normalize_text(text) for text in texts]
+    unique = list(dict.fromkeys(normalized))
+
+    if workers > 1 and len(unique) >= PARALLEL_MIN_TEXTS:
+        chunksize = max(1, len(unique) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(classify_normalized, unique, chunksize=chunksize))
+    else:
+        results = [classify_normalized(text) for text in unique]
+
+    by_text = dict(zip(unique, results))
+    return [by_text[text] for text in normalized]
@@ -3,11 +3,13 @@ Guardrails para determinar si un mensaje está relacionado con el negocio.
 Usa heurísticas y keywords, NO LLM, para mantener baja latencia y costo cero.
 """
 import re
-from typing import Tuple, Optional, List
+from typing import Iterable, Tuple, Optional, List
 
+from app.rules.batch import classify_batch
 from app.rules.keywords import (
     normalize_text,
-    contains_any,
+    select_variant,
+    SALUDO_VARIANTES,
     FUERA_DEL_NEGOCIO,
     SALUDOS,
     DESPEDIDAS,
@@ -49,7 +51,7 @@ from app.rules.keywords import (
 # Optimización P1-1: Expandir con casos comunes del dataset
 NEGOCIO_KEYWORDS = {
     # Productos
-    "máquina", "maquina", "máquinas", "maquinas",
+    "maquina", "maquinas",
     "coser", "costura", "sastre", "tela", "telas",
     
     # Marcas que manejamos
@@ -60,17 +62,17 @@ NEGOCIO_KEYWORDS = {
     "enviar", "entregar", "cotizar", "pagar",
     
     # Contexto de costura
-    "confección", "confeccion", "modista", "modistería",
-    "taller", "producción", "produccion", "puntada", "puntadas",
+    "confeccion", "modista", "modisteria",
+    "taller", "produccion", "puntada", "puntadas",
     "ojal", "ojales", "hilo", "aguja", "prensatela", "bobina",
     
     # Optimización P1-1: Agregar keywords comunes del dataset
-    "repuestos", "repuesto", "servicio técnico", "servicio tecnico",
-    "garantía", "garantia", "precio", "precios", "cuánto", "cuanto",
-    "stock", "disponibilidad", "catálogo", "catalogo", "promociones",
-    "financiación", "financiacion", "formas de pago", "horarios",
-    "ubicación", "ubicacion", "dirección", "direccion", "envíos", "envios",
-    "capacitación", "capacitacion", "asesoría", "asesoria", "fileteadora",
+    "repuestos", "repuesto", "servicio tecnico",
+    "garantia", "precio", "precios", "cuanto",
+    "stock", "disponibilidad", "catalogo", "promociones",
+    "financiacion", "formas de pago", "horarios",
+    "ubicacion", "direccion", "envios",
+    "capacitacion", "asesoria", "fileteadora",
     "industrial", "familiar", "gorras", "calzado", "ropa", "accesorios"
 }
 
@@ -92,6 +94,68 @@ class MessageType(Enum):
     BUSINESS_CONSULT = "business_consult"  # venta/asesoría/repuestos/garantía/reparación
 
 
+# Señales claras de temas fuera del negocio (palabras completas, no substrings)
+BLACKLIST_SIGNALS = frozenset({
+    # Programación y tecnología
+    "python", "javascript", "java", "react", "angular", "vue", "node", "npm", "pip", "django",
+    "flask", "fastapi", "selenium", "docker", "kubernetes", "aws", "azure", "git", "github",
+    "sql", "mysql", "postgresql", "mongodb", "redis", "html", "css", "typescript", "php",
+    "ruby", "rust", "c++", "c#", "scala", "kotlin", "swift", "objective-c",
+    "matlab", "sas", "tableau", "power bi", "excel vba", "macro", "script", "bash", "shell",
+    "linux", "windows", "macos", "ubuntu", "debian", "centos", "redhat", "algorithm", "algoritmo",
+    "bug", "debug", "error", "exception", "stacktrace", "null pointer", "syntax error",
+    "compilation", "framework", "library", "api", "backend", "frontend", "fullstack",
+    "programar", "programacion", "codigo", "programador", "desarrollo", "software",
+
+    # Tareas académicas
+    "tarea", "examen", "trabajo", "universidad", "colegio", "clase", "profesor", "estudiar",
+    "ensayo", "monografia", "investigacion", "tesis", "matematicas", "fisica", "quimica",
+
+    # Temas médicos y de salud
+    "dolor", "medicina", "medicamento", "enfermedad", "sintoma", "doctor", "medico",
+    "hospital", "clinica", "fiebre", "gripe", "covid", "coronavirus", "vacuna", "pastilla",
+    "tableta", "inyeccion", "cirugia", "tratamiento", "diagnostico",
+
+    # Otros temas no relacionados
+    "politica", "religion", "futbol", "deporte", "musica",
+    "cine", "series", "netflix", "spotify", "instagram", "facebook", "twitter", "tiktok",
+    "whatsapp", "telegram", "comida", "restaurante", "hotel", "viaje", "vacaciones", "turismo"
+})
+
+# Frases (substrings) que por sí solas marcan NON_BUSINESS
+NON_BUSINESS_PHRASES = (
+    "cómo hago un", "como hago un", "ayuda con", "necesito ayuda con", "problema con",
+    "error en", "no funciona mi", "bug en", "código", "codigo"
+)
+
+# Mensajes de 1-2 palabras sin contexto
+SHORT_GIBBERISH = frozenset({"ok", "si", "no", "👍", "👌", "😊", "🙂", "gracias", "vale", ".", "!", "?", "...", "jaja"})
+
+# Grupos de keywords precalculados (tuplas: recorrerlas es más barato que unir sets en cada llamada)
+_SHORT_REPLY_KEYWORDS = tuple(CONFIRMACIONES | NEGACIONES | SALUDOS | DESPEDIDAS)
+_FAQ_KEYWORDS = tuple(HORARIOS | UBICACION | {"telefono", "contacto", "direccion"})
+_FAQ_SERVICE_KEYWORDS = tuple(FORMAS_PAGO | ENVIO | PROMOCIONES)
+_CONSULT_KEYWORDS = tuple(
+    MAQUINA_FAMILIAR | MAQUINA_INDUSTRIAL | FILETEADORA | REPUESTOS |
+    INSTALACION | REPARACION | GARANTIA | CAPACITACION | ASESORIA |
+    USO_ROPA | USO_GORRAS | USO_CALZADO | USO_ACCESORIOS | USO_CUERO |
+    IMPACTO_NEGOCIO | {"emprender", "negocio", "taller", "produccion"}
+)
+_PRICE_KEYWORDS = tuple(PRECIO | DISPONIBILIDAD)
+_NEGOCIO_KEYWORDS = tuple(NEGOCIO_KEYWORDS)
+_HORARIOS_KEYWORDS = tuple(HORARIOS)
+_UBICACION_KEYWORDS = tuple(UBICACION)
+_FORMAS_PAGO_KEYWORDS = tuple(FORMAS_PAGO)
+_PROGRAMMING_KEYWORDS = ("programacion", "codigo", "python", "javascript")
+
+
+def _contains(text_normalized: str, keywords: Tuple[str, ...]) -> bool:
+    for keyword in keywords:
+        if keyword in text_normalized:
+            return True
+    return False
+
+
 def classify_message_type(text: str) -> MessageType:
     """
     Clasifica el tipo de mensaje para determinar si puede usar OpenAI.
@@ -99,7 +163,11 @@ def classify_message_type(text: str) -> MessageType:
     Returns:
         MessageType enum
     """
-    text_normalized = normalize_text(text)
+    return _classify_normalized(normalize_text(text))
+
+
+def _classify_normalized(text_normalized: str) -> MessageType:
+    """classify_message_type sobre texto ya normalizado (normalize_text)."""
     words = text_normalized.split()
 
     # EMPTY_OR_GIBBERISH: mensajes vacíos, cortos o sin sentido
@@ -108,83 +176,35 @@ def classify_message_type(text: str) -> MessageType:
 
     if len(words) <= 2:
         # Mensajes muy cortos sin contexto -> EMPTY_OR_GIBBERISH (prioridad alta)
-        short_gibberish = ["ok", "si", "no", "👍", "👌", "😊", "🙂", "gracias", "vale", ".", "!", "?", "...", "jaja"]
-        if len(text_normalized) <= 5 or text_normalized.lower() in short_gibberish:
+        if len(text_normalized) <= 5 or text_normalized in SHORT_GIBBERISH:
             return MessageType.EMPTY_OR_GIBBERISH
 
         # Solo confirmaciones/negaciones/saludos -> BUSINESS_FAQ
-        if contains_any(text, CONFIRMACIONES | NEGACIONES | SALUDOS | DESPEDIDAS):
+        if _contains(text_normalized, _SHORT_REPLY_KEYWORDS):
             return MessageType.BUSINESS_FAQ
 
-    # BLACKLIST ROBUSTA: señales claras de temas fuera del negocio
-    blacklist_signals = {
-        # Programación y tecnología
-        "python", "javascript", "java", "react", "angular", "vue", "node", "npm", "pip", "django",
-        "flask", "fastapi", "selenium", "docker", "kubernetes", "aws", "azure", "git", "github",
-        "sql", "mysql", "postgresql", "mongodb", "redis", "html", "css", "typescript", "php",
-        "ruby", "rust", "c++", "c#", "scala", "kotlin", "swift", "objective-c",
-        "matlab", "sas", "tableau", "power bi", "excel vba", "macro", "script", "bash", "shell",
-        "linux", "windows", "macos", "ubuntu", "debian", "centos", "redhat", "algorithm", "algoritmo",
-        "bug", "debug", "error", "exception", "stacktrace", "null pointer", "syntax error",
-        "compilation", "framework", "library", "api", "backend", "frontend", "fullstack",
-        "programar", "programación", "código", "codigo", "programador", "desarrollo", "software",
-
-        # Tareas académicas
-        "tarea", "examen", "trabajo", "universidad", "colegio", "clase", "profesor", "estudiar",
-        "ensayo", "monografía", "investigación", "tesis", "matemáticas", "física", "química",
-
-        # Temas médicos y de salud
-        "dolor", "medicina", "medicamento", "enfermedad", "síntoma", "sintoma", "doctor", "médico",
-        "hospital", "clínica", "fiebre", "gripe", "covid", "coronavirus", "vacuna", "pastilla",
-        "tableta", "inyección", "cirugía", "cirugia", "tratamiento", "diagnóstico", "diagnostico",
-
-        # Otros temas no relacionados
-        "política", "política", "religión", "religión", "fútbol", "futbol", "deporte", "música",
-        "cine", "series", "netflix", "spotify", "instagram", "facebook", "twitter", "tiktok",
-        "whatsapp", "telegram", "comida", "restaurante", "hotel", "viaje", "vacaciones", "turismo"
-    }
-
-    # Contar señales de blacklist (palabras completas, no substrings)
-    words_in_text = set(text_normalized.split())
-    blacklist_count = sum(1 for signal in blacklist_signals if signal in words_in_text)
-    
     # Si hay señales claras de blacklist -> NON_BUSINESS
-    if blacklist_count >= 2 or any(signal in text_normalized for signal in [
-        "cómo hago un", "como hago un", "ayuda con", "necesito ayuda con", "problema con",
-        "error en", "no funciona mi", "bug en", "código", "codigo"
-    ]):
+    blacklist_count = len(BLACKLIST_SIGNALS.intersection(words))
+    if blacklist_count >= 2 or _contains(text_normalized, NON_BUSINESS_PHRASES):
         return MessageType.NON_BUSINESS
 
     # BUSINESS_FAQ: preguntas simples sobre info básica del negocio
-    faq_keywords = HORARIOS | UBICACION | {"telefono", "teléfono", "contacto", "dirección", "direccion"}
-    if contains_any(text, faq_keywords):
+    if _contains(text_normalized, _FAQ_KEYWORDS):
         return MessageType.BUSINESS_FAQ
 
     # BUSINESS_FAQ: formas de pago, envíos, promociones
-    if contains_any(text, FORMAS_PAGO | ENVIO | PROMOCIONES):
+    if _contains(text_normalized, _FAQ_SERVICE_KEYWORDS):
         return MessageType.BUSINESS_FAQ
 
     # BUSINESS_CONSULT: consultas complejas sobre productos/servicios
-    consult_keywords = (
-        MAQUINA_FAMILIAR | MAQUINA_INDUSTRIAL | FILETEADORA | REPUESTOS |
-        INSTALACION | REPARACION | GARANTIA | CAPACITACION | ASESORIA |
-        USO_ROPA | USO_GORRAS | USO_CALZADO | USO_ACCESORIOS | USO_CUERO |
-        IMPACTO_NEGOCIO | {"emprender", "negocio", "taller", "producción", "produccion"}
-    )
-
-    if contains_any(text, consult_keywords):
+    if _contains(text_normalized, _CONSULT_KEYWORDS):
         return MessageType.BUSINESS_CONSULT
 
     # BUSINESS_FAQ: preguntas sobre precio/disponibilidad (pueden ser simples)
-    if contains_any(text, PRECIO | DISPONIBILIDAD):
+    if _contains(text_normalized, _PRICE_KEYWORDS):
         return MessageType.BUSINESS_FAQ
 
-    # Default: si tiene keywords del negocio, BUSINESS_CONSULT
-    negocio_signals = sum(1 for keyword in NEGOCIO_KEYWORDS if keyword in text_normalized)
-    if negocio_signals > 0:
-        return MessageType.BUSINESS_CONSULT
-
-    # Si no clasifica claramente, asumir BUSINESS_CONSULT (ser permisivo)
+    # Default: con o sin keywords del negocio, BUSINESS_CONSULT (ser permisivo)
     return MessageType.BUSINESS_CONSULT
 
 
@@ -200,8 +220,12 @@ def is_business_related(text: str) -> Tuple[bool, str, float, List[str]]:
         - score: Confianza 0.0-1.0 (0.9-1.0 = alto, 0.5-0.9 = medio, <0.5 = bajo)
         - reasons_list: Lista de keywords/patrones que matchearon
     """
-    message_type = classify_message_type(text)
-    text_normalized = normalize_text(text)
+    return _business_related_normalized(normalize_text(text))
+
+
+def _business_related_normalized(text_normalized: str) -> Tuple[bool, str, float, List[str]]:
+    """is_business_related sobre texto ya normalizado (normalize_text)."""
+    message_type = _classify_normalized(text_normalized)
     reasons_list = []
     score = 0.0
 
@@ -216,7 +240,7 @@ def is_business_related(text: str) -> Tuple[bool, str, float, List[str]]:
         score = 0.95
         reasons_list.append("non_business")
         # Buscar keywords específicos que indican que NO es del negocio
-        if any(kw in text_normalized for kw in ["programación", "programacion", "código", "codigo", "python", "javascript"]):
+        if _contains(text_normalized, _PROGRAMMING_KEYWORDS):
             reasons_list.append("programming_keyword")
         return False, "non_business", score, reasons_list
 
@@ -225,17 +249,17 @@ def is_business_related(text: str) -> Tuple[bool, str, float, List[str]]:
         score = 0.95
         reasons_list.append("business_faq")
         # Buscar keywords específicos
-        if any(kw in text_normalized for kw in HORARIOS):
+        if _contains(text_normalized, _HORARIOS_KEYWORDS):
             reasons_list.append("horarios_keyword")
-        if any(kw in text_normalized for kw in UBICACION):
+        if _contains(text_normalized, _UBICACION_KEYWORDS):
             reasons_list.append("ubicacion_keyword")
-        if any(kw in text_normalized for kw in FORMAS_PAGO):
+        if _contains(text_normalized, _FORMAS_PAGO_KEYWORDS):
             reasons_list.append("formas_pago_keyword")
     else:  # BUSINESS_CONSULT
         score = 0.9
         reasons_list.append("business_consult")
         # Contar keywords del negocio
-        negocio_matches = [kw for kw in NEGOCIO_KEYWORDS if kw in text_normalized]
+        negocio_matches = [kw for kw in _NEGOCIO_KEYWORDS if kw in text_normalized]
         if negocio_matches:
             reasons_list.extend(negocio_matches[:5])  # Máximo 5 keywords
             score = min(1.0, 0.9 + (len(negocio_matches) * 0.02))  # Aumentar score con más keywords
@@ -243,6 +267,21 @@ def is_business_related(text: str) -> Tuple[bool, str, float, List[str]]:
     return True, f"business_{message_type.value}", score, reasons_list
 
 
+def classify_message_type_batch(texts: Iterable[str], workers: int = 0) -> List[MessageType]:
+    """
+    classify_message_type para muchos textos (re-etiquetar tráfico histórico).
+    Ver app/rules/batch.py para deduplicación y workers.
+    """
+    return classify_batch(_classify_normalized, texts, workers=workers)
+
+
+def is_business_related_batch(texts: Iterable[str], workers: int = 0) -> List[Tuple[bool, str, float, List[str]]]:
+    """is_business_related para muchos textos, en el mismo orden."""
+    results = classify_batch(_business_related_normalized, texts, workers=workers)
+    # Los textos repetidos comparten resultado: cada uno recibe su propia lista de razones
+    return [(is_business, reason, score, list(reasons)) for is_business, reason, score, reasons in results]
+
+
 def get_response_for_message_type(message_type: MessageType, text: str, conversation_id: Optional[str] = None) -> str:
     """
     Retorna la respuesta apropiada según el tipo de mensaje.
@@ -275,7 +314,7 @@ def is_sensitive_query(text: str) -> bool:
         r'\b\d{10}\b',  # Números de teléfono
         r'\b\d{3}\s?\d{3}\s?\d{4}\b',  # Teléfonos con espacios
         r'@\w+\.\w+',  # Emails
-        r'cedula|cédula|cc\s*\d+',  # Documentos
+        r'cedula|cc\s*\d+',  # Documentos
         
         # Pagos/Transacciones
         r'(ya\s+)?pag[ué|ue|o]',  # "ya pagué", "pagué", "pago"
@@ -316,13 +355,13 @@ def is_cacheable_query(text: str, intent: str = None) -> bool:
     # Consultas genéricas cacheables
     cacheable_keywords = [
         "horario",
-        "dónde quedan", "donde quedan",
-        "dirección", "direccion",
-        "ubicación", "ubicacion",
+        "donde quedan",
+        "direccion",
+        "ubicacion",
         "formas de pago",
-        "hacen envíos", "hacen envios",
-        "qué máquinas", "que maquinas",
-        "qué marcas", "que marcas"
+        "hacen envios",
+        "que maquinas",
+        "que marcas"
     ]
     
     for keyword in cacheable_keywords:
@@ -0,0 +1,220 @@
+"""
+Tabla de decisión de build_response(): qué hacer con un mensaje según
+(message_type, intent, etapa del funnel: context["etapa_funnel"]).
+
+Las reglas son datos (DEFAULT_RULES). Cada regla fija algunos campos de la
+Route para los mensajes que coinciden; "*" coincide con cualquier valor. Al
+compilar se aplican de la más general a la más específica (cantidad de
+campos sin comodín) y, a igual especificidad, en orden de declaración: la
+última gana.
+
+DecisionTable.compile() precalcula la Route de todas las combinaciones de los
+valores que aparecen en alguna regla; cualquier otro valor se trata como
+OTHER (ninguna regla específica lo menciona, así que resuelve igual). Elegir
+la ruta de un mensaje es un lookup en un dict, sin recorrer reglas.
+
+La tabla activa se puede reemplazar en caliente con set_decision_table().
+"""
+from dataclasses import dataclass, field, replace
+from itertools import product
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from app.rules.business_guardrails import MessageType
+
+
+ANY = "*"
+OTHER = ""  # valor que ninguna regla menciona
+
+# Cómo se genera el texto de la respuesta
+REPLY_MESSAGE_TYPE = "message_type"  # get_response_for_message_type() y fin del pipeline
+REPLY_GREETING = "greeting"          # variante de saludo por conversación
+REPLY_GENERATE = "generate"          # cache -> LLM (con gating) -> fallback
+
+
+@dataclass(frozen=True, slots=True)
+class Route:
+    """Decisiones para una combinación (message_type, intent, etapa)."""
+    reply: str = REPLY_GENERATE
+    decision_path: Optional[str] = None  # solo para respuestas terminales
+    cacheable: bool = True
+    asset_allowed: bool = False
+    llm_block: Optional[str] = None  # motivo de bloqueo del LLM; None = pasa al gating de runtime
+    next_step_question: Optional[str] = None
+    rules: Tuple[str, ...] = ()  # reglas aplicadas, en orden
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Fija `values` en la Route de los mensajes que coinciden."""
+    name: str
+    message_type: str = ANY
+    intent: str = ANY
+    stage: str = ANY
+    values: Mapping[str, Any] = field(default_factory=dict)
+
+    @property
+    def specificity(self) -> int:
+        return sum(value != ANY for value in (self.message_type, self.intent, self.stage))
+
+    def matches(self, message_type: str, intent: str, stage: str) -> bool:
+        return (
+            self.message_type in (ANY, message_type)
+            and self.intent in (ANY, intent)
+            and self.stage in (ANY, stage)
+        )
+
+
+class DecisionTable:
+    """Reglas compiladas a un dict (message_type, intent, etapa) -> Route."""
+
+    def __init__(self, rules: Iterable[Rule]):
+        self.rules: List[Rule] = list(rules)
+        fields = set(Route.__dataclass_fields__) - {"rules"}
+        for rule in self.rules:
+            unknown = set(rule.values) - fields
+            if unknown:
+                raise ValueError(f"Regla {rule.name!r}: campos desconocidos {sorted(unknown)}")
+        self._message_types = {r.message_type for r in self.rules} - {ANY}
+        self._intents = {r.intent for r in self.rules} - {ANY}
+        self._stages = {r.stage for r in self.rules} - {ANY}
+        self._routes: Dict[Tuple[str, str, str], Route] = {}
+        self.compile()
+
+    def compile(self) -> None:
+        """Precalcula la Route de todas las combinaciones conocidas (+ OTHER)."""
+        ordered = sorted(enumerate(self.rules), key=lambda item: (item[1].specificity, item[0]))
+        ordered = [rule for _, rule in ordered]
+        self._routes = {
+            key: self._resolve(ordered, *key)
+            for key in product(
+                self._message_types | {OTHER}, self._intents | {OTHER}, self._stages | {OTHER}
+            )
+        }
+
+    @staticmethod
+    def _resolve(ordered: List[Rule], message_type: str, intent: str, stage: str) -> Route:
+        values: Dict[str, Any] = {}
+        names = []
+        for rule in ordered:
+            if rule.matches(message_type, intent, stage):
+                values.update(rule.values)
+                names.append(rule.name)
+        return replace(Route(), rules=tuple(names), **values)
+
+    def route(self, message_type: Any = None, intent: Optional[str] = None, stage: Optional[str] = None) -> Route:
+        """
+        Route de un mensaje. message_type acepta MessageType o su valor;
+        None (o un valor que ninguna regla menciona) se resuelve como OTHER.
+        """
+        message_type = getattr(message_type, "value", message_type)
+        return self._routes[(
+            message_type if message_type in self._message_types else OTHER,
+            intent if intent in self._intents else OTHER,
+            stage if stage in self._stages else OTHER,
+        )]
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+
+# ============================================================================
+# REGLAS
+# ============================================================================
+
+# Preguntas de cierre que agrega ensure_next_step_question()
+NEXT_STEP_QUESTIONS: Dict[str, str] = {
+    # Búsqueda de máquinas
+    "buscar_maquina_industrial": "¿Qué vas a fabricar: ropa, gorras, calzado o accesorios?",
+    "buscar_maquina_familiar": "¿La necesitas para uso en casa o para emprendimiento?",
+    "buscar_fileteadora": "¿Buscas fileteadora familiar o industrial?",
+
+    # Información comercial
+    "preguntar_precio": "¿Buscas máquina familiar (desde $400.000) o industrial (desde $1.230.000)?",
+    "envios": "¿A qué ciudad o municipio sería el envío?",
+    "pagos": "¿Prefieres Addi o Sistecrédito para financiamiento?",
+    "garantia": "¿Es garantía por defecto de fábrica o por reparación?",
+
+    # Servicio técnico
+    "repuesto_accesorio": "¿Me confirmas la marca de tu máquina o me envías foto de la placa?",
+    "soporte_tecnico": "¿Es problema con costura, motor o alimentación?",
+    "instalacion_servicio": "¿Prefieres instalación en tu taller o domicilio?",
+
+    # Asesoría
+    "asesoria_negocio": "¿Vas a producir de forma ocasional o constante?",
+    "comparacion_maquinas": "¿Buscas comparar precios, características o marcas específicas?",
+
+    # Información general
+    "horario": "¿Necesitas más información sobre ubicación o contacto?",
+    "ubicacion": "¿Quieres que te guíe con direcciones o prefieres envío?",
+    "catalogo": "¿Te intereso alguna máquina específica o necesitas recomendaciones?",
+
+    # Otros informativos
+    "info_general": "¿Necesitas información sobre máquinas, repuestos o servicio técnico?",
+}
+
+# FAQ simples: nunca van al LLM, aunque sean BUSINESS_CONSULT
+LLM_FAQ_INTENTS = (
+    "saludo", "despedida", "cierre", "envios", "pagos", "horarios",
+    "direccion", "ubicacion", "telefono", "contacto", "promociones",
+)
+
+NO_CACHE_INTENTS = ("saludo", "cierre", "despedida", "info_general")
+
+# Intenciones que permiten adjuntar una foto del catálogo (además se exigen señales de producto)
+ASSET_INTENTS = (
+    "venta_maquina", "asesoria_negocio", "repuesto_accesorio",
+    "soporte_tecnico", "garantia", "instalacion_servicio",
+    "comparacion_maquinas", "buscar_maquina_familiar", "buscar_maquina_industrial",
+    "buscar_fileteadora", "solicitar_fotos", "preguntar_precio",
+)
+
+# Nunca se les agrega pregunta de cierre (sus reglas van después de las preguntas)
+NO_QUESTION_INTENTS = ("saludo", "despedida", "confirmacion_pago", "cierre")
+
+
+def _default_rules() -> List[Rule]:
+    rules = [
+        # El LLM solo redacta consultas del negocio
+        Rule("llm_solo_consultas", values={"llm_block": "blocked_message_type"}),
+        Rule("llm_consulta", message_type=MessageType.BUSINESS_CONSULT.value, values={"llm_block": None}),
+    ]
+    rules += [Rule(f"llm_faq_{i}", intent=i, values={"llm_block": "blocked_faq"}) for i in LLM_FAQ_INTENTS]
+    # Declaradas después: el motivo por tipo de mensaje gana sobre el de FAQ
+    rules += [
+        Rule(f"llm_{mt.value}", message_type=mt.value, values={"llm_block": f"blocked_{mt.value}"})
+        for mt in MessageType if mt != MessageType.BUSINESS_CONSULT
+    ]
+    rules += [
+        Rule("saludo", intent="saludo", values={"reply": REPLY_GREETING}),
+        # Después del saludo: la respuesta por tipo de mensaje corta el pipeline
+        Rule("gibberish", message_type=MessageType.EMPTY_OR_GIBBERISH.value,
+             values={"reply": REPLY_MESSAGE_TYPE, "decision_path": "->gibberish_handled"}),
+        Rule("non_business", message_type=MessageType.NON_BUSINESS.value,
+             values={"reply": REPLY_MESSAGE_TYPE, "decision_path": "->non_business_handled"}),
+    ]
+    rules += [Rule(f"sin_cache_{i}", intent=i, values={"cacheable": False}) for i in NO_CACHE_INTENTS]
+    rules += [Rule(f"asset_{i}", intent=i, values={"asset_allowed": True}) for i in ASSET_INTENTS]
+    rules += [
+        Rule(f"pregunta_{i}", intent=i, values={"next_step_question": q}) for i, q in NEXT_STEP_QUESTIONS.items()
+    ]
+    rules += [Rule(f"sin_pregunta_{i}", intent=i, values={"next_step_question": None}) for i in NO_QUESTION_INTENTS]
+    return rules
+
+
+DEFAULT_RULES: List[Rule] = _default_rules()
+
+_table: Optional[DecisionTable] = None
+
+
+def get_decision_table() -> DecisionTable:
+    """Tabla activa (la de DEFAULT_RULES, compilada en el primer uso)."""
+    global _table
+    if _table is None:
+        _table = DecisionTable(DEFAULT_RULES)
+    return _table
+
+
+def set_decision_table(table: Optional[DecisionTable]) -> None:
+    """Reemplaza la tabla activa (None = volver a DEFAULT_RULES en el próximo uso)."""
+    global _table
+    _table = table
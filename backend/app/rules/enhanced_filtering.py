@@ -2,11 +2,11 @@
 Filtrado Mejorado con LLM para casos ambiguos.
 
 Usa LLM barato (gpt-4o-mini) solo para casos donde las heurísticas
-no pueden determinar claramente si un mensaje es personal o del negocio.
+no pueden determinar claramente si un mensaje es personal o del negocio,
+y el clasificador local (app/services/local_classifier.py) tampoco está seguro.
 """
 import time
 from typing import Tuple, Optional, List
-import httpx
 
 from app.config import (
     OPENAI_ENABLED,
@@ -14,6 +14,8 @@ from app.config import (
     ENHANCED_FILTERING_WITH_LLM
 )
 from app.logging_config import logger
+from app.services.metrics import OPENAI_REQUEST_SECONDS
+from app.services.local_classifier import TASK_BUSINESS, classify_locally
 
 # Configuración del filtrado mejorado
 FILTERING_MODEL = "gpt-4o-mini"  # Modelo barato
@@ -79,6 +81,8 @@ async def classify_with_llm(text: str) -> Tuple[bool, str, float, List[str]]:
             - score: Confianza 0.0-1.0 (0.5-0.9 para ambiguos)
             - reasons_list: Lista de razones
     """
+    import httpx
+    from app.services.http_pool import get_async_http_client
     if not OPENAI_ENABLED or not OPENAI_API_KEY or not ENHANCED_FILTERING_WITH_LLM:
         # Si LLM no está habilitado, retornar como business (conservador)
         return True, "llm_disabled_default_business"
@@ -108,7 +112,8 @@ RESPONDE SOLO: "business" o "personal" (una sola palabra, sin explicación).
     user_prompt = f"Mensaje: {text}\n\n¿Es del negocio o personal?"
     
     try:
-        async with httpx.AsyncClient(timeout=FILTERING_TIMEOUT) as client:
+        client = get_async_http_client()
+        with OPENAI_REQUEST_SECONDS.time("filter"):
             response = await client.post(
                 "https://api.openai.com/v1/chat/completions",
                 headers={
@@ -123,38 +128,39 @@ RESPONDE SOLO: "business" o "personal" (una sola palabra, sin explicación).
                     ],
                     "max_tokens": FILTERING_MAX_TOKENS,
                     "temperature": 0.1  # Muy determinístico
-                }
+                },
+                timeout=FILTERING_TIMEOUT
             )
+        
+        latency_ms = int((time.perf_counter() - start_time) * 1000)
+        
+        if response.status_code == 200:
+            data = response.json()
+            result = data["choices"][0]["message"]["content"].strip().lower()
             
-            latency_ms = int((time.perf_counter() - start_time) * 1000)
+            is_business = "business" in result
+            reason = f"llm_classified_{result[:20]}"
+            # Score para LLM: 0.5-0.9 (ambiguo, pero con confianza)
+            score = 0.7 if is_business else 0.3
+            reasons_list = [reason, "llm_used"]
             
-            if response.status_code == 200:
-                data = response.json()
-                result = data["choices"][0]["message"]["content"].strip().lower()
-                
-                is_business = "business" in result
-                reason = f"llm_classified_{result[:20]}"
-                # Score para LLM: 0.5-0.9 (ambiguo, pero con confianza)
-                score = 0.7 if is_business else 0.3
-                reasons_list = [reason, "llm_used"]
-                
-                logger.info(
-                    "enhanced_filtering_llm_used",
-                    text_preview=text[:50],
-                    result="business" if is_business else "personal",
-                    latency_ms=latency_ms
-                )
-                
-                return is_business, reason, score, reasons_list
+            logger.info(
+                "enhanced_filtering_llm_used",
+                text_preview=text[:50],
+                result="business" if is_business else "personal",
+                latency_ms=latency_ms
+            )
             
-            else:
-                # Error en LLM: retornar como business (conservador)
-                logger.warning(
-                    "enhanced_filtering_llm_error",
-                    status=response.status_code,
-                    text_preview=text[:50]
-                )
-                return True, "llm_error_default_business", 0.5, ["llm_error"]
+            return is_business, reason, score, reasons_list
+        
+        else:
+            # Error en LLM: retornar como business (conservador)
+            logger.warning(
+                "enhanced_filtering_llm_error",
+                status=response.status_code,
+                text_preview=text[:50]
+            )
+            return True, "llm_error_default_business", 0.5, ["llm_error"]
     
     except Exception as e:
         # Error en LLM: retornar como business (conservador)
@@ -189,7 +195,19 @@ async def enhanced_is_business_related(text: str, heuristic_result: Tuple[bool,
     if not is_ambiguous_message(text, is_business_heuristic):
         return is_business_heuristic, reason_heuristic, score_heuristic, reasons_list_heuristic
     
-    # Si es ambiguo Y score < 0.3, usar LLM
+    # Si es ambiguo Y score < 0.3: modelo local si está seguro
+    local = classify_locally(TASK_BUSINESS, text)
+    if local:
+        label, confidence = local
+        is_business = label == "business"
+        return (
+            is_business,
+            f"{reason_heuristic}_ambiguous_local_{label}",
+            confidence if is_business else 1.0 - confidence,
+            reasons_list_heuristic + ["local_classifier"]
+        )
+
+    # Si no, usar LLM
     is_business_llm, reason_llm, score_llm, reasons_list_llm = await classify_with_llm(text)
     
     # Combinar razones
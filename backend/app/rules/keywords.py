@@ -1,27 +1,34 @@
 """
 Keywords centralizados para el sistema LUISA.
 ÚNICA fuente de verdad para todas las listas de palabras clave.
+
+Los keywords se escriben plegados (minúsculas, sin tildes ni ñ) y se buscan
+en el texto normalizado por normalize_text(), que pliega y corrige errores
+de tipeo contra TYPO_VOCABULARY (ver app/rules/normalization.py). Una sola
+variante por palabra: "maquina" cubre "máquina", "Maquina" y "maqina".
 """
-from typing import Set, Dict, List
+from functools import lru_cache
+from typing import Set, Dict, List, Tuple
+
+from app.rules.normalization import fold_text, normalize_for_matching
 
 # ============================================================================
 # CONFIRMACIONES Y NEGACIONES
 # ============================================================================
 
 CONFIRMACIONES: Set[str] = {
-    "si", "sí", "ok", "dale", "claro", "perfecto", "bueno", "vale",
-    "está bien", "esta bien", "listo", "de acuerdo", "correcto",
-    "exacto", "eso", "así es", "asi es", "afirmativo", "por favor",
-    "muestrame", "muéstrame", "enséñame", "ensename", "a ver",
-    "quiero ver", "me interesa", "manda", "envía", "envia",
-    "pásame", "pasame", "dime", "cuáles", "cuales", "va", "oks", "okok"
+    "si", "ok", "dale", "claro", "perfecto", "bueno", "vale", "esta bien",
+    "listo", "de acuerdo", "correcto", "exacto", "eso", "asi es",
+    "afirmativo", "por favor", "muestrame", "ensename", "a ver", "quiero ver",
+    "me interesa", "manda", "envia", "pasame", "dime", "cuales", "va", "oks",
+    "okok"
 }
 
 NEGACIONES: Set[str] = {
-    "no", "nop", "nel", "negativo", "otro", "otra", "diferente",
-    "distinto", "distinta", "no esa", "no ese", "ninguno", "ninguna",
-    "no me interesa", "no gracias", "paso", "mejor no", "no ahora",
-    "más adelante", "mas adelante", "luego", "después", "despues"
+    "no", "nop", "nel", "negativo", "otro", "otra", "diferente", "distinto",
+    "distinta", "no esa", "no ese", "ninguno", "ninguna", "no me interesa",
+    "no gracias", "paso", "mejor no", "no ahora", "mas adelante", "luego",
+    "despues"
 }
 
 # ============================================================================
@@ -29,13 +36,12 @@ NEGACIONES: Set[str] = {
 # ============================================================================
 
 SALUDOS: Set[str] = {
-    "hola", "buenos días", "buenos dias", "buenas tardes", "buenas noches",
-    "buen día", "buen dia", "buenas", "saludos", "qué tal", "que tal",
-    "hey", "holi", "alo", "aló"
+    "hola", "buenos dias", "buenas tardes", "buenas noches", "buen dia",
+    "buenas", "saludos", "que tal", "hey", "holi", "alo"
 }
 
 DESPEDIDAS: Set[str] = {
-    "gracias", "chau", "adiós", "adios", "nos vemos", "hasta luego",
+    "gracias", "chau", "adios", "nos vemos", "hasta luego",
     "perfecto gracias", "ok gracias", "listo gracias", "bye",
     "muchas gracias", "mil gracias", "te agradezco", "hasta pronto"
 }
@@ -45,47 +51,38 @@ DESPEDIDAS: Set[str] = {
 # ============================================================================
 
 PRECIO: Set[str] = {
-    "precio", "precios", "cuánto cuesta", "cuanto cuesta",
-    "cuánto vale", "cuanto vale", "valor", "costo",
-    "precio de", "precio de la", "precio del", "cuánto es",
-    "cuanto es", "qué precio", "que precio", "a cómo", "a como",
-    "sale a", "está a", "esta a", "qué valor", "que valor"
+    "precio", "precios", "cuanto cuesta", "cuanto vale", "valor", "costo",
+    "precio de", "precio de la", "precio del", "cuanto es", "que precio",
+    "a como", "sale a", "esta a", "que valor"
 }
 
 DISPONIBILIDAD: Set[str] = {
-    "disponible", "disponibles", "tienen", "hay", "stock",
-    "inventario", "cuántas", "cuántos", "existe", "tienen en",
-    "hay en", "disponibilidad", "en existencia", "hay stock",
-    "tienen stock", "manejan"
+    "disponible", "disponibles", "tienen", "hay", "stock", "inventario",
+    "cuantas", "cuantos", "existe", "tienen en", "hay en", "disponibilidad",
+    "en existencia", "hay stock", "tienen stock", "manejan"
 }
 
 FORMAS_PAGO: Set[str] = {
-    "forma de pago", "formas de pago", "cómo pagar", "como pagar",
-    "pago", "pagando", "addi", "sistecrédito", "sistecredito",
-    "crédito", "credito", "financiación", "financiacion",
-    "cuotas", "a plazos", "contado", "efectivo", "transferencia",
-    "tarjeta", "nequi", "daviplata"
+    "forma de pago", "formas de pago", "como pagar", "pago", "pagando",
+    "addi", "sistecredito", "credito", "financiacion", "cuotas", "a plazos",
+    "contado", "efectivo", "transferencia", "tarjeta", "nequi", "daviplata"
 }
 
 COMPRAR: Set[str] = {
-    "comprar", "quiero comprar", "me interesa comprar",
-    "necesito comprar", "voy a comprar", "ya hice el pago",
-    "pagué", "pague", "lo quiero", "la quiero", "me la llevo",
-    "listo para comprar", "cómo compro", "como compro"
+    "comprar", "quiero comprar", "me interesa comprar", "necesito comprar",
+    "voy a comprar", "ya hice el pago", "pague", "lo quiero", "la quiero",
+    "me la llevo", "listo para comprar", "como compro"
 }
 
 COTIZACION: Set[str] = {
-    "cotización", "cotizacion", "cotizar", "cotizame",
-    "pasame cotización", "pásame cotización", "factura proforma",
-    "presupuesto formal", "proforma"
+    "cotizacion", "cotizar", "cotizame", "pasame cotizacion",
+    "factura proforma", "presupuesto formal", "proforma"
 }
 
 ENVIO: Set[str] = {
-    "envío", "envio", "enviar", "llegar", "entrega",
-    "entregar", "envían", "envian", "hacen envío",
-    "hacen envio", "a domicilio", "domicilio", "despacho",
-    "mandan", "mandarlo", "tiempo de entrega", "cuándo llega",
-    "cuando llega", "envían a", "envian a", "hacen envío a",
+    "envio", "enviar", "llegar", "entrega", "entregar", "envian",
+    "hacen envio", "a domicilio", "domicilio", "despacho", "mandan",
+    "mandarlo", "tiempo de entrega", "cuando llega", "envian a",
     "hacen envio a", "llegan a", "mandan a", "despachan a"
 }
 
@@ -94,9 +91,9 @@ ENVIO: Set[str] = {
 # ============================================================================
 
 INSTALACION: Set[str] = {
-    "instalación", "instalacion", "instalar", "instalen", "instalo",
-    "montar", "montaje", "dejan funcionando", "dejen funcionando",
-    "configurar", "poner a funcionar", "armado", "vengan a instalar"
+    "instalacion", "instalar", "instalen", "instalo", "montar", "montaje",
+    "dejan funcionando", "dejen funcionando", "configurar",
+    "poner a funcionar", "armado", "vengan a instalar"
 }
 
 VISITA: Set[str] = {
@@ -105,17 +102,14 @@ VISITA: Set[str] = {
 }
 
 GARANTIA: Set[str] = {
-    "garantía", "garantia", "garantizado", "cobertura",
-    "respaldo", "soporte", "servicio técnico", "servicio tecnico",
-    "postventa", "post venta", "si se daña", "si se dana"
+    "garantia", "garantizado", "cobertura", "respaldo", "soporte",
+    "servicio tecnico", "postventa", "post venta", "si se dana"
 }
 
 REPARACION: Set[str] = {
-    "servicio", "reparación", "reparacion", "arreglar",
-    "arreglo", "mantenimiento", "revisar", "revisión",
-    "revision", "no funciona", "se dañó", "se dano",
-    "está mala", "esta mala", "no prende", "no cose",
-    "tiene problemas", "se trabó", "se trabo", "hace ruido",
+    "servicio", "reparacion", "arreglar", "arreglo", "mantenimiento",
+    "revisar", "revision", "no funciona", "se dano", "esta mala", "no prende",
+    "no cose", "tiene problemas", "se trabo", "hace ruido",
     "no avanza la tela", "rompe el hilo", "salta puntadas", "desajustada"
 }
 
@@ -127,20 +121,15 @@ REPUESTOS: Set[str] = {
 }
 
 CAPACITACION: Set[str] = {
-    "capacitación", "capacitacion", "enseñan", "ensenan",
-    "curso", "cursos", "aprendo", "aprender", "clases",
-    "tutorial", "cómo usar", "como usar", "instrucciones",
-    "me enseñan", "me ensenan"
+    "capacitacion", "ensenan", "curso", "cursos", "aprendo", "aprender",
+    "clases", "tutorial", "como usar", "instrucciones", "me ensenan"
 }
 
 ASESORIA: Set[str] = {
-    "asesoría", "asesoria", "asesorar", "asesoramiento",
-    "recomiendas", "recomienda", "qué me recomiendas",
-    "que me recomiendas", "me recomiendas", "recomiéndame",
-    "recomiendame", "qué máquina", "que maquina",
-    "cuál máquina", "cual maquina", "sugieres", "sugerencia",
-    "aconsejas", "qué necesito", "que necesito",
-    "cuál es la mejor", "cual es la mejor"
+    "asesoria", "asesorar", "asesoramiento", "recomiendas", "recomienda",
+    "que me recomiendas", "me recomiendas", "recomiendame", "que maquina",
+    "cual maquina", "sugieres", "sugerencia", "aconsejas", "que necesito",
+    "cual es la mejor"
 }
 
 # ============================================================================
@@ -148,19 +137,16 @@ ASESORIA: Set[str] = {
 # ============================================================================
 
 MAQUINA_FAMILIAR: Set[str] = {
-    "máquina familiar", "maquina familiar", "familiar",
-    "familiares", "para casa", "doméstico", "domestico",
-    "hogar", "uso personal", "máquinas familiares",
-    "maquinas familiares", "uso doméstico", "uso domestico",
+    "maquina familiar", "familiar", "familiares", "para casa", "domestico",
+    "hogar", "uso personal", "maquinas familiares", "uso domestico",
     "para el hogar", "casera"
 }
 
 MAQUINA_INDUSTRIAL: Set[str] = {
-    "máquina industrial", "maquina industrial", "industrial",
-    "industriales", "taller", "producción", "produccion",
-    "emprendimiento", "negocio", "máquinas industriales",
-    "maquinas industriales", "recta industrial", "para taller",
-    "para producir", "profesional", "trabajo pesado"
+    "maquina industrial", "industrial", "industriales", "taller",
+    "produccion", "emprendimiento", "negocio", "maquinas industriales",
+    "recta industrial", "para taller", "para producir", "profesional",
+    "trabajo pesado"
 }
 
 FILETEADORA: Set[str] = {
@@ -174,8 +160,8 @@ FILETEADORA: Set[str] = {
 # ============================================================================
 
 USO_ROPA: Set[str] = {
-    "ropa", "prendas", "camisas", "pantalones", "vestidos",
-    "blusas", "faldas", "confección", "confeccion"
+    "ropa", "prendas", "camisas", "pantalones", "vestidos", "blusas",
+    "faldas", "confeccion"
 }
 
 USO_GORRAS: Set[str] = {
@@ -191,16 +177,15 @@ USO_ACCESORIOS: Set[str] = {
 }
 
 USO_HOGAR: Set[str] = {
-    "cortinas", "mantelería", "manteleria", "cojines",
-    "lencería hogar", "lenceria hogar"
+    "cortinas", "manteleria", "cojines", "lenceria hogar"
 }
 
 USO_UNIFORMES: Set[str] = {
-    "uniformes", "dotación", "dotacion", "overoles"
+    "uniformes", "dotacion", "overoles"
 }
 
 USO_CUERO: Set[str] = {
-    "cuero", "cueros", "marroquinería", "marroquineria"
+    "cuero", "cueros", "marroquineria"
 }
 
 # ============================================================================
@@ -208,15 +193,14 @@ USO_CUERO: Set[str] = {
 # ============================================================================
 
 VOLUMEN_ALTO: Set[str] = {
-    "constante", "muchas", "muchos", "producción constante",
-    "produccion constante", "producción continua", "produccion continua",
-    "continua", "diario", "todos los días", "clientes", "pedidos",
-    "encargos", "alta producción", "alta produccion"
+    "constante", "muchas", "muchos", "produccion constante",
+    "produccion continua", "continua", "diario", "todos los dias", "clientes",
+    "pedidos", "encargos", "alta produccion"
 }
 
 VOLUMEN_BAJO: Set[str] = {
-    "pocas", "poca", "poco", "pocos", "ocasional", "esporádico",
-    "esporadico", "hobby", "arreglos", "remiendos", "casual"
+    "pocas", "poca", "poco", "pocos", "ocasional", "esporadico", "hobby",
+    "arreglos", "remiendos", "casual"
 }
 
 # ============================================================================
@@ -225,44 +209,43 @@ VOLUMEN_BAJO: Set[str] = {
 
 IMPACTO_NEGOCIO: Set[str] = {
     "montar negocio", "montar un negocio", "montar mi negocio",
-    "emprendimiento", "emprender", "mi emprendimiento",
-    "mi taller", "abrir taller", "mejorar mi negocio",
-    "mejorar negocio", "hacer crecer", "crecer",
-    "aumentar producción", "aumentar produccion",
-    "escalar", "expandir"
+    "emprendimiento", "emprender", "mi emprendimiento", "mi taller",
+    "abrir taller", "mejorar mi negocio", "mejorar negocio", "hacer crecer",
+    "crecer", "aumentar produccion", "escalar", "expandir"
 }
 
 # ============================================================================
 # CIUDADES COLOMBIA
 # ============================================================================
 
-CIUDADES_MONTERIA: Set[str] = {"montería", "monteria"}
+# Para extraer la ubicación de un texto usar app/rules/locations.py (gazetteer
+# MUNICIPIOS_COLOMBIA más abajo); estos sets quedan como grupos de keywords.
+CIUDADES_MONTERIA: Set[str] = {"monteria"}
 
 CIUDADES_OTRAS: Set[str] = {
-    "bogotá", "bogota", "medellín", "medellin", "cali", "barranquilla",
-    "cartagena", "santa marta", "manizales", "pereira", "armenia",
-    "ibagué", "ibague", "villavicencio", "bucaramanga", "pasto",
-    "neiva", "cúcuta", "cucuta", "sincelejo", "valledupar",
-    "popayán", "popayan"
+    "bogota", "medellin", "cali", "barranquilla", "cartagena", "santa marta",
+    "manizales", "pereira", "armenia", "ibague", "villavicencio",
+    "bucaramanga", "pasto", "neiva", "cucuta", "sincelejo", "valledupar",
+    "popayan"
 }
 
 UBICACIONES_RURALES: Set[str] = {
-    "municipio", "pueblo", "vereda", "corregimiento"
+    "municipio", "pueblo", "vereda", "corregimiento", "caserio", "zona rural"
 }
 
-# Mapeo de ciudades normalizadas
+# Mapeo de ciudades normalizadas (clave plegada -> nombre para mostrar)
 CIUDADES_MAP: Dict[str, str] = {
-    "montería": "montería", "monteria": "montería",
-    "bogotá": "bogotá", "bogota": "bogotá",
-    "medellín": "medellín", "medellin": "medellín",
+    "monteria": "montería",
+    "bogota": "bogotá",
+    "medellin": "medellín",
     "cali": "cali",
     "barranquilla": "barranquilla",
     "cartagena": "cartagena",
     "bucaramanga": "bucaramanga",
     "pereira": "pereira",
     "manizales": "manizales",
-    "ibagué": "ibagué", "ibague": "ibagué",
-    "cúcuta": "cúcuta", "cucuta": "cúcuta",
+    "ibague": "ibagué",
+    "cucuta": "cúcuta",
     "villavicencio": "villavicencio",
     "santa marta": "santa marta",
     "pasto": "pasto",
@@ -270,8 +253,120 @@ CIUDADES_MAP: Dict[str, str] = {
     "armenia": "armenia",
     "sincelejo": "sincelejo",
     "valledupar": "valledupar",
-    "popayán": "popayán", "popayan": "popayán"
-}
+    "popayan": "popayán"
+}
+
+# Gazetteer de municipios (departamento -> municipios, nombre para mostrar).
+# Córdoba y Sucre completos (zona de influencia de la tienda), capitales y
+# ciudades principales del resto del país. Lo usa app/rules/locations.py.
+MUNICIPIOS_COLOMBIA: Dict[str, Tuple[str, ...]] = {
+    "Córdoba": (
+        "Montería", "Ayapel", "Buenavista", "Canalete", "Cereté", "Chimá", "Chinú",
+        "Ciénaga de Oro", "Cotorra", "La Apartada", "Lorica", "Los Córdobas",
+        "Momil", "Montelíbano", "Moñitos", "Planeta Rica", "Pueblo Nuevo",
+        "Puerto Escondido", "Puerto Libertador", "Purísima", "Sahagún",
+        "San Andrés de Sotavento", "San Antero", "San Bernardo del Viento",
+        "San Carlos", "San José de Uré", "San Pelayo", "Tierralta", "Tuchín",
+        "Valencia",
+    ),
+    "Sucre": (
+        "Sincelejo", "Caimito", "Chalán", "Colosó", "Corozal", "Coveñas", "El Roble",
+        "Galeras", "Guaranda", "La Unión", "Los Palmitos", "Majagual", "Morroa",
+        "Ovejas", "Palmito", "Sampués", "San Benito Abad", "San Juan de Betulia",
+        "San Marcos", "San Onofre", "San Pedro", "Sincé", "Sucre", "Tolú",
+        "Tolú Viejo",
+    ),
+    "Antioquia": (
+        "Medellín", "Bello", "Itagüí", "Envigado", "Sabaneta", "La Estrella",
+        "Caldas", "Copacabana", "Girardota", "Barbosa", "Rionegro", "Marinilla",
+        "La Ceja", "Santa Fe de Antioquia", "Apartadó", "Turbo", "Carepa",
+        "Chigorodó", "Necoclí", "Arboletes", "San Juan de Urabá",
+        "San Pedro de Urabá", "Mutatá", "Caucasia", "El Bagre", "Zaragoza",
+        "Nechí", "Cáceres", "Tarazá", "Segovia", "Remedios", "Puerto Berrío",
+        "Yarumal",
+    ),
+    "Bolívar": (
+        "Cartagena", "Magangué", "Turbaco", "Arjona", "El Carmen de Bolívar",
+        "Mompox", "María la Baja", "San Juan Nepomuceno", "San Jacinto",
+        "Santa Rosa del Sur", "Simití",
+    ),
+    "Atlántico": (
+        "Barranquilla", "Soledad", "Malambo", "Sabanalarga", "Puerto Colombia",
+        "Galapa", "Baranoa",
+    ),
+    "Magdalena": (
+        "Santa Marta", "Ciénaga", "Fundación", "El Banco", "Aracataca", "Plato",
+        "Zona Bananera",
+    ),
+    "Cesar": (
+        "Valledupar", "Aguachica", "Agustín Codazzi", "Bosconia", "Curumaní",
+        "La Jagua de Ibirico",
+    ),
+    "La Guajira": ("Riohacha", "Maicao", "Uribia", "Fonseca", "San Juan del Cesar"),
+    "Norte de Santander": ("Cúcuta", "Ocaña", "Pamplona", "Villa del Rosario", "Los Patios"),
+    "Santander": (
+        "Bucaramanga", "Floridablanca", "Girón", "Piedecuesta", "Barrancabermeja",
+        "San Gil", "Socorro",
+    ),
+    "Bogotá D.C.": ("Bogotá",),
+    "Cundinamarca": (
+        "Soacha", "Chía", "Zipaquirá", "Facatativá", "Fusagasugá", "Girardot",
+        "Mosquera", "Madrid", "Funza", "Cajicá",
+    ),
+    "Boyacá": ("Tunja", "Duitama", "Sogamoso", "Chiquinquirá"),
+    "Caldas": ("Manizales", "La Dorada"),
+    "Risaralda": ("Pereira", "Dosquebradas", "Santa Rosa de Cabal"),
+    "Quindío": ("Armenia", "Calarcá"),
+    "Tolima": ("Ibagué", "Espinal"),
+    "Huila": ("Neiva", "Pitalito", "Garzón"),
+    "Valle del Cauca": (
+        "Cali", "Palmira", "Buenaventura", "Tuluá", "Buga", "Cartago", "Jamundí",
+        "Yumbo",
+    ),
+    "Cauca": ("Popayán", "Santander de Quilichao"),
+    "Nariño": ("Pasto", "Tumaco", "Ipiales"),
+    "Meta": ("Villavicencio", "Acacías", "Granada"),
+    "Casanare": ("Yopal",),
+    "Arauca": ("Arauca",),
+    "Chocó": ("Quibdó",),
+    "Caquetá": ("Florencia",),
+    "Putumayo": ("Mocoa",),
+    "Amazonas": ("Leticia",),
+    "Guainía": ("Inírida",),
+    "Guaviare": ("San José del Guaviare",),
+    "Vaupés": ("Mitú",),
+    "Vichada": ("Puerto Carreño",),
+    "San Andrés y Providencia": ("San Andrés",),
+}
+
+# Otros nombres con los que escriben un municipio (plegado -> municipio plegado)
+ALIAS_MUNICIPIOS: Dict[str, str] = {
+    "santa cruz de lorica": "lorica",
+    "santa cruz de mompox": "mompox",
+    "mompos": "mompox",
+    "santiago de tolu": "tolu",
+    "san luis de since": "since",
+    "cartagena de indias": "cartagena",
+    "medallo": "medellin",
+    "barranca": "barrancabermeja",
+    "villavo": "villavicencio",
+}
+
+# Municipios que también son palabras, apellidos o lugares de otros países:
+# solo cuentan después de una pista ("en", "de", "desde", ...)
+MUNICIPIOS_AMBIGUOS: Set[str] = {
+    "buenavista", "cotorra", "la apartada", "monitos", "pueblo nuevo", "purisima",
+    "san carlos", "valencia", "caimito", "el roble", "galeras", "la union",
+    "los palmitos", "ovejas", "palmito", "san marcos", "san pedro", "sucre",
+    "bello", "la estrella", "caldas", "barbosa", "la ceja", "turbo", "caceres",
+    "segovia", "remedios", "arjona", "cienaga", "fundacion", "el banco", "plato",
+    "fonseca", "pamplona", "los patios", "giron", "socorro", "chia", "mosquera",
+    "madrid", "espinal", "garzon", "pasto", "granada", "florencia", "leticia",
+    "la dorada", "san andres", "apartado", "soledad", "since", "coloso", "chalan",
+    "acacias", "buenaventura", "copacabana", "zaragoza",
+}
+
+PISTAS_UBICACION: Set[str] = {"en", "de", "desde", "a", "para", "hasta", "por"}
 
 # ============================================================================
 # MARCAS Y MODELOS
@@ -304,12 +399,11 @@ MARCAS_MODELOS: Dict[str, tuple] = {
 # ============================================================================
 
 PROMOCIONES: Set[str] = {
-    "promoción", "promocion", "promociones", "promociones de navidad",
-    "promoción navideña", "promocion navidena", "oferta", "ofertas",
-    "descuento", "descuentos", "rebaja", "rebajas", "especial",
-    "tienen promoción", "hay promoción", "promoción navidad",
-    "ganga", "oportunidad", "liquidación", "liquidacion",
-    "precio especial", "navidad", "navideña", "navidena"
+    "promocion", "promociones", "promociones de navidad",
+    "promocion navidena", "oferta", "ofertas", "descuento", "descuentos",
+    "rebaja", "rebajas", "especial", "tienen promocion", "hay promocion",
+    "promocion navidad", "ganga", "oportunidad", "liquidacion",
+    "precio especial", "navidad", "navidena"
 }
 
 # ============================================================================
@@ -317,13 +411,10 @@ PROMOCIONES: Set[str] = {
 # ============================================================================
 
 FOTOS: Set[str] = {
-    "fotos", "foto", "imágenes", "imagenes", "imagen",
-    "muéstrame", "muestrame", "ver fotos", "quiero ver",
-    "tienes fotos", "tiene fotos", "muestra", "fotografía",
-    "fotografia", "regalame fotos", "regálame fotos",
-    "puedes mostrarme", "muéstrame fotos", "envíame foto",
-    "enviame foto", "pásame fotos", "pasame fotos",
-    "mándame", "mandame"
+    "fotos", "foto", "imagenes", "imagen", "muestrame", "ver fotos",
+    "quiero ver", "tienes fotos", "tiene fotos", "muestra", "fotografia",
+    "regalame fotos", "puedes mostrarme", "muestrame fotos", "enviame foto",
+    "pasame fotos", "mandame"
 }
 
 # ============================================================================
@@ -331,12 +422,9 @@ FOTOS: Set[str] = {
 # ============================================================================
 
 ESPECIFICACIONES: Set[str] = {
-    "especificaciones", "especificacion", "características",
-    "caracteristicas", "qué tiene", "que tiene",
-    "incluye", "trae", "viene con", "specs",
-    "detalles técnicos", "detalles tecnicos",
-    "ficha técnica", "ficha tecnica", "datos", "info",
-    "información técnica", "informacion tecnica"
+    "especificaciones", "especificacion", "caracteristicas", "que tiene",
+    "incluye", "trae", "viene con", "specs", "detalles tecnicos",
+    "ficha tecnica", "datos", "info", "informacion tecnica"
 }
 
 # ============================================================================
@@ -344,13 +432,12 @@ ESPECIFICACIONES: Set[str] = {
 # ============================================================================
 
 HORARIOS: Set[str] = {
-    "horario", "horarios", "hora", "cuándo abren", "cuando abren",
-    "están abiertos", "estan abiertos", "abierto", "cierran"
+    "horario", "horarios", "hora", "cuando abren", "estan abiertos",
+    "abierto", "cierran"
 }
 
 UBICACION: Set[str] = {
-    "dónde quedan", "donde quedan", "ubicación", "ubicacion",
-    "dirección", "direccion", "cómo llego", "como llego"
+    "donde quedan", "ubicacion", "direccion", "como llego"
 }
 
 # ============================================================================
@@ -363,10 +450,10 @@ URGENTE: Set[str] = {
 }
 
 PROBLEMAS: Set[str] = {
-    "problema", "error", "no llegó", "perdido", "equivocado",
-    "devolución", "reembolso", "cancelar", "cancelación",
-    "insatisfecho", "mal servicio", "defectuoso", "rota", "roto",
-    "reclamo", "queja", "mal estado", "llegó roto", "producto roto"
+    "problema", "error", "no llego", "perdido", "equivocado", "devolucion",
+    "reembolso", "cancelar", "cancelacion", "insatisfecho", "mal servicio",
+    "defectuoso", "rota", "roto", "reclamo", "queja", "mal estado",
+    "llego roto", "producto roto"
 }
 
 # ============================================================================
@@ -375,21 +462,21 @@ PROBLEMAS: Set[str] = {
 
 FUERA_DEL_NEGOCIO: Set[str] = {
     # Programación y tecnología
-    "programar", "programación", "código", "codigo", "python",
+    "programar", "programacion", "codigo", "python",
     "javascript", "java", "react", "angular", "software",
-    "aplicación", "aplicacion", "app", "desarrollo", "programador",
+    "aplicacion", "app", "desarrollo", "programador",
     "bug", "debug", "api", "backend", "frontend", "base de datos",
-    "sql", "html", "css", "algoritmo", "función", "funcion",
+    "sql", "html", "css", "algoritmo", "funcion",
     
     # Tareas académicas
     "tarea", "examen", "trabajo escolar", "universidad",
     "colegio", "clase de", "profesor", "estudiar", "ensayo",
-    "monografía", "monografia", "investigación", "investigacion",
+    "monografia", "investigacion",
     
     # Temas personales/sensibles
-    "médico", "medico", "doctor", "enfermedad", "síntomas",
-    "sintomas", "receta", "medicina", "abogado", "legal",
-    "demanda", "divorcio", "psicólogo", "psicologo",
+    "medico", "doctor", "enfermedad", "sintomas",
+    "receta", "medicina", "abogado", "legal",
+    "demanda", "divorcio", "psicologo",
     
     # Otros servicios no relacionados
     "comida", "restaurante", "hotel", "vuelo", "viaje",
@@ -401,9 +488,14 @@ FUERA_DEL_NEGOCIO: Set[str] = {
 # FUNCIONES DE UTILIDAD
 # ============================================================================
 
+@lru_cache(maxsize=4096)
 def normalize_text(text: str) -> str:
-    """Normaliza texto para comparación."""
-    return text.lower().strip()
+    """
+    Normaliza texto para comparación: minúsculas, sin tildes, recortado y con
+    errores de tipeo corregidos. Memorizado: contains_any() lo llama por cada
+    grupo de keywords con el mismo texto.
+    """
+    return normalize_for_matching(text)
 
 
 def contains_any(text: str, keywords: Set[str]) -> bool:
@@ -421,6 +513,29 @@ def extract_match(text: str, keywords: Set[str]) -> str | None:
     return None
 
 
+# Vocabulario del corrector de tipeo: toda palabra que aparece en algún keyword
+TYPO_VOCABULARY: Set[str] = {
+    word
+    for group in (
+        CONFIRMACIONES, NEGACIONES, SALUDOS, DESPEDIDAS, PRECIO, DISPONIBILIDAD,
+        FORMAS_PAGO, COMPRAR, COTIZACION, ENVIO, INSTALACION, VISITA, GARANTIA,
+        REPARACION, REPUESTOS, CAPACITACION, ASESORIA, MAQUINA_FAMILIAR,
+        MAQUINA_INDUSTRIAL, FILETEADORA, USO_ROPA, USO_GORRAS, USO_CALZADO,
+        USO_ACCESORIOS, USO_HOGAR, USO_UNIFORMES, USO_CUERO, VOLUMEN_ALTO,
+        VOLUMEN_BAJO, IMPACTO_NEGOCIO, CIUDADES_MONTERIA, CIUDADES_OTRAS,
+        UBICACIONES_RURALES, CIUDADES_MAP, MARCAS_MODELOS, PROMOCIONES, FOTOS,
+        ESPECIFICACIONES, HORARIOS, UBICACION, URGENTE, PROBLEMAS, FUERA_DEL_NEGOCIO,
+    )
+    for keyword in group
+    for word in keyword.split()
+} | {
+    word
+    for municipios in MUNICIPIOS_COLOMBIA.values()
+    for municipio in municipios
+    for word in fold_text(municipio).split()
+} | {word for alias in ALIAS_MUNICIPIOS for word in alias.split()}
+
+
 def get_all_comercial_keywords() -> Set[str]:
     """Retorna todos los keywords que indican consulta comercial."""
     return PRECIO | DISPONIBILIDAD | FORMAS_PAGO | COMPRAR | COTIZACION | ENVIO | PROMOCIONES
@@ -0,0 +1,174 @@
+"""
+Extracción de ubicación: municipio canónico y clase Montería / otra / rural.
+
+Un trie por palabras sobre el gazetteer de keywords.py (MUNICIPIOS_COLOMBIA,
+ALIAS_MUNICIPIOS) más las señales rurales (UBICACIONES_RURALES). El texto se
+normaliza con normalize_text (sin tildes, typos corregidos: "monteira",
+"barranquila") y se recorre una sola vez por palabras, quedándose en cada
+posición con la coincidencia más larga ("ciénaga de oro" antes que "ciénaga",
+"san andrés de sotavento" antes que "san andrés"). Al ir por palabras no hay
+falsos positivos por substring ("cali" en "calidad").
+
+Los municipios que también son palabras comunes (MUNICIPIOS_AMBIGUOS: "turbo",
+"plato", "el banco") solo cuentan después de una pista ("en", "de", ...).
+"""
+import re
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.rules.keywords import (
+    normalize_text,
+    ALIAS_MUNICIPIOS,
+    CIUDADES_MONTERIA,
+    MUNICIPIOS_AMBIGUOS,
+    MUNICIPIOS_COLOMBIA,
+    PISTAS_UBICACION,
+    UBICACIONES_RURALES,
+)
+from app.rules.normalization import fold_text
+
+
+class LocationClass(Enum):
+    """Clase de ubicación para logística (tienda en Montería)."""
+    MONTERIA = "monteria"  # Montería: puede venir a la tienda
+    OTHER = "other"  # otro municipio: envío
+    RURAL = "rural"  # vereda, corregimiento, "un pueblo": coordinar con asesor
+
+
+@dataclass(frozen=True)
+class Location:
+    """Ubicación extraída de un texto."""
+    city: Optional[str]  # nombre para mostrar ("Cereté"); None si solo hay señal rural
+    key: Optional[str]  # nombre plegado ("cerete")
+    department: Optional[str]
+    location_class: LocationClass
+
+
+@dataclass(frozen=True)
+class _Municipio:
+    name: str
+    key: str
+    department: str
+    needs_cue: bool
+
+
+_RURAL = object()  # valor terminal del trie para señales rurales
+_END = ""  # clave del valor terminal en cada nodo (ninguna palabra es vacía)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class LocationTrie:
+    """Trie por palabras con búsqueda de la coincidencia más larga."""
+
+    def __init__(self):
+        self.root: Dict[str, dict] = {}
+
+    def add(self, phrase: str, value) -> None:
+        node = self.root
+        for word in phrase.split():
+            node = node.setdefault(word, {})
+        node.setdefault(_END, value)  # el primero en agregarse gana
+
+    def longest_match(self, words: List[str], start: int) -> Tuple[object, int]:
+        """(valor, cantidad de palabras) de la frase más larga que empieza en start."""
+        node = self.root
+        best, best_length = None, 0
+        for i in range(start, len(words)):
+            node = node.get(words[i])
+            if node is None:
+                break
+            if _END in node:
+                best, best_length = node[_END], i - start + 1
+        return best, best_length
+
+
+def build_location_trie() -> LocationTrie:
+    """Trie con todos los municipios, sus alias y las señales rurales."""
+    trie = LocationTrie()
+    by_key: Dict[str, _Municipio] = {}
+    for department, names in MUNICIPIOS_COLOMBIA.items():
+        for name in names:
+            key = fold_text(name)
+            # Nombres repetidos (Buenavista): gana el primer departamento (Córdoba)
+            municipio = by_key.setdefault(
+                key, _Municipio(name, key, department, key in MUNICIPIOS_AMBIGUOS)
+            )
+            trie.add(key, municipio)
+    for alias, key in ALIAS_MUNICIPIOS.items():
+        trie.add(alias, by_key[key])
+    for signal in UBICACIONES_RURALES:
+        trie.add(signal, _RURAL)
+    return trie
+
+
+_trie: Optional[LocationTrie] = None
+
+
+def get_location_trie() -> LocationTrie:
+    """Trie del gazetteer (se construye en el primer uso)."""
+    global _trie
+    if _trie is None:
+        _trie = build_location_trie()
+    return _trie
+
+
+def _scan(words: List[str]) -> Iterable[object]:
+    """Coincidencias (municipio o _RURAL) de izquierda a derecha, sin solaparse."""
+    trie = get_location_trie()
+    i = 0
+    while i < len(words):
+        value, length = trie.longest_match(words, i)
+        if value is None:
+            i += 1
+            continue
+        has_cue = i > 0 and words[i - 1] in PISTAS_UBICACION
+        if value is _RURAL or not value.needs_cue or has_cue:
+            yield value
+        i += length
+
+
+@lru_cache(maxsize=4096)
+def extract_location(text: str) -> Optional[Location]:
+    """
+    Primer municipio mencionado en el texto y su clase, en una pasada.
+
+    Una señal rural ("vereda", "corregimiento") hace la ubicación RURAL aunque
+    también se nombre el municipio ("vereda El Sabanal de Montería").
+    """
+    if not text:
+        return None
+    municipio: Optional[_Municipio] = None
+    rural = False
+    for value in _scan(_WORD_RE.findall(normalize_text(text))):
+        if value is _RURAL:
+            rural = True
+        elif municipio is None:
+            municipio = value
+    if municipio is None and not rural:
+        return None
+    if rural:
+        location_class = LocationClass.RURAL
+    elif municipio.key in CIUDADES_MONTERIA:
+        location_class = LocationClass.MONTERIA
+    else:
+        location_class = LocationClass.OTHER
+    if municipio is None:
+        return Location(None, None, None, location_class)
+    return Location(municipio.name, municipio.key, municipio.department, location_class)
+
+
+def extract_location_from_history(history: List[Dict], limit: int = 12) -> Optional[Location]:
+    """Ubicación del mensaje más reciente del cliente que menciona un municipio."""
+    rural: Optional[Location] = None
+    for msg in reversed(history[-limit:]):
+        if msg.get("sender") == "luisa":
+            continue
+        location = extract_location(msg.get("text", ""))
+        if location is None:
+            continue
+        if location.city:
+            return location
+        rural = rural or location
+    return rural
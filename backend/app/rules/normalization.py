@@ -0,0 +1,193 @@
+"""
+Normalización de texto para las reglas de keywords.
+
+1. Plegado Unicode: minúsculas y sin tildes/diéresis/ñ con una tabla de
+   str.translate precalculada ("Máquina" -> "maquina"). Los keywords de
+   keywords.py se escriben ya plegados, una sola variante por palabra.
+2. Errores de tipeo: índice estilo SymSpell (deletes precalculados) sobre el
+   vocabulario de keywords. Un token desconocido se corrige solo si está a
+   distancia 1 de exactamente una palabra del vocabulario ("maqina" ->
+   "maquina", "presio" -> "precio"). Las correcciones se memorizan por token.
+
+Una palabra real a distancia 1 de un keyword no es un typo ("pedido" no es
+"perdido", "queda" no es "queja"). Por eso nunca se corrigen tokens que están
+en la lista curada de palabras comunes (SPANISH_WORDLIST_PATH; candidatas
+nuevas con scripts/check_typo_collisions.py), del vocabulario ni de
+PROTECTED_WORDS. Además: solo se corrigen tokens de
+MIN_TOKEN_LENGTH+ letras hacia palabras de MIN_TARGET_LENGTH+ letras; las
+sustituciones solo valen entre letras que se confunden al escribir (s/c/z,
+b/v, g/j, ...); y no se cambian flexiones que solo difieren en la última letra
+("productos"/"producto", "maneja"/"manejan").
+"""
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+# ============================================================================
+# PLEGADO UNICODE
+# ============================================================================
+
+FOLD_TABLE = str.maketrans(
+    "áàäâãéèëêíìïîóòöôõúùüûñç",
+    "aaaaaeeeeiiiiooooouuuunc"
+)
+
+
+def fold_text(text: str) -> str:
+    """Minúsculas y sin tildes (no recorta espacios ni corrige)."""
+    return text.lower().translate(FOLD_TABLE)
+
+
+def fold_keywords(keywords: Iterable[str]) -> List[str]:
+    """Keywords plegados, sin repetidos y en el orden original."""
+    return list(dict.fromkeys(fold_text(keyword) for keyword in keywords))
+
+
+# ============================================================================
+# ÍNDICE DE ERRORES DE TIPEO
+# ============================================================================
+
+MIN_TOKEN_LENGTH = 5
+MIN_TARGET_LENGTH = 6
+MAX_EDIT_DISTANCE = 1
+
+# Palabras comunes del español a distancia 1 de un keyword: un token que está aquí nunca se corrige
+SPANISH_WORDLIST_PATH = Path(__file__).parent / "palabras_comunes_es.txt"
+
+# Palabras del negocio (comercio y costura) que nunca se corrigen
+PROTECTED_WORDS = frozenset({
+    "pedido", "pedidos", "cotiza", "cotizas", "cotizo", "abono", "abonos", "apartado",
+    "contraentrega", "domicilio", "domicilios", "enviado", "enviada", "pagado", "pagada",
+    "fiado", "cuotas", "sastre", "modista", "confeccion", "confecciones", "bordado",
+    "bordados", "overlock", "collarin", "recubridora", "dobladillo", "ruedo", "cosen",
+    "puntada", "puntadas",
+})
+
+
+def load_spanish_wordlist(path: Path = SPANISH_WORDLIST_PATH) -> FrozenSet[str]:
+    """Palabras de una lista (una por línea, # para comentarios)."""
+    with open(path, encoding="utf-8") as f:
+        return frozenset(line.strip() for line in f if line.strip() and not line.startswith("#"))
+
+
+# Sustituciones que sí son errores de tipeo/ortografía típicos ("presio", "bolsa"/"volsa")
+CONFUSABLE_LETTERS = (frozenset("scz"), frozenset("bv"), frozenset("yi"), frozenset("gj"), frozenset("ckq"))
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """Todas las variantes de word con hasta `distance` letras borradas."""
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        results |= frontier
+    return results
+
+
+def _is_inflection(a: str, b: str) -> bool:
+    """a y b solo difieren en una letra agregada al final (plural, persona del verbo)."""
+    return a[:-1] == b or b[:-1] == a
+
+
+def _plausible_substitution(a: str, b: str) -> bool:
+    """Si a y b solo difieren por sustituciones, todas deben ser entre letras confundibles."""
+    if len(a) != len(b):
+        return True
+    mismatches = [(x, y) for x, y in zip(a, b) if x != y]
+    if len(mismatches) == 2 and mismatches[0] == mismatches[1][::-1]:
+        return True  # transposición ("maqiuna")
+    return all(any(x in group and y in group for group in CONFUSABLE_LETTERS) for x, y in mismatches)
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Distancia Damerau-Levenshtein (alineación óptima de cadenas)."""
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+class TypoIndex:
+    """Corrector por deletes precalculados (SymSpell) sobre un vocabulario fijo."""
+
+    def __init__(
+        self,
+        vocabulary: Iterable[str],
+        protected: Iterable[str] = (),
+        max_distance: int = MAX_EDIT_DISTANCE,
+        min_token_length: int = MIN_TOKEN_LENGTH,
+        min_target_length: int = MIN_TARGET_LENGTH
+    ):
+        self.vocabulary: FrozenSet[str] = frozenset(vocabulary)
+        self.known: FrozenSet[str] = self.vocabulary | frozenset(protected)
+        self.max_distance = max_distance
+        self.min_token_length = min_token_length
+        self.deletes: Dict[str, Set[str]] = {}
+        for word in self.vocabulary:
+            if len(word) >= min_target_length and word.isalpha():
+                for variant in _deletes(word, max_distance):
+                    self.deletes.setdefault(variant, set()).add(word)
+
+    def lookup(self, token: str) -> Optional[str]:
+        """Única palabra del vocabulario más cercana a token (None si no hay o es ambigua)."""
+        if token in self.known or len(token) < self.min_token_length or not token.isalpha():
+            return None
+        candidates: Set[str] = set()
+        for variant in _deletes(token, self.max_distance):
+            candidates |= self.deletes.get(variant, set())
+        best: List[str] = []
+        best_distance = self.max_distance + 1
+        for candidate in candidates:
+            distance = edit_distance(token, candidate)
+            if distance > self.max_distance or _is_inflection(token, candidate):
+                continue
+            if not _plausible_substitution(token, candidate):
+                continue
+            if distance < best_distance:
+                best, best_distance = [candidate], distance
+            elif distance == best_distance:
+                best.append(candidate)
+        return best[0] if len(best) == 1 else None
+
+    def correct(self, token: str) -> str:
+        return self.lookup(token) or token
+
+
+# ============================================================================
+# NORMALIZACIÓN
+# ============================================================================
+
+_TOKEN_RE = re.compile(r"[a-z]+")
+_index: Optional[TypoIndex] = None
+
+
+def get_typo_index() -> TypoIndex:
+    """Índice sobre el vocabulario de keywords.py (se construye en el primer uso)."""
+    global _index
+    if _index is None:
+        from app.rules.keywords import TYPO_VOCABULARY
+        _index = TypoIndex(TYPO_VOCABULARY, PROTECTED_WORDS | load_spanish_wordlist())
+    return _index
+
+
+@lru_cache(maxsize=20000)
+def correct_token(token: str) -> str:
+    """Token corregido (memorizado: el tráfico repite mucho las mismas palabras)."""
+    return get_typo_index().correct(token)
+
+
+def _correct_match(match: "re.Match[str]") -> str:
+    return correct_token(match.group())
+
+
+def normalize_for_matching(text: str) -> str:
+    """Plegado + recorte + corrección de tokens: la forma contra la que se buscan keywords."""
+    return _TOKEN_RE.sub(_correct_match, fold_text(text).strip())
@@ -0,0 +1,222 @@
+"""
+Exportación incremental de tablas a archivos columnares para analítica offline.
+
+interaction_traces, messages y handoffs se copian a Parquet (o Arrow IPC)
+comprimido, particionado por día al estilo Hive:
+
+    {out_dir}/{tabla}/date=YYYY-MM-DD/part-{primer_id}-{último_id}.parquet
+
+Cada corrida exporta solo las filas con id mayor a la marca de agua de la tabla
+(export_state) y la avanza lote a lote. Los archivos de un lote se escriben a un
+temporal y se renombran antes de mover la marca de agua; si el proceso muere en
+el medio, la corrida siguiente reescribe el mismo part con el mismo nombre.
+
+Cada fila se exporta una sola vez, tal como estaba en esa corrida: lo que se
+actualiza después no se reexporta. En interaction_traces eso es el resultado de
+un envío que quedó en la cola de salida: la traza sale con
+whatsapp_send_error_code = "queued" y el resultado final (que escribe
+outbound_queue._finish) queda solo en la base y en los rollups (send_failures).
+
+Conviene correrlo más seguido que TRACE_RETENTION_DAYS: las trazas crudas
+borradas por la retención ya no se pueden exportar.
+
+Requiere pyarrow (opcional, solo en la máquina que exporta):
+pip install -r requirements-analytics.txt
+"""
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import ANALYTICS_EXPORT_DIR
+from app.models.database import get_connection
+from app.logging_config import logger
+
+
+# Tabla -> columna de fecha que define la partición
+EXPORT_TABLES: Dict[str, str] = {
+    "interaction_traces": "created_at",
+    "messages": "timestamp",
+    "handoffs": "timestamp",
+}
+
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+_UNKNOWN_DATE = "unknown"
+
+
+def get_export_watermark(conn: sqlite3.Connection, table: str) -> int:
+    """Último id exportado de la tabla (0 si nunca se exportó)."""
+    row = conn.execute("SELECT last_id FROM export_state WHERE table_name = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+
+def _set_export_watermark(conn: sqlite3.Connection, table: str, last_id: int) -> None:
+    conn.execute("""
+        INSERT INTO export_state (table_name, last_id, exported_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(table_name) DO UPDATE SET last_id = excluded.last_id, exported_at = excluded.exported_at
+    """, (table, last_id))
+    conn.commit()
+
+
+def reset_export_watermarks(tables: Optional[Sequence[str]] = None) -> None:
+    """Vuelve a exportar desde el principio las tablas indicadas (todas por defecto)."""
+    conn = get_connection()
+    try:
+        for table in tables or EXPORT_TABLES:
+            conn.execute("DELETE FROM export_state WHERE table_name = ?", (table,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str]]:
+    """(nombre, tipo declarado) de cada columna, en orden."""
+    return [(row[1], (row[2] or "").upper()) for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def partition_rows_by_day(rows: Iterable[Sequence[Any]], date_index: int) -> Dict[str, List[Sequence[Any]]]:
+    """Agrupa filas por el día (YYYY-MM-DD) de la columna date_index."""
+    partitions: Dict[str, List[Sequence[Any]]] = {}
+    for row in rows:
+        value = row[date_index]
+        day = str(value)[:10] if value else _UNKNOWN_DATE
+        partitions.setdefault(day, []).append(row)
+    return partitions
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value)[:19], _TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def _arrow_schema(columns: List[Tuple[str, str]]):
+    import pyarrow as pa
+
+    fields = []
+    for name, declared in columns:
+        if "INT" in declared:
+            arrow_type = pa.int64()
+        elif "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+            arrow_type = pa.float64()
+        elif "TIMESTAMP" in declared:
+            # Parquet no tiene precisión de segundos: ms en ambos formatos (mismo esquema)
+            arrow_type = pa.timestamp("ms")
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _write_file(path: Path, schema, rows: List[Sequence[Any]], fmt: str, compression: str) -> None:
+    import pyarrow as pa
+
+    arrays = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in rows]
+        if pa.types.is_timestamp(field.type):
+            values = [_parse_timestamp(v) for v in values]
+        elif pa.types.is_string(field.type):
+            values = [None if v is None else str(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    table = pa.Table.from_arrays(arrays, schema=schema)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, tmp_path, compression=compression)
+    else:
+        import pyarrow.ipc as ipc
+        options = ipc.IpcWriteOptions(compression=compression)
+        with ipc.new_file(str(tmp_path), schema, options=options) as writer:
+            writer.write_table(table)
+    tmp_path.replace(path)
+
+
+def export_table(
+    table: str,
+    out_dir: Optional[Path] = None,
+    fmt: str = "parquet",
+    batch_size: int = 50000,
+    compression: str = "zstd",
+) -> Dict[str, Any]:
+    """
+    Exporta las filas nuevas de una tabla (id > marca de agua), tal como están
+    ahora; las que ya se exportaron no se vuelven a leer aunque cambien.
+
+    Args:
+        table: una de EXPORT_TABLES
+        out_dir: raíz de la exportación (por defecto ANALYTICS_EXPORT_DIR)
+        fmt: "parquet" o "arrow" (Arrow IPC)
+        batch_size: filas leídas por lote (acota la memoria)
+        compression: códec (zstd, lz4, snappy para Parquet...)
+
+    Returns:
+        {"rows": n, "files": n, "last_id": id}
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Tabla no exportable: {table}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+
+    stats = {"rows": 0, "files": 0, "last_id": 0}
+    conn = get_connection()
+    try:
+        stats["last_id"] = get_export_watermark(conn, table)
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logger.warning("pyarrow no instalado, no se exporta", table=table)
+            return stats
+
+        out_dir = Path(out_dir or ANALYTICS_EXPORT_DIR)
+        columns = _table_columns(conn, table)
+        names = [name for name, _ in columns]
+        schema = _arrow_schema(columns)
+        date_index = names.index(EXPORT_TABLES[table])
+        id_index = names.index("id")
+
+        while True:
+            rows = conn.execute(
+                f"SELECT {', '.join(names)} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                (stats["last_id"], batch_size)
+            ).fetchall()
+            if not rows:
+                break
+
+            for day, day_rows in partition_rows_by_day(rows, date_index).items():
+                first_id, last_id = day_rows[0][id_index], day_rows[-1][id_index]
+                path = out_dir / table / f"date={day}" / f"part-{first_id:010d}-{last_id:010d}.{FORMATS[fmt]}"
+                _write_file(path, schema, day_rows, fmt, compression)
+                stats["files"] += 1
+
+            stats["rows"] += len(rows)
+            stats["last_id"] = rows[-1][id_index]
+            _set_export_watermark(conn, table, stats["last_id"])
+            if len(rows) < batch_size:
+                break
+    finally:
+        conn.close()
+
+    if stats["rows"]:
+        logger.info("Tabla exportada", table=table, rows=stats["rows"], files=stats["files"], last_id=stats["last_id"])
+    return stats
+
+
+def export_all(
+    out_dir: Optional[Path] = None,
+    fmt: str = "parquet",
+    tables: Optional[Sequence[str]] = None,
+    batch_size: int = 50000,
+) -> Dict[str, Dict[str, Any]]:
+    """Exporta las filas nuevas de cada tabla. Retorna las estadísticas por tabla."""
+    return {
+        table: export_table(table, out_dir=out_dir, fmt=fmt, batch_size=batch_size)
+        for table in (tables or EXPORT_TABLES)
+    }
@@ -0,0 +1,254 @@
+"""
+Entrega HTTP de assets del catálogo a partir del manifiesto precomputado.
+
+Soporta:
+- ETag fuerte (hash de contenido) + 304 con If-None-Match / If-Modified-Since
+- Cache-Control inmutable para URLs versionadas (?v=<hash>)
+- Byte ranges (206 / 416) con If-Range, para seek de videos
+- sendfile vía extensión ASGI zero-copy cuando el servidor la anuncia
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple, Mapping
+
+import anyio
+from starlette.types import Scope, Receive, Send
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+from app.services.asset_manifest import AssetManifestEntry
+
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+# URL versionada por hash: el contenido nunca cambia para esa URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# URL sin versión: el cliente puede cachear pero debe revalidar (304 barato)
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+class RangeNotSatisfiable(Exception):
+    """El header Range no se puede satisfacer para el tamaño del archivo."""
+
+
+def parse_byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parsea un header Range de un solo rango.
+
+    Returns:
+        (start, end) inclusivo, o None si el header debe ignorarse (ausente, otra unidad,
+        múltiples rangos o sintaxis inválida: se responde 200 completo)
+
+    Raises:
+        RangeNotSatisfiable: si el rango es válido pero está fuera del archivo
+    """
+    if not range_header:
+        return None
+
+    unit, _, spec = range_header.strip().partition("=")
+    if unit.strip().lower() != "bytes" or not spec or "," in spec:
+        return None
+
+    start_str, sep, end_str = spec.strip().partition("-")
+    if not sep:
+        return None
+    start_str, end_str = start_str.strip(), end_str.strip()
+
+    try:
+        if not start_str:
+            # Sufijo: últimos N bytes
+            suffix = int(end_str)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - suffix), size - 1
+
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start < 0 or end < start:
+        return None
+
+    return start, min(end, size - 1)
+
+
+def _etag_matches(header_value: str, etag: str) -> bool:
+    """Comparación débil de ETags para If-None-Match (RFC 7232 §3.2)."""
+    if header_value.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header_value.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def is_not_modified(headers: Mapping[str, str], entry: AssetManifestEntry) -> bool:
+    """Evalúa If-None-Match (prioritario) o If-Modified-Since contra el manifiesto."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, entry.etag)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(entry.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def _if_range_allows(headers: Mapping[str, str], entry: AssetManifestEntry) -> bool:
+    """If-Range: solo servir el rango si el validador sigue vigente (comparación fuerte)."""
+    if_range = headers.get("if-range")
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == entry.etag
+    try:
+        return int(entry.mtime) <= parsedate_to_datetime(if_range).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+class AssetFileResponse(FileResponse):
+    """
+    FileResponse que no hace os.stat por request (usa el manifiesto), soporta un
+    rango de bytes y envía el archivo con sendfile cuando el servidor ASGI soporta
+    la extensión zero-copy. Si no la soporta, lee el archivo (o el rango) por chunks.
+    """
+
+    def __init__(
+        self,
+        entry: AssetManifestEntry,
+        byte_range: Optional[Tuple[int, int]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        **kwargs
+    ):
+        headers = dict(headers or {})
+        headers.setdefault("etag", entry.etag)
+        headers.setdefault("accept-ranges", "bytes")
+
+        if byte_range:
+            start, end = byte_range
+            self.offset, self.count = start, end - start + 1
+            headers["content-range"] = f"bytes {start}-{end}/{entry.size}"
+            headers["content-length"] = str(self.count)
+            kwargs.setdefault("status_code", 206)
+        else:
+            self.offset, self.count = 0, entry.size
+
+        super().__init__(
+            entry.file_path,
+            media_type=entry.mime_type,
+            filename=entry.filename,
+            stat_result=entry.stat_result(),
+            headers=headers,
+            **kwargs
+        )
+        self.entry = entry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        if self.send_header_only or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": file,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                if self.offset:
+                    await file.seek(self.offset)
+                remaining = self.count
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": remaining > 0,
+                    })
+                if remaining > 0:
+                    # Archivo truncado después de construir el manifiesto: cerrar el body
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        if self.background is not None:
+            await self.background()
+
+
+def build_asset_response(
+    entry: AssetManifestEntry,
+    request: Optional[Request] = None,
+    version: Optional[str] = None,
+    vary: Optional[str] = None
+) -> Response:
+    """
+    Construye la respuesta HTTP para un asset del manifiesto.
+
+    Con request evalúa validadores condicionales (304), Range/If-Range (206/416) y
+    la versión `?v=` para decidir el Cache-Control.
+
+    Args:
+        entry: archivo a servir (original o derivado)
+        version: versión esperada en `?v=` (por defecto la del propio archivo; para
+            derivados es la del original, que es la que va en la URL)
+        vary: header Vary (ej: "Accept" si el derivado se eligió por negociación)
+    """
+    headers = {"vary": vary} if vary else {}
+
+    if request is None:
+        headers["cache-control"] = REVALIDATE_CACHE_CONTROL
+        return AssetFileResponse(entry, headers=headers)
+
+    expected_version = version or entry.version
+    cache_control = (
+        IMMUTABLE_CACHE_CONTROL
+        if request.query_params.get("v") == expected_version
+        else REVALIDATE_CACHE_CONTROL
+    )
+    headers["cache-control"] = cache_control
+
+    if is_not_modified(request.headers, entry):
+        return Response(status_code=304, headers={
+            **headers,
+            "etag": entry.etag,
+            "last-modified": formatdate(entry.mtime, usegmt=True),
+        })
+
+    byte_range = None
+    if _if_range_allows(request.headers, entry):
+        try:
+            byte_range = parse_byte_range(request.headers.get("range"), entry.size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={
+                "content-range": f"bytes */{entry.size}",
+                "accept-ranges": "bytes",
+                "etag": entry.etag,
+            })
+
+    return AssetFileResponse(
+        entry,
+        byte_range=byte_range,
+        headers=headers,
+        method=request.method
+    )
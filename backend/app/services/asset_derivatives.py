@@ -0,0 +1,243 @@
+"""
+Derivados pre-generados de las imágenes del catálogo.
+
+Por cada imagen válida se generan variantes reducidas (thumb, medium) en su formato
+original y en WebP, más un WebP a resolución completa. Los nombres de archivo llevan
+un hash del contenido fuente + parámetros, así que:
+- regenerar es incremental (si el archivo con ese nombre existe, está al día)
+- una URL de derivado nunca cambia de contenido
+
+La generación (Pillow, en paralelo por procesos) corre desde
+scripts/rebuild_catalog_index.py. Al iniciar la app solo se enlazan los derivados
+existentes al manifiesto, sin necesitar Pillow.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Any
+
+from app.config import ASSET_DERIVATIVES_DIR
+from app.services.asset_manifest import AssetManifestEntry, build_asset_entry
+from app.logging_config import logger
+
+
+# Cambiar para forzar regeneración de todos los derivados
+DERIVATIVE_SPEC_VERSION = "1"
+
+# Lado mayor en píxeles (solo reduce, nunca amplía)
+DERIVATIVE_SIZES = {
+    "thumb": 320,
+    "medium": 1024,
+}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+# MIME fuente -> formato Pillow del derivado "en formato original"
+_SOURCE_FORMATS = {
+    "image/png": "PNG",
+    "image/jpeg": "JPEG",
+    "image/webp": "WEBP",
+}
+_FORMAT_EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+# (key, max_px o None, formato Pillow)
+VariantSpec = Tuple[str, Optional[int], str]
+
+
+def plan_variants(entry: AssetManifestEntry) -> List[VariantSpec]:
+    """Variantes a generar para una entrada (vacío si no es imagen renderizable)."""
+    source_format = _SOURCE_FORMATS.get(entry.mime_type)
+    if not entry.valid or not source_format:
+        return []
+
+    specs: List[VariantSpec] = []
+    for size, max_px in DERIVATIVE_SIZES.items():
+        specs.append((size, max_px, source_format))
+        if source_format != "WEBP":
+            specs.append((f"{size}.webp", max_px, "WEBP"))
+    if source_format != "WEBP":
+        specs.append(("full.webp", None, "WEBP"))
+    return specs
+
+
+def derivative_filename(entry: AssetManifestEntry, spec: VariantSpec) -> str:
+    """Nombre con hash de la fuente + parámetros: I002.medium.<hash>.webp"""
+    key, max_px, fmt = spec
+    digest = hashlib.sha256(
+        f"{entry.content_hash}:{key}:{max_px}:{fmt}:{DERIVATIVE_SPEC_VERSION}".encode()
+    ).hexdigest()[:12]
+    size_name = key.split(".")[0]
+    return f"{entry.image_id}.{size_name}.{digest}.{_FORMAT_EXTENSIONS[fmt]}"
+
+
+def _render_variants(source_path: str, jobs: List[Tuple[Optional[int], str, str]]) -> List[str]:
+    """
+    Genera los derivados de una imagen (corre en un proceso del pool).
+
+    Args:
+        source_path: imagen original
+        jobs: (max_px, formato, ruta destino)
+
+    Returns:
+        Rutas generadas
+    """
+    from PIL import Image
+
+    generated = []
+    with Image.open(source_path) as source:
+        source.load()
+        for max_px, fmt, out_path in jobs:
+            image = source.copy()
+            if max_px:
+                image.thumbnail((max_px, max_px), Image.LANCZOS)
+
+            save_kwargs: Dict[str, Any] = {}
+            if fmt == "JPEG":
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                save_kwargs = {"quality": JPEG_QUALITY, "optimize": True, "progressive": True}
+            elif fmt == "WEBP":
+                save_kwargs = {"quality": WEBP_QUALITY, "method": 4}
+
+            tmp_path = f"{out_path}.tmp"
+            image.save(tmp_path, format=fmt, **save_kwargs)
+            os.replace(tmp_path, out_path)
+            generated.append(out_path)
+    return generated
+
+
+def attach_asset_derivatives(
+    manifest: Dict[str, AssetManifestEntry],
+    out_dir: Optional[Path] = None
+) -> bool:
+    """
+    Enlaza al manifiesto los derivados que ya existen en disco (sin generar nada).
+
+    Returns:
+        True si cambió alguna entrada
+    """
+    out_dir = out_dir or ASSET_DERIVATIVES_DIR
+    changed = False
+    for entry in manifest.values():
+        variants = {}
+        for spec in plan_variants(entry):
+            out_path = out_dir / derivative_filename(entry, spec)
+            if out_path.is_file():
+                variants[spec[0]] = build_asset_entry(entry.image_id, out_path, entry.variants.get(spec[0]))
+        if variants != entry.variants:
+            entry.variants = variants
+            changed = True
+    return changed
+
+
+def build_asset_derivatives(
+    manifest: Dict[str, AssetManifestEntry],
+    out_dir: Optional[Path] = None,
+    workers: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Genera los derivados faltantes en paralelo, los enlaza al manifiesto y borra
+    los derivados huérfanos (de versiones anteriores de las imágenes).
+
+    Args:
+        manifest: manifiesto a actualizar (se modifica in place)
+        out_dir: directorio de derivados (por defecto ASSET_DERIVATIVES_DIR)
+        workers: procesos del pool (None = núcleos disponibles, 1 = secuencial)
+
+    Returns:
+        {"generated": n, "up_to_date": n, "removed": n, "failed": n}
+    """
+    stats = {"generated": 0, "up_to_date": 0, "removed": 0, "failed": 0}
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        logger.warning("Pillow no instalado, no se generan derivados de imágenes")
+        return stats
+
+    out_dir = out_dir or ASSET_DERIVATIVES_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    expected = set()
+    tasks: List[Tuple[AssetManifestEntry, List[Tuple[Optional[int], str, str]]]] = []
+
+    for entry in manifest.values():
+        jobs = []
+        for spec in plan_variants(entry):
+            filename = derivative_filename(entry, spec)
+            expected.add(filename)
+            out_path = out_dir / filename
+            if out_path.is_file():
+                stats["up_to_date"] += 1
+            else:
+                jobs.append((spec[1], spec[2], str(out_path)))
+        if jobs:
+            tasks.append((entry, jobs))
+
+    if tasks:
+        if workers == 1 or len(tasks) == 1:
+            results = []
+            for entry, jobs in tasks:
+                try:
+                    results.append(_render_variants(str(entry.file_path), jobs))
+                except Exception as e:
+                    results.append(e)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_render_variants, str(entry.file_path), jobs)
+                    for entry, jobs in tasks
+                ]
+                results = []
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        results.append(e)
+
+        for (entry, jobs), result in zip(tasks, results):
+            if isinstance(result, Exception):
+                stats["failed"] += len(jobs)
+                logger.error("Error generando derivados", image_id=entry.image_id, error=str(result))
+            else:
+                stats["generated"] += len(result)
+
+    for path in out_dir.iterdir():
+        if path.is_file() and path.name not in expected:
+            path.unlink()
+            stats["removed"] += 1
+
+    attach_asset_derivatives(manifest, out_dir)
+    return stats
+
+
+def select_asset_variant(
+    entry: AssetManifestEntry,
+    size: Optional[str] = None,
+    accept: Optional[str] = None
+) -> AssetManifestEntry:
+    """
+    Elige el derivado a servir según el parámetro size y el header Accept.
+
+    Args:
+        entry: entrada original del manifiesto
+        size: "thumb" | "medium" | None (tamaño completo)
+        accept: header Accept; si incluye image/webp se prefiere la variante WebP
+
+    Returns:
+        Entrada del derivado, o la original si no hay derivado aplicable
+    """
+    if not entry.variants:
+        return entry
+
+    size = size if size in DERIVATIVE_SIZES else "full"
+    candidates = [size]
+    if accept and "image/webp" in accept.lower():
+        candidates.insert(0, f"{size}.webp")
+
+    for key in candidates:
+        variant = entry.variants.get(key)
+        if variant:
+            return variant
+    return entry
@@ -0,0 +1,322 @@
+"""
+Manifiesto precomputado de assets del catálogo.
+
+Se construye al iniciar la app (y desde scripts/rebuild_catalog_index.py) para que
+servir un asset sea un lookup en dict: ruta resuelta, MIME type, tamaño, mtime,
+hash de contenido, validez y ETag quedan calculados una sola vez.
+
+Servir no hace stat: una imagen agregada o reemplazada con la app corriendo se
+ve cuando run_asset_manifest_refresh_loop vuelve a comparar tamaño y mtime
+(cada ASSET_MANIFEST_REFRESH_INTERVAL_SECONDS, fuera del event loop), o de
+inmediato llamando a reload_asset_manifest() (ver /api/catalog/sync).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import stat
+from dataclasses import dataclass, asdict, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from app.config import ASSETS_DIR, ASSETS_CATALOG_DIR, ASSET_MANIFEST_PATH
+from app.services.asset_service import get_asset_mime_type
+from app.logging_config import logger
+
+
+MANIFEST_VERSION = "1.0"
+
+# Orden de búsqueda (igual que find_local_asset_file)
+ASSET_CANDIDATES = ["image_1.png", "image_1.jpg", "image_1.jpeg", "image_1.webp", "video_1.mp4"]
+
+# Assets fuera de las carpetas I*_* que también se sirven por image_id
+SPECIAL_ASSETS = {
+    "promo_navidad": Path("catalog") / "promociones" / "promocion_navidad_2024.png",
+}
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+ASSET_VERSION_LENGTH = 12
+
+
+@dataclass
+class AssetManifestEntry:
+    """Metadata precomputada de un archivo de asset."""
+    image_id: str
+    path: str  # Relativo a ASSETS_DIR (o absoluto si está fuera)
+    mime_type: str
+    size: int
+    mtime: float
+    content_hash: str
+    valid: bool
+    etag: str
+    # Derivados pre-generados (thumb, medium, *.webp) -> entrada del archivo derivado
+    variants: Dict[str, "AssetManifestEntry"] = field(default_factory=dict)
+
+    @property
+    def file_path(self) -> Path:
+        """Ruta absoluta del archivo."""
+        return ASSETS_DIR / self.path
+
+    @property
+    def filename(self) -> str:
+        return Path(self.path).name
+
+    @property
+    def version(self) -> str:
+        """Prefijo del hash de contenido, usado como ?v= en URLs inmutables."""
+        return self.content_hash[:ASSET_VERSION_LENGTH]
+
+    def stat_result(self) -> os.stat_result:
+        """stat_result sintético para FileResponse (evita os.stat por request)."""
+        return os.stat_result((
+            stat.S_IFREG | 0o644, 0, 0, 1, 0, 0,
+            self.size, int(self.mtime), int(self.mtime), int(self.mtime)
+        ))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AssetManifestEntry":
+        fields = {k: data[k] for k in cls.__dataclass_fields__ if k != "variants"}
+        variants = {
+            key: cls.from_dict(variant)
+            for key, variant in (data.get("variants") or {}).items()
+        }
+        return cls(variants=variants, **fields)
+
+
+def sniff_mime_type(header: bytes) -> Optional[str]:
+    """
+    Determina el MIME type por magic bytes.
+
+    Returns:
+        MIME type o None si no es una imagen/video reconocido (ej: placeholder de texto)
+    """
+    if header.startswith(b'\x89PNG'):
+        return "image/png"
+    if header.startswith(b'\xff\xd8\xff'):
+        return "image/jpeg"
+    if header.startswith(b'RIFF') and b'WEBP' in header[:12]:
+        return "image/webp"
+    if header.startswith(b'\x00\x00\x01\x00'):
+        return "image/x-icon"
+    if header[4:8] == b'ftyp':
+        return "video/mp4"
+    return None
+
+
+def build_asset_entry(
+    image_id: str,
+    file_path: Path,
+    previous: Optional[AssetManifestEntry] = None
+) -> AssetManifestEntry:
+    """
+    Construye la entrada del manifiesto para un archivo.
+
+    Si `previous` tiene el mismo tamaño y mtime, reutiliza hash y MIME sin releer el archivo.
+    """
+    st = file_path.stat()
+    try:
+        rel_path = file_path.resolve().relative_to(ASSETS_DIR.resolve()).as_posix()
+    except ValueError:
+        # Fuera de ASSETS_DIR: se guarda la ruta absoluta
+        rel_path = file_path.resolve().as_posix()
+
+    if previous and previous.size == st.st_size and previous.mtime == st.st_mtime and previous.path == rel_path:
+        return previous
+
+    digest = hashlib.sha256()
+    header = b""
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(_HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            if not header:
+                header = chunk[:16]
+            digest.update(chunk)
+
+    content_hash = digest.hexdigest()
+    sniffed = sniff_mime_type(header)
+
+    return AssetManifestEntry(
+        image_id=image_id,
+        path=rel_path,
+        mime_type=sniffed or get_asset_mime_type(file_path),
+        size=st.st_size,
+        mtime=st.st_mtime,
+        content_hash=content_hash,
+        valid=sniffed is not None,
+        etag=f'"{content_hash[:32]}"'
+    )
+
+
+def _resolve_asset_file(folder: Path) -> Optional[Path]:
+    for name in ASSET_CANDIDATES:
+        candidate = folder / name
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def build_asset_manifest(
+    previous: Optional[Dict[str, AssetManifestEntry]] = None
+) -> Dict[str, AssetManifestEntry]:
+    """
+    Escanea el catálogo y construye el manifiesto completo.
+
+    Es incremental: los archivos sin cambios (tamaño + mtime) reutilizan la entrada previa.
+    """
+    previous = previous or {}
+    manifest: Dict[str, AssetManifestEntry] = {}
+
+    if ASSETS_CATALOG_DIR.exists():
+        for folder in sorted(ASSETS_CATALOG_DIR.iterdir()):
+            if not folder.is_dir() or not folder.name.startswith("I") or "_" not in folder.name:
+                continue
+            image_id = folder.name.split("_")[0]
+            asset_file = _resolve_asset_file(folder)
+            if not asset_file:
+                continue
+            try:
+                manifest[image_id] = build_asset_entry(image_id, asset_file, previous.get(image_id))
+            except OSError as e:
+                logger.error("Error indexando asset", image_id=image_id, error=str(e))
+
+    for image_id, rel_path in SPECIAL_ASSETS.items():
+        asset_file = ASSETS_DIR / rel_path
+        if asset_file.is_file():
+            try:
+                manifest[image_id] = build_asset_entry(image_id, asset_file, previous.get(image_id))
+            except OSError as e:
+                logger.error("Error indexando asset", image_id=image_id, error=str(e))
+
+    return manifest
+
+
+def save_asset_manifest(manifest: Dict[str, AssetManifestEntry], path: Path = ASSET_MANIFEST_PATH) -> None:
+    """Guarda el manifiesto en JSON."""
+    data = {
+        "version": MANIFEST_VERSION,
+        "generated_at": datetime.now().isoformat(),
+        "total_assets": len(manifest),
+        "assets": [entry.to_dict() for entry in manifest.values()]
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_asset_manifest(path: Path = ASSET_MANIFEST_PATH) -> Dict[str, AssetManifestEntry]:
+    """Carga el manifiesto desde JSON (vacío si no existe o es inválido)."""
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return {
+            item["image_id"]: AssetManifestEntry.from_dict(item)
+            for item in data.get("assets", [])
+        }
+    except Exception as e:
+        logger.warning("asset_manifest.json inválido, se reconstruye", error=str(e))
+        return {}
+
+
+# Manifiesto en memoria (image_id -> entry)
+_ASSET_MANIFEST: Dict[str, AssetManifestEntry] = {}
+_MANIFEST_LOADED = False
+
+
+def init_asset_manifest(persist: bool = True) -> Dict[str, AssetManifestEntry]:
+    """
+    Carga el manifiesto persistido, lo refresca contra el filesystem y lo deja en memoria.
+    Llamado al iniciar la app.
+    """
+    global _ASSET_MANIFEST, _MANIFEST_LOADED
+
+    from app.services.asset_derivatives import attach_asset_derivatives
+
+    previous = load_asset_manifest()
+    manifest = build_asset_manifest(previous)
+    changed = manifest != previous
+    # Solo enlaza derivados ya generados (generarlos es tarea de rebuild_catalog_index.py)
+    changed = attach_asset_derivatives(manifest) or changed
+
+    if persist and changed:
+        try:
+            save_asset_manifest(manifest)
+        except OSError as e:
+            # Filesystem de solo lectura: el manifiesto en memoria es suficiente
+            logger.warning("No se pudo guardar asset_manifest.json", error=str(e))
+
+    # En los refrescos periódicos solo se loguea si algo cambió
+    if not _MANIFEST_LOADED or manifest != _ASSET_MANIFEST:
+        logger.info(
+            "Manifiesto de assets cargado",
+            assets=len(manifest),
+            invalid=sum(1 for e in manifest.values() if not e.valid)
+        )
+    _ASSET_MANIFEST = manifest
+    _MANIFEST_LOADED = True
+    return manifest
+
+
+def reload_asset_manifest() -> List[str]:
+    """
+    Refresca el manifiesto en memoria contra el filesystem (incremental: solo
+    re-hashea archivos con tamaño o mtime distintos). Lee archivos: llamar
+    fuera del event loop.
+
+    Returns:
+        image_ids agregados, modificados o eliminados
+    """
+    previous = _ASSET_MANIFEST
+    manifest = init_asset_manifest()
+    return sorted(
+        image_id for image_id in previous.keys() | manifest.keys()
+        if previous.get(image_id) != manifest.get(image_id)
+    )
+
+
+async def run_asset_manifest_refresh_loop(interval_seconds: int) -> None:
+    """Corre reload_asset_manifest() cada interval_seconds fuera del event loop."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            changed = await asyncio.to_thread(reload_asset_manifest)
+            if changed:
+                logger.info("Manifiesto de assets refrescado", changed=changed[:20])
+        except Exception as e:
+            logger.error("Error refrescando manifiesto de assets", error=str(e))
+
+
+# Entradas para archivos fuera del manifiesto (ej: cache de Drive), por ruta
+_FILE_ENTRIES: Dict[str, AssetManifestEntry] = {}
+
+
+def describe_asset_file(image_id: str, file_path: Path, mime_type: Optional[str] = None) -> AssetManifestEntry:
+    """
+    Entrada memoizada para un archivo fuera del catálogo local (ej: cache de Drive).
+    Solo re-hashea si cambió el tamaño o mtime del archivo (lee el archivo completo:
+    llamar fuera del event loop). mime_type reemplaza al detectado por magic bytes.
+    """
+    key = str(file_path)
+    entry = build_asset_entry(image_id, file_path, _FILE_ENTRIES.get(key))
+    if mime_type and entry.mime_type != mime_type:
+        entry = replace(entry, mime_type=mime_type)
+    _FILE_ENTRIES[key] = entry
+    return entry
+
+
+def get_asset_entry(image_id: str) -> Optional[AssetManifestEntry]:
+    """Obtiene la entrada del manifiesto para un image_id (O(1))."""
+    if not _MANIFEST_LOADED:
+        init_asset_manifest()
+    return _ASSET_MANIFEST.get(image_id)
@@ -188,12 +188,12 @@ def select_catalog_asset(text: str, context: dict) -> Tuple[Optional[dict], bool
         category = "fileteadora_familiar"
     elif any(word in text_lower for word in ["empezar", "hogar", "uso personal", "casa", "familiar"]):
         category = "familiar"
-    elif any(word in text_lower for word in ["taller", "producción", "produccion", "industrial", "negocio"]):
+    elif any(word in text_lower for word in ["taller", "produccion", "industrial", "negocio"]):
         category = "recta_industrial_mecatronica"
     
     # Detectar conflicto
     has_familiar = any(word in text_lower for word in ["familiar", "casa", "hogar"])
-    has_industrial = any(word in text_lower for word in ["industrial", "taller", "producción constante"])
+    has_industrial = any(word in text_lower for word in ["industrial", "taller", "produccion constante"])
     
     if has_familiar and has_industrial:
         return None, True
@@ -236,12 +236,32 @@ def get_all_catalog_items() -> List[dict]:
             "conversation_role": item.get("conversation_role"),
             "priority": item.get("priority"),
             "send_when_customer_says": item.get("send_when_customer_says", []),
-            "asset_url": f"/api/assets/{image_id}"
+            "asset_url": get_asset_url(image_id)
         })
     
     return items
 
 
+def get_asset_url(image_id: str, size: Optional[str] = None) -> str:
+    """
+    URL pública del asset. Si está en el manifiesto incluye ?v=<hash> para que
+    el cliente pueda cachearla como inmutable.
+    
+    Args:
+        image_id: ID del asset
+        size: "thumb" | "medium" para pedir un derivado reducido (si existe)
+    """
+    from app.services.asset_manifest import get_asset_entry
+    
+    url = f"/api/assets/{image_id}"
+    entry = get_asset_entry(image_id)
+    if entry:
+        url = f"{url}?v={entry.version}"
+        if size and entry.variants:
+            url = f"{url}&size={size}"
+    return url
+
+
 def get_promo_image_path() -> Optional[Path]:
     """Obtiene la ruta de la imagen de promoción navideña."""
     promo_path = ASSETS_CATALOG_DIR / "promociones" / "promocion_navidad_2024.png"
@@ -263,7 +283,3 @@ def validate_image_file(file_path: Path) -> bool:
     except:
         return False
 
-
-# Cargar catálogo al importar
-load_catalog_index()
-load_catalog_from_filesystem()
@@ -9,6 +9,7 @@ from threading import Lock
 
 from app.config import CACHE_ENABLED, CACHE_MAX_SIZE, CACHE_TTL_HOURS
 from app.rules.keywords import normalize_text
+from app.services.metrics import CACHE_LOOKUPS
 
 
 class LRUCache:
@@ -49,6 +50,7 @@ class LRUCache:
         with self._lock:
             if key not in self._cache:
                 self._misses += 1
+                CACHE_LOOKUPS.inc("response", "miss")
                 return None
             
             entry = self._cache[key]
@@ -57,11 +59,13 @@ class LRUCache:
             if time.time() > entry["expires_at"]:
                 del self._cache[key]
                 self._misses += 1
+                CACHE_LOOKUPS.inc("response", "miss")
                 return None
             
             # Mover al final (más reciente)
             self._cache.move_to_end(key)
             self._hits += 1
+            CACHE_LOOKUPS.inc("response", "hit")
             return entry["response"]
     
     def set(self, text: str, response: str) -> None:
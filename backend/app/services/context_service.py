@@ -18,12 +18,12 @@ from app.rules.keywords import (
     USO_CUERO,
     VOLUMEN_ALTO,
     VOLUMEN_BAJO,
-    CIUDADES_MAP,
     MARCAS_MODELOS,
     PROMOCIONES,
     ESPECIFICACIONES,
     FOTOS
 )
+from app.rules.locations import extract_location_from_history
 
 
 def extract_context_from_history(history: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -36,6 +36,7 @@ def extract_context_from_history(history: List[Dict[str, Any]]) -> Dict[str, Any
         "volumen": None,
         "presupuesto": None,
         "ciudad": None,
+        "clase_ubicacion": None,
         "marca_interes": None,
         "modelo_interes": None,
         "ultimo_tema": None,
@@ -54,8 +55,9 @@ def extract_context_from_history(history: List[Dict[str, Any]]) -> Dict[str, Any
     recent_history = history[-12:] if len(history) > 12 else history
     context["turnos_conversacion"] = len(recent_history)
     
-    full_text = " ".join([msg.get("text", "").lower() for msg in recent_history])
-    recent_text = " ".join([msg.get("text", "").lower() for msg in recent_history[-6:]])
+    # Normalizado (sin tildes, typos corregidos) para comparar con los keywords
+    full_text = " ".join([normalize_text(msg.get("text", "")) for msg in recent_history])
+    recent_text = " ".join([normalize_text(msg.get("text", "")) for msg in recent_history[-6:]])
     
     # Detectar tipo de máquina
     if contains_any(recent_text, MAQUINA_INDUSTRIAL):
@@ -98,11 +100,11 @@ def extract_context_from_history(history: List[Dict[str, Any]]) -> Dict[str, Any
     if context["volumen"] == "alto" and not context["tipo_maquina"]:
         context["tipo_maquina"] = "industrial"
     
-    # Detectar ciudad
-    for ciudad_key, ciudad_val in CIUDADES_MAP.items():
-        if ciudad_key in full_text:
-            context["ciudad"] = ciudad_val
-            break
+    # Detectar ciudad (la más reciente que nombró el cliente)
+    location = extract_location_from_history(recent_history)
+    if location:
+        context["ciudad"] = location.city.lower() if location.city else None
+        context["clase_ubicacion"] = location.location_class.value
     
     # Detectar marca/modelo
     productos_encontrados = []
@@ -125,7 +127,7 @@ def extract_context_from_history(history: List[Dict[str, Any]]) -> Dict[str, Any
         context["esperando_confirmacion"] = "?" in last_luisa
     
     # Detectar presupuesto
-    presupuesto_keywords = ["1.2", "1.3", "1.4", "1.5", "millón", "millones", "presupuesto"]
+    presupuesto_keywords = ["1.2", "1.3", "1.4", "1.5", "millon", "millones", "presupuesto"]
     if any(kw in full_text for kw in presupuesto_keywords):
         context["presupuesto"] = True
     
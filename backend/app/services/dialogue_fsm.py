@@ -0,0 +1,272 @@
+"""
+Máquina de estados del Sales Dialogue Manager (sales_dialogue.next_action).
+
+Estados: las etapas de state["stage"]. La transición de un turno sale de un
+dict precalculado (etapa, guardas) -> handler, donde las guardas son bits:
+pide fotos, pregunta de soporte, cambió de tema, pregunta precio, pregunta
+horario. Cada guarda combina la intención detectada con palabras clave del
+texto.
+
+Las palabras clave se buscan en TurnFeatures: una instancia por turno,
+compartida por las guardas y los handlers. Cada grupo se busca una sola vez
+y solo si alguien lo consulta (buscar todos los grupos de entrada cuesta más
+que las guardas que cortan en la primera coincidencia).
+
+Cobertura y tiempos: cada turno se observa en luisa_dialogue_turn_seconds
+por (etapa, transición); transition_report() cruza esas series con todas las
+transiciones compiladas para ver cuáles no se ejercitaron y cuánto cuesta cada
+una (ver scripts/dialogue_fsm_report.py).
+"""
+from itertools import product
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.metrics import DIALOGUE_TURN_SECONDS
+
+
+class Feature:
+    """Bits de señales de un turno (int plano: más barato que IntFlag)."""
+    PHOTO = 1 << 0
+    SUPPORT = 1 << 1
+    TOPIC = 1 << 2
+    PRICE = 1 << 3
+    HOURS = 1 << 4
+    GARANTIA = 1 << 5
+    REPUESTO = 1 << 6
+    INDUSTRIAL = 1 << 7
+    FAMILIAR = 1 << 8
+    USE_ROPA = 1 << 9
+    USE_GORRAS = 1 << 10
+    USE_CALZADO = 1 << 11
+    USE_ACCESORIOS = 1 << 12
+    VISIT = 1 << 13
+    HOY = 1 << 14
+    MANANA = 1 << 15
+    WEEKDAY = 1 << 16
+    TARDE = 1 << 17
+    UNDECIDED = 1 << 18
+    CONFIRM = 1 << 19
+    GORRA = 1 << 20
+    ROPA = 1 << 21
+    # Derivada (sin palabras clave): la calcula guard_mask()
+    CHANGED = 1 << 22
+
+
+# Subcadenas de text_lower que activan cada señal
+FEATURE_KEYWORDS: Dict[int, Tuple[str, ...]] = {
+    Feature.PHOTO: ("foto", "fotos", "imagen", "imágenes", "catálogo", "catalogo", "ver", "muestra"),
+    Feature.SUPPORT: ("garantía", "garantia", "repuesto", "repuestos", "reparación", "reparacion", "arreglo"),
+    Feature.TOPIC: ("foto", "precio", "garantía", "repuesto", "horario", "dirección"),
+    Feature.PRICE: ("precio",),
+    Feature.HOURS: ("horario",),
+    Feature.GARANTIA: ("garantía", "garantia"),
+    Feature.REPUESTO: ("repuesto",),
+    Feature.INDUSTRIAL: ("industrial",),
+    Feature.FAMILIAR: ("familiar", "casa", "hogar"),
+    Feature.USE_ROPA: ("ropa", "vestido", "camisa", "pantalón"),
+    Feature.USE_GORRAS: ("gorra", "gorras", "sombrero"),
+    Feature.USE_CALZADO: ("zapato", "zapatos", "calzado"),
+    Feature.USE_ACCESORIOS: ("accesorio", "accesorios", "bolso", "mochila"),
+    Feature.VISIT: (
+        "puedo visitar", "donde queda", "dónde queda", "ubicación", "ubicacion",
+        "dirección", "direccion", "puedo pasar", "quiero pasar", "visitar",
+    ),
+    Feature.HOY: ("hoy",),
+    Feature.MANANA: ("mañana",),
+    Feature.WEEKDAY: ("lunes", "martes"),
+    Feature.TARDE: ("tarde",),
+    Feature.UNDECIDED: ("no sé", "cual", "cuál", "indeciso"),
+    Feature.CONFIRM: ("sí", "si", "ok", "dale", "claro", "perfecto", "bueno", "sí por favor", "si por favor"),
+    Feature.GORRA: ("gorra",),
+    Feature.ROPA: ("ropa",),
+}
+
+# Uso de la máquina, en orden de prioridad
+USE_CASE_FEATURES = (
+    ("ropa", Feature.USE_ROPA),
+    ("gorras", Feature.USE_GORRAS),
+    ("calzado", Feature.USE_CALZADO),
+    ("accesorios", Feature.USE_ACCESORIOS),
+)
+
+# Intenciones que activan una guarda sin palabra clave
+INTENT_FEATURES: Dict[str, int] = {
+    "preguntar_catalogo": Feature.PHOTO,
+    "ver_productos": Feature.PHOTO,
+    "repuestos": Feature.SUPPORT,
+    "garantia": Feature.SUPPORT,
+    "preguntar_precio": Feature.PRICE,
+    "preguntar_horarios": Feature.HOURS,
+}
+
+# Intenciones que indican cambio de tema (si difieren de la anterior)
+TOPIC_CHANGE_INTENTS = frozenset({
+    "preguntar_catalogo", "preguntar_precio", "preguntar_garantia",
+    "preguntar_repuestos", "preguntar_horarios", "preguntar_direccion",
+})
+
+
+class TurnFeatures:
+    """Señales de palabras clave de un turno; cada grupo se busca a lo sumo una vez."""
+    __slots__ = ("text", "_checked", "_present")
+
+    def __init__(self, text_lower: str):
+        self.text = text_lower
+        self._checked = 0
+        self._present = 0
+
+    def has(self, feature: int) -> bool:
+        if not self._checked & feature:
+            self._checked |= feature
+            text = self.text
+            for keyword in FEATURE_KEYWORDS[feature]:
+                if keyword in text:
+                    self._present |= feature
+                    break
+        return bool(self._present & feature)
+
+    def use_case(self) -> Optional[str]:
+        """Primer uso de la máquina mencionado (ropa, gorras, calzado, accesorios)."""
+        for use, feature in USE_CASE_FEATURES:
+            if self.has(feature):
+                return use
+        return None
+
+
+# ============================================================================
+# TRANSICIONES
+# ============================================================================
+
+OTHER_STAGE = "other"  # etapa desconocida
+
+# Transición de cada etapa cuando ninguna guarda aplica
+STAGE_TRANSITIONS: Dict[str, str] = {
+    "discovery": "discovery",
+    "pricing": "pricing",
+    "visit": "visit",
+    "shipping": "shipping",
+    "photos": "photos",
+    "support": "support_request",
+    "handoff_schedule": "handoff_schedule",
+    "triage": "triage_repeat",
+    OTHER_STAGE: "default",
+}
+
+# Respuesta al menú de triage (parse_triage_response) -> transición
+TRIAGE_TRANSITIONS: Dict[str, str] = {
+    "buy_machine": "discovery",
+    "spare_parts": "spare_parts",
+    "tech_support": "support_request",
+    "business_advice": "business_advice",
+}
+
+# Transiciones previas a la tabla (clasificadores de triage, objeciones y playbook)
+TRIAGE_GREETING = "triage_greeting"
+OBJECTION = "objection"
+PLAYBOOK = "playbook"
+
+GUARDS = (Feature.PHOTO, Feature.SUPPORT, Feature.CHANGED, Feature.PRICE, Feature.HOURS)
+
+
+def _resolve(stage: str, mask: int) -> str:
+    """Transición de (etapa, guardas), en orden de prioridad."""
+    if mask & Feature.PHOTO:
+        return "photo_request"
+    if mask & Feature.SUPPORT:
+        return "support_request"
+    if mask & Feature.CHANGED and stage != "discovery":
+        # Responder primero la nueva intención
+        if mask & Feature.PRICE:
+            return "pricing"
+        if mask & Feature.HOURS:
+            return "intent_change_hours"
+        return "default"
+    return STAGE_TRANSITIONS[stage]
+
+
+def compile_transitions() -> Dict[Tuple[str, int], str]:
+    """(etapa, máscara de guardas) -> transición, para todas las combinaciones."""
+    table = {}
+    for stage in STAGE_TRANSITIONS:
+        for bits in product((0, 1), repeat=len(GUARDS)):
+            mask = sum(guard for guard, bit in zip(GUARDS, bits) if bit)
+            table[(stage, mask)] = _resolve(stage, mask)
+    return table
+
+
+TRANSITIONS = compile_transitions()
+
+
+def guard_mask(features: TurnFeatures, intent: str, last_intent: Optional[str]) -> int:
+    """Máscara de guardas del turno (PRICE y HOURS solo importan si cambió el tema)."""
+    mask = INTENT_FEATURES.get(intent, 0)
+    if features.has(Feature.PHOTO):
+        mask |= Feature.PHOTO
+    if features.has(Feature.SUPPORT):
+        mask |= Feature.SUPPORT
+    if last_intent and (
+        (intent in TOPIC_CHANGE_INTENTS and intent != last_intent) or features.has(Feature.TOPIC)
+    ):
+        mask |= Feature.CHANGED
+        if features.has(Feature.PRICE):
+            mask |= Feature.PRICE
+        if features.has(Feature.HOURS):
+            mask |= Feature.HOURS
+    return mask
+
+
+def transition_for(stage: str, mask: int) -> str:
+    """Transición precalculada (etapas desconocidas van por OTHER_STAGE)."""
+    if stage not in STAGE_TRANSITIONS:
+        stage = OTHER_STAGE
+    return TRANSITIONS[(stage, mask)]
+
+
+# ============================================================================
+# COBERTURA Y TIEMPOS
+# ============================================================================
+
+def record_turn(stage: str, transition: str, seconds: float) -> None:
+    """Observa la duración de un turno de next_action()."""
+    if stage not in STAGE_TRANSITIONS:
+        stage = OTHER_STAGE
+    DIALOGUE_TURN_SECONDS.observe(seconds, stage, transition)
+
+
+def reachable_transitions() -> List[Tuple[str, str]]:
+    """Todas las (etapa, transición) posibles: tabla + pasos previos."""
+    pairs = {(stage, transition) for (stage, _), transition in TRANSITIONS.items()}
+    for stage in STAGE_TRANSITIONS:
+        pairs.add((stage, OBJECTION))
+        pairs.add((stage, PLAYBOOK))
+    pairs.add(("discovery", TRIAGE_GREETING))
+    pairs.update(("triage", transition) for transition in TRIAGE_TRANSITIONS.values())
+    return sorted(pairs)
+
+
+def transition_report() -> Dict[str, Any]:
+    """
+    Cobertura y costo por transición desde el arranque (o reset_metrics()).
+
+    Returns:
+        {"total", "covered", "uncovered": [(etapa, transición)],
+         "transitions": [{"stage", "transition", "hits", "avg_us"}]}
+    """
+    rows = []
+    uncovered = []
+    for stage, transition in reachable_transitions():
+        hits = DIALOGUE_TURN_SECONDS.count(stage, transition)
+        if not hits:
+            uncovered.append((stage, transition))
+        total = DIALOGUE_TURN_SECONDS.total(stage, transition)
+        rows.append({
+            "stage": stage,
+            "transition": transition,
+            "hits": hits,
+            "avg_us": round(total / hits * 1e6, 1) if hits else None,
+        })
+    return {
+        "total": len(rows),
+        "covered": len(rows) - len(uncovered),
+        "uncovered": uncovered,
+        "transitions": rows,
+    }
@@ -0,0 +1,246 @@
+"""
+Cache en disco de assets servidos desde Google Drive.
+
+- Descarga en streaming a un archivo temporal, en un thread (no bloquea el event loop)
+- Single-flight: requests concurrentes por el mismo drive_file_id comparten una descarga
+- Presupuesto de bytes con desalojo LRU, registrado en la tabla cache_metadata
+"""
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, Callable
+
+
+from app.config import (
+    ASSETS_CACHE_DIR,
+    DRIVE_CACHE_MAX_BYTES,
+    DRIVE_CACHE_TTL_HOURS,
+    GOOGLE_DRIVE_API_URL,
+    GOOGLE_SERVICE_ACCOUNT_JSON_PATH,
+)
+from app.models.database import get_db
+from app.logging_config import logger
+from app.services.metrics import CACHE_LOOKUPS
+
+
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
+_DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+class DriveDownloadError(Exception):
+    """No se pudo descargar el archivo desde Drive."""
+
+
+def cache_key_for(drive_file_id: str) -> str:
+    """Clave de cache (mismo esquema md5 que el cache legacy de main.py)."""
+    return hashlib.md5(drive_file_id.encode()).hexdigest()
+
+
+# Credenciales de service account (google-auth es opcional)
+_CREDENTIALS = None
+
+
+def get_drive_access_token() -> Optional[str]:
+    """
+    Obtiene un access token de la service account configurada.
+
+    Returns:
+        Token o None si Drive no está configurado o google-auth no está instalado
+    """
+    global _CREDENTIALS
+
+    if not GOOGLE_SERVICE_ACCOUNT_JSON_PATH:
+        return None
+
+    try:
+        from google.oauth2 import service_account
+        from google.auth.transport.requests import Request as GoogleRequest
+    except ImportError:
+        logger.warning("google-auth no instalado, no se puede autenticar con Drive")
+        return None
+
+    if _CREDENTIALS is None:
+        _CREDENTIALS = service_account.Credentials.from_service_account_file(
+            GOOGLE_SERVICE_ACCOUNT_JSON_PATH,
+            scopes=DRIVE_SCOPES
+        )
+    if not _CREDENTIALS.valid:
+        _CREDENTIALS.refresh(GoogleRequest())
+    return _CREDENTIALS.token
+
+
+class DriveAssetCache:
+    """Cache de archivos de Drive con descarga single-flight y desalojo LRU por bytes."""
+
+    def __init__(
+        self,
+        cache_dir: Path = ASSETS_CACHE_DIR,
+        max_bytes: int = DRIVE_CACHE_MAX_BYTES,
+        ttl_hours: int = DRIVE_CACHE_TTL_HOURS,
+        api_url: str = GOOGLE_DRIVE_API_URL,
+        token_provider: Callable[[], Optional[str]] = get_drive_access_token,
+        timeout: float = 30.0
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttl_hours = ttl_hours
+        self.api_url = api_url.rstrip("/")
+        self.token_provider = token_provider
+        self.timeout = timeout
+        # drive_file_id -> descarga en curso
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.downloads = 0
+
+    async def get(self, drive_file_id: str, mime_type: str) -> Path:
+        """
+        Retorna la ruta local del archivo, descargándolo si no está en cache.
+
+        Raises:
+            DriveDownloadError: si la descarga falla
+        """
+        cached = await asyncio.to_thread(self.lookup, drive_file_id)
+        CACHE_LOOKUPS.inc("drive", "hit" if cached else "miss")
+        if cached:
+            return cached
+
+        future = self._inflight.get(drive_file_id)
+        if future is None:
+            future = asyncio.ensure_future(
+                asyncio.to_thread(self._download, drive_file_id, mime_type)
+            )
+            self._inflight[drive_file_id] = future
+            future.add_done_callback(lambda _: self._inflight.pop(drive_file_id, None))
+
+        # shield: si un cliente cancela, la descarga sigue para los demás
+        return await asyncio.shield(future)
+
+    def lookup(self, drive_file_id: str) -> Optional[Path]:
+        """Busca el archivo en cache; si es hit actualiza last_accessed_at (LRU)."""
+        cache_key = cache_key_for(drive_file_id)
+        with get_db() as conn:
+            row = conn.execute(
+                "SELECT file_path, expires_at FROM cache_metadata WHERE cache_key = ?",
+                (cache_key,)
+            ).fetchone()
+            if not row:
+                return None
+
+            file_path = Path(row["file_path"])
+            expired = bool(row["expires_at"]) and datetime.now() > datetime.fromisoformat(row["expires_at"])
+            if expired or not file_path.is_file():
+                file_path.unlink(missing_ok=True)
+                conn.execute("DELETE FROM cache_metadata WHERE cache_key = ?", (cache_key,))
+                return None
+
+            conn.execute(
+                "UPDATE cache_metadata SET last_accessed_at = ? WHERE cache_key = ?",
+                (time.time(), cache_key)
+            )
+            return file_path
+
+    def _download(self, drive_file_id: str, mime_type: str) -> Path:
+        """Descarga en streaming a un temporal y lo publica con un rename atómico."""
+        import httpx
+        # Otra descarga pudo terminar entre el lookup y el registro en _inflight
+        cached = self.lookup(drive_file_id)
+        if cached:
+            return cached
+
+        cache_key = cache_key_for(drive_file_id)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        final_path = self.cache_dir / cache_key
+        tmp_path = self.cache_dir / f"{cache_key}.{uuid.uuid4().hex[:8]}.part"
+
+        headers = {}
+        token = self.token_provider()
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        start = time.perf_counter()
+        size = 0
+        try:
+            with httpx.Client(timeout=self.timeout) as client:
+                with client.stream(
+                    "GET",
+                    f"{self.api_url}/files/{drive_file_id}",
+                    params={"alt": "media"},
+                    headers=headers
+                ) as response:
+                    response.raise_for_status()
+                    with open(tmp_path, "wb") as f:
+                        for chunk in response.iter_bytes(_DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                            size += len(chunk)
+            os.replace(tmp_path, final_path)
+        except (httpx.HTTPError, OSError) as e:
+            tmp_path.unlink(missing_ok=True)
+            logger.error("Error descargando desde Drive", drive_file_id=drive_file_id, error=str(e))
+            raise DriveDownloadError(str(e)) from e
+
+        self.downloads += 1
+        expires_at = datetime.now() + timedelta(hours=self.ttl_hours)
+        with get_db() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO cache_metadata
+                (cache_key, file_path, drive_file_id, mime_type, expires_at, size_bytes, last_accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (cache_key, str(final_path), drive_file_id, mime_type,
+                  expires_at.isoformat(), size, time.time()))
+
+        logger.info(
+            "Asset de Drive cacheado",
+            drive_file_id=drive_file_id,
+            size_bytes=size,
+            latency_ms=int((time.perf_counter() - start) * 1000)
+        )
+
+        self.evict(keep_key=cache_key)
+        return final_path
+
+    def evict(self, keep_key: Optional[str] = None) -> int:
+        """
+        Desaloja los archivos menos usados recientemente hasta cumplir el presupuesto.
+
+        Returns:
+            Cantidad de archivos desalojados
+        """
+        evicted = 0
+        with get_db() as conn:
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size_bytes), 0) FROM cache_metadata"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+
+            rows = conn.execute("""
+                SELECT cache_key, file_path, size_bytes FROM cache_metadata
+                ORDER BY COALESCE(last_accessed_at, 0) ASC
+            """).fetchall()
+            for row in rows:
+                if total <= self.max_bytes:
+                    break
+                if row["cache_key"] == keep_key:
+                    continue
+                Path(row["file_path"]).unlink(missing_ok=True)
+                conn.execute("DELETE FROM cache_metadata WHERE cache_key = ?", (row["cache_key"],))
+                total -= row["size_bytes"] or 0
+                evicted += 1
+
+        if evicted:
+            logger.info("Cache de Drive desalojado", evicted=evicted, total_bytes=total)
+        return evicted
+
+
+_DRIVE_CACHE: Optional[DriveAssetCache] = None
+
+
+def get_drive_cache() -> DriveAssetCache:
+    """Instancia global del cache de Drive."""
+    global _DRIVE_CACHE
+    if _DRIVE_CACHE is None:
+        _DRIVE_CACHE = DriveAssetCache()
+    return _DRIVE_CACHE
@@ -3,14 +3,10 @@ Servicio de handoff y notificaciones internas.
 ÚNICA fuente de verdad para reglas de escalamiento.
 """
 from typing import Tuple, Optional, List
-from datetime import datetime
-import json
-from pathlib import Path
 
 from app.config import (
     LUISA_HUMAN_NOTIFY_NUMBER,
     TECNICO_NOTIFY_NUMBER,
-    OUTBOX_DIR,
     HANDOFF_COOLDOWN_MINUTES
 )
 # DEPRECATED: mantener compatibilidad
@@ -25,14 +21,11 @@ from app.models.schemas import Team, Priority, HandoffDecision, InternalNotifica
 from app.rules.keywords import (
     normalize_text,
     contains_any,
-    extract_match,
     IMPACTO_NEGOCIO,
     INSTALACION,
     VISITA,
     ASESORIA,
     CAPACITACION,
-    CIUDADES_OTRAS,
-    UBICACIONES_RURALES,
     CIUDADES_MONTERIA,
     PRECIO,
     FORMAS_PAGO,
@@ -50,6 +43,9 @@ from app.rules.keywords import (
     HANDOFF_LLAMAMOS_PASAS_MONTERIA_VARIANTES,
     HANDOFF_LLAMAMOS_PASAS_FUERA_VARIANTES
 )
+from app.rules.locations import extract_location, LocationClass
+from app.rules.normalization import fold_text
+from app.services.notification_worker import append_handoff_log
 from app.logging_config import logger
 
 
@@ -99,9 +95,13 @@ def should_handoff(text: str, context: dict) -> HandoffDecision:
             priority=Priority.HIGH
         )
     
-    # 🟡 GEOGRÁFICO - Ciudad fuera de Montería
-    if contains_any(text, CIUDADES_OTRAS | UBICACIONES_RURALES):
-        ciudad = extract_match(text, CIUDADES_OTRAS) or "ubicación remota"
+    # 🟡 GEOGRÁFICO - Ciudad fuera de Montería o zona rural
+    location = extract_location(text)
+    if location and location.location_class != LocationClass.MONTERIA:
+        if location.city and location.key not in CIUDADES_MONTERIA:
+            ciudad = location.city.lower()
+        else:
+            ciudad = "ubicación remota"
         return HandoffDecision(
             should_handoff=True,
             team=Team.COMERCIAL,
@@ -326,8 +326,17 @@ def process_handoff(
         destination_number=destination_number
     )
     
-    # Guardar en outbox (JSON para debug/integración)
-    _save_to_outbox(conversation_id, decision, notification_text)
+    # Registro append-only; la entrega al equipo la hace el worker de notificaciones
+    append_handoff_log(
+        "handoff",
+        conversation_id=conversation_id,
+        notification_id=notification_id,
+        team=team.value if team else None,
+        reason=decision.reason,
+        priority=decision.priority.value,
+        destination=destination_number,
+        notification_text=notification_text
+    )
     
     # Activar modo humano para silenciar respuestas automáticas
     set_conversation_mode(conversation_id, "HUMAN_ACTIVE")
@@ -341,39 +350,9 @@ def process_handoff(
         reason=decision.reason
     )
     
-    # Imprimir notificación para demo
-    print("\n" + "=" * 60)
-    print("📱 NOTIFICACIÓN INTERNA")
-    print("=" * 60)
-    print(notification_text)
-    print("=" * 60 + "\n")
-    
     return True, notification_text, team
 
 
-def _save_to_outbox(conversation_id: str, decision: HandoffDecision, notification_text: str):
-    """Guarda handoff en outbox como JSON."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"handoff_{conversation_id}_{timestamp}.json"
-    filepath = OUTBOX_DIR / filename
-    
-    data = {
-        "conversation_id": conversation_id,
-        "team": decision.team.value if decision.team else None,
-        "reason": decision.reason,
-        "priority": decision.priority.value,
-        "notification_text": notification_text,
-        "timestamp": datetime.now().isoformat(),
-        "destination": TECNICO_NOTIFY_NUMBER if decision.team == Team.TECNICA and TECNICO_NOTIFY_NUMBER else LUISA_HUMAN_NOTIFY_NUMBER
-    }
-    
-    try:
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        logger.error("Error guardando en outbox", error=str(e))
-
-
 def generate_handoff_message(text: str, reason: str, priority: str, ciudad: Optional[str] = None, conversation_id: Optional[str] = None) -> str:
     """
     Genera mensaje de handoff para el cliente.
@@ -381,7 +360,10 @@ def generate_handoff_message(text: str, reason: str, priority: str, ciudad: Opti
     text_lower = normalize_text(text)
     
     # Detectar si está en Montería
-    esta_en_monteria = contains_any(text, CIUDADES_MONTERIA) or (ciudad and ciudad.lower() in ["montería", "monteria"])
+    location = extract_location(text)
+    esta_en_monteria = (location is not None and location.key in CIUDADES_MONTERIA) or (
+        ciudad and fold_text(ciudad) in CIUDADES_MONTERIA
+    )
     
     # Handoff por impacto de negocio o servicio diferencial
     if any(kw in reason.lower() for kw in ["proyecto de negocio", "servicio diferencial", "asesoría", "instalación"]):
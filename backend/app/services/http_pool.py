@@ -0,0 +1,96 @@
+"""
+Clientes HTTP compartidos (keep-alive) hacia Graph API y OpenAI.
+
+Antes cada llamada abría su propio cliente y pagaba DNS + TCP + TLS. Ahora:
+- get_http_client(): un httpx.Client global (thread-safe) para las llamadas síncronas
+- get_async_http_client(): un httpx.AsyncClient por event loop (un AsyncClient no
+  puede usarse desde otro loop; los tests y scripts usan varios asyncio.run)
+
+El timeout se pasa por request (cada servicio tiene el suyo).
+prewarm_connections() abre las conexiones durante el warm-up del arranque.
+"""
+import asyncio
+import weakref
+from typing import Any, Dict, List, Optional
+
+from app.logging_config import logger
+
+
+POOL_MAX_CONNECTIONS = 50
+POOL_MAX_KEEPALIVE = 20
+POOL_KEEPALIVE_EXPIRY_SECONDS = 60.0
+DEFAULT_TIMEOUT_SECONDS = 10.0
+
+_SYNC_CLIENT: Optional[Any] = None
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    import httpx
+    return {
+        "timeout": DEFAULT_TIMEOUT_SECONDS,
+        "limits": httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    }
+
+
+def get_http_client():
+    """Cliente síncrono compartido."""
+    global _SYNC_CLIENT
+    if _SYNC_CLIENT is None or _SYNC_CLIENT.is_closed:
+        import httpx
+        _SYNC_CLIENT = httpx.Client(**_client_kwargs())
+    return _SYNC_CLIENT
+
+
+def get_async_http_client():
+    """Cliente asíncrono compartido del event loop actual."""
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        import httpx
+        client = httpx.AsyncClient(**_client_kwargs())
+        _ASYNC_CLIENTS[loop] = client
+    return client
+
+
+async def prewarm_connections(origins: List[str], timeout: float = 3.0) -> Dict[str, bool]:
+    """
+    Abre (DNS + TCP + TLS) una conexión a cada origen en ambos pools.
+
+    Cualquier respuesta HTTP, incluso 4xx, deja la conexión en el pool; solo los
+    errores de red cuentan como fallo.
+
+    Returns:
+        {origen: conectado}
+    """
+    import httpx
+
+    async_client = get_async_http_client()
+    sync_client = get_http_client()
+
+    async def _warm(origin: str) -> bool:
+        try:
+            await async_client.head(origin, timeout=timeout)
+            await asyncio.to_thread(sync_client.head, origin, timeout=timeout)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning("No se pudo precalentar conexión", origin=origin, error=type(e).__name__)
+            return False
+
+    results = await asyncio.gather(*[_warm(origin) for origin in origins])
+    return dict(zip(origins, results))
+
+
+async def close_http_clients() -> None:
+    """Cierra los clientes del loop actual y el síncrono (apagado de la app)."""
+    global _SYNC_CLIENT
+    client = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+    if _SYNC_CLIENT is not None:
+        _SYNC_CLIENT.close()
+        _SYNC_CLIENT = None
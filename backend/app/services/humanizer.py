@@ -3,7 +3,6 @@ Humanizer: re-escribe respuestas base para hacerlas más humanas y comerciales.
 Usa OpenAI solo para reescritura, no para decisiones.
 """
 import time
-import httpx
 from typing import Optional, Tuple
 import json
 
@@ -14,6 +13,7 @@ from app.config import (
     OPENAI_TIMEOUT_SECONDS
 )
 from app.logging_config import logger
+from app.services.metrics import OPENAI_REQUEST_SECONDS
 
 
 # Configuración del humanizer
@@ -36,6 +36,8 @@ def humanize_response(base_reply: str, context: dict = None) -> Tuple[str, dict]
         Tuple[respuesta_humanizada, metadata]
         metadata incluye: humanized, openai_called, elapsed_ms, error
     """
+    import httpx
+    from app.services.http_pool import get_http_client
     metadata = {
         "humanized": False,
         "openai_called": False,
@@ -83,7 +85,8 @@ Solo reescribe para hacerlo más humano y comercial, sin cambiar información.""
 
     try:
         # Llamada síncrona con httpx
-        with httpx.Client(timeout=HUMANIZE_TIMEOUT) as client:
+        client = get_http_client()
+        with OPENAI_REQUEST_SECONDS.time("humanizer"):
             response = client.post(
                 "https://api.openai.com/v1/chat/completions",
                 headers={
@@ -98,17 +101,18 @@ Solo reescribe para hacerlo más humano y comercial, sin cambiar información.""
                     ],
                     "max_tokens": HUMANIZE_MAX_TOKENS,
                     "temperature": HUMANIZE_TEMPERATURE
-                }
+                },
+                timeout=HUMANIZE_TIMEOUT
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                humanized = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-            else:
-                error_data = response.json()
-                error_msg = error_data.get("error", {}).get("message", "Error desconocido")
-                logger.warning("Error en humanizer OpenAI", status_code=response.status_code, error=error_msg)
-                humanized = None
+        
+        if response.status_code == 200:
+            data = response.json()
+            humanized = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+        else:
+            error_data = response.json()
+            error_msg = error_data.get("error", {}).get("message", "Error desconocido")
+            logger.warning("Error en humanizer OpenAI", status_code=response.status_code, error=error_msg)
+            humanized = None
         
         elapsed_ms = (time.perf_counter() - start_time) * 1000
         metadata["elapsed_ms"] = round(elapsed_ms, 1)
@@ -0,0 +1,357 @@
+"""
+Métricas en memoria de la ventana reciente (por defecto 60 minutos).
+
+Cada interacción guardada por InteractionTracer se registra aquí con un costo
+fijo (lock + unos incrementos de dict). La ventana es un anillo de slots por
+minuto; además se mantienen los totales de la ventana, que suman al registrar y
+restan el slot que expira al rotar. Así get_live_snapshot() no recorre eventos:
+p50/p95/p99 salen del histograma logarítmico (mismos buckets que los rollups,
+error relativo ~12%) y las tasas de los contadores.
+
+Series: (decision_path, channel, stage), con stage "total", "openai",
+"whatsapp_send" o una de las etapas medidas con spans (trace_service). Las series distintas se acotan a LIVE_METRICS_MAX_SERIES; el
+excedente se cuenta como decision_path="other".
+
+El estado se persiste cada LIVE_METRICS_PERSIST_INTERVAL_SECONDS en
+live_metrics_state para que un reinicio no vacíe la ventana.
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import (
+    LIVE_METRICS_WINDOW_MINUTES,
+    LIVE_METRICS_MAX_SERIES,
+)
+from app.services.trace_rollups import LATENCY_BUCKETS_MS, latency_bucket, histogram_quantile
+from app.logging_config import logger
+
+
+COUNTERS = ["msgs", "personal", "handoffs", "openai_calls", "errors"]
+_STATE_KEY = "window"
+_MAX_PATH_CHARS = 120
+
+Series = Tuple[str, str, str]
+
+
+def _empty_counts() -> Dict[str, int]:
+    return {name: 0 for name in COUNTERS}
+
+
+def _add_histogram(target: Dict[int, int], other: Dict[int, int], sign: int = 1) -> None:
+    for index, count in other.items():
+        value = target.get(index, 0) + sign * count
+        if value:
+            target[index] = value
+        else:
+            target.pop(index, None)
+
+
+class LiveMetrics:
+    """Ventana deslizante por minuto con totales incrementales."""
+
+    def __init__(self, window_minutes: int = LIVE_METRICS_WINDOW_MINUTES, max_series: int = LIVE_METRICS_MAX_SERIES):
+        self.window_minutes = window_minutes
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._slot_minutes = [None] * window_minutes
+        self._slot_counts = [_empty_counts() for _ in range(window_minutes)]
+        self._slot_hists = [{} for _ in range(window_minutes)]
+        self._counts = _empty_counts()
+        self._hists: Dict[Series, Dict[int, int]] = {}
+        # Latencia total de todas las series (p50/p95/p99 del snapshot sin recorrer series)
+        self._slot_totals = [{} for _ in range(window_minutes)]
+        self._total_hist: Dict[int, int] = {}
+        self._current_minute: Optional[int] = None
+        self._known_paths = set()
+
+    # ------------------------------------------------------------------
+    # Ventana
+    # ------------------------------------------------------------------
+
+    def _evict(self, slot: int) -> None:
+        _add_counts(self._counts, self._slot_counts[slot], -1)
+        for series, histogram in self._slot_hists[slot].items():
+            window_hist = self._hists.get(series)
+            if window_hist is not None:
+                _add_histogram(window_hist, histogram, -1)
+                if not window_hist:
+                    del self._hists[series]
+        _add_histogram(self._total_hist, self._slot_totals[slot], -1)
+        self._slot_minutes[slot] = None
+        self._slot_counts[slot] = _empty_counts()
+        self._slot_hists[slot] = {}
+        self._slot_totals[slot] = {}
+        # Que los decision_path que ya no están en la ventana liberen cupo
+        self._known_paths = {series[0] for series in self._hists}
+
+    def _advance(self, minute: int) -> None:
+        """Expira los slots que salieron de la ventana (a lo sumo window_minutes)."""
+        if self._current_minute is not None and minute <= self._current_minute:
+            return
+        start = minute - self.window_minutes + 1
+        if self._current_minute is not None:
+            start = max(start, self._current_minute + 1)
+        for m in range(start, minute + 1):
+            slot = m % self.window_minutes
+            if self._slot_minutes[slot] is not None:
+                self._evict(slot)
+        self._current_minute = minute
+
+    def _slot_for(self, minute: int) -> Optional[int]:
+        """Slot de un minuto dentro de la ventana (None si ya expiró)."""
+        if minute <= self._current_minute - self.window_minutes:
+            return None
+        slot = minute % self.window_minutes
+        self._slot_minutes[slot] = minute
+        return slot
+
+    def _path_label(self, decision_path: Optional[str]) -> str:
+        label = (decision_path or "unknown").strip("->")[:_MAX_PATH_CHARS] or "unknown"
+        if label in self._known_paths:
+            return label
+        if len(self._known_paths) >= self.max_series:
+            return "other"
+        self._known_paths.add(label)
+        return label
+
+    # ------------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------------
+
+    def record(
+        self,
+        channel: str,
+        decision_path: Optional[str],
+        latency_ms: Optional[float],
+        stages: Optional[Dict[str, Optional[float]]] = None,
+        personal: bool = False,
+        handoff: bool = False,
+        openai_called: bool = False,
+        error: bool = False,
+        now: Optional[float] = None,
+    ) -> None:
+        """Registra una interacción terminada (latencias en ms)."""
+        minute = int((now if now is not None else time.time()) // 60)
+        increments = {
+            "msgs": 1,
+            "personal": int(bool(personal)),
+            "handoffs": int(bool(handoff)),
+            "openai_calls": int(bool(openai_called)),
+            "errors": int(bool(error)),
+        }
+        with self._lock:
+            self._advance(minute)
+            slot = self._slot_for(minute)
+            if slot is None:
+                return
+            _add_counts(self._slot_counts[slot], increments)
+            _add_counts(self._counts, increments)
+
+            path = self._path_label(decision_path)
+            channel = channel or "unknown"
+            timings = {"total": latency_ms, **(stages or {})}
+            for stage, value in timings.items():
+                if value is None or value <= 0:
+                    continue
+                series = (path, channel, stage)
+                index = latency_bucket(value)
+                slot_hist = self._slot_hists[slot].setdefault(series, {})
+                slot_hist[index] = slot_hist.get(index, 0) + 1
+                window_hist = self._hists.setdefault(series, {})
+                window_hist[index] = window_hist.get(index, 0) + 1
+                if stage == "total":
+                    self._slot_totals[slot][index] = self._slot_totals[slot].get(index, 0) + 1
+                    self._total_hist[index] = self._total_hist.get(index, 0) + 1
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def snapshot(self, detail: bool = False, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Totales, tasas y percentiles de la ventana.
+
+        Args:
+            detail: incluir percentiles por serie (decision_path, channel, stage)
+
+        Returns:
+            {"window_minutes", "counts", "rates_per_min", "latency_ms": {p50, p95, p99}, ["series"]}
+        """
+        minute = int((now if now is not None else time.time()) // 60)
+        with self._lock:
+            self._advance(minute)
+            counts = dict(self._counts)
+            total_hist = dict(self._total_hist)
+            series_hists = [(series, dict(histogram)) for series, histogram in self._hists.items()] if detail else []
+
+        snapshot = {
+            "window_minutes": self.window_minutes,
+            "counts": counts,
+            "rates_per_min": {
+                name: round(value / self.window_minutes, 3) for name, value in counts.items()
+            },
+            "latency_ms": _quantiles(total_hist),
+        }
+        if detail:
+            snapshot["series"] = [
+                {
+                    "decision_path": path,
+                    "channel": channel,
+                    "stage": stage,
+                    "count": sum(histogram.values()),
+                    **_quantiles(histogram),
+                }
+                for (path, channel, stage), histogram in sorted(series_hists)
+            ]
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+
+    def to_state(self) -> Dict[str, Any]:
+        """Slots vigentes serializables a JSON."""
+        with self._lock:
+            return {
+                "buckets": len(LATENCY_BUCKETS_MS),
+                "slots": [
+                    {
+                        "minute": minute,
+                        "counts": self._slot_counts[slot],
+                        "hists": [
+                            [list(series), {str(i): c for i, c in histogram.items()}]
+                            for series, histogram in self._slot_hists[slot].items()
+                        ],
+                    }
+                    for slot, minute in enumerate(self._slot_minutes)
+                    if minute is not None
+                ],
+            }
+
+    def load_state(self, state: Dict[str, Any], now: Optional[float] = None) -> int:
+        """
+        Suma a la ventana los slots persistidos que siguen vigentes.
+
+        Returns:
+            Cantidad de slots restaurados
+        """
+        if state.get("buckets") != len(LATENCY_BUCKETS_MS):
+            return 0
+        minute = int((now if now is not None else time.time()) // 60)
+        restored = 0
+        with self._lock:
+            self._advance(minute)
+            for entry in state.get("slots", []):
+                if entry["minute"] > minute:
+                    continue
+                slot = self._slot_for(entry["minute"])
+                if slot is None:
+                    continue
+                counts = {name: entry["counts"].get(name, 0) for name in COUNTERS}
+                _add_counts(self._slot_counts[slot], counts)
+                _add_counts(self._counts, counts)
+                for series, raw in entry["hists"]:
+                    path, channel, stage = series
+                    series = (self._path_label(path), channel, stage)
+                    histogram = {int(i): c for i, c in raw.items()}
+                    _add_histogram(self._slot_hists[slot].setdefault(series, {}), histogram)
+                    _add_histogram(self._hists.setdefault(series, {}), histogram)
+                    if stage == "total":
+                        _add_histogram(self._slot_totals[slot], histogram)
+                        _add_histogram(self._total_hist, histogram)
+                restored += 1
+        return restored
+
+
+def _add_counts(target: Dict[str, int], other: Dict[str, int], sign: int = 1) -> None:
+    for name, value in other.items():
+        target[name] += sign * value
+
+
+def _quantiles(histogram: Dict[int, int]) -> Dict[str, float]:
+    return {
+        f"p{int(q * 100)}": round(histogram_quantile(histogram, q), 1)
+        for q in (0.5, 0.95, 0.99)
+    }
+
+
+# Instancia del proceso
+_live_metrics = LiveMetrics()
+
+
+def get_live_metrics() -> LiveMetrics:
+    """Instancia global de métricas en memoria."""
+    return _live_metrics
+
+
+def reset_live_metrics() -> None:
+    """Vacía la ventana (tests)."""
+    global _live_metrics
+    _live_metrics = LiveMetrics()
+
+
+def record_interaction(tracer) -> None:
+    """Registra un InteractionTracer terminado en la ventana."""
+    _live_metrics.record(
+        channel=tracer.channel,
+        decision_path=tracer.decision_path,
+        latency_ms=tracer.latency_ms,
+        stages={
+            "openai": tracer.openai_latency_ms,
+            "whatsapp_send": tracer.whatsapp_send_latency_ms,
+            **{name: us / 1000 for name, us in tracer.stage_timings.items()},
+        },
+        personal=tracer.is_personal == 1,
+        handoff=bool(tracer.routed_team),
+        openai_called=bool(tracer.openai_called),
+        error=bool(tracer.error_message),
+    )
+
+
+def get_live_snapshot(detail: bool = False) -> Dict[str, Any]:
+    """Snapshot de la ventana en memoria."""
+    return _live_metrics.snapshot(detail=detail)
+
+
+def persist_live_metrics() -> None:
+    """Guarda la ventana en live_metrics_state."""
+    from app.models.database import get_db
+
+    payload = json.dumps(_live_metrics.to_state())
+    with get_db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO live_metrics_state (key, payload, saved_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
+            (_STATE_KEY, payload)
+        )
+
+
+def restore_live_metrics() -> int:
+    """Carga la ventana persistida (al arrancar). Retorna slots restaurados."""
+    from app.models.database import get_db
+
+    try:
+        with get_db() as conn:
+            row = conn.execute(
+                "SELECT payload FROM live_metrics_state WHERE key = ?", (_STATE_KEY,)
+            ).fetchone()
+        if not row:
+            return 0
+        restored = _live_metrics.load_state(json.loads(row[0]))
+        logger.info("Métricas en memoria restauradas", slots=restored)
+        return restored
+    except Exception as e:
+        logger.warning("No se pudieron restaurar métricas en memoria", error=str(e))
+        return 0
+
+
+async def run_live_metrics_persist_loop(interval_seconds: int) -> None:
+    """Persiste la ventana cada interval_seconds fuera del event loop."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(persist_live_metrics)
+        except Exception as e:
+            logger.error("Error persistiendo métricas en memoria", error=str(e))
@@ -12,7 +12,6 @@ Principios:
 """
 import time
 from typing import Optional, Dict, Any, List, Tuple
-import httpx
 
 from app.config import (
     OPENAI_ENABLED,
@@ -26,6 +25,7 @@ from app.config import (
     OPENAI_MAX_TOKENS_PER_CALL
 )
 from app.logging_config import logger
+from app.services.metrics import OPENAI_REQUEST_SECONDS
 
 
 # Timeout duro: 5 segundos (no configurable por seguridad)
@@ -408,6 +408,8 @@ async def get_llm_suggestion(
     
     Nota: Nunca lanza excepciones - siempre retorna Tuple[Optional[str], Dict]
     """
+    import httpx
+    from app.services.http_pool import get_async_http_client
     start_time = time.perf_counter()
     metadata = {
         "success": False,
@@ -534,7 +536,8 @@ async def get_llm_suggestion(
     latency_ms = 0
     
     try:
-        async with httpx.AsyncClient(timeout=LLM_ADAPTER_TIMEOUT_SECONDS) as client:
+        client = get_async_http_client()
+        with OPENAI_REQUEST_SECONDS.time(task_type):
             response = await client.post(
                 "https://api.openai.com/v1/chat/completions",
                 headers={
@@ -549,43 +552,44 @@ async def get_llm_suggestion(
                     ],
                     "max_tokens": OPENAI_MAX_OUTPUT_TOKENS,
                     "temperature": OPENAI_TEMPERATURE
-                }
+                },
+                timeout=LLM_ADAPTER_TIMEOUT_SECONDS
+            )
+        
+        latency_ms = int((time.perf_counter() - start_time) * 1000)
+        metadata["latency_ms"] = latency_ms
+        
+        # Verificar status HTTP
+        if response.status_code != 200:
+            error_body = response.text[:200] if hasattr(response, 'text') else "unknown"
+            logger.warning(
+                "LLM Adapter: OpenAI API error",
+                status=response.status_code,
+                body=error_body,
+                task_type=task_type,
+                conversation_id=conversation_id if conversation_id else "unknown"
+            )
+            fallback_reply = _generate_fallback_reply(task_type, context)
+            metadata["error"] = f"http_error_{response.status_code}"
+            metadata["fallback_used"] = True
+            return fallback_reply, metadata
+        
+        # Extraer respuesta
+        data = response.json()
+        suggested_reply = data["choices"][0]["message"]["content"].strip()
+        tokens_used = data.get("usage", {}).get("total_tokens", 0)
+        metadata["tokens_used"] = tokens_used
+        
+        # Validar límite de tokens por llamada (solo warning, no bloquear)
+        if tokens_used > OPENAI_MAX_TOKENS_PER_CALL:
+            logger.warning(
+                "LLM Adapter: Tokens excedidos en llamada",
+                conversation_id=conversation_id if conversation_id else "unknown",
+                tokens_used=tokens_used,
+                max_tokens=OPENAI_MAX_TOKENS_PER_CALL,
+                task_type=task_type,
+                reason_for_llm_use=reason_for_llm_use
             )
-            
-            latency_ms = int((time.perf_counter() - start_time) * 1000)
-            metadata["latency_ms"] = latency_ms
-            
-            # Verificar status HTTP
-            if response.status_code != 200:
-                error_body = response.text[:200] if hasattr(response, 'text') else "unknown"
-                logger.warning(
-                    "LLM Adapter: OpenAI API error",
-                    status=response.status_code,
-                    body=error_body,
-                    task_type=task_type,
-                    conversation_id=conversation_id if conversation_id else "unknown"
-                )
-                fallback_reply = _generate_fallback_reply(task_type, context)
-                metadata["error"] = f"http_error_{response.status_code}"
-                metadata["fallback_used"] = True
-                return fallback_reply, metadata
-            
-            # Extraer respuesta
-            data = response.json()
-            suggested_reply = data["choices"][0]["message"]["content"].strip()
-            tokens_used = data.get("usage", {}).get("total_tokens", 0)
-            metadata["tokens_used"] = tokens_used
-            
-            # Validar límite de tokens por llamada (solo warning, no bloquear)
-            if tokens_used > OPENAI_MAX_TOKENS_PER_CALL:
-                logger.warning(
-                    "LLM Adapter: Tokens excedidos en llamada",
-                    conversation_id=conversation_id if conversation_id else "unknown",
-                    tokens_used=tokens_used,
-                    max_tokens=OPENAI_MAX_TOKENS_PER_CALL,
-                    task_type=task_type,
-                    reason_for_llm_use=reason_for_llm_use
-                )
     
     except httpx.TimeoutException:
         latency_ms = int((time.perf_counter() - start_time) * 1000)
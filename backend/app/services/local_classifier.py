@@ -0,0 +1,424 @@
+"""
+Clasificador local de mensajes (sin red) para evitar llamadas al LLM.
+
+Modelo: TF-IDF de palabras y n-gramas de caracteres (3-5) con regresión
+logística multinomial; la confianza se calibra con temperature scaling sobre
+una partición de validación. Dos tareas:
+
+- "intent": intent de triage (buy_machine, spare_parts, ...), antes de
+  openai_classifier.classify_ambiguous_message
+- "business": business / personal, antes de
+  enhanced_filtering.classify_with_llm
+
+classify_locally() responde solo si la confianza calibrada llega a
+LOCAL_CLASSIFIER_MIN_CONFIDENCE; si no (o si no hay modelo entrenado), el
+llamador sigue escalando al LLM como antes.
+
+Sin dependencias: un mensaje activa ~100 n-gramas, así que el producto
+punto sobre dicts dispersos cuesta decenas de µs (menos que armar arrays
+densos). Los modelos se entrenan con scripts/train_local_classifier.py a
+partir de interaction_traces y del dataset de validate_filtering.py, y se
+guardan como JSON en LOCAL_CLASSIFIER_MODEL_DIR.
+"""
+import json
+import math
+import random
+import sqlite3
+import time
+import unicodedata
+import zlib
+from collections import Counter as TermCounter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.config import (
+    LOCAL_CLASSIFIER_ENABLED,
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE,
+    LOCAL_CLASSIFIER_MODEL_DIR
+)
+from app.logging_config import logger
+from app.services.metrics import LOCAL_CLASSIFIER_DECISIONS
+
+
+TASK_INTENT = "intent"
+TASK_BUSINESS = "business"
+TASKS = (TASK_INTENT, TASK_BUSINESS)
+
+MODEL_VERSION = 1
+CHAR_NGRAM_SIZES = (3, 4, 5)
+
+# Intent de interaction_traces (intent_analyzer) -> intent de triage
+TRACE_INTENT_TO_TRIAGE = {
+    "preguntar_precio": "buy_machine",
+    "preguntar_disponibilidad": "buy_machine",
+    "buscar_maquina_familiar": "buy_machine",
+    "buscar_maquina_industrial": "buy_machine",
+    "buscar_fileteadora": "buy_machine",
+    "solicitar_fotos": "buy_machine",
+    "solicitar_cotizacion": "buy_machine",
+    "confirmar_compra": "buy_machine",
+    "preguntar_caracteristicas": "buy_machine",
+    "preguntar_promociones": "buy_machine",
+    "preguntar_catalogo": "buy_machine",
+    "buscar_repuestos": "spare_parts",
+    "preguntar_repuestos": "spare_parts",
+    "solicitar_servicio": "tech_support",
+    "solicitar_instalacion": "tech_support",
+    "preguntar_garantia": "tech_support",
+    "preguntar_capacitacion": "tech_support",
+    "buscar_recomendacion": "business_advice",
+    "comparar": "business_advice",
+    "preguntar_horarios": "faq_hours_location",
+    "preguntar_direccion": "faq_hours_location",
+}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin tildes y con espacios simples."""
+    folded = unicodedata.normalize("NFD", text.lower())
+    folded = "".join(c for c in folded if unicodedata.category(c) != "Mn")
+    return " ".join(folded.split())
+
+
+def extract_terms(text: str) -> TermCounter:
+    """Conteo de términos: palabras ("w:") y n-gramas de caracteres por palabra ("c:")."""
+    terms: TermCounter = TermCounter()
+    for word in normalize(text).split():
+        terms["w:" + word] += 1
+        padded = f" {word} "
+        for size in CHAR_NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                terms["c:" + padded[start:start + size]] += 1
+    return terms
+
+
+def _softmax(scores: Sequence[float]) -> List[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+class LinearTextClassifier:
+    """Regresión logística multinomial sobre TF-IDF disperso."""
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        idf: Dict[str, float],
+        weights: Dict[str, List[float]],
+        bias: Sequence[float],
+        temperature: float = 1.0,
+        metadata: Optional[Dict] = None
+    ):
+        self.labels = list(labels)
+        self.idf = idf
+        self.weights = weights
+        self.bias = list(bias)
+        self.temperature = temperature
+        self.metadata = metadata or {}
+
+    def vectorize(self, text: str) -> Dict[str, float]:
+        """TF-IDF (tf sublineal) normalizado L2, solo con términos del vocabulario."""
+        idf = self.idf
+        vector = {
+            term: (1.0 + math.log(count)) * idf[term]
+            for term, count in extract_terms(text).items()
+            if term in idf
+        }
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        if norm:
+            for term in vector:
+                vector[term] /= norm
+        return vector
+
+    def _scores(self, vector: Dict[str, float]) -> List[float]:
+        scores = list(self.bias)
+        classes = range(len(scores))
+        weights = self.weights
+        for term, value in vector.items():
+            row = weights.get(term)
+            if row:
+                for k in classes:
+                    scores[k] += value * row[k]
+        return scores
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """Probabilidad calibrada por etiqueta."""
+        scores = self._scores(self.vectorize(text))
+        probs = _softmax([s / self.temperature for s in scores])
+        return dict(zip(self.labels, probs))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """(etiqueta más probable, confianza calibrada)."""
+        probs = self.predict_proba(text)
+        label = max(probs, key=probs.get)
+        return label, probs[label]
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": MODEL_VERSION,
+            "labels": self.labels,
+            "temperature": self.temperature,
+            "bias": self.bias,
+            "idf": self.idf,
+            "weights": self.weights,
+            "metadata": self.metadata,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LinearTextClassifier":
+        if data.get("version") != MODEL_VERSION:
+            raise ValueError(f"Versión de modelo no soportada: {data.get('version')}")
+        return cls(
+            labels=data["labels"],
+            idf=data["idf"],
+            weights=data["weights"],
+            bias=data["bias"],
+            temperature=data.get("temperature", 1.0),
+            metadata=data.get("metadata"),
+        )
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "LinearTextClassifier":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# ============================================================================
+# ENTRENAMIENTO
+# ============================================================================
+
+def train_classifier(
+    texts: Sequence[str],
+    labels: Sequence[str],
+    epochs: int = 30,
+    learning_rate: float = 0.5,
+    l2: float = 1e-4,
+    min_df: int = 1,
+    seed: int = 13
+) -> LinearTextClassifier:
+    """
+    Entrena la regresión logística con SGD + AdaGrad (temperature = 1; ver
+    fit_temperature()).
+    """
+    label_names = sorted(set(labels))
+    if len(label_names) < 2:
+        raise ValueError("Se necesitan al menos 2 etiquetas distintas")
+    label_index = {label: k for k, label in enumerate(label_names)}
+    n_classes = len(label_names)
+
+    # IDF suavizado sobre los términos con df >= min_df
+    term_counts = [extract_terms(text) for text in texts]
+    df: TermCounter = TermCounter()
+    for terms in term_counts:
+        df.update(terms.keys())
+    n_docs = len(texts)
+    idf = {term: math.log((1 + n_docs) / (1 + count)) + 1.0 for term, count in df.items() if count >= min_df}
+
+    model = LinearTextClassifier(label_names, idf, {}, [0.0] * n_classes)
+    vectors = [model.vectorize(text) for text in texts]
+    targets = [label_index[label] for label in labels]
+
+    weights: Dict[str, List[float]] = {}
+    grad_sq: Dict[str, List[float]] = {}
+    bias = [0.0] * n_classes
+    bias_sq = [1e-8] * n_classes
+    order = list(range(n_docs))
+    rng = random.Random(seed)
+    classes = range(n_classes)
+
+    for _ in range(epochs):
+        rng.shuffle(order)
+        for i in order:
+            vector = vectors[i]
+            scores = list(bias)
+            for term, value in vector.items():
+                row = weights.get(term)
+                if row:
+                    for k in classes:
+                        scores[k] += value * row[k]
+            probs = _softmax(scores)
+            probs[targets[i]] -= 1.0  # gradiente de la entropía cruzada respecto de los scores
+            for k in classes:
+                bias_sq[k] += probs[k] * probs[k]
+                bias[k] -= learning_rate * probs[k] / math.sqrt(bias_sq[k])
+            for term, value in vector.items():
+                row = weights.setdefault(term, [0.0] * n_classes)
+                acc = grad_sq.setdefault(term, [1e-8] * n_classes)
+                for k in classes:
+                    grad = probs[k] * value + l2 * row[k]
+                    acc[k] += grad * grad
+                    row[k] -= learning_rate * grad / math.sqrt(acc[k])
+
+    # Descartar pesos que no aportan (el idf queda completo: la norma L2 no cambia)
+    weights = {term: row for term, row in weights.items() if max(abs(w) for w in row) >= 1e-3}
+    model.weights = {term: [round(w, 5) for w in row] for term, row in weights.items()}
+    model.bias = bias
+    return model
+
+
+def fit_temperature(model: LinearTextClassifier, texts: Sequence[str], labels: Sequence[str]) -> float:
+    """Temperatura que minimiza la log-loss en validación (búsqueda en grilla)."""
+    index = {label: k for k, label in enumerate(model.labels)}
+    samples = [
+        (model._scores(model.vectorize(text)), index[label])
+        for text, label in zip(texts, labels)
+        if label in index
+    ]
+    if not samples:
+        return model.temperature
+
+    def log_loss(temperature: float) -> float:
+        return -sum(
+            math.log(max(_softmax([s / temperature for s in scores])[target], 1e-12))
+            for scores, target in samples
+        ) / len(samples)
+
+    grid = [0.25 * step for step in range(1, 41)]  # 0.25 .. 10
+    model.temperature = min(grid, key=log_loss)
+    return model.temperature
+
+
+def split_holdout(
+    texts: Sequence[str],
+    labels: Sequence[str],
+    fraction: float = 0.2
+) -> Tuple[List[str], List[str], List[str], List[str]]:
+    """Partición determinística por hash del texto (un texto repetido cae siempre del mismo lado)."""
+    train_x, train_y, test_x, test_y = [], [], [], []
+    for text, label in zip(texts, labels):
+        bucket = zlib.crc32(normalize(text).encode("utf-8")) % 1000
+        if bucket < fraction * 1000:
+            test_x.append(text)
+            test_y.append(label)
+        else:
+            train_x.append(text)
+            train_y.append(label)
+    return train_x, train_y, test_x, test_y
+
+
+def evaluate(
+    model: LinearTextClassifier,
+    texts: Sequence[str],
+    labels: Sequence[str],
+    threshold: float
+) -> Dict[str, float]:
+    """Exactitud total, fracción resuelta localmente (>= threshold) y exactitud en esa fracción."""
+    if not texts:
+        return {"samples": 0}
+    start = time.perf_counter()
+    predictions = [model.predict(text) for text in texts]
+    elapsed = time.perf_counter() - start
+    correct = [predicted == label for (predicted, _), label in zip(predictions, labels)]
+    confident = [ok for (_, confidence), ok in zip(predictions, correct) if confidence >= threshold]
+    return {
+        "samples": len(texts),
+        "accuracy": round(sum(correct) / len(texts), 4),
+        "local_rate": round(len(confident) / len(texts), 4),
+        "local_accuracy": round(sum(confident) / len(confident), 4) if confident else None,
+        "avg_predict_us": round(elapsed / len(texts) * 1e6, 1),
+    }
+
+
+def load_training_samples(
+    task: str,
+    db_path: Optional[str] = None,
+    days: int = 90,
+    filtering_dataset: Optional[Path] = None
+) -> Tuple[List[str], List[str]]:
+    """
+    Textos y etiquetas para entrenar.
+
+    - intent: interaction_traces con intent mapeable a triage (TRACE_INTENT_TO_TRIAGE)
+    - business: interaction_traces.business_related (incluye las decisiones del
+      LLM de enhanced_filtering) + samples del dataset de validate_filtering.py
+    """
+    texts: List[str] = []
+    labels: List[str] = []
+
+    if db_path and Path(db_path).exists():
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(
+                """
+                SELECT raw_text, intent, business_related FROM interaction_traces
+                WHERE raw_text IS NOT NULL AND raw_text != ''
+                  AND created_at >= datetime('now', ?)
+                """,
+                (f"-{int(days)} days",)
+            ).fetchall()
+        finally:
+            conn.close()
+        for raw_text, intent, business_related in rows:
+            if task == TASK_INTENT:
+                label = TRACE_INTENT_TO_TRIAGE.get(intent or "")
+            else:
+                label = None if business_related is None else ("business" if business_related else "personal")
+            if label:
+                texts.append(raw_text)
+                labels.append(label)
+
+    if task == TASK_BUSINESS and filtering_dataset and filtering_dataset.exists():
+        with open(filtering_dataset, encoding="utf-8") as f:
+            for sample in json.load(f).get("samples", []):
+                texts.append(sample["text"])
+                labels.append("business" if sample["expected"] == "BUSINESS" else "personal")
+
+    return texts, labels
+
+
+# ============================================================================
+# INFERENCIA
+# ============================================================================
+
+# tarea -> modelo (None si no hay archivo); se carga en el primer uso
+_models: Dict[str, Optional[LinearTextClassifier]] = {}
+
+
+def model_path(task: str, model_dir: Optional[Path] = None) -> Path:
+    return Path(model_dir or LOCAL_CLASSIFIER_MODEL_DIR) / f"{task}_classifier.json"
+
+
+def get_local_classifier(task: str) -> Optional[LinearTextClassifier]:
+    """Modelo de la tarea, o None si está deshabilitado o no hay modelo entrenado."""
+    if not LOCAL_CLASSIFIER_ENABLED:
+        return None
+    if task not in _models:
+        path = model_path(task)
+        model = None
+        if path.exists():
+            try:
+                model = LinearTextClassifier.load(path)
+                logger.info("Clasificador local cargado", task=task, terms=len(model.weights))
+            except Exception as e:
+                logger.error("Error cargando clasificador local", task=task, error=str(e))
+        _models[task] = model
+    return _models[task]
+
+
+def reset_local_classifiers() -> None:
+    """Olvida los modelos cargados (se releen del disco en el próximo uso)."""
+    _models.clear()
+
+
+def classify_locally(task: str, text: str) -> Optional[Tuple[str, float]]:
+    """
+    (etiqueta, confianza) si el modelo local está seguro; None para escalar al LLM.
+    """
+    model = get_local_classifier(task)
+    if model is None or not text or not text.strip():
+        return None
+    label, confidence = model.predict(text)
+    if confidence < LOCAL_CLASSIFIER_MIN_CONFIDENCE:
+        LOCAL_CLASSIFIER_DECISIONS.inc(task, "escalated")
+        return None
+    LOCAL_CLASSIFIER_DECISIONS.inc(task, "local")
+    return label, confidence
@@ -0,0 +1,266 @@
+"""
+Métricas en formato de exposición de Prometheus (texto 0.0.4) para GET /metrics.
+
+Sin dependencias: contadores e histogramas con buckets fijos en segundos.
+Registrar cuesta un bisect, un lock y un incremento de dict; el texto se arma
+solo al hacer scrape.
+
+Cardinalidad acotada: cada métrica declara sus labels y admite a lo sumo
+max_series combinaciones distintas; las nuevas por encima del tope se cuentan
+con todos los labels en "other". Nunca usar teléfonos, conversation_id ni
+textos como valor de label.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Sequence, Tuple
+
+# Buckets por defecto (segundos): de 1ms a 30s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+OVERFLOW_LABEL = "other"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+_INF_LABEL = 'le="+Inf"'
+
+_REGISTRY: List["_Metric"] = []
+
+# True dentro de suppressed(): inc/observe no registran nada
+_suppressed: ContextVar[bool] = ContextVar("metrics_suppressed", default=False)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), max_series: int = 64):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+        _REGISTRY.append(self)
+
+    def _key(self, label_values: Sequence[str]) -> Tuple[str, ...]:
+        """Tupla de labels acotada (llamar con el lock tomado)."""
+        key = tuple(str(value) for value in label_values)
+        if len(key) != len(self.label_names):
+            raise ValueError(f"{self.name}: se esperaban labels {self.label_names}")
+        if key in self._series or len(self._series) < self.max_series:
+            return key
+        return (OVERFLOW_LABEL,) * len(key)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monotónico."""
+    type_name = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        if _suppressed.get():
+            return
+        with self._lock:
+            key = self._key(label_values)
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._series.get(tuple(label_values), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}"
+            for key, value in series
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma con buckets fijos (se expone acumulado, como pide Prometheus)."""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        max_series: int = 64
+    ):
+        super().__init__(name, documentation, labels, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values: str) -> None:
+        if _suppressed.get():
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(label_values)
+            state = self._series.get(key)
+            if state is None:
+                # [conteos por bucket (+Inf al final), suma]
+                state = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, *label_values: str):
+        """Observa la duración del bloque (también si lanza excepción)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values: str) -> int:
+        state = self._series.get(tuple(label_values))
+        return sum(state[0]) if state else 0
+
+    def total(self, *label_values: str) -> float:
+        state = self._series.get(tuple(label_values))
+        return state[1] if state else 0.0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(state[0]), state[1])) for key, state in self._series.items())
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, _INF_LABEL)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Texto de exposición de todas las métricas registradas."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def suppressed():
+    """
+    Las métricas registradas dentro del bloque (en este contexto) se descartan:
+    tráfico sintético como el warm-up no debe aparecer en /metrics.
+    """
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def reset_metrics() -> None:
+    """Vacía todas las series (tests)."""
+    for metric in _REGISTRY:
+        metric.reset()
+
+
+# ============================================================================
+# MÉTRICAS DE LUISA
+# ============================================================================
+
+WEBHOOK_ACK_SECONDS = Histogram(
+    "luisa_webhook_ack_seconds",
+    "Tiempo desde que llega el webhook de WhatsApp hasta el ACK.",
+    labels=["outcome"],
+)
+WEBHOOK_QUEUE_WAIT_SECONDS = Histogram(
+    "luisa_webhook_queue_wait_seconds",
+    "Espera entre el ACK del webhook y el inicio del procesamiento en background.",
+)
+STAGE_SECONDS = Histogram(
+    "luisa_stage_seconds",
+    "Duración de las etapas del pipeline (guardrail, intent, context, asset, handoff, ...).",
+    labels=["stage"],
+)
+OPENAI_REQUEST_SECONDS = Histogram(
+    "luisa_openai_request_seconds",
+    "Latencia de las llamadas HTTP a OpenAI por tipo de tarea.",
+    labels=["task"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 12.0, 20.0, 30.0),
+)
+WHATSAPP_SEND_SECONDS = Histogram(
+    "luisa_whatsapp_send_seconds",
+    "Latencia de cada intento de envío a la Graph API de WhatsApp por código de error.",
+    labels=["error_code"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 30.0),
+    max_series=16,
+)
+WHATSAPP_OUTBOUND_EVENTS = Counter(
+    "luisa_whatsapp_outbound_total",
+    "Eventos de la cola de salida de WhatsApp (queued, retry, sent, failed).",
+    labels=["event"],
+    max_series=8,
+)
+WHATSAPP_STATUS_EVENTS = Counter(
+    "luisa_whatsapp_status_total",
+    "Statuses de mensajes salientes recibidos por webhook (sent, delivered, read, failed).",
+    labels=["status"],
+    max_series=8,
+)
+DB_QUERY_SECONDS = Histogram(
+    "luisa_db_query_seconds",
+    "Duración de cada bloque get_db() (conexión, consultas y commit) por función.",
+    labels=["operation"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+CACHE_LOOKUPS = Counter(
+    "luisa_cache_lookups_total",
+    "Consultas a caches por resultado (hit ratio = hit / total).",
+    labels=["cache", "result"],
+    max_series=16,
+)
+LOCAL_CLASSIFIER_DECISIONS = Counter(
+    "luisa_local_classifier_total",
+    "Decisiones del clasificador local por tarea (local = sin LLM, escalated = confianza baja).",
+    labels=["task", "outcome"],
+    max_series=8,
+)
+DIALOGUE_TURN_SECONDS = Histogram(
+    "luisa_dialogue_turn_seconds",
+    "Duración de next_action() del Sales Dialogue Manager por etapa y transición.",
+    labels=["stage", "transition"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.05),
+    max_series=160,
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "luisa_rate_limit_rejections_total",
+    "Solicitudes rechazadas por rate limit, por ámbito.",
+    labels=["scope"],
+    max_series=16,
+)
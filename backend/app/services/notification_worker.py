@@ -0,0 +1,177 @@
+"""
+Entrega de notificaciones internas de handoff (equipo comercial / técnico).
+
+process_handoff solo inserta en `notifications` (delivery_status='pending'); la
+respuesta al cliente no espera el envío al equipo. run_notification_worker_loop
+toma las notificaciones vencidas, junta las del mismo destino en un solo
+mensaje de WhatsApp y reintenta con backoff las que fallan:
+
+    pending -> sending -> sent
+                       -> retry -> sending -> ... -> failed (NOTIFICATION_MAX_ATTEMPTS)
+
+Una fila en 'sending' tiene un lease: si el proceso muere a mitad de envío,
+vuelve a tomarse cuando vence.
+
+Cada handoff y cada resultado de entrega queda además en un log JSONL de solo
+agregado (HANDOFF_LOG_PATH), que reemplaza los JSON sueltos de outbox/.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import (
+    HANDOFF_LOG_PATH,
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_BATCH_MAX_CHARS,
+)
+from app.models.database import get_db
+from app.logging_config import logger
+
+
+CLAIM_LEASE_SECONDS = 120
+FETCH_LIMIT = 100
+BATCH_SEPARATOR = "\n\n──────────\n\n"
+
+SendFn = Callable[[str, str], Awaitable[Tuple[bool, Optional[str]]]]
+
+_log_lock = threading.Lock()
+
+
+def append_handoff_log(event: str, **fields: Any) -> None:
+    """Agrega una línea JSON al log de handoffs (nunca reescribe lo anterior)."""
+    record = {"ts": datetime.now().isoformat(timespec="seconds"), "event": event, **fields}
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        with _log_lock:
+            with open(HANDOFF_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        logger.error("Error escribiendo log de handoffs", error=str(e))
+
+
+# ============================================================================
+# COLA (tabla notifications)
+# ============================================================================
+
+def _claim_due(now: float, limit: int = FETCH_LIMIT) -> List[Dict[str, Any]]:
+    """Toma las notificaciones vencidas (pendientes, a reintentar o con lease vencido)."""
+    claimed = []
+    with get_db() as conn:
+        rows = conn.execute("""
+            SELECT id, conversation_id, team, notification_text, destination_number, attempts, next_attempt_at
+            FROM notifications
+            WHERE delivery_status IN ('pending', 'retry', 'sending') AND next_attempt_at <= ?
+            ORDER BY id
+            LIMIT ?
+        """, (now, limit)).fetchall()
+        for row in rows:
+            cursor = conn.execute("""
+                UPDATE notifications SET delivery_status = 'sending', next_attempt_at = ?
+                WHERE id = ? AND next_attempt_at = ? AND delivery_status IN ('pending', 'retry', 'sending')
+            """, (now + CLAIM_LEASE_SECONDS, row["id"], row["next_attempt_at"]))
+            if cursor.rowcount:
+                claimed.append(dict(row))
+    return claimed
+
+
+def build_batches(rows: List[Dict[str, Any]], max_chars: int = NOTIFICATION_BATCH_MAX_CHARS) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    Agrupa por destino y junta textos hasta max_chars por mensaje.
+
+    Returns:
+        [(destino, [filas])] en orden de llegada
+    """
+    batches: List[Tuple[str, List[Dict[str, Any]]]] = []
+    open_batches: Dict[str, Tuple[int, int]] = {}  # destino -> (índice en batches, largo)
+    for row in rows:
+        destination = row["destination_number"]
+        length = len(row["notification_text"] or "")
+        current = open_batches.get(destination)
+        if current and current[1] + len(BATCH_SEPARATOR) + length <= max_chars:
+            index, size = current
+            batches[index][1].append(row)
+            open_batches[destination] = (index, size + len(BATCH_SEPARATOR) + length)
+        else:
+            batches.append((destination, [row]))
+            open_batches[destination] = (len(batches) - 1, length)
+    return batches
+
+
+def _batch_text(rows: List[Dict[str, Any]]) -> str:
+    texts = [row["notification_text"] or "" for row in rows]
+    if len(texts) == 1:
+        return texts[0]
+    return f"📱 {len(texts)} casos nuevos" + BATCH_SEPARATOR + BATCH_SEPARATOR.join(texts)
+
+
+def _record_outcome(rows: List[Dict[str, Any]], success: bool, error: Optional[str]) -> None:
+    from app.services.outbound_queue import backoff_delay
+
+    now = time.time()
+    with get_db() as conn:
+        for row in rows:
+            attempts = row["attempts"] + 1
+            if success:
+                status, next_attempt_at = "sent", 0
+            elif attempts >= NOTIFICATION_MAX_ATTEMPTS:
+                status, next_attempt_at = "failed", 0
+            else:
+                status, next_attempt_at = "retry", now + backoff_delay(attempts - 1)
+            conn.execute("""
+                UPDATE notifications
+                SET delivery_status = ?, attempts = ?, next_attempt_at = ?, error = ?,
+                    sent_at = CASE WHEN ? = 'sent' THEN CURRENT_TIMESTAMP ELSE sent_at END
+                WHERE id = ?
+            """, (status, attempts, next_attempt_at, None if success else error, status, row["id"]))
+            if status != "retry":
+                append_handoff_log(
+                    f"notification_{status}",
+                    notification_id=row["id"],
+                    conversation_id=row["conversation_id"],
+                    team=row["team"],
+                    attempts=attempts,
+                    error=None if success else error,
+                )
+
+
+async def deliver_pending_notifications(send: Optional[SendFn] = None) -> int:
+    """
+    Envía las notificaciones vencidas, un mensaje por lote de destino.
+    Retorna cuántas notificaciones se intentaron.
+    """
+    if send is None:
+        from app.services.whatsapp_service import send_whatsapp_message
+
+        async def send(destination: str, text: str):
+            # Los reintentos los maneja este worker, no la cola de salida; sin
+            # anti-spam: dos handoffs con el mismo texto son dos casos distintos
+            return await send_whatsapp_message(destination, text, dedup=False, allow_queue=False)
+
+    rows = _claim_due(time.time())
+    for destination, batch in build_batches(rows):
+        try:
+            success, result = await send(destination, _batch_text(batch))
+        except Exception as e:
+            success, result = False, str(e)
+        _record_outcome(batch, success, None if success else (result or "unknown_error"))
+        log = logger.info if success else logger.warning
+        log(
+            "Notificación interna entregada" if success else "Notificación interna no entregada",
+            notifications=len(batch),
+            destination=destination[-4:] if destination else "unknown",
+            error=None if success else result
+        )
+    return len(rows)
+
+
+async def run_notification_worker_loop(interval_seconds: float) -> None:
+    """Entrega notificaciones pendientes cada interval_seconds."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await deliver_pending_notifications()
+        except Exception as e:
+            logger.error("Error entregando notificaciones internas", error=str(e))
@@ -1,9 +1,9 @@
 """
 OpenAI Classifier: Clasifica intents ambiguos con JSON estricto.
-Solo se llama cuando el mensaje es ambiguo o mezcla intents.
+Solo se llama cuando el mensaje es ambiguo o mezcla intents, y solo llega a
+OpenAI si el clasificador local (local_classifier.py) no está seguro.
 """
 import json
-import httpx
 import time
 from typing import Dict, Any, Optional, Tuple, List
 
@@ -15,6 +15,8 @@ from app.config import (
 )
 from app.domain.schemas import ClassifierOutput
 from app.logging_config import logger
+from app.services.metrics import OPENAI_REQUEST_SECONDS
+from app.services.local_classifier import TASK_INTENT, classify_locally
 
 
 # Configuración del classifier
@@ -28,8 +30,8 @@ def classify_ambiguous_message(
     conversation_history: List[Dict[str, Any]] = None
 ) -> Optional[ClassifierOutput]:
     """
-    Clasifica un mensaje ambiguo usando OpenAI.
-    Solo se llama cuando reglas determinísticas no pueden clasificar.
+    Clasifica un mensaje ambiguo con el modelo local o, si su confianza no
+    alcanza, con OpenAI. Solo se llama cuando reglas determinísticas no pueden clasificar.
     
     Args:
         text: Mensaje del usuario
@@ -38,6 +40,15 @@ def classify_ambiguous_message(
     Returns:
         ClassifierOutput o None si falla
     """
+    import httpx
+    from app.services.http_pool import get_http_client
+
+    local = classify_locally(TASK_INTENT, text)
+    if local:
+        intent, confidence = local
+        logger.info("Clasificador local resolvió intent", intent=intent, confidence=round(confidence, 3))
+        return ClassifierOutput(intent=intent, confidence=confidence)
+
     if not OPENAI_ENABLED or not OPENAI_API_KEY:
         return None
     
@@ -87,7 +98,8 @@ INSTRUCCIONES:
     try:
         start_time = time.perf_counter()
         
-        with httpx.Client(timeout=CLASSIFIER_TIMEOUT) as client:
+        client = get_http_client()
+        with OPENAI_REQUEST_SECONDS.time("classifier"):
             response = client.post(
                 "https://api.openai.com/v1/chat/completions",
                 headers={
@@ -103,41 +115,42 @@ INSTRUCCIONES:
                     "max_tokens": CLASSIFIER_MAX_TOKENS,
                     "temperature": 0.2,
                     "response_format": {"type": "json_object"}
-                }
+                },
+                timeout=CLASSIFIER_TIMEOUT
             )
+        
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        
+        if response.status_code == 200:
+            data = response.json()
+            content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
             
-            elapsed_ms = (time.perf_counter() - start_time) * 1000
-            
-            if response.status_code == 200:
-                data = response.json()
-                content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+            try:
+                parsed = json.loads(content)
+                classifier_output = ClassifierOutput(**parsed)
                 
-                try:
-                    parsed = json.loads(content)
-                    classifier_output = ClassifierOutput(**parsed)
-                    
-                    logger.info(
-                        "OpenAI classifier exitoso",
-                        intent=classifier_output.intent,
-                        confidence=classifier_output.confidence,
-                        elapsed_ms=round(elapsed_ms, 1)
-                    )
-                    
-                    return classifier_output
-                except Exception as e:
-                    logger.error("Error parseando classifier output", error=str(e))
-                    return None
-            else:
-                error_data = response.json()
-                error_msg = error_data.get("error", {}).get("message", "Error desconocido")
-                logger.warning(
-                    "Error en OpenAI classifier",
-                    status_code=response.status_code,
-                    error=error_msg,
+                logger.info(
+                    "OpenAI classifier exitoso",
+                    intent=classifier_output.intent,
+                    confidence=classifier_output.confidence,
                     elapsed_ms=round(elapsed_ms, 1)
                 )
-                return None
                 
+                return classifier_output
+            except Exception as e:
+                logger.error("Error parseando classifier output", error=str(e))
+                return None
+        else:
+            error_data = response.json()
+            error_msg = error_data.get("error", {}).get("message", "Error desconocido")
+            logger.warning(
+                "Error en OpenAI classifier",
+                status_code=response.status_code,
+                error=error_msg,
+                elapsed_ms=round(elapsed_ms, 1)
+            )
+            return None
+            
     except httpx.TimeoutException:
         logger.warning("Timeout en OpenAI classifier")
         return None
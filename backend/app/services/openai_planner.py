@@ -3,7 +3,6 @@ OpenAI Planner: Genera plan de venta estructurado (JSON).
 Solo se llama cuando aporta valor (indeciso, objeción, soporte complejo).
 """
 import json
-import httpx
 import time
 from typing import Dict, Any, Optional, List
 
@@ -20,6 +19,7 @@ from app.domain.business_facts import (
     get_price_ranges_for_context
 )
 from app.logging_config import logger
+from app.services.metrics import OPENAI_REQUEST_SECONDS
 
 
 # Configuración del planner
@@ -46,6 +46,8 @@ def plan_sales_conversation(
     Returns:
         PlannerOutput o None si falla
     """
+    import httpx
+    from app.services.http_pool import get_http_client
     if not OPENAI_ENABLED or not OPENAI_API_KEY:
         return None
     
@@ -112,7 +114,8 @@ Slots actuales: {json.dumps(slots, ensure_ascii=False)}
     try:
         start_time = time.perf_counter()
         
-        with httpx.Client(timeout=PLANNER_TIMEOUT) as client:
+        client = get_http_client()
+        with OPENAI_REQUEST_SECONDS.time("planner"):
             response = client.post(
                 "https://api.openai.com/v1/chat/completions",
                 headers={
@@ -128,52 +131,53 @@ Slots actuales: {json.dumps(slots, ensure_ascii=False)}
                     "max_tokens": PLANNER_MAX_TOKENS,
                     "temperature": 0.3,
                     "response_format": {"type": "json_object"}
-                }
+                },
+                timeout=PLANNER_TIMEOUT
             )
+        
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        
+        if response.status_code == 200:
+            data = response.json()
+            content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
             
-            elapsed_ms = (time.perf_counter() - start_time) * 1000
-            
-            if response.status_code == 200:
-                data = response.json()
-                content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+            try:
+                parsed = json.loads(content)
+                
+                # Validar que no inventó precios
+                for rec in parsed.get("recommendations", []):
+                    if rec.get("price"):
+                        # Verificar que el precio esté en facts
+                        valid_prices = [p["price"] for p in promotions] + [price_ranges["familiar"]["min"], price_ranges["industrial"]["min"]]
+                        if rec["price"] not in valid_prices:
+                            logger.warning("Planner inventó precio", price=rec["price"])
+                            rec["price"] = None
                 
-                try:
-                    parsed = json.loads(content)
-                    
-                    # Validar que no inventó precios
-                    for rec in parsed.get("recommendations", []):
-                        if rec.get("price"):
-                            # Verificar que el precio esté en facts
-                            valid_prices = [p["price"] for p in promotions] + [price_ranges["familiar"]["min"], price_ranges["industrial"]["min"]]
-                            if rec["price"] not in valid_prices:
-                                logger.warning("Planner inventó precio", price=rec["price"])
-                                rec["price"] = None
-                    
-                    planner_output = PlannerOutput(**parsed)
-                    
-                    logger.info(
-                        "OpenAI planner exitoso",
-                        intent=planner_output.intent,
-                        confidence=planner_output.confidence,
-                        recommendations_count=len(planner_output.recommendations),
-                        elapsed_ms=round(elapsed_ms, 1)
-                    )
-                    
-                    return planner_output
-                except Exception as e:
-                    logger.error("Error parseando planner output", error=str(e))
-                    return None
-            else:
-                error_data = response.json()
-                error_msg = error_data.get("error", {}).get("message", "Error desconocido")
-                logger.warning(
-                    "Error en OpenAI planner",
-                    status_code=response.status_code,
-                    error=error_msg,
+                planner_output = PlannerOutput(**parsed)
+                
+                logger.info(
+                    "OpenAI planner exitoso",
+                    intent=planner_output.intent,
+                    confidence=planner_output.confidence,
+                    recommendations_count=len(planner_output.recommendations),
                     elapsed_ms=round(elapsed_ms, 1)
                 )
-                return None
                 
+                return planner_output
+            except Exception as e:
+                logger.error("Error parseando planner output", error=str(e))
+                return None
+        else:
+            error_data = response.json()
+            error_msg = error_data.get("error", {}).get("message", "Error desconocido")
+            logger.warning(
+                "Error en OpenAI planner",
+                status_code=response.status_code,
+                error=error_msg,
+                elapsed_ms=round(elapsed_ms, 1)
+            )
+            return None
+            
     except httpx.TimeoutException:
         logger.warning("Timeout en OpenAI planner")
         return None
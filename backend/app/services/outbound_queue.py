@@ -0,0 +1,375 @@
+"""
+Cola de salida de WhatsApp: reintentos persistidos y control de ritmo.
+
+El primer intento de cada envío se hace en línea (el cliente recibe la
+respuesta sin demora). Si falla por una causa transitoria (timeout, 5xx, 429
+o límite de throughput de Meta) el envío se guarda en wa_outbound_queue y lo
+reintenta run_outbound_dispatch_loop con backoff exponencial con jitter,
+respetando Retry-After. La conversación no espera esos segundos.
+
+- Orden FIFO por destinatario: mientras un número tenga envíos pendientes, los
+  nuevos se encolan detrás y se despacha solo la cabeza de cada número.
+- Token bucket por WHATSAPP_PHONE_NUMBER_ID: un 429 pausa el bucket completo.
+- Los pendientes sobreviven reinicios; cada intento toma la fila con un lease,
+  así que una caída a mitad de envío se reintenta (entrega al-menos-una-vez).
+- El resultado final de un envío diferido se escribe en interaction_traces
+  (whatsapp_send_*) por request_id.
+"""
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import (
+    WHATSAPP_SEND_RATE_PER_SECOND,
+    WHATSAPP_SEND_BURST,
+    WHATSAPP_SEND_MAX_RETRIES,
+    WHATSAPP_SEND_BACKOFF_BASE_SECONDS,
+    WHATSAPP_SEND_BACKOFF_MAX_SECONDS,
+)
+from app.models.database import get_db
+from app.services.metrics import WHATSAPP_OUTBOUND_EVENTS
+from app.logging_config import logger
+
+
+SEND_OK = "ok"
+SEND_RETRY = "retry"
+SEND_FATAL = "fatal"
+
+# Resultado de dispatch_send cuando el envío quedó en la cola (aún no hay wamid)
+SEND_QUEUED = "queued"
+
+# Esperas de token más largas que esto no se hacen en línea: el envío se encola
+MAX_INLINE_WAIT_SECONDS = 0.5
+# Tiempo que una fila tomada queda reservada para quien la está enviando
+CLAIM_LEASE_SECONDS = 60
+DISPATCH_BATCH_SIZE = 50
+
+
+@dataclass(slots=True)
+class SendResult:
+    """Resultado de un intento de POST a /messages."""
+    status: str  # SEND_OK | SEND_RETRY | SEND_FATAL
+    result: Optional[str]  # wamid si ok, mensaje de error si no
+    error_code: Optional[str] = None
+    retry_after: Optional[float] = None
+    throttled: bool = False  # 429 / límite de throughput del número
+
+
+PostFn = Callable[[Dict[str, Any], str], Awaitable[SendResult]]
+
+
+# ============================================================================
+# RITMO Y BACKOFF
+# ============================================================================
+
+class TokenBucket:
+    """Token bucket con reserva: take() consume un token y dice cuánto esperar."""
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def take(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def give_back(self) -> None:
+        """Devuelve el token de un take() cuya espera no se va a hacer."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds: float, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+_BUCKETS: Dict[str, TokenBucket] = {}
+
+
+def get_bucket(phone_number_id: str) -> TokenBucket:
+    bucket = _BUCKETS.get(phone_number_id)
+    if bucket is None:
+        bucket = _BUCKETS[phone_number_id] = TokenBucket(WHATSAPP_SEND_RATE_PER_SECOND, WHATSAPP_SEND_BURST)
+    return bucket
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Espera antes del reintento número attempt+1: exponencial con jitter
+    (entre la mitad y el total del escalón), nunca menor que Retry-After.
+    """
+    ceiling = min(WHATSAPP_SEND_BACKOFF_MAX_SECONDS, WHATSAPP_SEND_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    delay = random.uniform(ceiling / 2, ceiling)
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After en segundos (acepta segundos o fecha HTTP)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# ============================================================================
+# PERSISTENCIA
+# ============================================================================
+
+def enqueue_send(
+    payload: Dict[str, Any],
+    phone_number_id: str,
+    max_attempts: int,
+    next_attempt_at: float,
+    attempts: int = 0,
+    last_error: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    trace_request_id: Optional[str] = None,
+) -> int:
+    """Guarda un envío pendiente. Retorna su id."""
+    with get_db() as conn:
+        cursor = conn.execute("""
+            INSERT INTO wa_outbound_queue (
+                recipient, phone_number_id, payload, conversation_id, trace_request_id,
+                attempts, max_attempts, next_attempt_at, enqueued_at, last_error
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            payload["to"], phone_number_id, json.dumps(payload, ensure_ascii=False), conversation_id,
+            trace_request_id, attempts, max_attempts, next_attempt_at, time.time(), last_error
+        ))
+        return cursor.lastrowid
+
+
+def has_pending_sends(recipient: str) -> bool:
+    with get_db() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM wa_outbound_queue WHERE status = 'pending' AND recipient = ? LIMIT 1",
+            (recipient,)
+        ).fetchone()
+        return row is not None
+
+
+def get_outbound_queue_stats() -> Dict[str, int]:
+    """Cantidad de envíos por estado (pending, failed)."""
+    with get_db() as conn:
+        rows = conn.execute("SELECT status, COUNT(*) FROM wa_outbound_queue GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+def _due_heads(now: float, limit: int) -> List[Dict[str, Any]]:
+    """Cabeza (envío más viejo) de cada destinatario, si ya le toca."""
+    with get_db() as conn:
+        rows = conn.execute("""
+            SELECT q.* FROM wa_outbound_queue q
+            WHERE q.id IN (
+                SELECT MIN(id) FROM wa_outbound_queue WHERE status = 'pending' GROUP BY recipient
+            ) AND q.next_attempt_at <= ?
+            ORDER BY q.next_attempt_at
+            LIMIT ?
+        """, (now, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+
+def _claim(row: Dict[str, Any], now: float) -> bool:
+    """Reserva la fila por CLAIM_LEASE_SECONDS (otro proceso puede estar despachando)."""
+    with get_db() as conn:
+        cursor = conn.execute("""
+            UPDATE wa_outbound_queue SET next_attempt_at = ?
+            WHERE id = ? AND status = 'pending' AND next_attempt_at = ?
+        """, (now + CLAIM_LEASE_SECONDS, row["id"], row["next_attempt_at"]))
+        return cursor.rowcount > 0
+
+
+def _reschedule(row_id: int, next_attempt_at: float, attempts: int, last_error: Optional[str]) -> None:
+    with get_db() as conn:
+        conn.execute("""
+            UPDATE wa_outbound_queue
+            SET next_attempt_at = ?, attempts = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (next_attempt_at, attempts, last_error, row_id))
+
+
+def _finish(row: Dict[str, Any], success: bool, error: Optional[str], message_id: Optional[str] = None) -> None:
+    """Cierra el envío (los exitosos se borran) y anota el resultado (y el wamid) en la traza."""
+    latency_ms = round((time.time() - row["enqueued_at"]) * 1000, 1)
+    with get_db() as conn:
+        if success:
+            conn.execute("DELETE FROM wa_outbound_queue WHERE id = ?", (row["id"],))
+        else:
+            conn.execute("""
+                UPDATE wa_outbound_queue
+                SET status = 'failed', attempts = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (row["attempts"], error, row["id"]))
+        if row.get("trace_request_id"):
+            if not success:
+                # La traza pudo agregarse a los rollups antes de conocer el fallo
+                from app.services.trace_rollups import record_late_send_failure
+                record_late_send_failure(conn, row["trace_request_id"])
+            conn.execute("""
+                UPDATE interaction_traces
+                SET whatsapp_send_success = ?, whatsapp_send_error_code = ?, whatsapp_send_latency_ms = ?,
+                    whatsapp_message_id = COALESCE(whatsapp_message_id, ?)
+                WHERE request_id = ?
+            """, (1 if success else 0, None if success else error, latency_ms, message_id, row["trace_request_id"]))
+
+
+# ============================================================================
+# ENVÍO
+# ============================================================================
+
+def _queue(payload, phone_number_id, max_attempts, next_attempt_at, reason, conversation_id,
+           attempts=0, last_error=None) -> Tuple[bool, Optional[str]]:
+    from app.services.trace_service import current_tracer
+
+    tracer = current_tracer()
+    enqueue_send(
+        payload, phone_number_id, max_attempts, next_attempt_at,
+        attempts=attempts, last_error=last_error, conversation_id=conversation_id,
+        trace_request_id=tracer.request_id if tracer else None,
+    )
+    WHATSAPP_OUTBOUND_EVENTS.inc("queued")
+    logger.info(
+        "whatsapp_send_queued",
+        conversation_id=conversation_id or "unknown",
+        reason=reason,
+        attempts=attempts,
+        retry_in_s=round(max(0.0, next_attempt_at - time.time()), 1)
+    )
+    return True, SEND_QUEUED
+
+
+async def dispatch_send(
+    payload: Dict[str, Any],
+    phone_number_id: str,
+    post: PostFn,
+    max_retries: Optional[int] = None,
+    conversation_id: Optional[str] = None,
+    allow_queue: bool = True,
+) -> Tuple[bool, Optional[str]]:
+    """
+    Envía en línea o deja el envío en la cola.
+
+    allow_queue=False es para quien ya maneja sus propios reintentos (el worker
+    de notificaciones): nunca encola y cualquier envío no hecho es un fallo.
+
+    Returns:
+        (True, wamid) si se envió; (True, SEND_QUEUED) si quedó encolado
+        (lo entrega run_outbound_dispatch_loop); (False, error) si falló sin
+        posibilidad de reintento.
+    """
+    max_retries = WHATSAPP_SEND_MAX_RETRIES if max_retries is None else max_retries
+    if not allow_queue:
+        max_retries = 0
+    max_attempts = max_retries + 1
+
+    # FIFO por destinatario: no adelantar envíos pendientes
+    if has_pending_sends(payload["to"]):
+        if not allow_queue:
+            return False, "fifo"
+        return _queue(payload, phone_number_id, max_attempts, time.time(), "fifo", conversation_id)
+
+    bucket = get_bucket(phone_number_id)
+    wait = bucket.take()
+    if wait > MAX_INLINE_WAIT_SECONDS:
+        bucket.give_back()
+        if not allow_queue:
+            return False, "throttled"
+        return _queue(payload, phone_number_id, max_attempts, time.time() + wait, "throttled", conversation_id)
+    if wait:
+        await asyncio.sleep(wait)
+
+    outcome = await post(payload, phone_number_id)
+    if outcome.status == SEND_OK:
+        WHATSAPP_OUTBOUND_EVENTS.inc("sent")
+        return True, outcome.result
+    if outcome.status == SEND_FATAL or max_retries <= 0:
+        WHATSAPP_OUTBOUND_EVENTS.inc("failed")
+        return False, outcome.result
+
+    if outcome.throttled:
+        bucket.pause(backoff_delay(0, outcome.retry_after))
+    return _queue(
+        payload, phone_number_id, max_attempts, time.time() + backoff_delay(0, outcome.retry_after),
+        outcome.error_code or "retry", conversation_id, attempts=1, last_error=outcome.error_code,
+    )
+
+
+async def _dispatch_row(row: Dict[str, Any], post: PostFn) -> None:
+    bucket = get_bucket(row["phone_number_id"])
+    wait = bucket.take()
+    if wait > MAX_INLINE_WAIT_SECONDS:
+        bucket.give_back()
+        _reschedule(row["id"], time.time() + wait, row["attempts"], row["last_error"])
+        return
+    if wait:
+        await asyncio.sleep(wait)
+
+    outcome = await post(json.loads(row["payload"]), row["phone_number_id"])
+    row["attempts"] += 1
+    if outcome.status == SEND_OK:
+        WHATSAPP_OUTBOUND_EVENTS.inc("sent")
+        _finish(row, True, None, message_id=outcome.result)
+        logger.info("whatsapp_send_success_deferred", conversation_id=row["conversation_id"] or "unknown",
+                    message_id=outcome.result or "unknown", attempts=row["attempts"])
+        return
+
+    if outcome.status == SEND_FATAL or row["attempts"] >= row["max_attempts"]:
+        WHATSAPP_OUTBOUND_EVENTS.inc("failed")
+        _finish(row, False, outcome.error_code or outcome.result)
+        logger.error("whatsapp_send_failed_deferred", conversation_id=row["conversation_id"] or "unknown",
+                     error_code=outcome.error_code, attempts=row["attempts"], error=outcome.result)
+        return
+
+    delay = backoff_delay(row["attempts"] - 1, outcome.retry_after)
+    if outcome.throttled:
+        bucket.pause(delay)
+    WHATSAPP_OUTBOUND_EVENTS.inc("retry")
+    _reschedule(row["id"], time.time() + delay, row["attempts"], outcome.error_code)
+
+
+async def dispatch_due(post: Optional[PostFn] = None, limit: int = DISPATCH_BATCH_SIZE) -> int:
+    """
+    Un intento para la cabeza vencida de cada destinatario (en paralelo entre
+    destinatarios). Retorna cuántos envíos se intentaron.
+    """
+    if post is None:
+        from app.services.whatsapp_service import post_whatsapp_payload_once
+        post = post_whatsapp_payload_once
+
+    now = time.time()
+    rows = [row for row in _due_heads(now, limit) if _claim(row, now)]
+    if rows:
+        await asyncio.gather(*[_dispatch_row(row, post) for row in rows])
+    return len(rows)
+
+
+async def run_outbound_dispatch_loop(interval_seconds: float) -> None:
+    """Despacha los envíos pendientes cada interval_seconds."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await dispatch_due()
+        except Exception as e:
+            logger.error("Error despachando cola de salida WhatsApp", error=str(e))
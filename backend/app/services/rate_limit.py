@@ -5,6 +5,8 @@ No requiere Redis; adecuado para entornos single-instance.
 import time
 from typing import Dict, Tuple
 
+from app.services.metrics import RATE_LIMIT_REJECTIONS
+
 # key -> (window_start_epoch, count)
 _WINDOWS: Dict[str, Tuple[float, int]] = {}
 WINDOW_SECONDS = 60.0
@@ -25,7 +27,11 @@ def allow(key: str, limit_per_minute: int) -> bool:
     count += 1
     _WINDOWS[key] = (window_start, count)
 
-    return count <= limit_per_minute
+    if count > limit_per_minute:
+        # Ámbito = prefijo de la clave ("wa", "chat"), nunca el número
+        RATE_LIMIT_REJECTIONS.inc(key.partition(":")[0])
+        return False
+    return True
 
 
 def remaining(key: str, limit_per_minute: int) -> int:
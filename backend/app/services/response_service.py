@@ -5,7 +5,6 @@ Integra reglas existentes + OpenAI como fallback opcional.
 import time
 from typing import Optional, Tuple, List, Dict, Any
 from pathlib import Path
-import httpx
 
 from app.config import (
     OPENAI_ENABLED,
@@ -31,11 +30,18 @@ from app.services.context_service import (
     format_history_for_prompt
 )
 from app.logging_config import logger
+from app.services.metrics import OPENAI_REQUEST_SECONDS
 from app.services.llm_adapter import (
     get_llm_suggestion_sync,
     LLMTaskType
 )
 from app.rules.keywords import select_variant, SALUDO_VARIANTES
+from app.rules.decision_table import (
+    Route,
+    get_decision_table,
+    REPLY_MESSAGE_TYPE,
+    REPLY_GREETING
+)
 
 
 # Versión actual del prompt
@@ -64,6 +70,8 @@ async def generate_openai_response(
     Returns:
         Tuple[respuesta o None, latencia_ms]
     """
+    import httpx
+    from app.services.http_pool import get_async_http_client
     from app.config import OPENAI_MAX_INPUT_CHARS
 
     if not OPENAI_ENABLED or not OPENAI_API_KEY:
@@ -104,50 +112,52 @@ MENSAJE DEL CLIENTE:
 {message}"""
 
     try:
-        async with httpx.AsyncClient(timeout=OPENAI_TIMEOUT_SECONDS) as client:
+        client = get_async_http_client()
+        with OPENAI_REQUEST_SECONDS.time("response"):
             response = await client.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": OPENAI_MODEL,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": message}
-                ],
-                "max_tokens": OPENAI_MAX_OUTPUT_TOKENS,
-                "temperature": OPENAI_TEMPERATURE
-            }
+                "https://api.openai.com/v1/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {OPENAI_API_KEY}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": OPENAI_MODEL,
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": message}
+                    ],
+                    "max_tokens": OPENAI_MAX_OUTPUT_TOKENS,
+                    "temperature": OPENAI_TEMPERATURE
+                },
+                timeout=OPENAI_TIMEOUT_SECONDS
             )
 
-            latency_ms = int((time.time() - start_time) * 1000)
-
-            if response.status_code == 200:
-                data = response.json()
-                text = data["choices"][0]["message"]["content"].strip()
+        latency_ms = int((time.time() - start_time) * 1000)
 
-                # Validar que no mencione ser IA/bot
-                forbidden = ["soy un bot", "soy una ia", "asistente virtual", "soy un asistente"]
-                if any(f in text.lower() for f in forbidden):
-                    logger.warning("OpenAI generó texto prohibido", text=text[:100])
-                    return None, latency_ms
+        if response.status_code == 200:
+            data = response.json()
+            text = data["choices"][0]["message"]["content"].strip()
 
-                logger.info(
-                    "OpenAI respuesta generada",
-                    latency_ms=latency_ms,
-                    tokens=data.get("usage", {}).get("total_tokens", 0)
-                )
-                return text, latency_ms
-            else:
-                logger.error(
-                    "Error OpenAI",
-                    status=response.status_code,
-                    body=response.text[:200]
-                )
+            # Validar que no mencione ser IA/bot
+            forbidden = ["soy un bot", "soy una ia", "asistente virtual", "soy un asistente"]
+            if any(f in text.lower() for f in forbidden):
+                logger.warning("OpenAI generó texto prohibido", text=text[:100])
                 return None, latency_ms
 
+            logger.info(
+                "OpenAI respuesta generada",
+                latency_ms=latency_ms,
+                tokens=data.get("usage", {}).get("total_tokens", 0)
+            )
+            return text, latency_ms
+        else:
+            logger.error(
+                "Error OpenAI",
+                status=response.status_code,
+                body=response.text[:200]
+            )
+            return None, latency_ms
+
     except httpx.TimeoutException:
         latency_ms = int((time.time() - start_time) * 1000)
         logger.warning("OpenAI timeout", latency_ms=latency_ms)
@@ -327,63 +337,6 @@ def try_openai_enhancement(
     return rules_response, False
 
 
-def should_call_openai(intent: str, message_type: MessageType, text: str, context: dict, cache_hit: bool, conversation_id: Optional[str] = None, phone: Optional[str] = None) -> bool:
-    """
-    Determina si se debe llamar a OpenAI basado en reglas estrictas de gating.
-
-    Solo retorna True si:
-    - OPENAI_ENABLED == true
-    - message_type == BUSINESS_CONSULT
-    - intent NO está en FAQ simples
-    - cache_hit == false
-    - (si OPENAI_CANARY_ALLOWLIST está configurado) conversation_id o phone está en allowlist
-    """
-    from app.config import OPENAI_CANARY_ALLOWLIST
-    from app.logging_config import logger
-    
-    if not OPENAI_ENABLED:
-        return False
-
-    # OpenAI Canary: verificar allowlist si está configurado (P0-6)
-    if OPENAI_CANARY_ALLOWLIST:
-        is_allowed = False
-        if conversation_id and conversation_id in OPENAI_CANARY_ALLOWLIST:
-            is_allowed = True
-        elif phone:
-            phone_last4 = phone[-4:] if len(phone) >= 4 else phone
-            if phone_last4 in OPENAI_CANARY_ALLOWLIST:
-                is_allowed = True
-        
-        if not is_allowed:
-            logger.info(
-                "openai_canary_blocked",
-                conversation_id=conversation_id or "unknown",
-                phone=phone[-4:] if phone and len(phone) >= 4 else "unknown",
-                reason="not_in_allowlist"
-            )
-            return False
-
-    if message_type != MessageType.BUSINESS_CONSULT:
-        return False
-
-    faq_intents = {
-        "saludo", "despedida", "cierre", "envios", "pagos", "horarios",
-        "direccion", "ubicacion", "telefono", "contacto", "promociones"
-    }
-
-    if intent in faq_intents:
-        return False
-
-    if cache_hit:
-        return False
-
-    has_robust_deterministic = context.get("has_robust_deterministic", False)
-    if has_robust_deterministic:
-        return False
-
-    return True
-
-
 def _determine_llm_task_type(
     text: str,
     intent: str,
@@ -485,105 +438,6 @@ def _prepare_context_for_llm_adapter(
     }
 
 
-def ensure_next_step_question(text: str, intent: str, context: dict) -> str:
-    """
-    Post-procesador: Asegura que la respuesta termine con una pregunta cerrada.
-    """
-    if not text or intent in {"saludo", "despedida", "confirmacion_pago", "cierre"}:
-        return text
-
-    if "?" in text:
-        return text
-
-    intent_questions = {
-        "buscar_maquina_industrial": "¿Qué vas a fabricar: ropa, gorras, calzado o accesorios?",
-        "buscar_maquina_familiar": "¿La necesitas para uso en casa o para emprendimiento?",
-        "preguntar_precio": "¿Buscas máquina familiar (desde $400.000) o industrial (desde $1.230.000)?",
-        "envios": "¿A qué ciudad o municipio sería el envío?",
-        "pagos": "¿Prefieres Addi o Sistecrédito para financiamiento?",
-        "repuesto_accesorio": "¿Me confirmas la marca de tu máquina o me envías foto de la placa?",
-        "asesoria_negocio": "¿Vas a producir de forma ocasional o constante?",
-        "horario": "¿Necesitas más información sobre ubicación o contacto?",
-        "ubicacion": "¿Quieres que te guíe con direcciones o prefieres envío?",
-        "catalogo": "¿Te intereso alguna máquina específica o necesitas recomendaciones?",
-        "info_general": "¿Necesitas información sobre máquinas, repuestos o servicio técnico?"
-    }
-
-    question = intent_questions.get(intent)
-    if question:
-        if text.endswith(".") or text.endswith("!"):
-            return f"{text} {question}"
-        else:
-            return f"{text}. {question}"
-
-    return text
-
-
-def _generate_fallback_response(text: str, context: dict, intent_result: dict, conversation_id: Optional[str] = None) -> str:
-    """Genera respuesta fallback."""
-    intent = intent_result.get("intent", "")
-    confidence = intent_result.get("confidence", 0)
-
-    if confidence > 0.7:
-        if intent == "buscar_maquina_industrial":
-            return "Tenemos máquinas industriales desde $1.230.000. ¿Qué vas a fabricar: ropa, gorras, calzado o accesorios?"
-        elif intent == "buscar_maquina_familiar":
-            return "Tenemos máquinas familiares desde $400.000. ¿La necesitas para uso en casa o para emprendimiento?"
-
-    # Selección determinística de variante de saludo
-    variant_key = conversation_id if conversation_id else "default"
-    return select_variant(variant_key, SALUDO_VARIANTES)
-
-
-def _build_decision_path(
-    business_related: bool,
-    cache_checked: bool,
-    asset_selected: bool,
-    openai_called: bool,
-    handoff_triggered: bool,
-    question_appended: bool = False,
-    message_type: str = None,
-    openai_block_reason: str = None
-) -> str:
-    """Construye string de decision path para trazabilidad."""
-    path_parts = []
-
-    if message_type:
-        path_parts.append(f"msg_{message_type}")
-
-    if business_related:
-        path_parts.append("business_ok")
-    else:
-        path_parts.append("business_rejected")
-        return "->".join(path_parts)
-
-    if cache_checked:
-        path_parts.append("cache_hit")
-        return "->".join(path_parts)
-
-    path_parts.append("cache_miss")
-    
-    if asset_selected:
-        path_parts.append("asset_selected")
-    else:
-        path_parts.append("asset_skipped")
-
-    if openai_called:
-        path_parts.append("openai_called_fallback")
-    elif openai_block_reason:
-        path_parts.append(f"openai_{openai_block_reason}")
-    else:
-        path_parts.append("openai_skipped")
-
-    if handoff_triggered:
-        path_parts.append("handoff_triggered")
-
-    if question_appended:
-        path_parts.append("question_appended")
-    
-    return "->".join(path_parts)
-
-
 def build_response(
     text: str,
     conversation_id: str,
@@ -615,7 +469,7 @@ def build_response(
     from app.services.trace_service import trace_interaction
     from app.services.context_service import extract_context_from_history
     from app.services.intent_service import analyze_intent
-    from app.services.asset_service import select_catalog_asset
+    from app.services.asset_service import select_catalog_asset, get_asset_url
     from app.services.handoff_service import process_handoff
     from app.models.database import (
         create_or_update_conversation,
@@ -655,23 +509,22 @@ def build_response(
             tracer.raw_text = text
             tracer.normalized_text = text.lower().strip()
 
-            # Paso 1: Clasificar tipo de mensaje
-            message_type = classify_message_type(text)
-            tracer.message_type = message_type.value  # Guardar en trazas
-
-            # Paso 2: Guardrails - ¿Es del negocio?
-            is_business, reason = is_business_related(text)
-            tracer.business_related = is_business
+            with tracer.span("guardrail"):
+                # Paso 1: Clasificar tipo de mensaje
+                message_type = classify_message_type(text)
+                tracer.message_type = message_type.value  # Guardar en trazas
 
-            # Respuestas especiales para tipos específicos de mensaje
-            if message_type == MessageType.EMPTY_OR_GIBBERISH:
-                result["text"] = get_response_for_message_type(message_type, text, conversation_id)
-                tracer.decision_path = "->gibberish_handled"
-                return result
+                # Paso 2: Guardrails - ¿Es del negocio?
+                is_business, reason, _, _ = is_business_related(text)
+                tracer.business_related = is_business
 
-            if message_type == MessageType.NON_BUSINESS:
+            # Tabla de decisión (se toma una vez: un reemplazo en caliente no afecta
+            # al mensaje en curso). Respuestas especiales por tipo de mensaje
+            decision_table = get_decision_table()
+            route = decision_table.route(message_type)
+            if route.reply == REPLY_MESSAGE_TYPE:
                 result["text"] = get_response_for_message_type(message_type, text, conversation_id)
-                tracer.decision_path = "->non_business_handled"
+                tracer.decision_path = route.decision_path
                 return result
     
             if not is_business:
@@ -680,14 +533,18 @@ def build_response(
                 return result
     
             # Paso 2: Intent y contexto
-            intent_result = analyze_intent(text, history)
+            with tracer.span("intent"):
+                intent_result = analyze_intent(text, history)
             tracer.intent = intent_result.get("intent")
-            context = extract_context_from_history(history)
+            with tracer.span("context"):
+                context = extract_context_from_history(history)
+            route = decision_table.route(message_type, tracer.intent, context.get("etapa_funnel"))
 
             # Paso 3: Verificar cache para FAQs (solo si no es saludo)
             cache_checked = False
-            if tracer.intent not in ["saludo", "cierre", "despedida", "info_general"] and is_cacheable_query(text, tracer.intent):
-                cached = get_cached_response(text)
+            if route.cacheable and is_cacheable_query(text, tracer.intent):
+                with tracer.span("cache"):
+                    cached = get_cached_response(text)
                 if cached:
                     tracer.cache_hit = True
                     result["text"] = cached
@@ -696,13 +553,14 @@ def build_response(
             # Paso 4: Seleccionar asset del catálogo (SOLO si intención lo permite)
             asset_selected = False
             handoff_required = False  # Inicializar
-            if _should_select_asset(tracer.intent, text, context):
-                catalog_item, handoff_required = select_catalog_asset(text, context)
+            if route.asset_allowed and _has_product_signals(text, context):
+                with tracer.span("asset"):
+                    catalog_item, handoff_required = select_catalog_asset(text, context)
                 if catalog_item:
                     tracer.selected_asset_id = catalog_item.get("image_id")
                     result["asset"] = {
                         "image_id": catalog_item["image_id"],
-                        "asset_url": f"/api/assets/{catalog_item['image_id']}",
+                        "asset_url": get_asset_url(catalog_item["image_id"], size="medium"),
                         "type": "image"
                     }
                     asset_selected = True
@@ -711,13 +569,14 @@ def build_response(
             handoff_triggered = False
             if handoff_required:
                 # Procesar handoff
-                handoff_success, notification_text, team = process_handoff(
-                    conversation_id=conversation_id,
-                    text=text,
-                    context=context,
-                    customer_phone=customer_number,
-                    history=history
-                )
+                with tracer.span("handoff"):
+                    handoff_success, notification_text, team = process_handoff(
+                        conversation_id=conversation_id,
+                        text=text,
+                        context=context,
+                        customer_phone=customer_number,
+                        history=history
+                    )
                 if handoff_success:
                     tracer.routed_team = team.value if team else None
                     result["routed_notification"] = {
@@ -729,7 +588,7 @@ def build_response(
             # Paso 6: Generar respuesta de texto
             if not result["text"]:
                 # Lógica especial para saludos
-                if tracer.intent == "saludo":
+                if route.reply == REPLY_GREETING:
                     # Selección determinística de variante de saludo por conversation_id
                     result["text"] = select_variant(conversation_id, SALUDO_VARIANTES)
                 else:
@@ -741,7 +600,8 @@ def build_response(
                         context=context,
                         cache_hit=tracer.cache_hit,
                         conversation_id=conversation_id,
-                        phone=phone_from
+                        phone=customer_number,
+                        route=route
                     )
 
                     if can_call_openai:
@@ -785,19 +645,20 @@ def build_response(
                         reason_for_llm_use = f"{task_type}:{tracer.intent}:{message_type.value}"
                         
                         # Llamar LLM Adapter (nuevo sistema) con límites
-                        suggested_reply, adapter_metadata = get_llm_suggestion_sync(
-                            task_type=task_type,
-                            user_message=text,
-                            context=contexto_estructurado,
-                            conversation_history=history_formatted,
-                            conversation_id=conversation_id,
-                            reason_for_llm_use=reason_for_llm_use
-                        )
+                        with tracer.span("llm"):
+                            suggested_reply, adapter_metadata = get_llm_suggestion_sync(
+                                task_type=task_type,
+                                user_message=text,
+                                context=contexto_estructurado,
+                                conversation_history=history_formatted,
+                                conversation_id=conversation_id,
+                                reason_for_llm_use=reason_for_llm_use
+                            )
 
                         # Persistir metadatos de OpenAI Canary (P0-6) - incluso si falla
                         from app.config import OPENAI_CANARY_ALLOWLIST
                         if OPENAI_CANARY_ALLOWLIST:
-                            is_allowed = conversation_id in OPENAI_CANARY_ALLOWLIST or (phone_from and phone_from[-4:] in OPENAI_CANARY_ALLOWLIST)
+                            is_allowed = conversation_id in OPENAI_CANARY_ALLOWLIST or (customer_number and customer_number[-4:] in OPENAI_CANARY_ALLOWLIST)
                             tracer.openai_canary_allowed = 1 if is_allowed else 0
                         else:
                             tracer.openai_canary_allowed = 1  # Si no hay allowlist, todos están permitidos
@@ -825,7 +686,7 @@ def build_response(
                             # Persistir metadatos de OpenAI Canary (P0-6)
                             from app.config import OPENAI_CANARY_ALLOWLIST
                             if OPENAI_CANARY_ALLOWLIST:
-                                is_allowed = conversation_id in OPENAI_CANARY_ALLOWLIST or (phone_from and phone_from[-4:] in OPENAI_CANARY_ALLOWLIST)
+                                is_allowed = conversation_id in OPENAI_CANARY_ALLOWLIST or (customer_number and customer_number[-4:] in OPENAI_CANARY_ALLOWLIST)
                                 tracer.openai_canary_allowed = 1 if is_allowed else 0
                             else:
                                 tracer.openai_canary_allowed = 1  # Si no hay allowlist, todos están permitidos
@@ -870,10 +731,8 @@ def build_response(
                     else:
                         # Determinar por qué se bloqueó OpenAI
                         block_reason = "unknown"
-                        if message_type != MessageType.BUSINESS_CONSULT:
-                            block_reason = f"blocked_{message_type.value}"
-                        elif tracer.intent in ["envios", "pagos", "horarios", "direccion", "ubicacion"]:
-                            block_reason = "blocked_faq"
+                        if route.llm_block:
+                            block_reason = route.llm_block
                         elif tracer.cache_hit:
                             block_reason = "blocked_cache_hit"
                         elif context.get("has_robust_deterministic"):
@@ -893,7 +752,8 @@ def build_response(
 
             # Paso 8: Post-procesar para asegurar pregunta de siguiente paso
             original_text = result["text"]
-            result["text"] = ensure_next_step_question(result["text"], tracer.intent, context)
+            with tracer.span("postprocess"):
+                result["text"] = ensure_next_step_question(result["text"], tracer.intent, context, route=route)
             question_appended = original_text != result["text"]
 
             # Paso 9: Calcular decision_path para trazabilidad
@@ -908,26 +768,17 @@ def build_response(
 
             # Guardar respuesta de Luisa
             if result["text"]:
-                save_message(conversation_id, result["text"], "luisa")
+                with tracer.span("persist"):
+                    save_message(conversation_id, result["text"], "luisa")
     
     return result
 
 
-def _should_select_asset(intent: str, text: str, context: dict) -> bool:
+def _has_product_signals(text: str, context: dict) -> bool:
     """
-    Determina si debe seleccionar asset basado en intención y señales de producto.
+    Señales de producto en texto o contexto (la intención la filtra la tabla de
+    decisión: Route.asset_allowed).
     """
-    # Intenciones que PERMITEN selección de assets
-    asset_allowed_intents = {
-        "venta_maquina", "asesoria_negocio", "repuesto_accesorio",
-        "soporte_tecnico", "garantia", "instalacion_servicio",
-        "comparacion_maquinas", "buscar_maquina_familiar", "buscar_maquina_industrial",
-        "buscar_fileteadora", "solicitar_fotos", "preguntar_precio"
-    }
-
-    if intent not in asset_allowed_intents:
-        return False
-
     # Verificar señales de producto en texto o contexto
     from app.rules.keywords import (
         contains_any, MAQUINA_FAMILIAR, MAQUINA_INDUSTRIAL, FILETEADORA,
@@ -958,36 +809,28 @@ def _should_select_asset(intent: str, text: str, context: dict) -> bool:
     return has_product_signals or has_brand_signals or has_context_signals
 
 
-def _generate_fallback_response(text: str, context: dict, intent_result: dict, conversation_id: Optional[str] = None) -> str:
-    """
-    Genera respuesta fallback cuando no hay respuesta específica.
-    """
-    intent = intent_result.get("intent", "")
-    confidence = intent_result.get("confidence", 0)
-
-    # Si hay confianza alta en el intent, usar respuesta específica
-    if confidence > 0.7:
-        if intent == "buscar_maquina_industrial":
-            return "Tenemos máquinas industriales desde $1.230.000. ¿Qué vas a fabricar: ropa, gorras, calzado o accesorios?"
-        elif intent == "buscar_maquina_familiar":
-            return "Tenemos máquinas familiares desde $400.000. ¿La necesitas para uso en casa o para emprendimiento?"
-
-    # Respuesta genérica con selección determinística de variante de saludo
-    variant_key = conversation_id if conversation_id else "default"
-    return select_variant(variant_key, SALUDO_VARIANTES)
-
-
-def should_call_openai(intent: str, message_type: MessageType, text: str, context: dict, cache_hit: bool, conversation_id: Optional[str] = None, phone: Optional[str] = None) -> bool:
+def should_call_openai(
+    intent: str,
+    message_type: MessageType,
+    text: str,
+    context: dict,
+    cache_hit: bool,
+    conversation_id: Optional[str] = None,
+    phone: Optional[str] = None,
+    route: Optional[Route] = None
+) -> bool:
     """
     Determina si se debe llamar a OpenAI basado en reglas estrictas de gating.
 
     Solo retorna True si:
     - OPENAI_ENABLED == true
-    - message_type == BUSINESS_CONSULT
-    - intent NO está en FAQ simples
+    - la tabla de decisión no bloquea el LLM (message_type == BUSINESS_CONSULT
+      y intent NO está en FAQ simples)
     - cache_hit == false
     - y no hay respuesta determinística robusta
     - (si OPENAI_CANARY_ALLOWLIST está configurado) conversation_id o phone está en allowlist
+
+    route: la ya resuelta por build_response (si no, se busca en la tabla activa)
     """
     from app.config import OPENAI_CANARY_ALLOWLIST
     from app.logging_config import logger
@@ -1015,17 +858,10 @@ def should_call_openai(intent: str, message_type: MessageType, text: str, contex
             )
             return False
 
-    # Solo para consultas complejas del negocio
-    if message_type != MessageType.BUSINESS_CONSULT:
-        return False
-
-    # NO llamar para FAQ simples (incluso si son BUSINESS_CONSULT)
-    faq_intents = {
-        "saludo", "despedida", "cierre", "envios", "pagos", "horarios",
-        "direccion", "ubicacion", "telefono", "contacto", "promociones"
-    }
-
-    if intent in faq_intents:
+    # Solo consultas complejas del negocio; nunca FAQ simples (incluso si son BUSINESS_CONSULT)
+    if route is None:
+        route = get_decision_table().route(message_type, intent, context.get("etapa_funnel"))
+    if route.llm_block:
         return False
 
     # NO llamar si ya tenemos respuesta del cache
@@ -1042,56 +878,21 @@ def should_call_openai(intent: str, message_type: MessageType, text: str, contex
     return True
 
 
-def ensure_next_step_question(text: str, intent: str, context: dict) -> str:
+def ensure_next_step_question(text: str, intent: str, context: dict, route: Optional[Route] = None) -> str:
     """
     Post-procesador: Asegura que la respuesta termine con una pregunta cerrada
     para mantener la conversación activa.
-    """
-    if not text:
-        return text
 
-    # NO modificar estos intents
-    skip_intents = {"saludo", "despedida", "confirmacion_pago", "cierre"}
-    if intent in skip_intents:
-        return text
-
-    # Si ya tiene pregunta, NO modificar
-    if "?" in text:
+    La pregunta de cada intent está en la tabla de decisión (NEXT_STEP_QUESTIONS;
+    saludo, despedida, confirmacion_pago y cierre no llevan).
+    """
+    # Si no hay texto o ya tiene pregunta, NO modificar
+    if not text or "?" in text:
         return text
 
-    # Mapeo de intents a preguntas cerradas
-    intent_questions = {
-        # Búsqueda de máquinas
-        "buscar_maquina_industrial": "¿Qué vas a fabricar: ropa, gorras, calzado o accesorios?",
-        "buscar_maquina_familiar": "¿La necesitas para uso en casa o para emprendimiento?",
-        "buscar_fileteadora": "¿Buscas fileteadora familiar o industrial?",
-
-        # Información comercial
-        "preguntar_precio": "¿Buscas máquina familiar (desde $400.000) o industrial (desde $1.230.000)?",
-        "envios": "¿A qué ciudad o municipio sería el envío?",
-        "pagos": "¿Prefieres Addi o Sistecrédito para financiamiento?",
-        "garantia": "¿Es garantía por defecto de fábrica o por reparación?",
-
-        # Servicio técnico
-        "repuesto_accesorio": "¿Me confirmas la marca de tu máquina o me envías foto de la placa?",
-        "soporte_tecnico": "¿Es problema con costura, motor o alimentación?",
-        "instalacion_servicio": "¿Prefieres instalación en tu taller o domicilio?",
-
-        # Asesoría
-        "asesoria_negocio": "¿Vas a producir de forma ocasional o constante?",
-        "comparacion_maquinas": "¿Buscas comparar precios, características o marcas específicas?",
-
-        # Información general
-        "horario": "¿Necesitas más información sobre ubicación o contacto?",
-        "ubicacion": "¿Quieres que te guíe con direcciones o prefieres envío?",
-        "catalogo": "¿Te intereso alguna máquina específica o necesitas recomendaciones?",
-
-        # Otros informativos
-        "info_general": "¿Necesitas información sobre máquinas, repuestos o servicio técnico?"
-    }
-
-    # Buscar pregunta específica para este intent
-    question = intent_questions.get(intent)
+    if route is None:
+        route = get_decision_table().route(None, intent, (context or {}).get("etapa_funnel"))
+    question = route.next_step_question
 
     if question:
         # Añadir la pregunta al final
@@ -1100,8 +901,7 @@ def ensure_next_step_question(text: str, intent: str, context: dict) -> str:
         else:
             return f"{text}. {question}"
 
-    # Si no hay pregunta específica, usar genérica pero solo para intents informativos
-    # Evitar frases prohibidas como "cuéntame más" o "qué necesitas"
+    # Sin pregunta específica: evitar frases genéricas prohibidas como "cuéntame más"
     return text
 
 
@@ -3,14 +3,28 @@ Sales Dialogue Manager para LUISA.
 Gestiona el estado conversacional y genera respuestas comerciales humanas.
 """
 import re
+import time
 import unicodedata
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 from app.services.intent_service import analyze_intent
 from app.services.context_service import extract_context_from_history
 from app.services.asset_service import select_catalog_asset
 from app.services.sales_playbook import craft_reply, pick_one_question, handle_objection
+from app.services.dialogue_fsm import (
+    Feature,
+    TurnFeatures,
+    TRIAGE_TRANSITIONS,
+    TRIAGE_GREETING,
+    OBJECTION,
+    PLAYBOOK,
+    guard_mask,
+    transition_for,
+    record_turn
+)
+from app.rules.locations import extract_location
+from app.rules.normalization import fold_text
 from app.logging_config import logger
 
 
@@ -23,6 +37,9 @@ def next_action(
 ) -> Dict[str, Any]:
     """
     Determina la siguiente acción comercial basada en el estado conversacional.
+
+    Primero los clasificadores de triage, objeciones y playbook; si ninguno
+    responde, la transición sale de la máquina de estados (dialogue_fsm.py).
     
     Args:
         user_text: Texto del usuario
@@ -39,6 +56,21 @@ def next_action(
             "decision_path": str
         }
     """
+    start = time.perf_counter()
+    stage = state.get("stage", "discovery")
+    transition, result = _next_transition(user_text, intent, state, context, stage)
+    record_turn(stage, transition, time.perf_counter() - start)
+    return result
+
+
+def _next_transition(
+    user_text: str,
+    intent: str,
+    state: dict,
+    context: Dict[str, Any],
+    stage: str
+) -> Tuple[str, Dict[str, Any]]:
+    """(transición, resultado) del turno."""
     from app.services.triage_service import (
         classify_triage_intent,
         generate_triage_greeting,
@@ -46,10 +78,7 @@ def next_action(
     )
     
     text_lower = user_text.lower().strip()
-    stage = state.get("stage", "discovery")
-    slots = state.get("slots", {})
-    last_question = state.get("last_question")
-    asked_questions = state.get("asked_questions", {})
+    features = TurnFeatures(text_lower)
     
     # TRIAGE: Clasificar intención específica
     triage_intent, triage_confidence, is_ambiguous = classify_triage_intent(user_text)
@@ -57,23 +86,17 @@ def next_action(
     # Si está en stage triage, parsear respuesta del usuario
     if stage == "triage":
         parsed_intent = parse_triage_response(user_text)
-        if parsed_intent:
+        transition = TRIAGE_TRANSITIONS.get(parsed_intent)
+        if transition:
             # Avanzar al stage correcto según intent parseado
-            if parsed_intent == "buy_machine":
-                return _handle_discovery(user_text, parsed_intent, text_lower, state, context)
-            elif parsed_intent == "spare_parts":
-                return _handle_spare_parts(user_text, text_lower, state)
-            elif parsed_intent == "tech_support":
-                return _handle_support_request(user_text, state)
-            elif parsed_intent == "business_advice":
-                return _handle_business_advice(user_text, text_lower, state, context)
+            return transition, _HANDLERS[transition](user_text, parsed_intent, features, state, context)
     
     # Si el mensaje es ambiguo y NO hay estado previo, hacer triage
     if is_ambiguous and stage == "discovery" and not state.get("last_intent"):
         ambiguous_turns = state.get("ambiguous_turns", 0)
         # Usar phone_from del state como identificador determinístico si está disponible
         conversation_id = state.get("conversation_id") or state.get("phone_from", "")
-        return {
+        return TRIAGE_GREETING, {
             "reply_text": generate_triage_greeting(state, ambiguous_turns, conversation_id),
             "reply_assets": None,
             "state_updates": {
@@ -89,7 +112,7 @@ def next_action(
     # Verificar objeciones primero
     objection_response = handle_objection(text_lower, state)
     if objection_response:
-        return {
+        return OBJECTION, {
             "reply_text": objection_response["reply_text"],
             "reply_assets": None,
             "state_updates": {
@@ -103,7 +126,7 @@ def next_action(
     if not is_ambiguous and triage_confidence >= 0.5:
         playbook_result = craft_reply(triage_intent, state, user_text, context)
         if playbook_result:
-            return {
+            return PLAYBOOK, {
                 "reply_text": playbook_result["reply_text"],
                 "reply_assets": None,
                 "state_updates": {
@@ -113,89 +136,15 @@ def next_action(
                 "decision_path": playbook_result.get("decision_path", "playbook_handled")
             }
     
-    # Detectar cambio de intención
-    intent_changed = _detect_intent_change(intent, text_lower, state)
-    
-    # FIX P0: Si el usuario pregunta "fotos" o similar, cambiar a stage photos
-    if _is_photo_request(text_lower, intent):
-        return _handle_photo_request(user_text, state, context, slots)
-    
-    # FIX P0: Si el usuario pregunta garantía/repuestos, responder directamente
-    if _is_support_request(text_lower, intent):
-        return _handle_support_request(user_text, state)
-    
-    # Si cambió de intención, responder la nueva intención primero
-    if intent_changed and stage != "discovery":
-        return _handle_intent_change(user_text, intent, text_lower, state, context)
-    
-    # Flujo normal según stage
-    if stage == "discovery":
-        return _handle_discovery(user_text, intent, text_lower, state, context)
-    elif stage == "pricing":
-        return _handle_pricing(user_text, intent, text_lower, state, context)
-    elif stage == "visit":
-        return _handle_visit(user_text, intent, text_lower, state, context)
-    elif stage == "shipping":
-        return _handle_shipping(user_text, intent, text_lower, state, context)
-    elif stage == "photos":
-        return _handle_photos(user_text, intent, text_lower, state, context)
-    elif stage == "support":
-        return _handle_support(user_text, intent, text_lower, state)
-    elif stage == "handoff_schedule":
-        return _handle_handoff_schedule(user_text, intent, text_lower, state)
-    elif stage == "triage":
-        # Contar turnos ambiguos consecutivos
-        ambiguous_turns = state.get("ambiguous_turns", 0) + 1
-        # Usar phone_from del state como identificador determinístico si está disponible
-        conversation_id = state.get("conversation_id") or state.get("phone_from", "")
-        return {
-            "reply_text": generate_triage_greeting(state, ambiguous_turns, conversation_id),
-            "reply_assets": None,
-            "state_updates": {
-                "last_question": "triage_menu",
-                "ambiguous_turns": ambiguous_turns
-            },
-            "decision_path": "triage_repeat"
-        }
-    else:
-        return _handle_default(user_text, intent, text_lower, state)
-
-
-def _is_photo_request(text: str, intent: str) -> bool:
-    """Detecta si el usuario está pidiendo fotos."""
-    photo_keywords = ["foto", "fotos", "imagen", "imágenes", "catálogo", "catalogo", "ver", "muestra"]
-    return any(kw in text for kw in photo_keywords) or intent in ["preguntar_catalogo", "ver_productos"]
-
-
-def _is_support_request(text: str, intent: str) -> bool:
-    """Detecta si es pregunta de soporte (garantía, repuestos)."""
-    support_keywords = ["garantía", "garantia", "repuesto", "repuestos", "reparación", "reparacion", "arreglo"]
-    return any(kw in text for kw in support_keywords) or intent in ["repuestos", "garantia"]
+    # Máquina de estados: fotos y soporte se atienden en cualquier etapa; un
+    # cambio de intención (fuera de discovery) se responde antes de seguir el flujo
+    transition = transition_for(stage, guard_mask(features, intent, state.get("last_intent")))
+    return transition, _HANDLERS[transition](user_text, intent, features, state, context)
 
 
-def _detect_intent_change(intent: str, text_lower: str, state: dict) -> bool:
-    """Detecta si el usuario cambió de intención."""
-    last_intent = state.get("last_intent")
-    if not last_intent:
-        return False
-    
-    # Intenciones que indican cambio de tema
-    new_topic_intents = ["preguntar_catalogo", "preguntar_precio", "preguntar_garantia", 
-                         "preguntar_repuestos", "preguntar_horarios", "preguntar_direccion"]
-    
-    if intent in new_topic_intents and intent != last_intent:
-        return True
-    
-    # Detectar keywords de cambio
-    change_keywords = ["foto", "precio", "garantía", "repuesto", "horario", "dirección"]
-    if any(kw in text_lower for kw in change_keywords):
-        return True
-    
-    return False
-
-
-def _handle_photo_request(user_text: str, state: dict, context: dict, slots: dict) -> Dict[str, Any]:
+def _handle_photo_request(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja solicitud de fotos."""
+    slots = state.get("slots", {})
     product_type = slots.get("product_type") or context.get("tipo_maquina")
     use_case = slots.get("use_case") or context.get("uso")
     
@@ -239,16 +188,14 @@ def _handle_photo_request(user_text: str, state: dict, context: dict, slots: dic
     }
 
 
-def _handle_support_request(user_text: str, state: dict) -> Dict[str, Any]:
+def _handle_support_request(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja preguntas de soporte (garantía, repuestos)."""
-    text_lower = user_text.lower()
-    
-    if "garantía" in text_lower or "garantia" in text_lower:
+    if features.has(Feature.GARANTIA):
         reply = (
             "Todas nuestras máquinas tienen garantía de 3 meses en partes y mano de obra. "
             "Si algo falla, la revisamos sin costo. ¿Qué máquina tienes o estás pensando comprar?"
         )
-    elif "repuesto" in text_lower:
+    elif features.has(Feature.REPUESTO):
         reply = (
             "Sí, tenemos repuestos para las marcas que vendemos. "
             "¿Me confirmas la marca o me envías foto de la placa? Así te doy precio exacto."
@@ -258,7 +205,7 @@ def _handle_support_request(user_text: str, state: dict) -> Dict[str, Any]:
     
     state_updates = {
         "stage": "support",
-        "last_intent": "repuestos" if "repuesto" in text_lower else "garantia"
+        "last_intent": "repuestos" if features.has(Feature.REPUESTO) else "garantia"
     }
     
     return {
@@ -269,49 +216,40 @@ def _handle_support_request(user_text: str, state: dict) -> Dict[str, Any]:
     }
 
 
-def _handle_intent_change(user_text: str, intent: str, text_lower: str, state: dict, context: dict) -> Dict[str, Any]:
-    """Maneja cambio de intención en medio de otra conversación."""
-    # Responder la nueva intención primero
-    if _is_photo_request(text_lower, intent):
-        return _handle_photo_request(user_text, state, context, state.get("slots", {}))
-    elif "precio" in text_lower or intent == "preguntar_precio":
-        return _handle_pricing(user_text, intent, text_lower, state, context)
-    elif "horario" in text_lower or intent == "preguntar_horarios":
-        reply = (
-            "Nuestro horario:\n\n"
-            "📍 Calle 34 #1-30, Montería\n"
-            "🕘 Lunes a viernes: 9am-6pm\n"
-            "🕘 Sábados: 9am-2pm\n\n"
-        )
-        # Retomar hilo anterior si hay uno pendiente
-        pending = state.get("pending_question")
-        if pending == "city":
-            city = state.get("slots", {}).get("city")
-            if city and city.lower() != "montería" and city.lower() != "monteria":
-                reply += f"Veo que mencionaste {city}. ¿Vas a venir a Montería a la tienda o prefieres que te coordinemos envío?"
-            else:
-                reply += "¿Quieres pasar o prefieres envío a domicilio?"
+def _handle_intent_change_hours(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
+    """Cambio de intención a horarios en medio de otra conversación (responde y retoma el hilo)."""
+    reply = (
+        "Nuestro horario:\n\n"
+        "📍 Calle 34 #1-30, Montería\n"
+        "🕘 Lunes a viernes: 9am-6pm\n"
+        "🕘 Sábados: 9am-2pm\n\n"
+    )
+    # Retomar hilo anterior si hay uno pendiente
+    pending = state.get("pending_question")
+    if pending == "city":
+        city = state.get("slots", {}).get("city")
+        if city and city.lower() != "montería" and city.lower() != "monteria":
+            reply += f"Veo que mencionaste {city}. ¿Vas a venir a Montería a la tienda o prefieres que te coordinemos envío?"
         else:
             reply += "¿Quieres pasar o prefieres envío a domicilio?"
-        
-        return {
-            "reply_text": reply,
-            "reply_assets": None,
-            "state_updates": {"last_intent": intent, "stage": "visit"},
-            "decision_path": "intent_change_handled"
-        }
     else:
-        # Default: responder y retomar
-        return _handle_default(user_text, intent, text_lower, state)
+        reply += "¿Quieres pasar o prefieres envío a domicilio?"
+    
+    return {
+        "reply_text": reply,
+        "reply_assets": None,
+        "state_updates": {"last_intent": intent, "stage": "visit"},
+        "decision_path": "intent_change_handled"
+    }
 
 
-def _handle_discovery(user_text: str, intent: str, text_lower: str, state: dict, context: dict) -> Dict[str, Any]:
+def _handle_discovery(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja etapa de descubrimiento (identificar necesidad)."""
     slots = state.get("slots", {})
     asked_questions = state.get("asked_questions", {})
     
     # Detectar tipo de máquina
-    if "industrial" in text_lower:
+    if features.has(Feature.INDUSTRIAL):
         slots["product_type"] = "industrial"
         state_updates = {
             "slots": slots,
@@ -325,7 +263,7 @@ def _handle_discovery(user_text: str, intent: str, text_lower: str, state: dict,
             "decision_path": "discovery_industrial"
         }
     
-    if "familiar" in text_lower or "casa" in text_lower or "hogar" in text_lower:
+    if features.has(Feature.FAMILIAR):
         slots["product_type"] = "familiar"
         state_updates = {
             "slots": slots,
@@ -353,33 +291,21 @@ def _handle_discovery(user_text: str, intent: str, text_lower: str, state: dict,
                 "decision_path": "discovery_ask_type"
             }
     
-    return _handle_default(user_text, intent, text_lower, state)
+    return _handle_default(user_text, intent, features, state, context)
 
 
-def _handle_pricing(user_text: str, intent: str, text_lower: str, state: dict, context: dict) -> Dict[str, Any]:
+def _handle_pricing(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja etapa de precios."""
     slots = state.get("slots", {})
     product_type = slots.get("product_type") or context.get("tipo_maquina")
     
     # Detectar uso
-    use_cases = {
-        "ropa": ["ropa", "vestido", "camisa", "pantalón"],
-        "gorras": ["gorra", "gorras", "sombrero"],
-        "calzado": ["zapato", "zapatos", "calzado"],
-        "accesorios": ["accesorio", "accesorios", "bolso", "mochila"]
-    }
-    
-    detected_use = None
-    for use, keywords in use_cases.items():
-        if any(kw in text_lower for kw in keywords):
-            detected_use = use
-            break
-    
+    detected_use = features.use_case()
     if detected_use:
         slots["use_case"] = detected_use
     
     # Detectar cantidad
-    qty_match = re.search(r'(\d+)\s*(unidades|piezas|pares|máquinas)', text_lower)
+    qty_match = _QTY_RE.search(features.text)
     if qty_match:
         slots["qty"] = qty_match.group(1)
     
@@ -439,18 +365,13 @@ def _handle_pricing(user_text: str, intent: str, text_lower: str, state: dict, c
     }
 
 
-def _handle_visit(user_text: str, intent: str, text_lower: str, state: dict, context: dict) -> Dict[str, Any]:
+def _handle_visit(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja etapa de visita a tienda. SIN handoff, solo cerrar visita."""
     slots = state.get("slots", {})
     city = slots.get("city") or context.get("ciudad")
     
     # Detectar si pregunta por visita/ubicación/dirección
-    visit_keywords = ["puedo visitar", "donde queda", "dónde queda", "ubicación", "ubicacion", 
-                      "dirección", "direccion", "puedo pasar", "quiero pasar", "visitar"]
-    
-    is_visit_request = any(kw in text_lower for kw in visit_keywords)
-    
-    if is_visit_request:
+    if features.has(Feature.VISIT):
         # Responder con dirección + horarios (datos exactos)
         reply = (
             "Estamos en Calle 34 #1-30, Montería.\n\n"
@@ -480,14 +401,14 @@ def _handle_visit(user_text: str, intent: str, text_lower: str, state: dict, con
         }
     
     # Si ya está en stage visit y responde sobre cuándo venir
-    if "hoy" in text_lower or "mañana" in text_lower or "mañana" in text_lower or "lunes" in text_lower or "martes" in text_lower:
-        day = "hoy" if "hoy" in text_lower else ("mañana" if "mañana" in text_lower or "mañana" in text_lower else "pronto")
+    if features.has(Feature.HOY) or features.has(Feature.MANANA) or features.has(Feature.WEEKDAY):
+        day = "hoy" if features.has(Feature.HOY) else ("mañana" if features.has(Feature.MANANA) else "pronto")
         
         # Si ya tiene día, pedir franja horaria
         if slots.get("visit_day"):
-            if "mañana" in text_lower or "mañana" in text_lower:
+            if features.has(Feature.MANANA):
                 time_slot = "mañana"
-            elif "tarde" in text_lower:
+            elif features.has(Feature.TARDE):
                 time_slot = "tarde"
             else:
                 time_slot = None
@@ -544,31 +465,14 @@ def _handle_visit(user_text: str, intent: str, text_lower: str, state: dict, con
 
 def _normalize_city(city: str) -> str:
     """Normaliza nombre de ciudad (lower, sin tildes)."""
-    import unicodedata
-    city_lower = city.lower().strip()
-    # Remover tildes
-    city_norm = ''.join(c for c in unicodedata.normalize('NFD', city_lower) 
-                       if unicodedata.category(c) != 'Mn')
-    return city_norm
+    return fold_text(city.strip())
 
 
 def _extract_city_from_text(text: str) -> Optional[str]:
-    """Extrae nombre de ciudad del texto (ciudades comunes de Colombia)."""
-    # Lista de ciudades comunes (puede expandirse)
-    cities = [
-        "montería", "monteria", "bogotá", "bogota", "medellín", "medellin",
-        "cali", "barranquilla", "cartagena", "bucaramanga", "pereira",
-        "santa marta", "manizales", "ibagué", "ibague", "villavicencio",
-        "valledupar", "sincelejo", "armenia", "pasto", "buenaventura",
-        "montelíbano", "montelibano", "cereté", "cerete", "lorica",
-        "sahagún", "sahagun", "ayapel", "ciénaga", "cienaga"
-    ]
-    
-    text_lower = text.lower()
-    for city in cities:
-        if city in text_lower:
-            # Retornar con capitalización
-            return city.capitalize()
+    """Extrae nombre de ciudad del texto (gazetteer de municipios de Colombia)."""
+    location = extract_location(text)
+    if location and location.city:
+        return location.city
     
     # Intentar extraer con regex (palabra con mayúscula inicial)
     city_match = re.search(r'\b([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)\b', text)
@@ -580,7 +484,7 @@ def _extract_city_from_text(text: str) -> Optional[str]:
     return None
 
 
-def _handle_shipping(user_text: str, intent: str, text_lower: str, state: dict, context: dict) -> Dict[str, Any]:
+def _handle_shipping(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja etapa de envío. Mejora: pedir dirección SOLO cuando ya eligió máquina."""
     slots = state.get("slots", {})
     asked_questions = state.get("asked_questions", {})
@@ -593,6 +497,9 @@ def _handle_shipping(user_text: str, intent: str, text_lower: str, state: dict,
     if city:
         slots["city"] = city
         slots["city_norm"] = _normalize_city(city)
+        location = extract_location(user_text)
+        if location:
+            slots["location_class"] = location.location_class.value
         slots["city_filled"] = True
     
     # ANTI-REPETICIÓN: Si ya tiene ciudad, NO preguntar de nuevo
@@ -648,7 +555,7 @@ def _handle_shipping(user_text: str, intent: str, text_lower: str, state: dict,
     }
 
 
-def _handle_photos(user_text: str, intent: str, text_lower: str, state: dict, context: dict) -> Dict[str, Any]:
+def _handle_photos(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja etapa de mostrar fotos."""
     slots = state.get("slots", {})
     product_type = slots.get("product_type") or context.get("tipo_maquina")
@@ -661,7 +568,7 @@ def _handle_photos(user_text: str, intent: str, text_lower: str, state: dict, co
         assets.append(asset)
     
     # Si el usuario está indeciso, usar cierre de conversión
-    if "no sé" in text_lower or "cual" in text_lower or "cuál" in text_lower or "indeciso" in text_lower:
+    if features.has(Feature.UNDECIDED):
         if product_type == "industrial":
             reply = (
                 "Te recomiendo 2 opciones:\n\n"
@@ -696,12 +603,7 @@ def _handle_photos(user_text: str, intent: str, text_lower: str, state: dict, co
     }
 
 
-def _handle_support(user_text: str, intent: str, text_lower: str, state: dict) -> Dict[str, Any]:
-    """Maneja etapa de soporte."""
-    return _handle_support_request(user_text, state)
-
-
-def _handle_spare_parts(user_text: str, text_lower: str, state: dict) -> Dict[str, Any]:
+def _handle_spare_parts(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja solicitud de repuestos."""
     reply = (
         "Sí, tenemos repuestos para las marcas que vendemos. "
@@ -721,15 +623,15 @@ def _handle_spare_parts(user_text: str, text_lower: str, state: dict) -> Dict[st
     }
 
 
-def _handle_business_advice(user_text: str, text_lower: str, state: dict, context: dict) -> Dict[str, Any]:
+def _handle_business_advice(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja asesoría para montar negocio."""
     # Detectar tipo de negocio mencionado
-    if "gorra" in text_lower or "gorras" in text_lower:
+    if features.has(Feature.GORRA):
         reply = (
             "Perfecto, para gorras te recomiendo una industrial recta. "
             "¿Vas a producir de forma ocasional o constante?"
         )
-    elif "ropa" in text_lower:
+    elif features.has(Feature.ROPA):
         reply = (
             "Para ropa necesitas una industrial recta. "
             "¿Qué tipo de prendas: camisas, pantalones, vestidos?"
@@ -808,15 +710,12 @@ def _handle_sell_machine(user_text: str, text_lower: str, state: dict) -> Dict[s
     }
 
 
-def _handle_handoff_schedule(user_text: str, intent: str, text_lower: str, state: dict) -> Dict[str, Any]:
+def _handle_handoff_schedule(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja agendamiento de llamada/cita. Evita dead-end."""
     slots = state.get("slots", {})
     
     # Detectar confirmación de llamada
-    confirm_keywords = ["sí", "si", "ok", "dale", "claro", "perfecto", "bueno", "sí por favor", "si por favor"]
-    is_confirmation = any(kw in text_lower for kw in confirm_keywords)
-    
-    if is_confirmation:
+    if features.has(Feature.CONFIRM):
         # Ya tenemos día, ahora preguntar franja horaria
         if not slots.get("best_time"):
             reply = "Listo 🙌 ¿Te llamamos al mismo número de WhatsApp? ¿Hoy o mañana? ¿Mañana o tarde?"
@@ -836,11 +735,11 @@ def _handle_handoff_schedule(user_text: str, intent: str, text_lower: str, state
             # TODO: Generar handoff_summary para humano si corresponde
     else:
         # Detectar franja horaria
-        if "mañana" in text_lower or "mañana" in text_lower:
+        if features.has(Feature.MANANA):
             time_slot = "mañana"
-        elif "tarde" in text_lower:
+        elif features.has(Feature.TARDE):
             time_slot = "tarde"
-        elif "hoy" in text_lower:
+        elif features.has(Feature.HOY):
             time_slot = "hoy"
         else:
             time_slot = None
@@ -870,7 +769,26 @@ def _handle_handoff_schedule(user_text: str, intent: str, text_lower: str, state
     }
 
 
-def _handle_default(user_text: str, intent: str, text_lower: str, state: dict) -> Dict[str, Any]:
+def _handle_triage_repeat(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
+    """Sigue en triage sin respuesta reconocida: repetir el menú."""
+    from app.services.triage_service import generate_triage_greeting
+
+    # Contar turnos ambiguos consecutivos
+    ambiguous_turns = state.get("ambiguous_turns", 0) + 1
+    # Usar phone_from del state como identificador determinístico si está disponible
+    conversation_id = state.get("conversation_id") or state.get("phone_from", "")
+    return {
+        "reply_text": generate_triage_greeting(state, ambiguous_turns, conversation_id),
+        "reply_assets": None,
+        "state_updates": {
+            "last_question": "triage_menu",
+            "ambiguous_turns": ambiguous_turns
+        },
+        "decision_path": "triage_repeat"
+    }
+
+
+def _handle_default(user_text: str, intent: str, features: TurnFeatures, state: dict, context: dict) -> Dict[str, Any]:
     """Maneja casos por defecto."""
     reply = "¿Buscas máquina familiar (para casa) o industrial (para producción)?"
     state_updates = {
@@ -885,3 +803,22 @@ def _handle_default(user_text: str, intent: str, text_lower: str, state: dict) -
         "decision_path": "default_handled"
     }
 
+
+_QTY_RE = re.compile(r'(\d+)\s*(unidades|piezas|pares|máquinas)')
+
+# Transición (dialogue_fsm.TRANSITIONS) -> handler
+_HANDLERS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "discovery": _handle_discovery,
+    "pricing": _handle_pricing,
+    "visit": _handle_visit,
+    "shipping": _handle_shipping,
+    "photos": _handle_photos,
+    "photo_request": _handle_photo_request,
+    "support_request": _handle_support_request,
+    "spare_parts": _handle_spare_parts,
+    "business_advice": _handle_business_advice,
+    "handoff_schedule": _handle_handoff_schedule,
+    "intent_change_hours": _handle_intent_change_hours,
+    "triage_repeat": _handle_triage_repeat,
+    "default": _handle_default,
+}
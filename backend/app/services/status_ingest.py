@@ -0,0 +1,132 @@
+"""
+Ingesta de statuses de WhatsApp (sent / delivered / read / failed).
+
+Meta avisa por el mismo webhook cuándo aceptó, entregó y el cliente leyó cada
+mensaje que enviamos. En el ACK solo se acumulan en un buffer en memoria
+(dict por wamid, sin I/O); flush_statuses() los escribe en wa_message_status
+con un único executemany por lote, desde run_status_flush_loop o como
+background task cuando el buffer llega a WHATSAPP_STATUS_FLUSH_BATCH.
+
+wa_message_status se une a interaction_traces por whatsapp_message_id (el
+wamid de la respuesta). Con inbound_at de la traza (timestamp de Meta del
+mensaje del cliente) queda la latencia que percibe el usuario: del mensaje
+del cliente a la entrega / lectura de la respuesta (ver trace_analysis.py).
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+from app.config import WHATSAPP_STATUS_FLUSH_BATCH, WHATSAPP_STATUS_FLUSH_INTERVAL_SECONDS
+from app.models.database import get_db
+from app.services.metrics import WHATSAPP_STATUS_EVENTS
+from app.logging_config import logger
+
+
+# status de Meta -> columna de wa_message_status
+STATUS_COLUMNS = {
+    "sent": "sent_at",
+    "delivered": "delivered_at",
+    "read": "read_at",
+    "failed": "failed_at",
+}
+_TIME_COLUMNS = tuple(STATUS_COLUMNS.values())
+
+# wamid -> {columna: epoch, error_code, error_title}
+_pending: Dict[str, Dict[str, object]] = {}
+
+
+def parse_meta_timestamp(value) -> Optional[float]:
+    """Timestamp de Meta (epoch en segundos, como string) -> float; None si no es válido."""
+    try:
+        timestamp = float(value)
+    except (TypeError, ValueError):
+        return None
+    return timestamp if timestamp > 0 else None
+
+
+def record_statuses(statuses: List) -> bool:
+    """
+    Acumula statuses del webhook en memoria (sin I/O).
+
+    Un mismo wamid puede llegar varias veces y desordenado: por columna se
+    conserva el timestamp más temprano.
+
+    Returns:
+        True si conviene escribir ya (buffer lleno o sin loop de flush)
+    """
+    for status in statuses:
+        column = STATUS_COLUMNS.get(status.status)
+        if not column or not status.message_id:
+            continue
+        WHATSAPP_STATUS_EVENTS.inc(status.status)
+        timestamp = parse_meta_timestamp(status.timestamp)
+        if timestamp is None:
+            continue
+        row = _pending.setdefault(status.message_id, {})
+        current = row.get(column)
+        if current is None or timestamp < current:
+            row[column] = timestamp
+        if status.status == "failed":
+            row["error_code"] = status.error_code
+            row["error_title"] = status.error_title
+    return len(_pending) >= WHATSAPP_STATUS_FLUSH_BATCH or WHATSAPP_STATUS_FLUSH_INTERVAL_SECONDS <= 0
+
+
+def pending_status_count() -> int:
+    """wamids en el buffer todavía sin escribir."""
+    return len(_pending)
+
+
+def flush_statuses() -> int:
+    """
+    Escribe el buffer en wa_message_status (un executemany, una transacción).
+
+    Returns:
+        Cantidad de wamids escritos
+    """
+    global _pending
+    if not _pending:
+        return 0
+    batch, _pending = _pending, {}
+
+    rows = [
+        (wamid, *(values.get(column) for column in _TIME_COLUMNS), values.get("error_code"), values.get("error_title"))
+        for wamid, values in batch.items()
+    ]
+    # Por columna gana el timestamp más temprano (MIN escalar de SQLite devuelve NULL si hay un NULL)
+    updates = ", ".join(
+        f"{column} = COALESCE(MIN({column}, excluded.{column}), {column}, excluded.{column})"
+        for column in _TIME_COLUMNS
+    )
+    try:
+        with get_db() as conn:
+            conn.executemany(f"""
+                INSERT INTO wa_message_status (wamid, sent_at, delivered_at, read_at, failed_at, error_code, error_title)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(wamid) DO UPDATE SET {updates},
+                    error_code = COALESCE(excluded.error_code, error_code),
+                    error_title = COALESCE(excluded.error_title, error_title),
+                    updated_at = CURRENT_TIMESTAMP
+            """, rows)
+    except Exception as e:
+        # Se reintentan en el próximo flush (lo que llegó mientras tanto se conserva)
+        for wamid, values in batch.items():
+            current = _pending.setdefault(wamid, {})
+            for key, value in values.items():
+                current.setdefault(key, value)
+        logger.error("Error guardando statuses de WhatsApp", error=str(e), pending=len(_pending))
+        return 0
+
+    failed = sum(1 for values in batch.values() if values.get("failed_at"))
+    if failed:
+        logger.warning("Mensajes de WhatsApp no entregados", failed=failed, flushed=len(rows))
+    return len(rows)
+
+
+async def run_status_flush_loop(interval_seconds: float) -> None:
+    """Escribe los statuses acumulados cada interval_seconds."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            flush_statuses()
+        except Exception as e:
+            logger.error("Error en flush de statuses de WhatsApp", error=str(e))
@@ -0,0 +1,349 @@
+"""
+Análisis de interaction_traces por rango de tiempo, en memoria acotada.
+
+El rango [since, until) se parte en particiones de created_at. Cada partición
+se resume en un TracePartial:
+- conteos y agrupaciones (intents, equipos, tipos de mensaje, assets) salen de
+  GROUP BY / COUNT en SQLite, sin traer filas a Python
+- las latencias y los tiempos por etapa se recorren con un cursor (una columna
+  a la vez) y se acumulan en histogramas logarítmicos (los de trace_rollups)
+- de los casos a revisar (llamadas innecesarias, respuestas largas...) se
+  guarda el conteo exacto y a lo sumo EXAMPLES_LIMIT ejemplos
+- la entrega se une a wa_message_status por wamid: tasas de entrega/lectura/
+  fallo y latencia percibida por el cliente (de su mensaje a la entrega y a la
+  lectura de la respuesta), en segundos con los mismos histogramas logarítmicos
+
+Los parciales se combinan con merge(), así que las particiones pueden
+procesarse en paralelo (workers > 1 usa un pool de procesos, cada uno con su
+conexión de solo lectura). Memoria: O(buckets + etapas + ejemplos), no O(filas).
+"""
+import heapq
+import json
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.trace_rollups import latency_bucket, merge_histograms
+
+
+EXAMPLES_LIMIT = 10
+LONG_RESPONSE_CHARS = 350
+
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+_NON_LLM_INTENTS = ("saludo", "cierre", "despedida", "info_general")
+_NON_LLM_KEYWORDS = ("hola", "gracias", "horario", "direccion", "ubicacion", "telefono")
+_GREETING_INTENTS = ("saludo", "cierre", "despedida")
+DELIVERY_STAGES = ("sent", "delivered", "read")
+
+
+class TracePartial:
+    """Resumen mergeable de las trazas de una partición."""
+
+    def __init__(self):
+        self.counts = {"total": 0, "openai_called": 0, "business_related": 0, "cache_hit": 0}
+        self.latency = {"count": 0, "sum": 0.0, "min": None, "max": None}
+        self.latency_us = {"count": 0, "sum": 0}
+        self.latency_hist: Dict[int, int] = {}
+        self.intents = Counter()
+        self.routed_teams = Counter()
+        # tipo de mensaje -> [total, openai_called]
+        self.message_types: Dict[str, List[int]] = {}
+        self.asset_counts = Counter()
+        # top de respuestas más largas: (response_len_chars, id, intent)
+        self.long_responses: List[Tuple[int, int, str]] = []
+        # hallazgo -> {"count", "examples"}
+        self.findings: Dict[str, Dict[str, Any]] = {}
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.traced = {"count": 0, "latency_sum_ms": 0.0}
+        # Respuestas con wamid y qué statuses de Meta llegaron
+        self.delivery = {"sent": 0, "with_status": 0, "delivered": 0, "read": 0, "failed": 0}
+        # etapa -> histograma de segundos desde el mensaje del cliente (inbound_at)
+        self.delivery_hist: Dict[str, Dict[int, int]] = {stage: {} for stage in DELIVERY_STAGES}
+        self.delivery_errors = Counter()
+
+    def add_finding(self, name: str, count: int, examples: List[Dict[str, Any]]) -> None:
+        finding = self.findings.setdefault(name, {"count": 0, "examples": []})
+        finding["count"] += count
+        finding["examples"] = (finding["examples"] + examples)[:EXAMPLES_LIMIT]
+
+    def add_stage(self, stage: str, value_ms: float) -> None:
+        state = self.stages.setdefault(stage, {"count": 0, "sum_ms": 0.0, "hist": {}})
+        state["count"] += 1
+        state["sum_ms"] += value_ms
+        index = latency_bucket(value_ms)
+        state["hist"][index] = state["hist"].get(index, 0) + 1
+
+    def merge(self, other: "TracePartial") -> "TracePartial":
+        """Suma otro parcial (el orden de las particiones se respeta en los ejemplos)."""
+        for key, value in other.counts.items():
+            self.counts[key] += value
+        self.latency["count"] += other.latency["count"]
+        self.latency["sum"] += other.latency["sum"]
+        for key, pick in (("min", min), ("max", max)):
+            values = [v for v in (self.latency[key], other.latency[key]) if v is not None]
+            self.latency[key] = pick(values) if values else None
+        self.latency_us["count"] += other.latency_us["count"]
+        self.latency_us["sum"] += other.latency_us["sum"]
+        merge_histograms(self.latency_hist, other.latency_hist)
+        self.intents.update(other.intents)
+        self.routed_teams.update(other.routed_teams)
+        for msg_type, (total, openai_called) in other.message_types.items():
+            current = self.message_types.setdefault(msg_type, [0, 0])
+            current[0] += total
+            current[1] += openai_called
+        self.asset_counts.update(other.asset_counts)
+        self.long_responses = heapq.nlargest(EXAMPLES_LIMIT, self.long_responses + other.long_responses)
+        for name, finding in other.findings.items():
+            self.add_finding(name, finding["count"], finding["examples"])
+        for stage, state in other.stages.items():
+            current = self.stages.setdefault(stage, {"count": 0, "sum_ms": 0.0, "hist": {}})
+            current["count"] += state["count"]
+            current["sum_ms"] += state["sum_ms"]
+            merge_histograms(current["hist"], state["hist"])
+        self.traced["count"] += other.traced["count"]
+        self.traced["latency_sum_ms"] += other.traced["latency_sum_ms"]
+        for key, value in other.delivery.items():
+            self.delivery[key] += value
+        for stage, hist in other.delivery_hist.items():
+            merge_histograms(self.delivery_hist[stage], hist)
+        self.delivery_errors.update(other.delivery_errors)
+        return self
+
+
+def _connect_readonly(db_path: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def aggregate_partition(db_path: str, since: str, until: str) -> TracePartial:
+    """
+    Resume las trazas con since <= created_at < until.
+
+    Función de módulo (no método) para poder mandarla a otro proceso.
+    """
+    partial = TracePartial()
+    conn = _connect_readonly(db_path)
+    try:
+        where = "created_at >= ? AND created_at < ?"
+        rng = (since, until)
+
+        def query(sql: str, params: tuple = ()):
+            return conn.execute(sql.format(where=where), rng + params)
+
+        row = query("""
+            SELECT COUNT(*), COALESCE(SUM(openai_called = 1), 0),
+                   COALESCE(SUM(business_related != 0), 0), COALESCE(SUM(cache_hit = 1), 0),
+                   COUNT(CASE WHEN latency_ms > 0 THEN 1 END), COALESCE(SUM(CASE WHEN latency_ms > 0 THEN latency_ms END), 0),
+                   MIN(CASE WHEN latency_ms > 0 THEN latency_ms END), MAX(CASE WHEN latency_ms > 0 THEN latency_ms END),
+                   COUNT(CASE WHEN latency_us > 0 THEN 1 END), COALESCE(SUM(CASE WHEN latency_us > 0 THEN latency_us END), 0)
+            FROM interaction_traces WHERE {where}
+        """).fetchone()
+        if not row[0]:
+            return partial
+        partial.counts.update(total=row[0], openai_called=row[1], business_related=row[2], cache_hit=row[3])
+        partial.latency.update(count=row[4], sum=row[5], min=row[6], max=row[7])
+        partial.latency_us.update(count=row[8], sum=row[9])
+
+        # Percentiles: se recorre solo la columna de latencia
+        for (latency_ms,) in query("SELECT latency_ms FROM interaction_traces WHERE {where} AND latency_ms > 0"):
+            index = latency_bucket(latency_ms)
+            partial.latency_hist[index] = partial.latency_hist.get(index, 0) + 1
+
+        partial.intents.update(dict(query(
+            "SELECT intent, COUNT(*) FROM interaction_traces WHERE {where} AND intent != '' GROUP BY intent"
+        )))
+        partial.routed_teams.update(dict(query(
+            "SELECT routed_team, COUNT(*) FROM interaction_traces WHERE {where} AND routed_team != '' GROUP BY routed_team"
+        )))
+        partial.asset_counts.update(dict(query(
+            "SELECT selected_asset_id, COUNT(*) FROM interaction_traces WHERE {where} AND selected_asset_id != '' GROUP BY selected_asset_id"
+        )))
+        for msg_type, total, openai_called in query("""
+            SELECT COALESCE(message_type, 'unknown'), COUNT(*), COALESCE(SUM(openai_called = 1), 0)
+            FROM interaction_traces WHERE {where} GROUP BY 1
+        """):
+            partial.message_types[msg_type] = [total, openai_called]
+
+        partial.long_responses = [
+            (length or 0, trace_id, intent or "")
+            for length, trace_id, intent in query("""
+                SELECT response_len_chars, id, intent FROM interaction_traces WHERE {where}
+                ORDER BY response_len_chars DESC, id DESC LIMIT ?
+            """, (EXAMPLES_LIMIT,))
+        ]
+
+        def finding(name: str, condition: str, columns: str, to_example, params: tuple = ()) -> None:
+            count = query(f"SELECT COUNT(*) FROM interaction_traces WHERE {{where}} AND {condition}", params).fetchone()[0]
+            if not count:
+                return
+            rows = query(
+                f"SELECT {columns} FROM interaction_traces WHERE {{where}} AND {condition} ORDER BY id LIMIT ?",
+                params + (EXAMPLES_LIMIT,)
+            )
+            partial.add_finding(name, count, [to_example(*r) for r in rows])
+
+        keyword_sql = " OR ".join("lower(raw_text) LIKE ?" for _ in _NON_LLM_KEYWORDS)
+        finding(
+            "wasteful_openai",
+            f"openai_called = 1 AND (lower(COALESCE(intent, '')) IN ({','.join('?' * len(_NON_LLM_INTENTS))}) OR {keyword_sql})",
+            "id, intent, raw_text, latency_ms",
+            lambda trace_id, intent, text, latency_ms: {
+                "id": trace_id,
+                "intent": (intent or "").lower(),
+                "text": _preview((text or "").lower(), 50),
+                "latency_ms": latency_ms or 0,
+            },
+            _NON_LLM_INTENTS + tuple(f"%{keyword}%" for keyword in _NON_LLM_KEYWORDS),
+        )
+        finding(
+            "too_long",
+            "response_len_chars > ?",
+            "id, response_len_chars",
+            lambda trace_id, length: {"id": trace_id, "response_len_chars": length},
+            (LONG_RESPONSE_CHARS,),
+        )
+        finding(
+            "no_question",
+            "response_text != '' AND instr(substr(response_text, -100), '?') = 0",
+            "id, intent, response_text",
+            lambda trace_id, intent, response: {
+                "id": trace_id, "intent": intent or "", "response": _preview(response, 100)
+            },
+        )
+        for team in ("comercial", "tecnica"):
+            finding(
+                f"motivos_{team}",
+                "routed_team = ?",
+                "raw_text",
+                lambda text: (text or "").lower()[:50],
+                (team,),
+            )
+        finding(
+            "false_positives",
+            "routed_team != '' AND routed_team != 'comercial' AND lower(raw_text) LIKE '%addi%'",
+            "id, routed_team, raw_text",
+            lambda trace_id, team, text: {
+                "id": trace_id, "team": team, "text": (text or "").lower()[:50],
+                "issue": "Addi debería ir a comercial",
+            },
+        )
+        finding(
+            "assets_in_greetings",
+            f"selected_asset_id != '' AND lower(intent) IN ({','.join('?' * len(_GREETING_INTENTS))})",
+            "id, intent, selected_asset_id",
+            lambda trace_id, intent, asset_id: {"id": trace_id, "intent": intent, "selected_asset_id": asset_id},
+            _GREETING_INTENTS,
+        )
+
+        # Tiempos por etapa (solo trazas muestreadas con spans)
+        for latency_ms, raw in query(
+            "SELECT latency_ms, stage_timings FROM interaction_traces WHERE {where} AND stage_timings IS NOT NULL"
+        ):
+            try:
+                timings = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            partial.traced["count"] += 1
+            partial.traced["latency_sum_ms"] += latency_ms or 0
+            for stage, us in timings.items():
+                partial.add_stage(stage, us / 1000)
+
+        _aggregate_delivery(partial, query)
+    finally:
+        conn.close()
+    return partial
+
+
+def _aggregate_delivery(partial: TracePartial, query) -> None:
+    """Une las respuestas (whatsapp_message_id) con sus statuses de Meta."""
+    joined = """
+        FROM interaction_traces LEFT JOIN wa_message_status ON wamid = whatsapp_message_id
+        WHERE {where} AND whatsapp_message_id IS NOT NULL
+    """
+    row = query(f"""
+        SELECT COUNT(*), COUNT(wamid), COUNT(COALESCE(delivered_at, read_at)), COUNT(read_at), COUNT(failed_at)
+        {joined}
+    """).fetchone()
+    if not row[0]:
+        return
+    partial.delivery.update(sent=row[0], with_status=row[1], delivered=row[2], read=row[3], failed=row[4])
+    partial.delivery_errors.update({
+        str(code): count for code, count in query(
+            f"SELECT COALESCE(error_code, 'unknown'), COUNT(*) {joined} AND failed_at IS NOT NULL GROUP BY 1"
+        )
+    })
+    # Timestamps de Meta (resolución de 1 s): latencia en segundos
+    for inbound_at, *stamps in query(
+        f"SELECT inbound_at, sent_at, delivered_at, read_at {joined} AND inbound_at IS NOT NULL AND wamid IS NOT NULL"
+    ):
+        for stage, stamp in zip(DELIVERY_STAGES, stamps):
+            if stamp is not None:
+                index = latency_bucket(max(stamp - inbound_at, 0.0))
+                partial.delivery_hist[stage][index] = partial.delivery_hist[stage].get(index, 0) + 1
+
+
+def _preview(text: str, limit: int) -> str:
+    return text[:limit] + "..." if len(text) > limit else text
+
+
+def trace_time_bounds(db_path: str) -> Tuple[Optional[str], Optional[str]]:
+    """Primer y último created_at de interaction_traces (None si está vacía)."""
+    conn = _connect_readonly(db_path)
+    try:
+        return conn.execute("SELECT MIN(created_at), MAX(created_at) FROM interaction_traces").fetchone()
+    finally:
+        conn.close()
+
+
+def split_range(since: str, until: str, partitions: int) -> List[Tuple[str, str]]:
+    """Parte [since, until) en tramos consecutivos de igual duración (al segundo)."""
+    start = datetime.strptime(since, _TIMESTAMP_FORMAT)
+    end = datetime.strptime(until, _TIMESTAMP_FORMAT)
+    partitions = max(1, min(partitions, int((end - start).total_seconds()) or 1))
+    step = (end - start) / partitions
+    bounds = [(start + step * i).replace(microsecond=0).strftime(_TIMESTAMP_FORMAT) for i in range(partitions)]
+    bounds.append(until)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+
+def analyze_range(
+    db_path: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    workers: int = 1,
+    partitions: Optional[int] = None,
+) -> TracePartial:
+    """
+    Resume las trazas de [since, until) (created_at UTC, "YYYY-MM-DD HH:MM:SS").
+
+    Args:
+        since / until: límites del rango; None = desde la primera / hasta la última traza
+        workers: procesos en paralelo (1 = en este proceso)
+        partitions: tramos en que se parte el rango (default: 4 por worker)
+
+    Returns:
+        TracePartial con todo el rango
+    """
+    first, last = trace_time_bounds(db_path)
+    if first is None:
+        return TracePartial()
+    since = since or first[:19]
+    if until is None:
+        # Límite exclusivo: un segundo después de la última traza
+        until = (datetime.strptime(last[:19], _TIMESTAMP_FORMAT) + timedelta(seconds=1)).strftime(_TIMESTAMP_FORMAT)
+    if since >= until:
+        return TracePartial()
+
+    ranges = split_range(since, until, partitions or max(1, workers) * 4)
+    result = TracePartial()
+    if workers <= 1 or len(ranges) == 1:
+        for a, b in ranges:
+            result.merge(aggregate_partition(db_path, a, b))
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(aggregate_partition, db_path, a, b) for a, b in ranges]
+        for future in futures:
+            result.merge(future.result())
+    return result
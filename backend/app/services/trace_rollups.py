@@ -0,0 +1,335 @@
+"""
+Rollups y retención de interaction_traces.
+
+interaction_traces guarda el texto completo de cada mensaje. Para que los reportes
+no escaneen la tabla cruda:
+- refresh_trace_rollups() agrega incrementalmente (por id, desde una marca de agua)
+  las trazas nuevas en trace_rollup_minute / trace_rollup_hour por canal, más el
+  conjunto de conversaciones por hora. Una traza se agrega una sola vez; lo único
+  que cambia después es el resultado de un envío diferido, y eso lo suma
+  record_late_send_failure() desde la cola de salida
+- prune_traces() borra en lotes las trazas crudas viejas (solo las ya agregadas)
+  y los rollups fuera de su retención
+- get_rollup_totals() suma los buckets de una ventana; las latencias se guardan
+  como histograma logarítmico, así p95 sale de sumar histogramas
+
+El camino caliente (save_trace) no cambia: agregar cuesta proporcional a las
+trazas nuevas desde la última pasada.
+"""
+import asyncio
+import bisect
+import json
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from app.config import (
+    TRACE_RETENTION_DAYS,
+    TRACE_ROLLUP_MINUTE_RETENTION_HOURS,
+    TRACE_ROLLUP_HOUR_RETENTION_DAYS,
+)
+from app.models.database import get_connection
+from app.logging_config import logger
+
+
+# Límites superiores de bucket en ms: 20 por década de 1ms a 100s (~12% de ancho)
+LATENCY_BUCKETS_MS = [round(10 ** (i / 20), 3) for i in range(0, 101)]
+
+_COUNTERS = [
+    "msgs", "personal", "handoffs", "openai_calls", "openai_fallbacks",
+    "openai_unauthorized", "openai_latency_count", "openai_latency_sum_ms",
+    "errors", "latency_count", "latency_sum_ms", "send_failures",
+]
+_WATERMARK_KEY = "last_trace_id"
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def latency_bucket(latency_ms: float) -> int:
+    """Índice del bucket de LATENCY_BUCKETS_MS (el último absorbe el desborde)."""
+    return min(bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms), len(LATENCY_BUCKETS_MS) - 1)
+
+
+def merge_histograms(target: Dict[int, int], other: Dict[Any, int]) -> Dict[int, int]:
+    """Suma other en target (acepta claves str, como llegan desde JSON)."""
+    for index, count in other.items():
+        target[int(index)] = target.get(int(index), 0) + count
+    return target
+
+
+def load_histogram(raw: Optional[str]) -> Dict[int, int]:
+    """Histograma guardado como JSON (claves str) -> {índice: conteo}."""
+    return merge_histograms({}, json.loads(raw or "{}"))
+
+
+def histogram_quantile(histogram: Dict[int, int], q: float) -> float:
+    """Cuantil q (0-1) como límite superior del bucket que lo contiene."""
+    total = sum(histogram.values())
+    if not total:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for index in sorted(histogram):
+        seen += histogram[index]
+        if seen >= rank:
+            return LATENCY_BUCKETS_MS[index]
+    return LATENCY_BUCKETS_MS[max(histogram)]
+
+
+def _utc_cutoff(**delta) -> str:
+    return (datetime.utcnow() - timedelta(**delta)).strftime(_TIMESTAMP_FORMAT)
+
+
+def _get_watermark(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM trace_rollup_state WHERE key = ?", (_WATERMARK_KEY,)).fetchone()
+    return row[0] if row else 0
+
+
+def _new_bucket() -> Dict[str, Any]:
+    bucket: Dict[str, Any] = {name: 0 for name in _COUNTERS}
+    bucket["latency_hist"] = {}
+    return bucket
+
+
+def _upsert_buckets(conn: sqlite3.Connection, table: str, buckets: Dict[tuple, Dict[str, Any]]) -> None:
+    for (bucket_start, channel), values in buckets.items():
+        row = conn.execute(
+            f"SELECT latency_hist FROM {table} WHERE bucket_start = ? AND channel = ?",
+            (bucket_start, channel)
+        ).fetchone()
+        histogram = merge_histograms(load_histogram(row[0] if row else None), values["latency_hist"])
+        conn.execute(f"""
+            INSERT INTO {table} (bucket_start, channel, {", ".join(_COUNTERS)}, latency_hist)
+            VALUES (?, ?, {", ".join("?" for _ in _COUNTERS)}, ?)
+            ON CONFLICT(bucket_start, channel) DO UPDATE SET
+                {", ".join(f"{name} = {name} + excluded.{name}" for name in _COUNTERS)},
+                latency_hist = excluded.latency_hist
+        """, (bucket_start, channel, *[values[name] for name in _COUNTERS], json.dumps(histogram)))
+
+
+def refresh_trace_rollups(batch_size: int = 5000) -> int:
+    """
+    Agrega las trazas nuevas (id > marca de agua) en los rollups.
+
+    Cada lote se aplica en una transacción IMMEDIATE junto con la nueva marca de
+    agua, así dos procesos refrescando a la vez no cuentan dos veces.
+
+    Returns:
+        Cantidad de trazas agregadas
+    """
+    conn = get_connection()
+    conn.isolation_level = None
+    total = 0
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                watermark = _get_watermark(conn)
+                rows = conn.execute("""
+                    SELECT id, created_at, channel, conversation_id, is_personal, routed_team,
+                           openai_called, openai_fallback_used, openai_canary_allowed,
+                           openai_latency_ms, error_message, latency_ms, whatsapp_send_success
+                    FROM interaction_traces
+                    WHERE id > ?
+                    ORDER BY id
+                    LIMIT ?
+                """, (watermark, batch_size)).fetchall()
+                if not rows:
+                    conn.execute("COMMIT")
+                    break
+
+                minutes: Dict[tuple, Dict[str, Any]] = defaultdict(_new_bucket)
+                hours: Dict[tuple, Dict[str, Any]] = defaultdict(_new_bucket)
+                conversations = set()
+                for row in rows:
+                    created_at = str(row["created_at"] or "")[:19]
+                    channel = row["channel"] or "unknown"
+                    hour_start = created_at[:13] + ":00:00"
+                    if row["conversation_id"]:
+                        conversations.add((hour_start, row["conversation_id"]))
+                    for bucket in (minutes[(created_at[:16] + ":00", channel)], hours[(hour_start, channel)]):
+                        _add_trace(bucket, row)
+
+                _upsert_buckets(conn, "trace_rollup_minute", minutes)
+                _upsert_buckets(conn, "trace_rollup_hour", hours)
+                conn.executemany(
+                    "INSERT OR IGNORE INTO trace_rollup_conversations (bucket_start, conversation_id) VALUES (?, ?)",
+                    conversations
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO trace_rollup_state (key, value) VALUES (?, ?)",
+                    (_WATERMARK_KEY, rows[-1]["id"])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            total += len(rows)
+            if len(rows) < batch_size:
+                break
+    finally:
+        conn.close()
+    return total
+
+
+def _add_trace(bucket: Dict[str, Any], row: sqlite3.Row) -> None:
+    bucket["msgs"] += 1
+    bucket["personal"] += 1 if row["is_personal"] == 1 else 0
+    bucket["handoffs"] += 1 if row["routed_team"] else 0
+    bucket["errors"] += 1 if row["error_message"] else 0
+    bucket["send_failures"] += 1 if row["whatsapp_send_success"] == 0 else 0
+    if row["openai_called"] == 1:
+        bucket["openai_calls"] += 1
+        bucket["openai_unauthorized"] += 1 if row["openai_canary_allowed"] == 0 else 0
+        if row["openai_latency_ms"] is not None:
+            bucket["openai_latency_count"] += 1
+            bucket["openai_latency_sum_ms"] += row["openai_latency_ms"]
+    bucket["openai_fallbacks"] += 1 if row["openai_fallback_used"] == 1 else 0
+    latency = row["latency_ms"]
+    if latency and latency > 0:
+        bucket["latency_count"] += 1
+        bucket["latency_sum_ms"] += latency
+        index = latency_bucket(latency)
+        bucket["latency_hist"][index] = bucket["latency_hist"].get(index, 0) + 1
+
+
+def record_late_send_failure(conn: sqlite3.Connection, trace_request_id: str) -> None:
+    """
+    Suma un envío fallido a los buckets de una traza ya agregada (el envío quedó
+    en la cola de salida y falló después). Si la traza aún no se agregó, no hace
+    nada: refresh_trace_rollups() verá el fallo al agregarla.
+
+    Llamar en la transacción que escribe el fallo en la traza, antes de escribirlo
+    y después de otra escritura: así tiene el lock y no se cruza con un refresh.
+    """
+    row = conn.execute("""
+        SELECT id, created_at, channel, whatsapp_send_success
+        FROM interaction_traces WHERE request_id = ?
+    """, (trace_request_id,)).fetchone()
+    if row is None or row["whatsapp_send_success"] == 0 or row["id"] > _get_watermark(conn):
+        return
+    created_at = str(row["created_at"] or "")[:19]
+    channel = row["channel"] or "unknown"
+    for table, bucket_start in (
+        ("trace_rollup_minute", created_at[:16] + ":00"),
+        ("trace_rollup_hour", created_at[:13] + ":00:00"),
+    ):
+        conn.execute(
+            f"UPDATE {table} SET send_failures = send_failures + 1 WHERE bucket_start = ? AND channel = ?",
+            (bucket_start, channel)
+        )
+
+
+def get_rollup_totals(minutes: Optional[int] = None, hours: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Totales de una ventana hacia atrás desde ahora (incluye el bucket en curso).
+
+    Args:
+        minutes: ventana en minutos (lee trace_rollup_minute)
+        hours: ventana en horas (lee trace_rollup_hour, resolución horaria)
+
+    Returns:
+        Contadores sumados + latency_hist combinado + conversations (distintas; solo con hours)
+    """
+    if minutes:
+        table = "trace_rollup_minute"
+        since = (datetime.utcnow() - timedelta(minutes=minutes - 1)).strftime("%Y-%m-%d %H:%M:00")
+    else:
+        table = "trace_rollup_hour"
+        since = (datetime.utcnow() - timedelta(hours=(hours or 1) - 1)).strftime("%Y-%m-%d %H:00:00")
+
+    totals = _new_bucket()
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"SELECT {', '.join(_COUNTERS)}, latency_hist FROM {table} WHERE bucket_start >= ?",
+            (since,)
+        ).fetchall()
+        for row in rows:
+            for name in _COUNTERS:
+                totals[name] += row[name] or 0
+            merge_histograms(totals["latency_hist"], load_histogram(row["latency_hist"]))
+
+        if not minutes:
+            totals["conversations"] = conn.execute(
+                "SELECT COUNT(DISTINCT conversation_id) FROM trace_rollup_conversations WHERE bucket_start >= ?",
+                (since,)
+            ).fetchone()[0]
+    finally:
+        conn.close()
+    return totals
+
+
+def _delete_in_batches(conn: sqlite3.Connection, table: str, where: str, params: tuple, batch_size: int) -> int:
+    deleted = 0
+    while True:
+        cursor = conn.execute(
+            f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)",
+            (*params, batch_size)
+        )
+        conn.commit()
+        deleted += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return deleted
+
+
+def prune_traces(
+    retention_days: Optional[int] = None,
+    batch_size: int = 1000
+) -> Dict[str, int]:
+    """
+    Aplica la retención: trazas crudas (solo las ya agregadas), rollups viejos y
+    statuses de entrega de WhatsApp.
+
+    Borra en lotes con commit entre lotes para no retener el lock de escritura.
+
+    Returns:
+        Filas borradas por tabla
+    """
+    retention_days = TRACE_RETENTION_DAYS if retention_days is None else retention_days
+    raw_cutoff = _utc_cutoff(days=retention_days)
+    minute_cutoff = _utc_cutoff(hours=TRACE_ROLLUP_MINUTE_RETENTION_HOURS)
+    hour_cutoff = _utc_cutoff(days=TRACE_ROLLUP_HOUR_RETENTION_DAYS)
+
+    conn = get_connection()
+    try:
+        watermark = _get_watermark(conn)
+        return {
+            "interaction_traces": _delete_in_batches(
+                conn, "interaction_traces", "id <= ? AND created_at < ?", (watermark, raw_cutoff), batch_size
+            ),
+            "trace_rollup_minute": _delete_in_batches(
+                conn, "trace_rollup_minute", "bucket_start < ?", (minute_cutoff,), batch_size
+            ),
+            "trace_rollup_hour": _delete_in_batches(
+                conn, "trace_rollup_hour", "bucket_start < ?", (hour_cutoff,), batch_size
+            ),
+            "trace_rollup_conversations": _delete_in_batches(
+                conn, "trace_rollup_conversations", "bucket_start < ?", (hour_cutoff,), batch_size
+            ),
+            # Statuses de entrega: misma retención que las trazas a las que se unen
+            "wa_message_status": _delete_in_batches(
+                conn, "wa_message_status", "updated_at < ?", (raw_cutoff,), batch_size
+            ),
+        }
+    finally:
+        conn.close()
+
+
+def maintain_traces() -> Dict[str, Any]:
+    """Refresca rollups y aplica retención (una pasada completa)."""
+    aggregated = refresh_trace_rollups()
+    deleted = prune_traces()
+    if aggregated or any(deleted.values()):
+        logger.info("Mantenimiento de trazas", aggregated=aggregated, deleted=deleted)
+    return {"aggregated": aggregated, "deleted": deleted}
+
+
+async def run_trace_maintenance_loop(interval_seconds: int) -> None:
+    """Corre maintain_traces() cada interval_seconds fuera del event loop."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(maintain_traces)
+        except Exception as e:
+            logger.error("Error en mantenimiento de trazas", error=str(e))
@@ -1,16 +1,66 @@
 """
 Servicio de trazabilidad para registrar todas las interacciones.
+
+Además de la latencia total, cada traza puede llevar el tiempo de sus etapas
+(spans): `with tracer.span("intent"):` o, desde código que no recibe el tracer,
+`with span("intent"):` / `@traced("intent")`, que usan el tracer activo del
+contexto. Los spans siempre alimentan luisa_stage_seconds en /metrics; en las
+trazas muestreadas (TRACE_SPAN_SAMPLE_RATE) además se guardan en
+interaction_traces.stage_timings como JSON compacto {etapa: microsegundos}.
 """
+import functools
 import hashlib
+import inspect
+import json
+import random
 import time
-from typing import Optional
+from contextvars import ContextVar
+from typing import Dict, Optional
 from dataclasses import dataclass, field
 from contextlib import contextmanager
 
+from app.config import TRACE_SPAN_SAMPLE_RATE
 from app.models.database import save_trace
+from app.services.live_metrics import record_interaction
+from app.services.metrics import STAGE_SECONDS
 from app.logging_config import logger, generate_request_id
 
 
+# Canal de los mensajes sintéticos del warm-up: no dejan trazas ni métricas en memoria
+WARMUP_CHANNEL = "warmup"
+
+# Tracer de la interacción en curso (lo fija trace_interaction)
+_current_tracer: ContextVar[Optional["InteractionTracer"]] = ContextVar("current_tracer", default=None)
+
+
+def _sample_spans() -> bool:
+    if TRACE_SPAN_SAMPLE_RATE >= 1:
+        return True
+    return TRACE_SPAN_SAMPLE_RATE > 0 and random.random() < TRACE_SPAN_SAMPLE_RATE
+
+
+class _Span:
+    """Mide una etapa; clase con __slots__ en vez de generador para que cueste poco."""
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer: Optional["InteractionTracer"], name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, self.name)
+        spans = self.tracer._spans if self.tracer is not None else None
+        if spans is not None:
+            # Una etapa repetida en la misma interacción acumula
+            spans[self.name] = spans.get(self.name, 0) + int(elapsed * 1_000_000)
+        return False
+
+
 @dataclass
 class InteractionTracer:
     """
@@ -38,6 +88,8 @@ class InteractionTracer:
     whatsapp_send_success: Optional[int] = None
     whatsapp_send_latency_ms: Optional[float] = None
     whatsapp_send_error_code: Optional[str] = None
+    whatsapp_message_id: Optional[str] = None  # wamid de la respuesta (se une a wa_message_status)
+    inbound_at: Optional[float] = None  # timestamp de Meta del mensaje del cliente
     classification: Optional[str] = None
     is_personal: Optional[int] = None
     classification_score: Optional[float] = None
@@ -51,13 +103,25 @@ class InteractionTracer:
     _start_time: float = field(default=0.0, repr=False)
     _latency_ms: float = field(default=0.0, repr=False)
     _latency_us: int = field(default=0, repr=False)
+    # {etapa: microsegundos}; None si la traza no quedó muestreada
+    _spans: Optional[Dict[str, int]] = field(default=None, repr=False)
     
     def start(self) -> "InteractionTracer":
         """Inicia el timer con perf_counter para mayor precisión."""
         import time
         self._start_time = time.perf_counter()
+        self._spans = {} if _sample_spans() else None
         return self
     
+    def span(self, name: str) -> _Span:
+        """Context manager que mide la etapa `name` de esta interacción."""
+        return _Span(self, name)
+    
+    @property
+    def stage_timings(self) -> Dict[str, int]:
+        """Tiempos por etapa en microsegundos (vacío si no se muestreó)."""
+        return dict(self._spans or {})
+    
     def stop(self) -> float:
         """Detiene el timer y retorna latencia en ms con 1 decimal."""
         import time
@@ -91,6 +155,8 @@ class InteractionTracer:
     
     def save(self) -> None:
         """Guarda la traza en la base de datos."""
+        if self.channel == WARMUP_CHANNEL:
+            return
         # Asegurar que el timer está detenido
         if self._latency_ms == 0.0:
             self.stop()
@@ -128,11 +194,20 @@ class InteractionTracer:
                 openai_canary_allowed=self.openai_canary_allowed,
                 openai_latency_ms=self.openai_latency_ms,
                 openai_error=self.openai_error,
-                openai_fallback_used=self.openai_fallback_used
+                openai_fallback_used=self.openai_fallback_used,
+                stage_timings=json.dumps(self._spans, separators=(",", ":")) if self._spans else None,
+                whatsapp_message_id=self.whatsapp_message_id,
+                inbound_at=self.inbound_at
             )
         except Exception as e:
             # No fallar por errores de trazabilidad
             logger.error("Error guardando traza", error=str(e), request_id=self.request_id)
+
+        # Ventana en memoria de /api/ops/snapshot (también si la DB falló)
+        try:
+            record_interaction(self)
+        except Exception as e:
+            logger.error("Error registrando métricas en memoria", error=str(e), request_id=self.request_id)
     
     def log(self) -> None:
         """Registra la interacción en los logs estructurados."""
@@ -170,6 +245,7 @@ def trace_interaction(conversation_id: str, channel: str = "api", customer_phone
         customer_phone=customer_phone
     )
     tracer.start()
+    token = _current_tracer.set(tracer)
     
     try:
         yield tracer
@@ -177,6 +253,7 @@ def trace_interaction(conversation_id: str, channel: str = "api", customer_phone
         tracer.error_message = str(e)
         raise
     finally:
+        _current_tracer.reset(token)
         # Detener timer, loguear y guardar (todo incluido en la medición)
         tracer.stop()
         tracer.log()
@@ -199,3 +276,38 @@ def create_tracer(conversation_id: str, channel: str = "api", customer_phone: Op
         channel=channel,
         customer_phone=customer_phone
     )
+
+
+def current_tracer() -> Optional["InteractionTracer"]:
+    """Tracer de la interacción en curso (None fuera de trace_interaction)."""
+    return _current_tracer.get()
+
+
+def span(name: str) -> _Span:
+    """
+    Mide la etapa `name` de la interacción en curso (sin interacción activa solo
+    alimenta /metrics).
+    
+    Uso:
+        with span("asset"):
+            item = select_catalog_asset(text, context)
+    """
+    return _Span(_current_tracer.get(), name)
+
+
+def traced(name: str):
+    """Decorador: cada llamada a la función se mide como la etapa `name`."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
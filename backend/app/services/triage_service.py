@@ -2,9 +2,10 @@
 Triage Service: Detecta intención específica y maneja mensajes ambiguos.
 Para WhatsApp real: no asumir que todos quieren comprar máquina.
 """
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import re
 
+from app.rules.batch import classify_batch
 from app.rules.keywords import normalize_text, select_variant, TRIAGE_FIRST_VARIANTES, TRIAGE_RETRY_VARIANTES
 from app.logging_config import logger
 
@@ -20,6 +21,42 @@ TRIAGE_INTENTS = {
     "other": "other"
 }
 
+# Keywords por intent (el orden desempata scores iguales)
+TRIAGE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "buy_machine": (
+        "industrial", "familiar", "maquina", "precio", "promo", "promocion",
+        "recta", "fileteadora", "overlock", "singer", "kingter", "kansew", "union",
+        "comprar", "quiero", "necesito", "busco", "cotizacion"
+    ),
+    "spare_parts": (
+        "repuesto", "repuestos", "pieza", "piezas", "aguja", "agujas", "bobina", "bobinas",
+        "prensatela", "prensatelas", "motor", "correa", "correas", "placa", "placa de identificacion"
+    ),
+    "tech_support": (
+        "dano", "no prende", "no funciona", "ruido", "ruidoso", "mantenimiento",
+        "instalacion", "arreglo", "arreglar", "garantia",
+        "soporte", "reparacion", "falla", "fallas", "problema", "problemas"
+    ),
+    "business_advice": (
+        "montar negocio", "emprender", "que me recomiendas",
+        "quiero empezar", "consejo", "asesoria", "que necesito",
+        "recomendacion", "que maquina conviene"
+    ),
+    "faq_hours_location": (
+        "horario", "horarios", "direccion", "ubicacion",
+        "como llegar", "abren", "cierran", "cuando abren",
+        "donde estan", "direccion de la tienda"
+    ),
+    "sell_machine": (
+        "vendo", "tengo una maquina", "quiero vender", "usada", "usadas",
+        "segunda", "segunda mano", "consignacion", "tengo para vender"
+    ),
+}
+
+# Saludos y pedidos genéricos que no dicen qué necesita
+AMBIGUOUS_KEYWORDS = ("hola", "buenas", "buenos", "buen", "dias", "tardes", "noches",
+                      "info", "informacion", "ayuda", "👋", "🤝")
+
 
 def classify_triage_intent(text: str) -> Tuple[str, float, bool]:
     """
@@ -31,76 +68,19 @@ def classify_triage_intent(text: str) -> Tuple[str, float, bool]:
         - confidence: 0.0-1.0
         - is_ambiguous: True si el mensaje es ambiguo (necesita triage)
     """
-    text_lower = normalize_text(text)
+    return _classify_triage_normalized(normalize_text(text))
+
+
+def _classify_triage_normalized(text_lower: str) -> Tuple[str, float, bool]:
+    """classify_triage_intent sobre texto ya normalizado (normalize_text)."""
     words = text_lower.split()
-    
-    # Keywords por intent
-    buy_machine_keywords = [
-        "industrial", "familiar", "máquina", "maquina", "precio", "promo", "promoción",
-        "recta", "fileteadora", "overlock", "singer", "kingter", "kansew", "union",
-        "comprar", "quiero", "necesito", "busco", "cotización", "cotizacion"
-    ]
-    
-    spare_parts_keywords = [
-        "repuesto", "repuestos", "pieza", "piezas", "aguja", "agujas", "bobina", "bobinas",
-        "prensatela", "prensatelas", "motor", "correa", "correas", "placa", "placa de identificación"
-    ]
-    
-    tech_support_keywords = [
-        "daño", "dano", "no prende", "no funciona", "ruido", "ruidoso", "mantenimiento",
-        "instalación", "instalacion", "arreglo", "arreglar", "garantía", "garantia",
-        "soporte", "reparación", "reparacion", "falla", "fallas", "problema", "problemas"
-    ]
-    
-    business_advice_keywords = [
-        "montar negocio", "emprender", "qué me recomiendas", "que me recomiendas",
-        "quiero empezar", "consejo", "asesoría", "asesoria", "qué necesito", "que necesito",
-        "recomendación", "recomendacion", "qué máquina conviene", "que maquina conviene"
-    ]
-    
-    faq_hours_location_keywords = [
-        "horario", "horarios", "dirección", "direccion", "ubicación", "ubicacion",
-        "cómo llegar", "como llegar", "abren", "cierran", "cuándo abren", "cuando abren",
-        "dónde están", "donde estan", "dirección de la tienda", "direccion de la tienda"
-    ]
-    
-    sell_machine_keywords = [
-        "vendo", "tengo una máquina", "tengo una maquina", "quiero vender", "usada", "usadas",
-        "segunda", "segunda mano", "consignación", "consignacion", "tengo para vender"
-    ]
-    
+
     # Detectar intents con keywords (reglas determinísticas)
     intent_scores = {}
-    
-    # buy_machine
-    buy_score = sum(1 for kw in buy_machine_keywords if kw in text_lower)
-    if buy_score > 0:
-        intent_scores["buy_machine"] = min(buy_score / 2.0, 1.0)  # Normalizar
-    
-    # spare_parts
-    spare_score = sum(1 for kw in spare_parts_keywords if kw in text_lower)
-    if spare_score > 0:
-        intent_scores["spare_parts"] = min(spare_score / 2.0, 1.0)
-    
-    # tech_support
-    tech_score = sum(1 for kw in tech_support_keywords if kw in text_lower)
-    if tech_score > 0:
-        intent_scores["tech_support"] = min(tech_score / 2.0, 1.0)
-    
-    # business_advice
-    advice_score = sum(1 for kw in business_advice_keywords if kw in text_lower)
-    if advice_score > 0:
-        intent_scores["business_advice"] = min(advice_score / 2.0, 1.0)
-    
-    # faq_hours_location
-    faq_score = sum(1 for kw in faq_hours_location_keywords if kw in text_lower)
-    if faq_score > 0:
-        intent_scores["faq_hours_location"] = min(faq_score / 2.0, 1.0)
-    
-    # sell_machine
-    sell_score = sum(1 for kw in sell_machine_keywords if kw in text_lower)
-    if sell_score > 0:
-        intent_scores["sell_machine"] = min(sell_score / 2.0, 1.0)
+    for intent, keywords in TRIAGE_KEYWORDS.items():
+        score = sum(1 for kw in keywords if kw in text_lower)
+        if score > 0:
+            intent_scores[intent] = min(score / 2.0, 1.0)  # Normalizar
     
     # Si hay un intent con score alto, retornarlo
     if intent_scores:
@@ -109,11 +89,8 @@ def classify_triage_intent(text: str) -> Tuple[str, float, bool]:
             return best_intent[0], best_intent[1], False
     
     # Si el mensaje es muy corto o ambiguo (hola, buenas, info, etc.)
-    ambiguous_keywords = ["hola", "buenas", "buenos", "buen", "días", "dias", "tardes", "noches",
-                          "info", "información", "informacion", "ayuda", "👋", "🤝"]
-    
     is_ambiguous = (
-        len(words) <= 3 and any(kw in text_lower for kw in ambiguous_keywords)
+        len(words) <= 3 and any(kw in text_lower for kw in AMBIGUOUS_KEYWORDS)
     ) or (
         len(words) <= 2
     )
@@ -125,6 +102,11 @@ def classify_triage_intent(text: str) -> Tuple[str, float, bool]:
     return "other", 0.3, True
 
 
+def classify_triage_intent_batch(texts: Iterable[str], workers: int = 0) -> List[Tuple[str, float, bool]]:
+    """classify_triage_intent para muchos textos, en el mismo orden (ver app/rules/batch.py)."""
+    return classify_batch(_classify_triage_normalized, texts, workers=workers)
+
+
 def generate_triage_greeting(state: Optional[dict] = None, ambiguous_turns: int = 0, conversation_id: Optional[str] = None) -> str:
     """
     Genera el mensaje de triage para mensajes ambiguos.
@@ -185,16 +167,16 @@ def parse_triage_response(text: str) -> Optional[str]:
         return mapping.get(num)
     
     # Detectar por keywords en la respuesta
-    if any(kw in text_lower for kw in ["comprar", "máquina", "maquina", "precio", "industrial", "familiar"]):
+    if any(kw in text_lower for kw in ["comprar", "maquina", "precio", "industrial", "familiar"]):
         return "buy_machine"
     
     if any(kw in text_lower for kw in ["repuesto", "repuestos", "pieza", "aguja", "bobina"]):
         return "spare_parts"
     
-    if any(kw in text_lower for kw in ["soporte", "garantía", "garantia", "reparación", "reparacion", "arreglo"]):
+    if any(kw in text_lower for kw in ["soporte", "garantia", "reparacion", "arreglo"]):
         return "tech_support"
     
-    if any(kw in text_lower for kw in ["asesoría", "asesoria", "consejo", "recomendación", "recomendacion", "emprender", "negocio"]):
+    if any(kw in text_lower for kw in ["asesoria", "consejo", "recomendacion", "emprender", "negocio"]):
         return "business_advice"
     
     return None
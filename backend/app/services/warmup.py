@@ -0,0 +1,177 @@
+"""
+Warm-up del arranque: deja calientes las estructuras del camino crítico antes de
+que /health declare la app lista, para que el primer cliente tras un deploy no
+pague la carga del catálogo, las reglas, la DB ni los handshakes TLS.
+
+Etapas (cada una queda medida en el perfil de arranque como warmup.*):
+- catalog: catalog_index.json y catálogo del filesystem
+- rules: patrones de intención y keywords ejercitados con mensajes de muestra
+- db: páginas de las tablas calientes en el page cache
+- connections: conexiones keep-alive a Graph API / OpenAI (solo si están habilitados)
+- pipeline: un mensaje sintético por build_response con upstreams apagados
+
+Las etapas síncronas corren en un hilo (asyncio.to_thread) y con las métricas
+de /metrics suspendidas; el mensaje sintético usa el canal WARMUP_CHANNEL, que
+no guarda traza ni entra en la ventana de métricas en memoria. Un fallo en una
+etapa se registra y no bloquea las siguientes.
+"""
+import asyncio
+import importlib
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+from app.config import (
+    WARMUP_CONNECT_TIMEOUT_SECONDS,
+    WHATSAPP_ENABLED,
+    OPENAI_ENABLED,
+    OPENAI_API_KEY,
+)
+from app.startup import startup_phase
+from app.logging_config import logger
+
+
+WARMUP_SAMPLE_MESSAGES = [
+    "Hola, buenos días",
+    "¿Cuánto cuesta la máquina familiar Singer?",
+    "Necesito una fileteadora industrial para mi taller",
+    "¿Tienen repuestos y hacen envíos a Montería?",
+    "asdkjh",
+]
+
+WARMUP_PIPELINE_MESSAGE = "Hola, busco una máquina de coser para emprender, ¿qué precios manejan?"
+
+# Tablas leídas en cada mensaje
+_HOT_TABLES = ["conversations", "messages", "interaction_traces", "wa_processed_messages"]
+
+# Módulos con flags que habilitan llamadas salientes (se apagan durante el pipeline sintético)
+_UPSTREAM_FLAGS = {
+    "OPENAI_ENABLED": [
+        "app.services.response_service",
+        "app.services.llm_adapter",
+        "app.services.humanizer",
+        "app.services.openai_planner",
+        "app.services.openai_classifier",
+        "app.services.conversation_continuity_service",
+        "app.rules.enhanced_filtering",
+    ],
+    "WHATSAPP_ENABLED": [
+        "app.services.whatsapp_service",
+    ],
+}
+
+
+def _warm_catalog() -> Dict[str, Any]:
+    from app.services.asset_service import load_catalog_index, load_catalog_from_filesystem
+    return {
+        "catalog_index": len(load_catalog_index()),
+        "catalog_filesystem": len(load_catalog_from_filesystem()),
+    }
+
+
+def _warm_rules() -> Dict[str, Any]:
+    from app.rules.keywords import normalize_text
+    from app.rules.normalization import get_typo_index
+    from app.rules.business_guardrails import classify_message_type, is_business_related
+    from app.services.intent_service import analyze_intent
+
+    typo_index = get_typo_index()
+    for text in WARMUP_SAMPLE_MESSAGES:
+        normalize_text(text)
+        classify_message_type(text)
+        is_business_related(text)
+        analyze_intent(text, [])
+    return {"messages": len(WARMUP_SAMPLE_MESSAGES), "typo_vocabulary": len(typo_index.vocabulary)}
+
+
+def _warm_db() -> Dict[str, Any]:
+    from app.models.database import get_db
+
+    rows = {}
+    with get_db() as conn:
+        for table in _HOT_TABLES:
+            rows[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    return rows
+
+
+def _upstream_origins() -> List[str]:
+    origins = []
+    if WHATSAPP_ENABLED:
+        origins.append("https://graph.facebook.com")
+    if OPENAI_ENABLED and OPENAI_API_KEY:
+        origins.append("https://api.openai.com")
+    return origins
+
+
+@contextmanager
+def _upstreams_disabled():
+    """Apaga temporalmente OpenAI/WhatsApp en los módulos que los consultan."""
+    previous = []
+    try:
+        for flag, module_names in _UPSTREAM_FLAGS.items():
+            for module_name in module_names:
+                module = importlib.import_module(module_name)
+                if hasattr(module, flag):
+                    previous.append((module, flag, getattr(module, flag)))
+                    setattr(module, flag, False)
+        yield
+    finally:
+        for module, flag, value in previous:
+            setattr(module, flag, value)
+
+
+def _warm_pipeline() -> Dict[str, Any]:
+    from app.services.response_service import build_response
+    from app.services.trace_service import WARMUP_CHANNEL
+    from app.models.database import delete_conversation_data
+
+    conversation_id = f"__warmup__{os.getpid()}"
+    try:
+        with _upstreams_disabled():
+            result = build_response(WARMUP_PIPELINE_MESSAGE, conversation_id, channel=WARMUP_CHANNEL)
+    finally:
+        # Mensajes y conversación del mensaje sintético (la traza ya no se guarda)
+        delete_conversation_data(conversation_id)
+    return {"reply_chars": len(result.get("text") or "")}
+
+
+async def run_warmup() -> Dict[str, Any]:
+    """
+    Ejecuta todas las etapas del warm-up.
+
+    Returns:
+        {etapa: {"ok": bool, ...detalle o "error"}}
+    """
+    from app.services.http_pool import prewarm_connections
+
+    report: Dict[str, Any] = {}
+
+    for name, stage in [("catalog", _warm_catalog), ("rules", _warm_rules), ("db", _warm_db)]:
+        with startup_phase(f"warmup.{name}"):
+            report[name] = await asyncio.to_thread(_run_stage, name, stage)
+
+    origins = _upstream_origins()
+    if origins:
+        with startup_phase("warmup.connections"):
+            connected = await prewarm_connections(origins, timeout=WARMUP_CONNECT_TIMEOUT_SECONDS)
+            report["connections"] = {"ok": all(connected.values()), **connected}
+
+    with startup_phase("warmup.pipeline"):
+        report["pipeline"] = await asyncio.to_thread(_run_stage, "pipeline", _warm_pipeline)
+
+    logger.info(
+        "Warm-up completado",
+        failed=[name for name, stage in report.items() if not stage["ok"]]
+    )
+    return report
+
+
+def _run_stage(name: str, stage) -> Dict[str, Any]:
+    from app.services.metrics import suppressed
+
+    try:
+        with suppressed():
+            return {"ok": True, **stage()}
+    except Exception as e:
+        logger.warning("Etapa de warm-up falló", stage=name, error=f"{type(e).__name__}: {e}")
+        return {"ok": False, "error": type(e).__name__}
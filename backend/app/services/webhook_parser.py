@@ -0,0 +1,132 @@
+"""
+Decodificador del webhook de WhatsApp Cloud API en una sola pasada.
+
+Meta puede agrupar varios entries, changes y mensajes en un mismo POST; el
+decodificador recorre el cuerpo una vez y devuelve todos los mensajes y
+statuses como objetos tipados, en el orden en que llegaron.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+from app.logging_config import logger
+
+
+@dataclass(slots=True)
+class InboundMessage:
+    """Mensaje entrante de un cliente."""
+    message_id: str
+    phone_from: str
+    type: str
+    text: str = ""
+    timestamp: str = ""
+    contact_name: Optional[str] = None
+    phone_number_id: Optional[str] = None
+
+    @property
+    def is_text(self) -> bool:
+        return self.type == "text"
+
+
+@dataclass(slots=True)
+class StatusEvent:
+    """Actualización de estado (sent/delivered/read/failed) de un mensaje enviado."""
+    message_id: str
+    status: str
+    recipient_id: str = ""
+    timestamp: str = ""
+    phone_number_id: Optional[str] = None
+    error_code: Optional[int] = None
+    error_title: Optional[str] = None
+
+
+@dataclass(slots=True)
+class WebhookBatch:
+    """Todo lo que trae un POST del webhook."""
+    messages: List[InboundMessage] = field(default_factory=list)
+    statuses: List[StatusEvent] = field(default_factory=list)
+
+    @property
+    def event_kind(self) -> str:
+        if self.messages and self.statuses:
+            return "mixed"
+        if self.messages:
+            return "messages"
+        if self.statuses:
+            return "statuses"
+        return "unknown"
+
+    @property
+    def text_messages(self) -> List[InboundMessage]:
+        return [message for message in self.messages if message.is_text]
+
+
+def _as_list(value: Any) -> list:
+    return value if isinstance(value, list) else []
+
+
+def _as_dict(value: Any) -> dict:
+    return value if isinstance(value, dict) else {}
+
+
+def _decode_value(value: dict, batch: WebhookBatch) -> None:
+    """Agrega al batch los mensajes y statuses de un change.value."""
+    phone_number_id = _as_dict(value.get("metadata")).get("phone_number_id")
+
+    names: Dict[str, Optional[str]] = {}
+    first_name = None
+    for index, contact in enumerate(_as_list(value.get("contacts"))):
+        contact = _as_dict(contact)
+        name = _as_dict(contact.get("profile")).get("name")
+        names[contact.get("wa_id", "")] = name
+        if index == 0:
+            first_name = name
+
+    for raw in _as_list(value.get("messages")):
+        raw = _as_dict(raw)
+        message_type = raw.get("type", "")
+        phone_from = raw.get("from", "")
+        batch.messages.append(InboundMessage(
+            message_id=raw.get("id", ""),
+            phone_from=phone_from,
+            type=message_type,
+            text=_as_dict(raw.get("text")).get("body", "") if message_type == "text" else "",
+            timestamp=raw.get("timestamp", ""),
+            contact_name=names.get(phone_from, first_name),
+            phone_number_id=phone_number_id,
+        ))
+
+    for raw in _as_list(value.get("statuses")):
+        raw = _as_dict(raw)
+        errors = _as_list(raw.get("errors"))
+        error = _as_dict(errors[0]) if errors else {}
+        batch.statuses.append(StatusEvent(
+            message_id=raw.get("id", ""),
+            status=raw.get("status", ""),
+            recipient_id=raw.get("recipient_id", ""),
+            timestamp=raw.get("timestamp", ""),
+            phone_number_id=phone_number_id,
+            error_code=error.get("code"),
+            error_title=error.get("title"),
+        ))
+
+
+def decode_webhook(body: Union[bytes, str, Dict[str, Any]]) -> WebhookBatch:
+    """
+    Decodifica el cuerpo del webhook (bytes crudos o dict ya parseado).
+
+    Raises:
+        ValueError: si el cuerpo no es JSON válido
+    """
+    if isinstance(body, (bytes, str)):
+        body = json.loads(body)
+
+    batch = WebhookBatch()
+    for entry in _as_list(_as_dict(body).get("entry")):
+        for change in _as_list(_as_dict(entry).get("changes")):
+            try:
+                _decode_value(_as_dict(_as_dict(change).get("value")), batch)
+            except Exception as e:
+                # Un change malformado no debe tumbar el resto del batch
+                logger.error("Error decodificando change del webhook", error=str(e))
+    return batch
@@ -1,7 +1,7 @@
 """
 Servicio de integración con WhatsApp Cloud API.
 """
-import httpx
+from pathlib import Path
 from typing import Optional, Dict, Any, Tuple
 import json
 import asyncio
@@ -12,24 +12,46 @@ from app.config import (
     WHATSAPP_ACCESS_TOKEN,
     WHATSAPP_PHONE_NUMBER_ID,
     WHATSAPP_API_VERSION,
+    WHATSAPP_MEDIA_TTL_HOURS,
     LUISA_HUMAN_NOTIFY_NUMBER,
     TECNICO_NOTIFY_NUMBER
 )
 from app.models.schemas import Team
-from app.models.database import check_outbox_dedup
+from app.models.database import (
+    check_outbox_dedup,
+    get_wa_media_id,
+    save_wa_media_id,
+    delete_wa_media_id
+)
 from app.logging_config import logger
+from app.services.webhook_parser import decode_webhook
+from app.services.outbound_queue import (
+    SendResult,
+    SEND_OK,
+    SEND_RETRY,
+    SEND_FATAL,
+    SEND_QUEUED,
+    dispatch_send,
+    parse_retry_after
+)
+from app.services.metrics import CACHE_LOOKUPS, WHATSAPP_SEND_SECONDS
 
 
 # URL base de la API de WhatsApp
 WHATSAPP_API_BASE = f"https://graph.facebook.com/{WHATSAPP_API_VERSION}"
 
+# Códigos de la Graph API por límite de throughput/spam (se reintentan con backoff)
+GRAPH_THROTTLING_CODES = {4, 80007, 130429, 131048, 131056}
+
 
 async def send_whatsapp_message(
     to: str,
     text: str,
-    retry_count: int = 2,
+    retry_count: Optional[int] = None,
     conversation_id: Optional[str] = None,
-    message_id: Optional[str] = None
+    message_id: Optional[str] = None,
+    dedup: bool = True,
+    allow_queue: bool = True
 ) -> Tuple[bool, Optional[str]]:
     """
     Envía un mensaje de WhatsApp.
@@ -37,17 +59,20 @@ async def send_whatsapp_message(
     Args:
         to: Número de destino (con código de país, ej: +573142156486)
         text: Texto del mensaje
-        retry_count: Número de reintentos en caso de fallo
+        retry_count: Reintentos diferidos en la cola de salida (default WHATSAPP_SEND_MAX_RETRIES)
         conversation_id: ID de conversación (opcional, para logging)
         message_id: ID del mensaje original (opcional, para logging)
+        dedup: Aplicar el anti-spam de outbox (False para notificaciones internas,
+            donde dos casos distintos pueden producir el mismo texto)
+        allow_queue: Usar la cola de salida si no se puede enviar en línea (False
+            cuando quien llama maneja sus propios reintentos)
     
     Returns:
-        Tuple[success, message_id o error]
+        Tuple[success, message_id o error]; (True, SEND_QUEUED) si quedó en la cola de salida
     """
     start_time = time.perf_counter()
     masked_phone = _mask_phone(to)
     error_code = None
-    final_message_id = None
     
     try:
         if not WHATSAPP_ENABLED:
@@ -82,7 +107,7 @@ async def send_whatsapp_message(
         phone = to.replace("+", "").replace(" ", "").replace("-", "")
         
         # ANTI-SPAM GUARD: Verificar deduplicación de outbox
-        if check_outbox_dedup(phone, text, ttl_seconds=120):
+        if dedup and check_outbox_dedup(phone, text, ttl_seconds=120):
             error_code = "outbox_dedup"
             latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
             logger.info(
@@ -97,13 +122,6 @@ async def send_whatsapp_message(
             )
             return False, "Mensaje duplicado reciente (anti-spam)"
         
-        url = f"{WHATSAPP_API_BASE}/{WHATSAPP_PHONE_NUMBER_ID}/messages"
-        
-        headers = {
-            "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "messaging_product": "whatsapp",
             "recipient_type": "individual",
@@ -115,77 +133,19 @@ async def send_whatsapp_message(
             }
         }
 
-        for attempt in range(retry_count + 1):
-            try:
-                async with httpx.AsyncClient(timeout=8.0) as client:
-                    response = await client.post(url, headers=headers, json=payload)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        final_message_id = data.get("messages", [{}])[0].get("id")
-                        latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
-                        logger.info(
-                            "whatsapp_send_success",
-                            conversation_id=conversation_id or "unknown",
-                            message_id=final_message_id or "unknown",
-                            to=masked_phone,
-                            latency_ms=latency_ms
-                        )
-                        return True, final_message_id
-                    else:
-                        error_data = response.json()
-                        error_msg = error_data.get("error", {}).get("message", "Error desconocido")
-                        error_code = f"http_{response.status_code}"
-                        
-                        # No reintentar en errores de validación
-                        if response.status_code in [400, 401, 403]:
-                            latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
-                            logger.error(
-                                "whatsapp_send_failed",
-                                conversation_id=conversation_id or "unknown",
-                                message_id=message_id or "unknown",
-                                to=masked_phone,
-                                error_code=error_code,
-                                latency_ms=latency_ms,
-                                error=error_msg,
-                                attempt=attempt + 1
-                            )
-                            return False, error_msg
-                    
-            except httpx.TimeoutException:
-                error_code = "timeout"
-                if attempt == retry_count:
-                    latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
-                    logger.error(
-                        "whatsapp_send_failed",
-                        conversation_id=conversation_id or "unknown",
-                        message_id=message_id or "unknown",
-                        to=masked_phone,
-                        error_code=error_code,
-                        latency_ms=latency_ms,
-                        attempt=attempt + 1
-                    )
-            except Exception as e:
-                error_code = "exception"
-                if attempt == retry_count:
-                    latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
-                    logger.error(
-                        "whatsapp_send_failed",
-                        conversation_id=conversation_id or "unknown",
-                        message_id=message_id or "unknown",
-                        to=masked_phone,
-                        error_code=error_code,
-                        latency_ms=latency_ms,
-                        error=str(e),
-                        attempt=attempt + 1
-                    )
-            
-            # Esperar antes de reintentar
-            if attempt < retry_count:
-                await asyncio.sleep(1 * (attempt + 1))
-        
-        # Máximo de reintentos alcanzado
-        error_code = "max_retries"
+        return await _post_whatsapp_payload(
+            payload,
+            masked_phone=masked_phone,
+            start_time=start_time,
+            retry_count=retry_count,
+            conversation_id=conversation_id,
+            message_id=message_id,
+            allow_queue=allow_queue
+        )
+    
+    except Exception as e:
+        # Catch-all para cualquier error no esperado
+        error_code = "unexpected_error"
         latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
         logger.error(
             "whatsapp_send_failed",
@@ -194,26 +154,321 @@ async def send_whatsapp_message(
             to=masked_phone,
             error_code=error_code,
             latency_ms=latency_ms,
-            error="Máximo de reintentos alcanzado"
+            error=str(e)
         )
-        return False, "Máximo de reintentos alcanzado"
+        return False, str(e)
+
+
+async def _post_whatsapp_payload(
+    payload: Dict[str, Any],
+    masked_phone: str,
+    start_time: float,
+    retry_count: Optional[int] = None,
+    conversation_id: Optional[str] = None,
+    message_id: Optional[str] = None,
+    allow_queue: bool = True
+) -> Tuple[bool, Optional[str]]:
+    """
+    POST a /messages (compartido por texto y media). Un intento en línea; los
+    fallos transitorios quedan en la cola de salida (ver outbound_queue).
     
-    except Exception as e:
-        # Catch-all para cualquier error no esperado
-        error_code = "unexpected_error"
-        latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
+    Returns:
+        Tuple[success, message_id o error]; (True, SEND_QUEUED) si quedó encolado
+    """
+    success, result = await dispatch_send(
+        payload,
+        WHATSAPP_PHONE_NUMBER_ID,
+        post_whatsapp_payload_once,
+        max_retries=retry_count,
+        conversation_id=conversation_id,
+        allow_queue=allow_queue
+    )
+    latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
+    if success:
+        # Si quedó encolado, dispatch_send ya lo registró (whatsapp_send_queued)
+        if result != SEND_QUEUED:
+            logger.info(
+                "whatsapp_send_success",
+                conversation_id=conversation_id or "unknown",
+                message_id=result,
+                to=masked_phone,
+                latency_ms=latency_ms
+            )
+    else:
         logger.error(
             "whatsapp_send_failed",
             conversation_id=conversation_id or "unknown",
             message_id=message_id or "unknown",
             to=masked_phone,
-            error_code=error_code,
             latency_ms=latency_ms,
+            error=result
+        )
+    return success, result
+
+
+async def post_whatsapp_payload_once(payload: Dict[str, Any], phone_number_id: str) -> SendResult:
+    """Un intento de POST a /messages, clasificado como ok / retry / fatal."""
+    import httpx
+    from app.services.http_pool import get_async_http_client
+    
+    url = f"{WHATSAPP_API_BASE}/{phone_number_id}/messages"
+    headers = {
+        "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
+        "Content-Type": "application/json"
+    }
+    start = time.perf_counter()
+    try:
+        client = get_async_http_client()
+        response = await client.post(url, headers=headers, json=payload, timeout=8.0)
+    except httpx.TimeoutException:
+        WHATSAPP_SEND_SECONDS.observe(time.perf_counter() - start, "timeout")
+        return SendResult(SEND_RETRY, "Timeout", error_code="timeout")
+    except Exception as e:
+        WHATSAPP_SEND_SECONDS.observe(time.perf_counter() - start, "exception")
+        return SendResult(SEND_RETRY, str(e), error_code="exception")
+    
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+    
+    if response.status_code == 200:
+        WHATSAPP_SEND_SECONDS.observe(time.perf_counter() - start, "ok")
+        return SendResult(SEND_OK, data.get("messages", [{}])[0].get("id"))
+    
+    error = data.get("error", {}) if isinstance(data, dict) else {}
+    error_msg = error.get("message", "Error desconocido")
+    error_code = f"http_{response.status_code}"
+    WHATSAPP_SEND_SECONDS.observe(time.perf_counter() - start, error_code)
+    
+    throttled = response.status_code == 429 or error.get("code") in GRAPH_THROTTLING_CODES
+    if throttled or response.status_code >= 500:
+        return SendResult(
+            SEND_RETRY,
+            error_msg,
+            error_code=error_code,
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+            throttled=throttled
+        )
+    # Errores de validación/permisos: reintentar no sirve
+    return SendResult(SEND_FATAL, error_msg, error_code=error_code)
+
+
+# ============================================================================
+# ENVÍO DE MEDIA (imágenes / videos del catálogo)
+# ============================================================================
+
+# MIME aceptados por WhatsApp para mensajes image/video -> tipo de mensaje
+WHATSAPP_MEDIA_TYPES = {
+    "image/jpeg": "image",
+    "image/png": "image",
+    "video/mp4": "video",
+}
+
+# Uploads en curso: (content_hash, phone_number_id) -> future con el media_id
+_MEDIA_UPLOADS: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+class WhatsAppMediaError(Exception):
+    """Error subiendo media a WhatsApp."""
+
+
+async def upload_whatsapp_media(file_path: Path, mime_type: str) -> str:
+    """
+    Sube un archivo al endpoint /media de la Graph API.
+    
+    Returns:
+        media_id asignado por WhatsApp
+    
+    Raises:
+        WhatsAppMediaError: si la subida falla
+    """
+    import httpx
+    from app.services.http_pool import get_async_http_client
+    url = f"{WHATSAPP_API_BASE}/{WHATSAPP_PHONE_NUMBER_ID}/media"
+    content = await asyncio.to_thread(file_path.read_bytes)
+    
+    try:
+        client = get_async_http_client()
+        response = await client.post(
+            url,
+            headers={"Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}"},
+            data={"messaging_product": "whatsapp", "type": mime_type},
+            files={"file": (file_path.name, content, mime_type)},
+            timeout=30.0
+        )
+    except httpx.HTTPError as e:
+        raise WhatsAppMediaError(f"upload_{type(e).__name__}") from e
+    
+    if response.status_code != 200:
+        try:
+            error_msg = response.json().get("error", {}).get("message", "Error desconocido")
+        except ValueError:
+            error_msg = response.text[:100]
+        raise WhatsAppMediaError(f"upload_http_{response.status_code}: {error_msg}")
+    
+    media_id = response.json().get("id")
+    if not media_id:
+        raise WhatsAppMediaError("upload_sin_media_id")
+    return media_id
+
+
+async def _upload_and_cache(entry) -> str:
+    """Sube el archivo de una entrada del manifiesto y guarda su media_id."""
+    start_time = time.perf_counter()
+    media_id = await upload_whatsapp_media(entry.file_path, entry.mime_type)
+    save_wa_media_id(
+        entry.content_hash,
+        WHATSAPP_PHONE_NUMBER_ID,
+        media_id,
+        entry.mime_type,
+        ttl_seconds=WHATSAPP_MEDIA_TTL_HOURS * 3600
+    )
+    logger.info(
+        "whatsapp_media_uploaded",
+        image_id=entry.image_id,
+        size_bytes=entry.size,
+        latency_ms=round((time.perf_counter() - start_time) * 1000, 1)
+    )
+    return media_id
+
+
+async def get_or_upload_media_id(entry) -> Tuple[str, bool]:
+    """
+    Obtiene el media_id de un asset, subiéndolo solo si no está en cache.
+    
+    El cache es por hash de contenido: el mismo archivo se sube una vez por número
+    de negocio, y uploads concurrentes del mismo archivo comparten una sola subida.
+    
+    Returns:
+        Tuple[media_id, from_cache]
+    """
+    cached = get_wa_media_id(entry.content_hash, WHATSAPP_PHONE_NUMBER_ID)
+    CACHE_LOOKUPS.inc("wa_media", "hit" if cached else "miss")
+    if cached:
+        return cached, True
+    
+    key = (entry.content_hash, WHATSAPP_PHONE_NUMBER_ID)
+    future = _MEDIA_UPLOADS.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_upload_and_cache(entry))
+        _MEDIA_UPLOADS[key] = future
+        future.add_done_callback(lambda _: _MEDIA_UPLOADS.pop(key, None))
+    
+    return await asyncio.shield(future), False
+
+
+async def send_whatsapp_media(
+    to: str,
+    image_id: str,
+    caption: Optional[str] = None,
+    retry_count: Optional[int] = None,
+    conversation_id: Optional[str] = None,
+    message_id: Optional[str] = None
+) -> Tuple[bool, Optional[str]]:
+    """
+    Envía un asset del catálogo (imagen o video) por WhatsApp.
+    
+    Las imágenes se envían en su derivado medium (si existe). El archivo se sube una
+    sola vez y luego se referencia por media_id; si WhatsApp rechaza un media_id
+    cacheado, se invalida y se vuelve a subir una vez.
+    
+    Args:
+        to: Número de destino
+        image_id: ID del asset en el manifiesto
+        caption: Texto opcional bajo la imagen/video
+    
+    Returns:
+        Tuple[success, message_id o error]
+    """
+    from app.services.asset_manifest import get_asset_entry
+    from app.services.asset_derivatives import select_asset_variant
+    
+    start_time = time.perf_counter()
+    masked_phone = _mask_phone(to)
+    
+    try:
+        if not WHATSAPP_ENABLED:
+            return False, "WhatsApp deshabilitado"
+        if not WHATSAPP_ACCESS_TOKEN or not WHATSAPP_PHONE_NUMBER_ID:
+            return False, "Configuración incompleta"
+        
+        entry = get_asset_entry(image_id)
+        if not entry or not entry.valid:
+            return False, f"Asset {image_id} no disponible"
+        
+        variant = select_asset_variant(entry, "medium")
+        media_type = WHATSAPP_MEDIA_TYPES.get(variant.mime_type)
+        if not media_type:
+            return False, f"Tipo de media no soportado: {variant.mime_type}"
+        
+        phone = to.replace("+", "").replace(" ", "").replace("-", "")
+        
+        for upload_attempt in range(2):
+            try:
+                media_id, from_cache = await get_or_upload_media_id(variant)
+            except WhatsAppMediaError as e:
+                logger.error(
+                    "whatsapp_send_failed",
+                    conversation_id=conversation_id or "unknown",
+                    message_id=message_id or "unknown",
+                    to=masked_phone,
+                    error_code="media_upload_failed",
+                    image_id=image_id,
+                    latency_ms=round((time.perf_counter() - start_time) * 1000, 1),
+                    error=str(e)
+                )
+                return False, str(e)
+            
+            media = {"id": media_id}
+            if caption:
+                media["caption"] = caption
+            payload = {
+                "messaging_product": "whatsapp",
+                "recipient_type": "individual",
+                "to": phone,
+                "type": media_type,
+                media_type: media
+            }
+            
+            success, result = await _post_whatsapp_payload(
+                payload,
+                masked_phone=masked_phone,
+                start_time=start_time,
+                retry_count=retry_count,
+                conversation_id=conversation_id,
+                message_id=message_id
+            )
+            
+            if success or not from_cache or upload_attempt > 0:
+                logger.info(
+                    "whatsapp_media_send",
+                    conversation_id=conversation_id or "unknown",
+                    image_id=image_id,
+                    media_type=media_type,
+                    media_cache_hit=from_cache,
+                    success=success
+                )
+                return success, result
+            
+            # El media_id cacheado pudo expirar en WhatsApp: invalidar y subir de nuevo
+            delete_wa_media_id(variant.content_hash, WHATSAPP_PHONE_NUMBER_ID)
+        
+        return False, "Error enviando media"
+    
+    except Exception as e:
+        logger.error(
+            "whatsapp_send_failed",
+            conversation_id=conversation_id or "unknown",
+            message_id=message_id or "unknown",
+            to=masked_phone,
+            error_code="unexpected_error",
+            image_id=image_id,
+            latency_ms=round((time.perf_counter() - start_time) * 1000, 1),
             error=str(e)
         )
         return False, str(e)
 
-
 async def send_internal_notification(notification_text: str, team: Optional[str] = None) -> Tuple[bool, Optional[str]]:
     """
     Envía una notificación interna según el equipo.
@@ -234,120 +489,50 @@ async def send_internal_notification(notification_text: str, team: Optional[str]
 
 def parse_webhook_message(body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
-    Parsea el cuerpo de un webhook de WhatsApp y extrae el mensaje.
+    Primer mensaje de texto del webhook (compatibilidad).
+    El router usa decode_webhook(), que entrega todos los mensajes del batch.
     
     Returns:
-        Dict con phone_from, text, message_id o None si no es un mensaje válido
+        Dict con phone_from, text, message_id o None si no hay mensaje de texto
     """
     try:
-        entry = body.get("entry", [])
-        if not entry:
-            return None
-        
-        changes = entry[0].get("changes", [])
-        if not changes:
-            return None
-        
-        value = changes[0].get("value", {})
-        
-        # Verificar que hay mensajes
-        messages = value.get("messages", [])
-        if not messages:
-            return None
-        
-        message = messages[0]
-        
-        # Solo procesar mensajes de texto por ahora
-        if message.get("type") != "text":
-            logger.info("Mensaje no es de texto, ignorando", type=message.get("type"))
-            return None
-        
-        # Extraer datos
-        phone_from = message.get("from", "")
-        text = message.get("text", {}).get("body", "")
-        message_id = message.get("id", "")
-        timestamp = message.get("timestamp", "")
-        
-        # Obtener nombre del contacto si está disponible
-        contacts = value.get("contacts", [])
-        contact_name = None
-        if contacts:
-            contact_name = contacts[0].get("profile", {}).get("name")
-        
-        return {
-            "phone_from": phone_from,
-            "text": text,
-            "message_id": message_id,
-            "timestamp": timestamp,
-            "contact_name": contact_name
-        }
-        
+        messages = decode_webhook(body).text_messages
     except Exception as e:
         logger.error("Error parseando webhook WhatsApp", error=str(e))
         return None
+    if not messages:
+        return None
+    
+    message = messages[0]
+    return {
+        "phone_from": message.phone_from,
+        "text": message.text,
+        "message_id": message.message_id,
+        "timestamp": message.timestamp,
+        "contact_name": message.contact_name
+    }
 
 
 def is_status_update(body: Dict[str, Any]) -> bool:
     """
     Verifica si el webhook es una actualización de estado (no un mensaje).
     """
-    try:
-        entry = body.get("entry", [])
-        if not entry:
-            return False
-        
-        changes = entry[0].get("changes", [])
-        if not changes:
-            return False
-        
-        value = changes[0].get("value", {})
-        
-        # Si tiene "statuses" y NO tiene "messages", es actualización de estado
-        has_statuses = "statuses" in value and bool(value.get("statuses"))
-        has_messages = "messages" in value and bool(value.get("messages"))
-        
-        return has_statuses and not has_messages
-    except:
-        return False
+    return analyze_webhook_event(body)["event_kind"] == "statuses"
 
 
 def analyze_webhook_event(body: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Analiza el webhook para instrumentación forense.
-    Compatible con la función en routers/whatsapp.py
+    Analiza el webhook para instrumentación forense (todos los entries y changes).
     """
     try:
-        entry = body.get("entry", [])
-        if not entry:
-            return {"event_kind": "unknown", "has_messages": False, "has_statuses": False}
-        
-        changes = entry[0].get("changes", [])
-        if not changes:
-            return {"event_kind": "unknown", "has_messages": False, "has_statuses": False}
-        
-        value = changes[0].get("value", {})
-        messages = value.get("messages", [])
-        statuses = value.get("statuses", [])
-        
-        has_messages = bool(messages)
-        has_statuses = bool(statuses)
-        
-        if has_statuses and not has_messages:
-            event_kind = "statuses"
-        elif has_messages and not has_statuses:
-            event_kind = "messages"
-        elif has_messages and has_statuses:
-            event_kind = "mixed"
-        else:
-            event_kind = "unknown"
-        
-        return {
-            "event_kind": event_kind,
-            "has_messages": has_messages,
-            "has_statuses": has_statuses
-        }
-    except:
+        batch = decode_webhook(body)
+    except Exception:
         return {"event_kind": "error", "has_messages": False, "has_statuses": False}
+    return {
+        "event_kind": batch.event_kind,
+        "has_messages": bool(batch.messages),
+        "has_statuses": bool(batch.statuses)
+    }
 
 
 def get_phone_conversation_id(phone: str) -> str:
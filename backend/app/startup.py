@@ -0,0 +1,157 @@
+"""
+Perfil de arranque: tiempos por fase y estado del arranque.
+
+Se importa antes que cualquier otro módulo de la app (solo usa la stdlib) para que
+el reloj arranque lo más cerca posible del inicio del proceso. Las integraciones
+opcionales (httpx, Google Drive, Pillow, OpenAI) se importan dentro de las
+funciones que las usan: el arranque solo paga FastAPI, config y la DB.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+
+_STARTED_AT = time.perf_counter()
+_PHASES: List[Dict[str, Any]] = []
+_COMPLETED_AT: Optional[float] = None
+_WARMUP: Optional[Dict[str, Any]] = None
+
+
+@contextmanager
+def startup_phase(name: str):
+    """
+    Mide una fase del arranque.
+
+    Uso:
+        with startup_phase("init_db"):
+            init_db()
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, start)
+
+
+def record_phase(name: str, start: float) -> None:
+    """Registra una fase que empezó en start (time.perf_counter())."""
+    global _STARTED_AT
+    # Una fase medida antes de importar este módulo adelanta el inicio del perfil
+    _STARTED_AT = min(_STARTED_AT, start)
+    _PHASES.append({
+        "phase": name,
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+    })
+
+
+def mark_startup_complete(warmup: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Cierra el perfil de arranque (la app pasa a lista) y lo deja en el log.
+
+    Args:
+        warmup: resultado por etapa del warm-up, si corrió
+    """
+    global _COMPLETED_AT, _WARMUP
+    _COMPLETED_AT = time.perf_counter()
+    _WARMUP = warmup
+    report = get_startup_report()
+
+    from app.logging_config import logger
+    logger.info(
+        "Arranque completado",
+        total_ms=report["total_ms"],
+        phases={p["phase"]: p["ms"] for p in report["phases"]}
+    )
+    return report
+
+
+def is_ready() -> bool:
+    """True cuando terminó el arranque, incluido el warm-up."""
+    return _COMPLETED_AT is not None
+
+
+def get_startup_report() -> Dict[str, Any]:
+    """
+    Desglose del arranque.
+
+    Returns:
+        {"complete": bool, "total_ms": float, "phases": [{"phase", "ms"}, ...], "warmup": {...} | None}
+    """
+    end = _COMPLETED_AT if _COMPLETED_AT is not None else time.perf_counter()
+    return {
+        "complete": _COMPLETED_AT is not None,
+        "total_ms": round((end - _STARTED_AT) * 1000, 1),
+        "phases": list(_PHASES),
+        "warmup": _WARMUP,
+    }
+
+
+def reset_startup_profile() -> None:
+    """Reinicia el perfil (tests)."""
+    global _STARTED_AT, _COMPLETED_AT, _WARMUP
+    _STARTED_AT = time.perf_counter()
+    _COMPLETED_AT = None
+    _WARMUP = None
+    _PHASES.clear()
+
+
+# ============================================================================
+# LOOPS EN SEGUNDO PLANO (compartidos por main.py y app/main.py)
+# ============================================================================
+
+def start_background_tasks(whatsapp_enabled: bool) -> List[asyncio.Task]:
+    """
+    Arranca los loops periódicos de la app (cada uno con intervalo 0 queda apagado).
+    Los de WhatsApp solo con whatsapp_enabled. Llamar desde el lifespan, con el
+    event loop corriendo.
+    """
+    from app import config
+    from app.services.asset_manifest import run_asset_manifest_refresh_loop
+    from app.services.live_metrics import run_live_metrics_persist_loop
+    from app.services.notification_worker import run_notification_worker_loop
+    from app.services.outbound_queue import run_outbound_dispatch_loop
+    from app.services.status_ingest import run_status_flush_loop
+    from app.services.trace_rollups import run_trace_maintenance_loop
+
+    loops = [
+        # Rollups y retención de interaction_traces
+        (run_trace_maintenance_loop, config.TRACE_MAINTENANCE_INTERVAL_SECONDS, True),
+        # Imágenes agregadas o reemplazadas con la app corriendo
+        (run_asset_manifest_refresh_loop, config.ASSET_MANIFEST_REFRESH_INTERVAL_SECONDS, True),
+        # Ventana de /api/ops/snapshot en live_metrics_state
+        (run_live_metrics_persist_loop, config.LIVE_METRICS_PERSIST_INTERVAL_SECONDS, True),
+        # Reintentos de envíos de WhatsApp pendientes (también los de antes del reinicio)
+        (run_outbound_dispatch_loop, config.WHATSAPP_OUTBOUND_DISPATCH_INTERVAL_SECONDS, whatsapp_enabled),
+        # Statuses de entrega acumulados en el webhook
+        (run_status_flush_loop, config.WHATSAPP_STATUS_FLUSH_INTERVAL_SECONDS, whatsapp_enabled),
+        # Notificaciones internas de handoff (process_handoff solo las encola)
+        (run_notification_worker_loop, config.NOTIFICATION_WORKER_INTERVAL_SECONDS, whatsapp_enabled),
+    ]
+    return [
+        asyncio.create_task(loop(interval_seconds))
+        for loop, interval_seconds, enabled in loops
+        if enabled and interval_seconds > 0
+    ]
+
+
+async def stop_background_tasks(tasks: List[asyncio.Task]) -> None:
+    """
+    Cancela los loops y espera a que terminen antes de bajar lo que usan; luego
+    guarda la ventana de métricas, los statuses pendientes y cierra los clientes HTTP.
+    """
+    from app.logging_config import logger
+    from app.services.http_pool import close_http_clients
+    from app.services.live_metrics import persist_live_metrics
+    from app.services.status_ingest import flush_statuses
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+        persist_live_metrics()
+    except Exception as e:
+        logger.error("Error persistiendo métricas en memoria", error=str(e))
+    # Statuses que quedaron en el buffer (menos de WHATSAPP_STATUS_FLUSH_BATCH)
+    flush_statuses()
+    await close_http_clients()
@@ -12,6 +12,9 @@ Sistema mejorado con detección de:
 from typing import Dict, List, Optional
 from enum import Enum
 
+from app.rules.keywords import normalize_text
+from app.rules.locations import extract_location
+
 
 class IntentType(Enum):
     """Tipos de intención primaria del usuario"""
@@ -54,81 +57,73 @@ class IntentAnalyzer:
         self.intent_patterns = {
             # === INTENCIONES DE FLUJO CONVERSACIONAL (prioridad alta) ===
             IntentType.CONFIRMAR: [
-                "si", "sí", "ok", "dale", "claro", "perfecto", "bueno", "vale",
-                "está bien", "esta bien", "listo", "de acuerdo", "correcto",
-                "exacto", "eso", "así es", "asi es", "afirmativo", "por favor",
-                "muestrame", "muéstrame", "enséñame", "ensename", "a ver", 
-                "quiero ver", "me interesa"
+                "si", "ok", "dale", "claro", "perfecto", "bueno", "vale",
+                "esta bien", "listo", "de acuerdo", "correcto", "exacto",
+                "eso", "asi es", "afirmativo", "por favor", "muestrame",
+                "ensename", "a ver", "quiero ver", "me interesa"
             ],
             IntentType.NEGAR: [
                 "no", "nop", "nel", "negativo", "otro", "otra", "diferente",
-                "distinto", "distinta", "no esa", "no ese", "ninguno", "ninguna",
-                "no me interesa", "no gracias", "paso", "mejor no", "no ahora",
-                "más adelante", "mas adelante", "luego", "después", "despues"
+                "distinto", "distinta", "no esa", "no ese", "ninguno",
+                "ninguna", "no me interesa", "no gracias", "paso", "mejor no",
+                "no ahora", "mas adelante", "luego", "despues"
             ],
             IntentType.REFERENCIA_PRODUCTO: [
-                "esa", "esa máquina", "esa maquina", "la que dijiste", "la que mencionaste",
-                "la primera", "la segunda", "primera opción", "primera opcion",
-                "segunda opción", "segunda opcion", "esa que me mostraste",
-                "la de la foto", "la de la imagen", "la barata", "la cara",
-                "la más económica", "la mas economica", "la mejor", "la premium"
+                "esa", "esa maquina", "la que dijiste", "la que mencionaste",
+                "la primera", "la segunda", "primera opcion",
+                "segunda opcion", "esa que me mostraste", "la de la foto",
+                "la de la imagen", "la barata", "la cara", "la mas economica",
+                "la mejor", "la premium"
             ],
             IntentType.COMPARAR: [
-                "cuál es mejor", "cual es mejor", "diferencia", "diferencias",
-                "comparar", "comparación", "comparacion", "versus", "vs",
-                "qué diferencia", "que diferencia", "mejor entre", "entre estas",
-                "cuál me conviene", "cual me conviene", "ventajas", "desventajas"
+                "cual es mejor", "diferencia", "diferencias", "comparar",
+                "comparacion", "versus", "vs", "que diferencia",
+                "mejor entre", "entre estas", "cual me conviene", "ventajas",
+                "desventajas"
             ],
             
             # === INTENCIONES DE SALUDO/DESPEDIDA ===
             IntentType.SALUDO: [
-                "hola", "buenos días", "buenos dias", "buenas tardes", "buenas noches", 
-                "buen día", "buen dia", "buenas", "saludos", "qué tal", "que tal",
-                "hey", "holi"
+                "hola", "buenos dias", "buenas tardes", "buenas noches",
+                "buen dia", "buenas", "saludos", "que tal", "hey", "holi"
             ],
             IntentType.DESPEDIDA: [
-                "gracias", "chau", "adiós", "adios", "nos vemos", "hasta luego",
+                "gracias", "chau", "adios", "nos vemos", "hasta luego",
                 "perfecto gracias", "ok gracias", "listo gracias", "bye",
-                "muchas gracias", "mil gracias", "te agradezco", "hasta pronto"
+                "muchas gracias", "mil gracias", "te agradezco",
+                "hasta pronto"
             ],
             
             # === INTENCIONES DE SOLICITUD DE INFORMACIÓN VISUAL ===
             IntentType.SOLICITAR_FOTOS: [
-                "fotos", "foto", "imágenes", "imagenes", "imagen",
-                "muéstrame", "muestrame", "ver fotos", "quiero ver",
-                "tienes fotos", "tiene fotos", "muestra", "fotografía",
-                "fotografia", "regalame fotos", "regálame fotos",
-                "puedes mostrarme", "muéstrame fotos", "envíame foto", "enviame foto",
-                "pásame fotos", "pasame fotos", "mándame", "mandame"
+                "fotos", "foto", "imagenes", "imagen", "muestrame",
+                "ver fotos", "quiero ver", "tienes fotos", "tiene fotos",
+                "muestra", "fotografia", "regalame fotos", "puedes mostrarme",
+                "muestrame fotos", "enviame foto", "pasame fotos", "mandame"
             ],
             
             # === INTENCIONES DE PRECIO Y DISPONIBILIDAD ===
             IntentType.PREGUNTAR_PRECIO: [
-                "precio", "precios", "cuánto cuesta", "cuanto cuesta",
-                "cuánto vale", "cuanto vale", "valor", "costo",
-                "precio de", "precio de la", "precio del", "cuánto es",
-                "cuanto es", "qué precio", "que precio", "a cómo", "a como",
-                "sale a", "está a", "esta a"
+                "precio", "precios", "cuanto cuesta", "cuanto vale", "valor",
+                "costo", "precio de", "precio de la", "precio del",
+                "cuanto es", "que precio", "a como", "sale a", "esta a"
             ],
             IntentType.PREGUNTAR_DISPONIBILIDAD: [
                 "disponible", "disponibles", "tienen", "hay", "stock",
-                "inventario", "cuántas", "cuántos", "existe", "tienen en",
+                "inventario", "cuantas", "cuantos", "existe", "tienen en",
                 "hay en", "disponibilidad", "en existencia", "hay stock",
                 "tienen stock", "manejan"
             ],
             
             # === INTENCIONES DE BÚSQUEDA DE PRODUCTOS ===
             IntentType.BUSCAR_MAQUINA_FAMILIAR: [
-                "máquina familiar", "maquina familiar", "familiar",
-                "familiares", "para casa", "doméstico", "domestico",
-                "hogar", "uso personal", "máquinas familiares",
-                "maquinas familiares", "uso doméstico", "uso domestico",
-                "para el hogar", "casera"
+                "maquina familiar", "familiar", "familiares", "para casa",
+                "domestico", "hogar", "uso personal", "maquinas familiares",
+                "uso domestico", "para el hogar", "casera"
             ],
             IntentType.BUSCAR_MAQUINA_INDUSTRIAL: [
-                "máquina industrial", "maquina industrial", "industrial",
-                "industriales", "taller", "producción", "produccion",
-                "emprendimiento", "negocio", "máquinas industriales",
+                "maquina industrial", "industrial", "industriales", "taller",
+                "produccion", "emprendimiento", "negocio",
                 "maquinas industriales", "recta industrial", "para taller",
                 "para producir", "profesional", "trabajo pesado"
             ],
@@ -138,102 +133,89 @@ class IntentAnalyzer:
                 "remalladora", "remallado"
             ],
             IntentType.BUSCAR_REPUESTOS: [
-                "repuestos", "repuesto", "accesorios", "accesorio",
-                "piezas", "pieza", "partes", "aguja", "agujas",
-                "hilo", "hilos", "pedal", "pie", "prensatela",
-                "bobina", "canilla"
+                "repuestos", "repuesto", "accesorios", "accesorio", "piezas",
+                "pieza", "partes", "aguja", "agujas", "hilo", "hilos",
+                "pedal", "pie", "prensatela", "bobina", "canilla"
             ],
             
             # === INTENCIONES DE SERVICIO ===
             IntentType.SOLICITAR_SERVICIO: [
-                "servicio", "reparación", "reparacion", "arreglar",
-                "arreglo", "mantenimiento", "revisar", "revisión",
-                "revision", "no funciona", "se dañó", "se dano",
-                "está mala", "esta mala", "no prende", "no cose",
+                "servicio", "reparacion", "arreglar", "arreglo",
+                "mantenimiento", "revisar", "revision", "no funciona",
+                "se dano", "esta mala", "no prende", "no cose",
                 "tiene problemas"
             ],
             IntentType.SOLICITAR_INSTALACION: [
-                "instalación", "instalacion", "instalar", "instalen",
-                "montar", "montaje", "dejan funcionando", "dejen funcionando",
-                "configurar", "poner a funcionar", "armado"
+                "instalacion", "instalar", "instalen", "montar", "montaje",
+                "dejan funcionando", "dejen funcionando", "configurar",
+                "poner a funcionar", "armado"
             ],
             IntentType.SOLICITAR_ENVIO: [
-                "envío", "envio", "enviar", "llegar", "entrega",
-                "entregar", "envían", "envian", "hacen envío",
+                "envio", "enviar", "llegar", "entrega", "entregar", "envian",
                 "hacen envio", "a domicilio", "domicilio", "despacho",
-                "mandan", "mandarlo", "tiempo de entrega", "cuándo llega",
-                "cuando llega"
+                "mandan", "mandarlo", "tiempo de entrega", "cuando llega"
             ],
             
             # === INTENCIONES DE PAGO Y COMPRA ===
             IntentType.PREGUNTAR_FORMA_PAGO: [
-                "forma de pago", "formas de pago", "cómo pagar",
-                "como pagar", "pago", "pagando", "addi", "sistecrédito",
-                "sistecredito", "crédito", "credito", "financiación",
-                "financiacion", "cuotas", "a plazos", "contado",
-                "efectivo", "transferencia", "tarjeta", "nequi", "daviplata"
+                "forma de pago", "formas de pago", "como pagar", "pago",
+                "pagando", "addi", "sistecredito", "credito", "financiacion",
+                "cuotas", "a plazos", "contado", "efectivo", "transferencia",
+                "tarjeta", "nequi", "daviplata"
             ],
             IntentType.CONFIRMAR_COMPRA: [
-                "comprar", "quiero comprar", "me interesa comprar", 
+                "comprar", "quiero comprar", "me interesa comprar",
                 "necesito comprar", "voy a comprar", "ya hice el pago",
-                "pagué", "pague", "lo quiero", "la quiero", "me la llevo",
-                "va", "listo para comprar", "cómo compro", "como compro"
+                "pague", "lo quiero", "la quiero", "me la llevo", "va",
+                "listo para comprar", "como compro"
             ],
             IntentType.SOLICITAR_COTIZACION: [
-                "cotización", "cotizacion", "cotizar", "cotizame",
-                "pasame cotización", "pásame cotización", "factura proforma",
-                "presupuesto formal"
+                "cotizacion", "cotizar", "cotizame", "pasame cotizacion",
+                "factura proforma", "presupuesto formal"
             ],
             
             # === INTENCIONES DE ASESORÍA ===
             IntentType.BUSCAR_RECOMENDACION: [
-                "recomendación", "recomendacion", "recomiendas",
-                "recomienda", "qué me recomiendas", "que me recomiendas",
-                "me recomiendas", "recomiéndame", "recomiendame",
-                "qué máquina", "que maquina", "cuál máquina", "cual maquina",
-                "sugieres", "sugerencia", "aconsejas", "qué necesito",
-                "que necesito", "cuál es la mejor", "cual es la mejor"
+                "recomendacion", "recomiendas", "recomienda",
+                "que me recomiendas", "me recomiendas", "recomiendame",
+                "que maquina", "cual maquina", "sugieres", "sugerencia",
+                "aconsejas", "que necesito", "cual es la mejor"
             ],
             IntentType.PREGUNTAR_CARACTERISTICAS: [
-                "características", "caracteristicas", "especificaciones",
-                "qué tiene", "que tiene", "incluye", "trae", "viene con",
-                "specs", "detalles técnicos", "detalles tecnicos",
-                "ficha técnica", "ficha tecnica", "datos", "info",
-                "información técnica", "informacion tecnica"
+                "caracteristicas", "especificaciones", "que tiene", "incluye",
+                "trae", "viene con", "specs", "detalles tecnicos",
+                "ficha tecnica", "datos", "info", "informacion tecnica"
             ],
             IntentType.PREGUNTAR_GARANTIA: [
-                "garantía", "garantia", "garantizado", "cobertura",
-                "respaldo", "soporte", "servicio técnico", "servicio tecnico",
-                "postventa", "post venta", "si se daña", "si se dana"
+                "garantia", "garantizado", "cobertura", "respaldo", "soporte",
+                "servicio tecnico", "postventa", "post venta", "si se dana"
             ],
             IntentType.PREGUNTAR_CAPACITACION: [
-                "capacitación", "capacitacion", "enseñan", "ensenan",
-                "curso", "cursos", "aprendo", "aprender", "clases",
-                "tutorial", "cómo usar", "como usar", "instrucciones"
+                "capacitacion", "ensenan", "curso", "cursos", "aprendo",
+                "aprender", "clases", "tutorial", "como usar", "instrucciones"
             ],
             
             # === INTENCIONES DE PROMOCIONES ===
             IntentType.PREGUNTAR_PROMOCIONES: [
-                "promoción", "promocion", "promociones", "promociones de navidad",
-                "promoción navideña", "promocion navidena", "oferta", "ofertas",
-                "descuento", "descuentos", "rebaja", "rebajas", "especial",
-                "tienen promoción", "hay promoción", "promoción navidad",
-                "ganga", "oportunidad", "liquidación", "liquidacion",
-                "precio especial"
+                "promocion", "promociones", "promociones de navidad",
+                "promocion navidena", "oferta", "ofertas", "descuento",
+                "descuentos", "rebaja", "rebajas", "especial",
+                "tienen promocion", "hay promocion", "promocion navidad",
+                "ganga", "oportunidad", "liquidacion", "precio especial"
             ]
         }
         
         # Patrones de confirmación contextual (para respuestas cortas)
         self.confirmation_patterns = [
-            "si", "sí", "ok", "dale", "claro", "perfecto", "bueno", "vale",
-            "está bien", "esta bien", "listo", "de acuerdo", "correcto",
-            "exacto", "eso", "así es", "asi es", "va", "oks", "okok"
+            "si", "ok", "dale", "claro", "perfecto", "bueno", "vale",
+            "esta bien", "listo", "de acuerdo", "correcto", "exacto", "eso",
+            "asi es", "va", "oks", "okok"
         ]
         
         # Patrones de negación contextual
         self.negation_patterns = [
-            "no", "nop", "nel", "negativo", "no gracias", "paso",
-            "mejor no", "no ahora", "luego", "después", "despues"
+            "no", "nop", "nel", "negativo", "no gracias", "paso", "mejor no",
+            "no ahora", "luego", "despues"
         ]
     
     def analyze(self, text: str, conversation_history: List[Dict] = None) -> Dict:
@@ -252,7 +234,7 @@ class IntentAnalyzer:
                 - is_negation: bool (si es negación contextual)
                 - last_luisa_topic: str (tema del último mensaje de Luisa)
         """
-        text_lower = text.lower().strip()
+        text_lower = normalize_text(text)
         conversation_history = conversation_history or []
         
         # Primero: detectar si es respuesta corta (confirmación/negación contextual)
@@ -265,7 +247,7 @@ class IntentAnalyzer:
         if conversation_history:
             luisa_messages = [msg for msg in conversation_history if msg.get("sender") == "luisa"]
             if luisa_messages:
-                last_luisa_msg = luisa_messages[-1].get("text", "").lower()
+                last_luisa_msg = luisa_messages[-1].get("text", "")
                 last_luisa_topic = self._detect_luisa_topic(last_luisa_msg)
         
         # Detectar confirmación/negación contextual en respuestas cortas
@@ -370,15 +352,15 @@ class IntentAnalyzer:
     
     def _detect_luisa_topic(self, luisa_msg: str) -> Optional[str]:
         """Detecta el tema del último mensaje de Luisa para contexto"""
-        luisa_lower = luisa_msg.lower()
+        luisa_lower = normalize_text(luisa_msg)
         
         # Promociones
-        if any(word in luisa_lower for word in ["promoción", "promocion", "ofertas disponibles", 
-                                                  "promociones navideñas", "te muestro las ofertas"]):
+        if any(word in luisa_lower for word in ["promocion", "ofertas disponibles", 
+                                                  "promociones navidenas", "te muestro las ofertas"]):
             return "promocion"
         
         # Especificaciones
-        if any(word in luisa_lower for word in ["especificaciones", "características", "caracteristicas"]):
+        if any(word in luisa_lower for word in ["especificaciones", "caracteristicas"]):
             return "especificaciones"
         
         # Fotos/Imágenes
@@ -386,19 +368,19 @@ class IntentAnalyzer:
             return "fotos"
         
         # Diagnóstico de tipo
-        if any(word in luisa_lower for word in ["familiar o industrial", "¿buscas máquina", "¿buscas maquina"]):
+        if any(word in luisa_lower for word in ["familiar o industrial", "¿buscas maquina"]):
             return "diagnostico_tipo"
         
         # Diagnóstico de uso
-        if any(word in luisa_lower for word in ["qué vas a fabricar", "que vas a fabricar"]):
+        if any(word in luisa_lower for word in ["que vas a fabricar"]):
             return "diagnostico_uso"
         
         # Diagnóstico de volumen
-        if any(word in luisa_lower for word in ["producción constante", "produccion constante", "pocas unidades"]):
+        if any(word in luisa_lower for word in ["produccion constante", "pocas unidades"]):
             return "diagnostico_volumen"
         
         # Cierre/Ciudad
-        if any(word in luisa_lower for word in ["qué ciudad", "que ciudad", "dónde te encuentras", "donde te encuentras"]):
+        if any(word in luisa_lower for word in ["que ciudad", "donde te encuentras"]):
             return "diagnostico_ciudad"
         
         # Handoff
@@ -424,7 +406,7 @@ class IntentAnalyzer:
         }
         
         # Detectar tipo de máquina
-        if any(word in text_lower for word in ["familiar", "familiares", "casa", "doméstico", "domestico", "hogar", "personal"]):
+        if any(word in text_lower for word in ["familiar", "familiares", "casa", "domestico", "hogar", "personal"]):
             context["tipo_maquina"] = "familiar"
             context["categoria"] = "familiar"
         elif any(word in text_lower for word in ["fileteadora", "fileteadoras", "overlock", "overlok"]):
@@ -435,19 +417,19 @@ class IntentAnalyzer:
             else:
                 context["tipo_maquina"] = "familiar"
                 context["categoria"] = "fileteadora_familiar"
-        elif any(word in text_lower for word in ["industrial", "industriales", "taller", "producción", "produccion", "emprendimiento", "negocio"]):
+        elif any(word in text_lower for word in ["industrial", "industriales", "taller", "produccion", "emprendimiento", "negocio"]):
             context["tipo_maquina"] = "industrial"
             context["categoria"] = "recta_industrial_mecatronica"
         
         # Detectar uso específico
         usos = {
-            "ropa": ["ropa", "prendas", "camisas", "pantalones", "vestidos", "blusas", "faldas", "confección", "confeccion"],
+            "ropa": ["ropa", "prendas", "camisas", "pantalones", "vestidos", "blusas", "faldas", "confeccion"],
             "gorras": ["gorras", "gorra", "cachuchas", "sombreros"],
             "calzado": ["calzado", "zapatos", "zapatillas", "tenis", "botas", "sandalias"],
             "accesorios": ["accesorios", "accesorio", "bolsos", "carteras", "morrales", "billeteras"],
-            "hogar": ["cortinas", "mantelería", "manteleria", "cojines", "lencería hogar", "lenceria hogar"],
-            "uniformes": ["uniformes", "dotación", "dotacion", "overoles"],
-            "cuero": ["cuero", "cueros", "marroquinería", "marroquineria"]
+            "hogar": ["cortinas", "manteleria", "cojines", "lenceria hogar"],
+            "uniformes": ["uniformes", "dotacion", "overoles"],
+            "cuero": ["cuero", "cueros", "marroquineria"]
         }
         for uso_key, palabras in usos.items():
             if any(word in text_lower for word in palabras):
@@ -455,36 +437,14 @@ class IntentAnalyzer:
                 break
         
         # Detectar ciudad (Colombia)
-        ciudades = {
-            "montería": "montería", "monteria": "montería",
-            "bogotá": "bogotá", "bogota": "bogotá",
-            "medellín": "medellín", "medellin": "medellín",
-            "cali": "cali", 
-            "barranquilla": "barranquilla",
-            "cartagena": "cartagena",
-            "bucaramanga": "bucaramanga",
-            "pereira": "pereira",
-            "manizales": "manizales",
-            "ibagué": "ibagué", "ibague": "ibagué",
-            "cúcuta": "cúcuta", "cucuta": "cúcuta",
-            "villavicencio": "villavicencio",
-            "santa marta": "santa marta",
-            "pasto": "pasto",
-            "neiva": "neiva",
-            "armenia": "armenia",
-            "sincelejo": "sincelejo",
-            "valledupar": "valledupar",
-            "popayán": "popayán", "popayan": "popayán"
-        }
-        for ciudad_key, ciudad_val in ciudades.items():
-            if ciudad_key in text_lower:
-                context["ciudad"] = ciudad_val
-                break
+        location = extract_location(text_lower)
+        if location and location.city:
+            context["ciudad"] = location.city.lower()
         
         # Detectar volumen de producción
-        if any(word in text_lower for word in ["constante", "muchas", "taller", "producción", "produccion", "continua", "diario", "negocio"]):
+        if any(word in text_lower for word in ["constante", "muchas", "taller", "produccion", "continua", "diario", "negocio"]):
             context["volumen"] = "alto"
-        elif any(word in text_lower for word in ["pocas", "poco", "ocasional", "esporádico", "esporadico", "hobby", "arreglos"]):
+        elif any(word in text_lower for word in ["pocas", "poco", "ocasional", "esporadico", "hobby", "arreglos"]):
             context["volumen"] = "bajo"
         
         # Detectar marca/modelo
@@ -510,19 +470,19 @@ class IntentAnalyzer:
                 break
         
         # Detectar presupuesto
-        presupuestos = ["1.2", "1.3", "1.4", "1.5", "millón", "millones", "presupuesto", 
-                        "1200", "1300", "1400", "1500", "un millón", "dos millones"]
+        presupuestos = ["1.2", "1.3", "1.4", "1.5", "millon", "millones", "presupuesto", 
+                        "1200", "1300", "1400", "1500", "un millon", "dos millones"]
         if any(word in text_lower for word in presupuestos):
             context["presupuesto"] = True
         
         # Usar historial si no hay contexto claro
         if not context["tipo_maquina"] and history:
             for msg in reversed(history[-6:]):  # Últimos 6 mensajes
-                msg_text = msg.get("text", "").lower()
+                msg_text = normalize_text(msg.get("text", ""))
                 if any(word in msg_text for word in ["familiar", "familiares", "casa", "hogar"]):
                     context["tipo_maquina"] = "familiar"
                     break
-                elif any(word in msg_text for word in ["industrial", "industriales", "taller", "producción"]):
+                elif any(word in msg_text for word in ["industrial", "industriales", "taller", "produccion"]):
                     context["tipo_maquina"] = "industrial"
                     break
         
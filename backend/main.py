@@ -1,8 +1,13 @@
+import time
+_IMPORT_START = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, Response
 from pydantic import BaseModel
 from typing import Optional, List, Dict
+from contextlib import asynccontextmanager, nullcontext
+import asyncio
 import sqlite3
 import json
 import os
@@ -31,21 +36,40 @@ try:
     import sys
     sys.path.insert(0, str(Path(__file__).parent))
     
+    from app.startup import (
+        startup_phase,
+        record_phase,
+        mark_startup_complete,
+        get_startup_report,
+        is_ready,
+        start_background_tasks,
+        stop_background_tasks
+    )
     from app.config import (
         WHATSAPP_ENABLED,
         OPENAI_ENABLED,
         TEST_NOTIFY_NUMBER,
         CACHE_ENABLED,
-        PRODUCTION_MODE
+        PRODUCTION_MODE,
+        WARMUP_ENABLED
     )
     from app.models.database import init_db as init_new_db
     from app.services.trace_service import create_tracer
     from app.services.cache_service import get_cached_response, cache_response
     from app.rules.business_guardrails import is_business_related, is_cacheable_query
     from app.services.handoff_service import process_handoff, should_handoff as new_should_handoff
-    from app.routers.whatsapp import router as whatsapp_router
     from app.logging_config import logger as structured_logger
     from app.services.rate_limit import allow as rl_allow, remaining as rl_remaining
+    from app.services.asset_manifest import (
+        init_asset_manifest,
+        reload_asset_manifest,
+        get_asset_entry,
+        describe_asset_file
+    )
+    from app.services.asset_delivery import build_asset_response
+    from app.services.asset_derivatives import select_asset_variant
+    from app.services.asset_service import get_asset_url
+    from app.services.drive_cache import get_drive_cache, DriveDownloadError
     
     NEW_MODULES_AVAILABLE = True
     print("✅ Módulos nuevos cargados correctamente")
@@ -54,13 +78,50 @@ except ImportError as e:
     WHATSAPP_ENABLED = False
     OPENAI_ENABLED = False
     CACHE_ENABLED = False
+    # Sin perfil de arranque: las fases corren sin medirse
+    startup_phase = nullcontext
     print(f"⚠️ Módulos nuevos no disponibles: {e}")
     print("   Continuando con funcionalidad legacy...")
 
+if NEW_MODULES_AVAILABLE:
+    record_phase("imports", _IMPORT_START)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Fases de arranque diferidas hasta que el servidor levanta, y warm-up."""
+    tasks = []
+    if NEW_MODULES_AVAILABLE:
+        # Si se sirve un asset antes, get_asset_entry lo inicializa bajo demanda
+        with startup_phase("asset_manifest"):
+            try:
+                init_asset_manifest()
+            except Exception as e:
+                print(f"⚠️ Error construyendo manifiesto de assets: {e}")
+        
+        warmup_report = None
+        if WARMUP_ENABLED:
+            from app.services.warmup import run_warmup
+            warmup_report = await run_warmup()
+        mark_startup_complete(warmup_report)
+        
+        # Ventana de métricas en memoria guardada antes del último apagado
+        from app.services.live_metrics import restore_live_metrics
+        restore_live_metrics()
+        
+        tasks = start_background_tasks(WHATSAPP_ENABLED)
+    
+    yield
+    
+    if NEW_MODULES_AVAILABLE:
+        await stop_background_tasks(tasks)
+
+
 app = FastAPI(
     title="LUISA - Asistente El Sastre",
     description="API del asistente comercial para Almacén y Taller El Sastre",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # CORS para permitir frontend
@@ -116,6 +177,16 @@ class HandoffPayload(BaseModel):
 
 # Inicializar DB
 def init_db():
+    if NEW_MODULES_AVAILABLE:
+        # Esquema único versionado (app/models/migrations.py), sobre la DB legacy
+        from app.models.migrations import migrate
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+        return
+    
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
@@ -188,18 +259,20 @@ def init_db():
     conn.commit()
     conn.close()
 
-init_db()
+with startup_phase("init_db"):
+    init_db()
 
-# Inicializar tablas nuevas si los módulos están disponibles
-if NEW_MODULES_AVAILABLE:
-    try:
-        init_new_db()
-        print("✅ Tablas adicionales inicializadas (trazas, notificaciones, modo sombra)")
-    except Exception as e:
-        print(f"⚠️ Error inicializando tablas nuevas: {e}")
+    # Inicializar tablas nuevas si los módulos están disponibles
+    if NEW_MODULES_AVAILABLE:
+        try:
+            init_new_db()
+            print("✅ Tablas adicionales inicializadas (trazas, notificaciones, modo sombra)")
+        except Exception as e:
+            print(f"⚠️ Error inicializando tablas nuevas: {e}")
 
-# Montar router de WhatsApp si está habilitado
+# Montar router de WhatsApp si está habilitado (solo entonces se importa)
 if NEW_MODULES_AVAILABLE and WHATSAPP_ENABLED:
+    from app.routers.whatsapp import router as whatsapp_router
     app.include_router(whatsapp_router)
     print("✅ WhatsApp webhook habilitado en /whatsapp/webhook")
 
@@ -367,6 +440,12 @@ def find_local_asset_file(image_id: str) -> Optional[Path]:
     
     return None
 
+def chat_asset_url(image_id: str) -> str:
+    """URL del asset para el chat: derivado medium versionado si hay manifiesto"""
+    if NEW_MODULES_AVAILABLE:
+        return get_asset_url(image_id, size="medium")
+    return f"/api/assets/{image_id}"
+
 def get_asset_mime_type(file_path: Path) -> str:
     """Determina el MIME type del archivo"""
     ext = file_path.suffix.lower()
@@ -460,7 +539,8 @@ def save_to_cache(drive_file_id: str, content: bytes, mime_type: str) -> Path:
     return cache_file
 
 # Cargar catálogo inicial desde filesystem (modo demo)
-CATALOG = load_catalog_from_filesystem()
+with startup_phase("catalog_filesystem"):
+    CATALOG = load_catalog_from_filesystem()
 
 # Cargar índice del catálogo
 def load_catalog_index() -> Dict[str, dict]:
@@ -481,7 +561,8 @@ def load_catalog_index() -> Dict[str, dict]:
         print(f"Error cargando catalog_index.json: {e}")
         return {}
 
-CATALOG_INDEX = load_catalog_index()
+with startup_phase("catalog_index"):
+    CATALOG_INDEX = load_catalog_index()
 
 # Sistema de Assets (legacy - mantener compatibilidad)
 def load_assets() -> Dict[str, dict]:
@@ -640,7 +721,8 @@ def find_matching_catalog_item(text: str, context: dict) -> Optional[dict]:
     return catalog_item
 
 # Cargar assets al inicio
-ASSETS = load_assets()
+with startup_phase("legacy_assets"):
+    ASSETS = load_assets()
 
 # Motor de decisión
 def analyze_message(text: str, conversation_history: List[dict]) -> dict:
@@ -1225,6 +1307,11 @@ def generate_response(text: str, history: List[dict], needs_escalation: bool, in
     """
     Genera respuesta directiva y orientada a ventas - Luisa lidera la conversación.
     Sistema mejorado con manejo de contexto conversacional y escenarios anticipados.
+
+    Solo la usa _chat_legacy, el fallback de /api/chat cuando el paquete app/ no
+    se pudo importar; en ese caso tampoco está disponible la tabla de decisión
+    (app/rules/decision_table.py), por eso esta cadena no se migró a ella. Con
+    los módulos nuevos el chat web y WhatsApp responden con build_response.
     """
     text_lower = text.lower().strip()
     context = extract_context_from_history(history)
@@ -2316,7 +2403,7 @@ async def _chat_legacy(message: Message):
                     if is_valid:
                         asset_info = {
                             "image_id": "PROMO_NAVIDAD",
-                            "asset_url": "/api/assets/promo_navidad",
+                            "asset_url": chat_asset_url("promo_navidad"),
                             "type": "image"
                         }
             except Exception as e:
@@ -2333,7 +2420,7 @@ async def _chat_legacy(message: Message):
                     asset_type = "video" if mime_type.startswith("video/") else "image"
                     asset_info = {
                         "image_id": catalog_item["image_id"],
-                        "asset_url": f"/api/assets/{catalog_item['image_id']}",
+                        "asset_url": chat_asset_url(catalog_item["image_id"]),
                         "type": asset_type
                     }
                 else:
@@ -2351,7 +2438,7 @@ async def _chat_legacy(message: Message):
                                 asset_type = "video" if mime_type.startswith("video/") else "image"
                                 asset_info = {
                                     "image_id": catalog_item["image_id"],
-                                    "asset_url": f"/api/assets/{catalog_item['image_id']}",
+                                    "asset_url": chat_asset_url(catalog_item["image_id"]),
                                     "type": asset_type
                                 }
                     except Exception:
@@ -2545,25 +2632,46 @@ async def get_catalog_items():
             "conversation_role": item.get("conversation_role"),
             "priority": item.get("priority", 0),
             "send_when_customer_says": item.get("send_when_customer_says", []),
-            "asset_url": f"/api/assets/{image_id}"
+            "asset_url": get_asset_url(image_id) if NEW_MODULES_AVAILABLE else f"/api/assets/{image_id}"
         })
     
     return {"items": items, "count": len(items)}
 
 @app.get("/api/assets/{image_id}")
-async def serve_asset(image_id: str, request: Request):
-    """Sirve el archivo binario (imagen o video) del catálogo"""
+async def serve_asset(image_id: str, request: Request, size: Optional[str] = None):
+    """
+    Sirve el archivo binario (imagen o video) del catálogo.
+    
+    Los archivos locales se resuelven con el manifiesto precomputado (lookup en dict,
+    sin stats ni lectura de magic bytes por request), con ETag/304 y Range (206).
+    Con ?size=thumb|medium y/o Accept: image/webp se sirve un derivado pre-generado.
+    Lo que no está en el manifiesto (Drive, o archivos agregados entre refrescos)
+    se resuelve con el catálogo en DB.
+    """
+    if NEW_MODULES_AVAILABLE:
+        entry = get_asset_entry(image_id)
+        if entry:
+            if not entry.valid:
+                # Es un placeholder de texto, retornar 404
+                raise HTTPException(status_code=404, detail=f"Imagen placeholder detectada - agregar imagen real para {image_id}")
+            variant = select_asset_variant(entry, size, request.headers.get("accept"))
+            return build_asset_response(
+                variant,
+                request,
+                version=entry.version,
+                vary="Accept" if entry.variants else None
+            )
+    
     # Manejar imagen de promoción navideña
     if image_id == "promo_navidad":
         promo_path = Path("assets/catalog/promociones/promocion_navidad_2024.png")
-        if promo_path.exists():
+        if not NEW_MODULES_AVAILABLE and promo_path.exists():
             return FileResponse(
                 promo_path,
                 media_type="image/png",
                 filename="promocion_navidad_2024.png"
             )
-        else:
-            raise HTTPException(status_code=404, detail="Imagen de promoción no encontrada")
+        raise HTTPException(status_code=404, detail="Imagen de promoción no encontrada")
     
     item = get_catalog_item(image_id)
     
@@ -2572,49 +2680,24 @@ async def serve_asset(image_id: str, request: Request):
     
     asset_provider = item.get("asset_provider", ASSET_PROVIDER)
     
-    # Modo local
+    # Modo local (sin archivo en el manifiesto)
     if asset_provider == "local":
-        asset_file = find_local_asset_file(image_id)
+        # Archivo agregado después del último refresh del manifiesto (o sin módulos nuevos):
+        # resolverlo directamente
+        asset_file = await asyncio.to_thread(find_local_asset_file, image_id)
         if not asset_file or not asset_file.exists():
             raise HTTPException(status_code=404, detail=f"Archivo no encontrado para {image_id}")
         
-        # Verificar que el archivo sea una imagen/video válida (no un placeholder de texto)
-        try:
-            with open(asset_file, 'rb') as f:
-                header = f.read(8)
-                # Verificar headers de imágenes/videos comunes
-                is_valid_image = (
-                    header.startswith(b'\x89PNG') or  # PNG
-                    header.startswith(b'\xff\xd8\xff') or  # JPEG
-                    (header.startswith(b'RIFF') and len(header) >= 8 and b'WEBP' in header[:12]) or  # WEBP
-                    header.startswith(b'\x00\x00\x01\x00')  # ICO
-                )
-                is_valid_video = header.startswith(b'\x00\x00\x00') and b'ftyp' in header[:12]  # MP4
-                
-                if not (is_valid_image or is_valid_video):
-                    # Es un placeholder de texto, retornar 404
-                    raise HTTPException(status_code=404, detail=f"Imagen placeholder detectada - agregar imagen real para {image_id}")
-        except HTTPException:
-            raise
-        except Exception:
-            pass  # Continuar si hay error leyendo el archivo
-        
-        mime_type = get_asset_mime_type(asset_file)
-        
-        # Para videos, usar StreamingResponse
-        if mime_type.startswith("video/"):
-            return StreamingResponse(
-                open(asset_file, "rb"),
-                media_type=mime_type,
-                headers={
-                    "Accept-Ranges": "bytes",
-                    "Content-Length": str(asset_file.stat().st_size)
-                }
-            )
+        if NEW_MODULES_AVAILABLE:
+            # Entrada bajo demanda (hashea el archivo: fuera del event loop) hasta el próximo refresh
+            entry = await asyncio.to_thread(describe_asset_file, image_id, asset_file)
+            if not entry.valid:
+                raise HTTPException(status_code=404, detail=f"Imagen placeholder detectada - agregar imagen real para {image_id}")
+            return build_asset_response(entry, request)
         
         return FileResponse(
             asset_file,
-            media_type=mime_type,
+            media_type=get_asset_mime_type(asset_file),
             filename=asset_file.name
         )
     
@@ -2626,37 +2709,26 @@ async def serve_asset(image_id: str, request: Request):
         
         mime_type = item.get("drive_mime_type", "application/octet-stream")
         
+        if NEW_MODULES_AVAILABLE:
+            # Cache con descarga en streaming, single-flight y desalojo LRU
+            try:
+                cached_file = await get_drive_cache().get(drive_file_id, mime_type)
+            except DriveDownloadError:
+                raise HTTPException(status_code=500, detail="Error descargando desde Drive")
+            # El primer serve hashea el archivo completo: fuera del event loop
+            entry = await asyncio.to_thread(describe_asset_file, image_id, cached_file, mime_type)
+            return build_asset_response(entry, request)
+        
         # Verificar cache primero
         cached_file = get_cached_file(drive_file_id)
-        if cached_file:
-            if mime_type.startswith("video/"):
-                return StreamingResponse(
-                    open(cached_file, "rb"),
-                    media_type=mime_type,
-                    headers={
-                        "Accept-Ranges": "bytes",
-                        "Content-Length": str(cached_file.stat().st_size)
-                    }
-                )
-            return FileResponse(cached_file, media_type=mime_type)
-        
-        # Descargar desde Drive
-        content = download_from_drive(drive_file_id)
-        if not content:
-            raise HTTPException(status_code=500, detail="Error descargando desde Drive")
-        
-        # Guardar en cache
-        cached_file = save_to_cache(drive_file_id, content, mime_type)
-        
-        if mime_type.startswith("video/"):
-            return StreamingResponse(
-                open(cached_file, "rb"),
-                media_type=mime_type,
-                headers={
-                    "Accept-Ranges": "bytes",
-                    "Content-Length": str(len(content))
-                }
-            )
+        if not cached_file:
+            # Descargar desde Drive
+            content = download_from_drive(drive_file_id)
+            if not content:
+                raise HTTPException(status_code=500, detail="Error descargando desde Drive")
+            
+            # Guardar en cache
+            cached_file = save_to_cache(drive_file_id, content, mime_type)
         
         return FileResponse(cached_file, media_type=mime_type)
     
@@ -2722,16 +2794,39 @@ async def sync_catalog_item(
     conn.commit()
     conn.close()
     
+    if NEW_MODULES_AVAILABLE:
+        # Si el archivo ya está en assets/catalog, servirlo sin esperar el refresco periódico
+        await asyncio.to_thread(reload_asset_manifest)
+    
     return {"ok": True, "image_id": payload.image_id}
 
 
+@app.post("/api/catalog/reload-assets")
+async def reload_catalog_assets(
+    x_luisa_api_key: Optional[str] = Header(None, alias="X-LUISA-API-KEY")
+):
+    """Refresca el manifiesto de assets (ej: después de scripts/rebuild_catalog_index.py)"""
+    if x_luisa_api_key != LUISA_API_KEY:
+        raise HTTPException(status_code=401, detail="API key inválida")
+    if not NEW_MODULES_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Módulos nuevos no disponibles")
+    
+    changed = await asyncio.to_thread(reload_asset_manifest)
+    return {"ok": True, "changed": changed}
+
+
 # ============================================================================
 # ENDPOINTS ADICIONALES
 # ============================================================================
 
 @app.get("/health")
 async def health_check():
-    """Health check con información de módulos."""
+    """Health check con información de módulos (503 hasta terminar el warm-up)."""
+    if NEW_MODULES_AVAILABLE and not is_ready():
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming_up", "service": "luisa", "startup": get_startup_report()}
+        )
     return {
         "status": "healthy",
         "service": "luisa",
@@ -2742,7 +2837,8 @@ async def health_check():
             "openai": OPENAI_ENABLED if NEW_MODULES_AVAILABLE else False,
             "cache": CACHE_ENABLED if NEW_MODULES_AVAILABLE else False
         },
-        "catalog_items": len(CATALOG_INDEX)
+        "catalog_items": len(CATALOG_INDEX),
+        "startup": get_startup_report() if NEW_MODULES_AVAILABLE else None
     }
 
 
@@ -2755,6 +2851,15 @@ async def get_cache_stats():
     return {"enabled": False, "message": "Cache no disponible"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Exposición Prometheus (labels acotados, sin datos de clientes)."""
+    if not NEW_MODULES_AVAILABLE:
+        raise HTTPException(status_code=404, detail="Métricas no disponibles")
+    from app.services.metrics import render_metrics, CONTENT_TYPE
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     print("\n" + "=" * 60)
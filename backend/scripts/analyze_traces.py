@@ -2,221 +2,221 @@
 """
 Analizador de trazas de interaction_traces.
 Genera reporte completo de métricas, auditoría y calidad.
+
+Analiza un rango de tiempo arbitrario en memoria acotada: los conteos se
+agrupan en SQLite y las latencias se resumen en histogramas mergeables (ver
+app/services/trace_analysis.py). Con --workers el rango se procesa en
+particiones paralelas.
+
+Uso:
+    python scripts/analyze_traces.py                      # últimas 24 horas
+    python scripts/analyze_traces.py --days 30 --workers 4
+    python scripts/analyze_traces.py --since 2026-01-01 --until 2026-02-01
+    python scripts/analyze_traces.py --all
 """
-import sqlite3
 import sys
-import statistics
+from datetime import datetime, timedelta
 from pathlib import Path
-from collections import Counter, defaultdict
-from typing import List, Dict, Tuple, Any
+from typing import Any, Dict, Optional
+
+# Agregar backend al path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.services.trace_analysis import analyze_range
+from app.services.trace_rollups import histogram_quantile
 
 
 class TraceAnalyzer:
     """Analizador de trazas de interacción."""
 
-    def __init__(self, db_path: str = "luisa.db"):
+    def __init__(
+        self,
+        db_path: str = "luisa.db",
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        workers: int = 1,
+        partitions: Optional[int] = None
+    ):
         self.db_path = db_path
-        self.traces = []
+        self.since = since
+        self.until = until
+        self.workers = workers
+        self.partitions = partitions
+        self.summary = None
         self.load_traces()
 
-    def load_traces(self, limit: int = 80) -> None:
-        """Carga las últimas N trazas."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+    @property
+    def total(self) -> int:
+        return self.summary.counts["total"]
 
-        cursor.execute("""
-            SELECT * FROM interaction_traces
-            ORDER BY created_at DESC
-            LIMIT ?
-        """, (limit,))
-
-        self.traces = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+    def load_traces(self) -> None:
+        """Resume las trazas del rango (since/until en UTC; None = sin límite)."""
+        self.summary = analyze_range(
+            self.db_path, since=self.since, until=self.until,
+            workers=self.workers, partitions=self.partitions
+        )
+        print(f"📊 Analizadas {self.total} trazas ({self.since or 'inicio'} → {self.until or 'ahora'})")
 
-        print(f"📊 Cargadas {len(self.traces)} trazas recientes")
+    def _finding(self, name: str) -> Dict[str, Any]:
+        return self.summary.findings.get(name, {"count": 0, "examples": []})
 
     def calculate_metrics(self) -> Dict[str, Any]:
         """Calcula métricas principales."""
-        if not self.traces:
+        if not self.total:
             return {}
 
-        total = len(self.traces)
-
-        # Métricas básicas
-        openai_called = sum(1 for t in self.traces if t.get('openai_called', 0))
-        business_related = sum(1 for t in self.traces if t.get('business_related', 1))
-        cache_hits = sum(1 for t in self.traces if t.get('cache_hit', 0))
-
-        # Latencias
-        latencies_ms = [t.get('latency_ms', 0) for t in self.traces if t.get('latency_ms', 0) > 0]
-        latencies_us = [t.get('latency_us', 0) for t in self.traces if t.get('latency_us', 0) > 0]
-
-        # Top intents y teams
-        intents = Counter(t.get('intent', '') for t in self.traces if t.get('intent'))
-        routed_teams = Counter(t.get('routed_team', '') for t in self.traces if t.get('routed_team'))
+        counts = self.summary.counts
+        total = counts['total']
+        latency = self.summary.latency
+        latency_us = self.summary.latency_us
+        hist = self.summary.latency_hist
 
         return {
             'total_interacciones': total,
-            'openai_called_percent': round((openai_called / total) * 100, 1) if total > 0 else 0,
-            'business_related_percent': round((business_related / total) * 100, 1) if total > 0 else 0,
-            'cache_hit_percent': round((cache_hits / total) * 100, 1) if total > 0 else 0,
+            'openai_called_percent': round((counts['openai_called'] / total) * 100, 1),
+            'business_related_percent': round((counts['business_related'] / total) * 100, 1),
+            'cache_hit_percent': round((counts['cache_hit'] / total) * 100, 1),
             'latencies_ms': {
-                'count': len(latencies_ms),
-                'avg': round(statistics.mean(latencies_ms), 1) if latencies_ms else 0,
-                'median': round(statistics.median(latencies_ms), 1) if latencies_ms else 0,
-                'p95': round(sorted(latencies_ms)[int(len(latencies_ms) * 0.95)] if latencies_ms else 0, 1),
-                'min': min(latencies_ms) if latencies_ms else 0,
-                'max': max(latencies_ms) if latencies_ms else 0
+                'count': latency['count'],
+                'avg': round(latency['sum'] / latency['count'], 1) if latency['count'] else 0,
+                # Mediana y P95: límite superior del bucket (~12% de error)
+                'median': histogram_quantile(hist, 0.5),
+                'p95': histogram_quantile(hist, 0.95),
+                'p99': histogram_quantile(hist, 0.99),
+                'min': latency['min'] or 0,
+                'max': latency['max'] or 0
             },
             'latencies_us': {
-                'count': len(latencies_us),
-                'avg': round(statistics.mean(latencies_us), 0) if latencies_us else 0,
-                'median': round(statistics.median(latencies_us), 0) if latencies_us else 0
+                'count': latency_us['count'],
+                'avg': round(latency_us['sum'] / latency_us['count'], 0) if latency_us['count'] else 0,
+                'median': round(histogram_quantile(hist, 0.5) * 1000, 0)
             },
-            'top_intents': intents.most_common(10),
-            'top_routed_teams': routed_teams.most_common(5)
+            'top_intents': self.summary.intents.most_common(10),
+            'top_routed_teams': self.summary.routed_teams.most_common(5)
         }
 
     def audit_costs(self) -> Dict[str, Any]:
         """Auditoría de costos de OpenAI."""
-        openai_called_traces = [t for t in self.traces if t.get('openai_called', 0)]
-
-        # Casos donde OpenAI se llamó pero no debería
-        wasteful_calls = []
-        for trace in openai_called_traces:
-            intent = trace.get('intent', '').lower()
-            text = trace.get('raw_text', '').lower()
-
-            # Reglas de auditoría
-            should_not_call = (
-                intent in ['saludo', 'cierre', 'despedida', 'info_general'] or
-                'hola' in text or 'gracias' in text or
-                'horario' in text or 'direccion' in text or
-                'ubicacion' in text or 'telefono' in text
-            )
-
-            if should_not_call:
-                wasteful_calls.append({
-                    'id': trace.get('id'),
-                    'intent': intent,
-                    'text': text[:50] + '...' if len(text) > 50 else text,
-                    'latency_ms': trace.get('latency_ms', 0)
-                })
-
-        # Top respuestas largas (posibles prompts largos)
-        long_responses = sorted(
-            [(t.get('response_len_chars', 0), t.get('id'), t.get('intent', '')) for t in self.traces],
-            reverse=True
-        )[:10]
-
+        # Casos donde OpenAI se llamó pero no debería (saludos, FAQs de horario/dirección...)
+        wasteful = self._finding('wasteful_openai')
         return {
-            'wasteful_openai_calls': wasteful_calls,
-            'wasteful_count': len(wasteful_calls),
-            'long_responses': long_responses
+            'wasteful_openai_calls': wasteful['examples'],
+            'wasteful_count': wasteful['count'],
+            # Top respuestas largas (posibles prompts largos)
+            'long_responses': self.summary.long_responses
         }
 
     def analyze_quality(self) -> Dict[str, Any]:
         """Análisis de calidad conversacional."""
-        # Respuestas demasiado largas
-        too_long = [t for t in self.traces if t.get('response_len_chars', 0) > 350]
-
-        # Respuestas sin pregunta cerrada (heurística simple)
-        no_question = []
-        for trace in self.traces:
-            response = trace.get('response_text', '')
-            if response and '?' not in response[-100:]:  # Últimos 100 chars
-                no_question.append({
-                    'id': trace.get('id'),
-                    'intent': trace.get('intent', ''),
-                    'response': response[:100] + '...' if len(response) > 100 else response
-                })
-
+        too_long = self._finding('too_long')
+        # Respuestas sin pregunta cerrada: sin '?' en los últimos 100 chars
+        no_question = self._finding('no_question')
         return {
-            'too_long_responses': too_long,
-            'too_long_count': len(too_long),
-            'no_question_responses': no_question,
-            'no_question_count': len(no_question)
+            'too_long_responses': too_long['examples'],
+            'too_long_count': too_long['count'],
+            'no_question_responses': no_question['examples'],
+            'no_question_count': no_question['count']
         }
 
     def analyze_message_types(self) -> Dict[str, Any]:
         """Análisis por tipo de mensaje."""
-        message_types = Counter(t.get('message_type', 'unknown') for t in self.traces)
-
-        # OpenAI por tipo de mensaje
-        openai_by_type = {}
-        for msg_type in message_types.keys():
-            type_traces = [t for t in self.traces if t.get('message_type') == msg_type]
-            openai_called = sum(1 for t in type_traces if t.get('openai_called', 0))
-            total = len(type_traces)
-            openai_by_type[msg_type] = {
+        message_types = self.summary.message_types
+        openai_by_type = {
+            msg_type: {
                 'total': total,
                 'openai_called': openai_called,
                 'openai_percent': round((openai_called / total) * 100, 1) if total > 0 else 0
             }
+            for msg_type, (total, openai_called) in message_types.items()
+        }
+        breakdown = sorted(((t, v[0]) for t, v in message_types.items()), key=lambda item: item[1], reverse=True)
 
         return {
-            'message_types_breakdown': message_types.most_common(10),
+            'message_types_breakdown': breakdown[:10],
             'openai_by_message_type': openai_by_type
         }
 
     def analyze_routing(self) -> Dict[str, Any]:
         """Análisis de routing y handoffs."""
-        routed_traces = [t for t in self.traces if t.get('routed_team')]
-
-        # Motivos por equipo
-        comercial_motivos = []
-        tecnica_motivos = []
-
-        for trace in routed_traces:
-            team = trace.get('routed_team', '')
-            text = trace.get('raw_text', '').lower()
-
-            if team == 'comercial':
-                comercial_motivos.append(text[:50])
-            elif team == 'tecnica':
-                tecnica_motivos.append(text[:50])
-
-        # Falsos positivos (heurística simple)
-        false_positives = []
-        for trace in routed_traces:
-            team = trace.get('routed_team', '')
-            text = trace.get('raw_text', '').lower()
-
-            if 'addi' in text and team != 'comercial':
-                false_positives.append({
-                    'id': trace.get('id'),
-                    'team': team,
-                    'text': text[:50],
-                    'issue': 'Addi debería ir a comercial'
-                })
-
+        false_positives = self._finding('false_positives')
         return {
-            'comercial_motivos': comercial_motivos[:10],
-            'tecnica_motivos': tecnica_motivos[:10],
-            'false_positives': false_positives,
-            'false_positives_count': len(false_positives)
+            'comercial_motivos': self._finding('motivos_comercial')['examples'],
+            'tecnica_motivos': self._finding('motivos_tecnica')['examples'],
+            'false_positives': false_positives['examples'],
+            'false_positives_count': false_positives['count']
         }
 
     def analyze_assets(self) -> Dict[str, Any]:
         """Análisis de selección de assets."""
         # Assets en saludos (debería ser 0)
-        assets_in_greetings = [
-            t for t in self.traces
-            if (t.get('intent') or '').lower() in ['saludo', 'cierre', 'despedida']
-            and t.get('selected_asset_id')
-        ]
-
-        # Conteo por asset_id
-        asset_counts = Counter(
-            t.get('selected_asset_id', '') for t in self.traces
-            if t.get('selected_asset_id')
-        )
+        in_greetings = self._finding('assets_in_greetings')
+        return {
+            'assets_in_greetings': in_greetings['examples'],
+            'assets_in_greetings_count': in_greetings['count'],
+            'asset_counts': self.summary.asset_counts.most_common(10)
+        }
 
+    def analyze_stages(self) -> Dict[str, Any]:
+        """
+        Desglose de latencia por etapa (columna stage_timings, JSON {etapa: µs}).
+
+        Solo cuenta trazas muestreadas con spans. share_percent es la fracción de
+        la latencia total de esas trazas que se fue en cada etapa; lo que no cae
+        en ninguna etapa queda como unaccounted_percent.
+        """
+        traced_total_ms = self.summary.traced['latency_sum_ms']
+        stages = []
+        for stage, state in self.summary.stages.items():
+            stages.append({
+                'stage': stage,
+                'count': state['count'],
+                'avg_ms': round(state['sum_ms'] / state['count'], 2),
+                'p50_ms': histogram_quantile(state['hist'], 0.5),
+                'p95_ms': histogram_quantile(state['hist'], 0.95),
+                'total_ms': round(state['sum_ms'], 2),
+                'share_percent': round(state['sum_ms'] / traced_total_ms * 100, 1) if traced_total_ms else 0,
+            })
+        stages.sort(key=lambda s: s['total_ms'], reverse=True)
+
+        accounted = sum(s['total_ms'] for s in stages)
         return {
-            'assets_in_greetings': assets_in_greetings,
-            'assets_in_greetings_count': len(assets_in_greetings),
-            'asset_counts': asset_counts.most_common(10)
+            'traced_count': self.summary.traced['count'],
+            'stages': stages,
+            'unaccounted_percent': round(max(traced_total_ms - accounted, 0) / traced_total_ms * 100, 1) if traced_total_ms else 0,
+        }
+
+    def analyze_delivery(self) -> Dict[str, Any]:
+        """
+        Entrega real de las respuestas de WhatsApp (statuses de Meta unidos por wamid).
+
+        Las latencias van del mensaje del cliente (inbound_at) a que Meta aceptó,
+        entregó y el cliente leyó la respuesta: lo que percibe el usuario, no solo
+        nuestro procesamiento. Tasas sobre las respuestas con wamid.
+        """
+        delivery = self.summary.delivery
+        sent = delivery['sent']
+
+        def rate(count: int) -> float:
+            return round(count / sent * 100, 1) if sent else 0
+
+        return {
+            'sent': sent,
+            'with_status': delivery['with_status'],
+            'delivered_percent': rate(delivery['delivered']),
+            'read_percent': rate(delivery['read']),
+            'failed_percent': rate(delivery['failed']),
+            'failed_count': delivery['failed'],
+            'top_error_codes': self.summary.delivery_errors.most_common(5),
+            'latency_s': {
+                stage: {
+                    'count': sum(hist.values()),
+                    'p50': histogram_quantile(hist, 0.5),
+                    'p95': histogram_quantile(hist, 0.95),
+                    'p99': histogram_quantile(hist, 0.99),
+                }
+                for stage, hist in self.summary.delivery_hist.items()
+            },
         }
 
     def generate_report(self) -> str:
@@ -227,10 +227,13 @@ class TraceAnalyzer:
         routing = self.analyze_routing()
         assets = self.analyze_assets()
         message_types = self.analyze_message_types()
+        stages = self.analyze_stages()
+        delivery = self.analyze_delivery()
 
         report = f"""# 📊 Reporte de Análisis de Trazas
 
 **Total de trazas analizadas:** {metrics.get('total_interacciones', 0)}
+**Rango (UTC):** {self.since or 'inicio'} → {self.until or 'ahora'}
 
 ## 1️⃣ Métricas Principales
 
@@ -245,6 +248,7 @@ class TraceAnalyzer:
 - **Promedio:** {metrics.get('latencies_ms', {}).get('avg', 0)}ms
 - **Mediana:** {metrics.get('latencies_ms', {}).get('median', 0)}ms
 - **P95:** {metrics.get('latencies_ms', {}).get('p95', 0)}ms
+- **P99:** {metrics.get('latencies_ms', {}).get('p99', 0)}ms
 - **Mín/Máx:** {metrics.get('latencies_ms', {}).get('min', 0)}ms / {metrics.get('latencies_ms', {}).get('max', 0)}ms
 
 ### Latencia (μs)
@@ -314,18 +318,65 @@ class TraceAnalyzer:
         for msg_type, stats in message_types.get('openai_by_message_type', {}).items():
             report += f"- **{msg_type}:** {stats['openai_called']}/{stats['total']} ({stats['openai_percent']}%)\n"
 
+        report += "\n## 7️⃣ Desglose por Etapa\n"
+        report += f"### Trazas con tiempos por etapa: {stages.get('traced_count', 0)}\n"
+        if stages.get('stages'):
+            report += "\n| Etapa | Conteo | Promedio (ms) | P50 (ms) | P95 (ms) | % de la latencia |\n"
+            report += "|---|---|---|---|---|---|\n"
+            for s in stages['stages']:
+                report += f"| {s['stage']} | {s['count']} | {s['avg_ms']} | {s['p50_ms']} | {s['p95_ms']} | {s['share_percent']}% |\n"
+            report += f"\n- **Sin etapa asignada:** {stages.get('unaccounted_percent', 0)}% de la latencia\n"
+
+        report += "\n## 8️⃣ Entrega en WhatsApp\n"
+        report += f"### Respuestas con wamid: {delivery['sent']} (con status de Meta: {delivery['with_status']})\n"
+        report += f"- **Entregadas:** {delivery['delivered_percent']}%\n"
+        report += f"- **Leídas:** {delivery['read_percent']}%\n"
+        report += f"- **Fallidas:** {delivery['failed_percent']}% ({delivery['failed_count']})\n"
+        for code, count in delivery['top_error_codes']:
+            report += f"  - Código {code}: {count}\n"
+        report += "\n### Latencia percibida por el cliente (s, desde su mensaje)\n"
+        report += "\n| Hasta | Conteo | P50 | P95 | P99 |\n"
+        report += "|---|---|---|---|---|\n"
+        for stage, label in (('sent', 'Aceptada por Meta'), ('delivered', 'Entregada'), ('read', 'Leída')):
+            lat = delivery['latency_s'][stage]
+            report += f"| {label} | {lat['count']} | {lat['p50']} | {lat['p95']} | {lat['p99']} |\n"
+
         report += "\n---\n*Reporte generado automáticamente por `analyze_traces.py`*"
 
         return report
 
 
+def _parse_timestamp(value: str) -> str:
+    """Acepta fecha (YYYY-MM-DD) o fecha y hora (ISO) y la normaliza al formato de created_at."""
+    return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+
+
 def main():
     """Función principal."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reporte de interaction_traces por rango de tiempo")
+    parser.add_argument("--db", default="luisa.db", help="Ruta a la base SQLite")
+    parser.add_argument("--since", type=_parse_timestamp, help="Inicio del rango en UTC (inclusive)")
+    parser.add_argument("--until", type=_parse_timestamp, help="Fin del rango en UTC (exclusivo)")
+    parser.add_argument("--hours", type=int, help="Últimas N horas")
+    parser.add_argument("--days", type=int, help="Últimos N días")
+    parser.add_argument("--all", action="store_true", help="Todas las trazas")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos en paralelo")
+    parser.add_argument("--partitions", type=int, help="Tramos del rango (default: 4 por worker)")
+    parser.add_argument("--output", default="trace_analysis_report.md", help="Archivo del reporte")
+    args = parser.parse_args()
+
+    since, until = args.since, args.until
+    if not since and not args.all:
+        window = timedelta(hours=args.hours) if args.hours else timedelta(days=args.days or 1)
+        since = (datetime.utcnow() - window).strftime("%Y-%m-%d %H:%M:%S")
+
     print("🔍 ANALIZANDO TRAZAS...\n")
 
-    analyzer = TraceAnalyzer()
+    analyzer = TraceAnalyzer(args.db, since=since, until=until, workers=args.workers, partitions=args.partitions)
 
-    if not analyzer.traces:
+    if not analyzer.total:
         print("❌ No hay trazas para analizar")
         return
 
@@ -333,11 +384,11 @@ def main():
     print(report)
 
     # Guardar reporte a archivo
-    with open("trace_analysis_report.md", "w", encoding="utf-8") as f:
+    with open(args.output, "w", encoding="utf-8") as f:
         f.write(report)
 
-    print("\n💾 Reporte guardado en: trace_analysis_report.md")
-    print(f"📊 Analizadas {len(analyzer.traces)} trazas")
+    print(f"\n💾 Reporte guardado en: {args.output}")
+    print(f"📊 Analizadas {analyzer.total} trazas")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Benchmarks reproducibles del pipeline de mensajes.
+
+Mide ops/seg, p50/p99 y memoria asignada por operación de:
+classify_message_type, is_business_related, analyze_intent,
+extract_context_from_history, select_catalog_asset, la tabla de decisión,
+sales_dialogue.next_action, build_response y
+_process_whatsapp_message, sobre el corpus fijo tests/data/benchmark_corpus_v1.json.
+
+OpenAI y la Graph API de WhatsApp se reemplazan por un transporte httpx local
+(http_pool) que responde al instante: se mide el costo propio del pipeline
+(reglas, SQLite, armado de requests, parseo), no la red. La base es un SQLite
+temporal y cada iteración usa conversaciones nuevas, así el historial no crece
+entre iteraciones.
+
+Con --baseline la corrida falla (exit 1) si algún benchmark empeora más que la
+tolerancia respecto del JSON guardado con --save-baseline en la misma máquina.
+
+Uso:
+    python scripts/benchmark_pipeline.py
+    python scripts/benchmark_pipeline.py --save-baseline benchmark_baseline.json
+    python scripts/benchmark_pipeline.py --baseline benchmark_baseline.json --tolerance 0.15
+    python scripts/benchmark_pipeline.py --only build_response --iterations 20
+"""
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Agregar backend al path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+CORPUS_PATH = BASE_DIR / "tests" / "data" / "benchmark_corpus_v1.json"
+BASELINE_VERSION = 1
+
+# Métricas comparadas contra el baseline: (clave, mayor_es_mejor)
+COMPARED_METRICS = [
+    ("ops_per_sec", True),
+    ("p50_us", False),
+    ("p99_us", False),
+    ("alloc_kib_per_op", False),
+]
+
+STUB_REPLY = "Claro, te ayudo con eso. ¿Para qué tipo de costura la necesitas?"
+STUB_WAMID = "wamid.benchmark"
+
+# Numera las respuestas del stub: textos idénticos al mismo teléfono caerían en
+# el anti-spam del outbox y el benchmark mediría envíos descartados
+_stub_replies = itertools.count(1)
+
+
+# ============================================================================
+# ENTORNO Y STUBS
+# ============================================================================
+
+def configure_environment(db_path: str) -> None:
+    """
+    Fija la configuración antes de importar app (los módulos leen app.config
+    al importarse): base temporal, OpenAI y WhatsApp habilitados contra el stub
+    y logs apagados (escribir a stdout no es parte de lo que se mide).
+    """
+    os.environ.update({
+        "DB_PATH": db_path,
+        "OPENAI_ENABLED": "true",
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_CANARY_ALLOWLIST": "",
+        "WHATSAPP_ENABLED": "true",
+        "WHATSAPP_ACCESS_TOKEN": "benchmark-token",
+        "WHATSAPP_PHONE_NUMBER_ID": "000000000",
+        # Sin pacing: se mide el pipeline, no el token bucket de la cola de salida
+        "WHATSAPP_SEND_RATE_PER_SECOND": "1000000",
+        "WHATSAPP_SEND_BURST": "1000000",
+        "SALESBRAIN_ENABLED": "false",
+        "LOG_LEVEL": "CRITICAL",
+    })
+
+
+def _stub_handler(request):
+    """Respuestas fijas de OpenAI y Graph API."""
+    import httpx
+
+    host = request.url.host
+    if host == "api.openai.com":
+        body = json.loads(request.content or b"{}")
+        system_prompt = next(
+            (m.get("content", "") for m in body.get("messages", []) if m.get("role") == "system"), ""
+        )
+        if body.get("response_format", {}).get("type") == "json_object":
+            content = "{}"
+        elif '"business" o "personal"' in system_prompt:
+            content = "business"
+        else:
+            content = f"{STUB_REPLY} (ref {next(_stub_replies)})"
+        return httpx.Response(200, json={
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 90, "completion_tokens": 30, "total_tokens": 120},
+        })
+    if host == "graph.facebook.com":
+        if request.url.path.endswith("/media"):
+            return httpx.Response(200, json={"id": "media.benchmark"})
+        return httpx.Response(200, json={
+            "messaging_product": "whatsapp",
+            "messages": [{"id": STUB_WAMID}],
+        })
+    return httpx.Response(404, json={"error": {"message": f"host sin stub: {host}"}})
+
+
+def install_stubs() -> None:
+    """Hace que los clientes de http_pool usen el transporte local."""
+    import httpx
+    from app.services import http_pool
+
+    transport = httpx.MockTransport(_stub_handler)
+    original_kwargs = http_pool._client_kwargs
+    http_pool._client_kwargs = lambda: {**original_kwargs(), "transport": transport}
+    http_pool._SYNC_CLIENT = None
+    http_pool._ASYNC_CLIENTS.clear()
+
+
+# ============================================================================
+# CORPUS
+# ============================================================================
+
+def load_corpus(path: Path = CORPUS_PATH) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def corpus_turns(corpus: Dict[str, Any]) -> List[Tuple[str, str, List[Dict[str, str]]]]:
+    """
+    (id de conversación, texto, historial previo) de cada turno, con el
+    historial en el formato de get_conversation_history().
+    """
+    turns = []
+    for conversation in corpus["conversations"]:
+        history: List[Dict[str, str]] = []
+        for text in conversation["turns"]:
+            turns.append((conversation["id"], text, list(history)))
+            history.append({"text": text, "sender": "customer", "timestamp": "2026-01-01 10:00:00"})
+            history.append({"text": STUB_REPLY, "sender": "luisa", "timestamp": "2026-01-01 10:00:01"})
+    return turns
+
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(
+    make_ops: Callable[[int], List[Callable[[], Any]]],
+    iterations: int,
+    warmup: int = 1,
+    alloc_iterations: int = 1,
+) -> Dict[str, Any]:
+    """
+    Corre las operaciones de make_ops(iteración) y resume la medición.
+
+    make_ops devuelve una lista de callables (una operación cada uno); recibe el
+    número de iteración para que los benchmarks con estado usen ids nuevos.
+    Las asignaciones se miden en pasadas aparte con tracemalloc (que hace todo
+    más lento y no debe contaminar los tiempos).
+    """
+    iteration = 0
+    for _ in range(warmup):
+        for op in make_ops(iteration):
+            op()
+        iteration += 1
+
+    samples_ns: List[int] = []
+    total_ns = 0
+    for _ in range(iterations):
+        for op in make_ops(iteration):
+            start = time.perf_counter_ns()
+            op()
+            elapsed = time.perf_counter_ns() - start
+            samples_ns.append(elapsed)
+            total_ns += elapsed
+        iteration += 1
+
+    alloc_bytes = 0
+    alloc_ops = 0
+    for _ in range(alloc_iterations):
+        ops = make_ops(iteration)
+        iteration += 1
+        tracemalloc.start()
+        try:
+            for op in ops:
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                op()
+                _, peak = tracemalloc.get_traced_memory()
+                alloc_bytes += max(peak - before, 0)
+                alloc_ops += 1
+        finally:
+            tracemalloc.stop()
+
+    samples_ns.sort()
+    ops_count = len(samples_ns)
+    return {
+        "ops": ops_count,
+        "ops_per_sec": round(ops_count / (total_ns / 1e9), 1) if total_ns else 0.0,
+        "p50_us": round(_percentile(samples_ns, 0.50) / 1000, 1),
+        "p99_us": round(_percentile(samples_ns, 0.99) / 1000, 1),
+        # Pico de memoria por encima de lo ya asignado, promedio por operación
+        "alloc_kib_per_op": round(alloc_bytes / alloc_ops / 1024, 2) if alloc_ops else 0.0,
+    }
+
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+def _bench_classify_message_type(turns):
+    from app.rules.business_guardrails import classify_message_type
+    return lambda i: [lambda t=text: classify_message_type(t) for _, text, _ in turns]
+
+
+def _bench_is_business_related(turns):
+    from app.rules.business_guardrails import is_business_related
+    return lambda i: [lambda t=text: is_business_related(t) for _, text, _ in turns]
+
+
+def _bench_guardrails_batch(turns):
+    from app.rules.business_guardrails import is_business_related_batch
+    texts = [text for _, text, _ in turns]
+    return lambda i: [lambda: is_business_related_batch(texts)]
+
+
+def _bench_analyze_intent(turns):
+    from app.services.intent_service import analyze_intent
+    return lambda i: [lambda t=text, h=history: analyze_intent(t, h) for _, text, history in turns]
+
+
+def _bench_extract_context(turns):
+    from app.services.context_service import extract_context_from_history
+    return lambda i: [lambda h=history: extract_context_from_history(h) for _, _, history in turns]
+
+
+def _bench_select_catalog_asset(turns):
+    from app.services.asset_service import select_catalog_asset
+    from app.services.context_service import extract_context_from_history
+    cases = [(text, extract_context_from_history(history)) for _, text, history in turns]
+    return lambda i: [lambda t=text, c=context: select_catalog_asset(t, dict(c)) for text, context in cases]
+
+
+def _bench_decision_table(turns):
+    from app.rules.business_guardrails import classify_message_type
+    from app.rules.decision_table import get_decision_table
+    from app.services.context_service import extract_context_from_history
+    from app.services.intent_service import analyze_intent
+    # Solo el lookup: las claves se calculan fuera de la medición
+    keys = [
+        (classify_message_type(text), analyze_intent(text, history).get("intent"),
+         extract_context_from_history(history).get("etapa_funnel"))
+        for _, text, history in turns
+    ]
+    table = get_decision_table()
+    return lambda i: [lambda k=key: table.route(*k) for key in keys]
+
+
+def _bench_sales_dialogue(turns):
+    from app.services.context_service import extract_context_from_history
+    from app.services.intent_service import analyze_intent
+    from app.services.sales_dialogue import next_action
+    cases = [
+        (text, analyze_intent(text, history).get("intent"), history, extract_context_from_history(history))
+        for _, text, history in turns
+    ]
+    # Estado nuevo por turno: next_action modifica los slots del estado que recibe
+    return lambda i: [
+        lambda t=text, n=intent, h=history, c=context: next_action(t, n, {"conversation_id": "bench"}, h, c)
+        for text, intent, history, context in cases
+    ]
+
+
+def _bench_decode_webhook(turns):
+    from app.services.webhook_parser import decode_webhook
+    # Un POST por conversación con todos sus turnos en el mismo batch
+    bodies: Dict[str, List[Dict[str, Any]]] = {}
+    for turn, (conversation_id, text, _) in enumerate(turns):
+        bodies.setdefault(conversation_id, []).append({
+            "from": "573000000000", "id": f"wamid.in.{turn}", "timestamp": "1700000000",
+            "type": "text", "text": {"body": text},
+        })
+    raw_bodies = [
+        json.dumps({"object": "whatsapp_business_account", "entry": [{"id": "WABA", "changes": [{
+            "value": {"metadata": {"phone_number_id": "bench"}, "messages": messages}, "field": "messages",
+        }]}]}).encode()
+        for messages in bodies.values()
+    ]
+    return lambda i: [lambda b=body: decode_webhook(b) for body in raw_bodies]
+
+
+def _bench_build_response(turns):
+    from app.services.response_service import build_response
+    from app.services.cache_service import clear_cache
+
+    def make_ops(iteration):
+        # Cache vacía y conversaciones nuevas: cada iteración recorre el mismo camino
+        clear_cache()
+        return [
+            lambda t=text, c=f"bench_{iteration}_{conversation_id}": build_response(
+                text=t, conversation_id=c, channel="api", customer_number=None
+            )
+            for conversation_id, text, _ in turns
+        ]
+    return make_ops
+
+
+def _bench_process_whatsapp_message(turns):
+    from app.routers.whatsapp import _process_whatsapp_message
+
+    loop = asyncio.new_event_loop()
+    phones = {conversation_id: n for n, conversation_id in enumerate(dict.fromkeys(c for c, _, _ in turns))}
+
+    def make_ops(iteration):
+        ops = []
+        for turn, (conversation_id, text, _) in enumerate(turns):
+            phone = f"5730{iteration:05d}{phones[conversation_id]:03d}"
+            coro_args = (f"wamid.in.{iteration}.{turn}", phone, text, "Cliente", str(int(time.time())))
+            ops.append(lambda a=coro_args: loop.run_until_complete(_process_whatsapp_message(*a)))
+        return ops
+    return make_ops
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    "classify_message_type": _bench_classify_message_type,
+    "is_business_related": _bench_is_business_related,
+    "guardrails_batch": _bench_guardrails_batch,
+    "analyze_intent": _bench_analyze_intent,
+    "extract_context_from_history": _bench_extract_context,
+    "select_catalog_asset": _bench_select_catalog_asset,
+    "decision_table": _bench_decision_table,
+    "sales_dialogue": _bench_sales_dialogue,
+    "decode_webhook": _bench_decode_webhook,
+    "build_response": _bench_build_response,
+    "process_whatsapp_message": _bench_process_whatsapp_message,
+}
+
+# Las etapas puras son baratas: más iteraciones para estabilizar p99
+PURE_ITERATION_FACTOR = 20
+PURE_BENCHMARKS = {"classify_message_type", "is_business_related", "guardrails_batch", "analyze_intent",
+                   "extract_context_from_history", "select_catalog_asset", "decision_table",
+                   "sales_dialogue", "decode_webhook"}
+
+
+def run_benchmarks(
+    names: Optional[List[str]] = None,
+    iterations: int = 10,
+    corpus: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Corre los benchmarks pedidos (todos por defecto). Requiere app ya configurada."""
+    turns = corpus_turns(corpus or load_corpus())
+    results = {}
+    for name in names or list(BENCHMARKS):
+        make_ops = BENCHMARKS[name](turns)
+        factor = PURE_ITERATION_FACTOR if name in PURE_BENCHMARKS else 1
+        try:
+            results[name] = measure(make_ops, iterations=iterations * factor)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+# ============================================================================
+# BASELINE
+# ============================================================================
+
+def build_baseline(results: Dict[str, Dict[str, Any]], corpus_version: str) -> Dict[str, Any]:
+    return {
+        "version": BASELINE_VERSION,
+        "corpus": corpus_version,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": results,
+    }
+
+
+def compare_to_baseline(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.2,
+    p99_tolerance: Optional[float] = None,
+) -> List[str]:
+    """
+    Regresiones respecto del baseline.
+
+    Una métrica empeora si cae (ops/seg) o sube (latencias, memoria) más de
+    tolerance (fracción). p99 es más ruidoso: por defecto usa el doble.
+
+    Returns:
+        Lista de regresiones legibles (vacía si no hay)
+    """
+    p99_tolerance = tolerance * 2 if p99_tolerance is None else p99_tolerance
+    regressions = []
+    for name, base in baseline.get("benchmarks", {}).items():
+        current = results.get(name)
+        if current is None or "error" in base:
+            continue
+        if "error" in current:
+            regressions.append(f"{name}: error ({current['error']})")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            old, new = base.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            limit = p99_tolerance if metric == "p99_us" else tolerance
+            change = (new - old) / old
+            if (higher_is_better and change < -limit) or (not higher_is_better and change > limit):
+                regressions.append(f"{name}.{metric}: {old} → {new} ({change:+.0%}, tolerancia ±{limit:.0%})")
+    return regressions
+
+
+def format_results(results: Dict[str, Dict[str, Any]]) -> str:
+    lines = [
+        f"{'benchmark':<30} {'ops/seg':>10} {'p50 µs':>10} {'p99 µs':>10} {'KiB/op':>8}",
+        "-" * 72,
+    ]
+    for name, r in results.items():
+        if "error" in r:
+            lines.append(f"{name:<30} ERROR {r['error']}")
+            continue
+        lines.append(
+            f"{name:<30} {r['ops_per_sec']:>10} {r['p50_us']:>10} {r['p99_us']:>10} {r['alloc_kib_per_op']:>8}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    """Función principal."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline con stubs locales")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks a correr (default: todos)")
+    parser.add_argument("--iterations", type=int, default=10, help="Pasadas por el corpus (x20 en etapas puras)")
+    parser.add_argument("--baseline", type=Path, help="JSON contra el cual comparar")
+    parser.add_argument("--save-baseline", type=Path, help="Guardar los resultados como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento tolerado (fracción)")
+    parser.add_argument("--json", action="store_true", help="Imprimir resultados en JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="luisa_bench_") as tmp_dir:
+        configure_environment(str(Path(tmp_dir) / "bench.db"))
+        from app.models.database import init_db
+        init_db()
+        install_stubs()
+
+        corpus = load_corpus()
+        results = run_benchmarks(args.only, iterations=args.iterations, corpus=corpus)
+
+    print(json.dumps(results, indent=2) if args.json else format_results(results))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(build_baseline(results, corpus["version"]), f, indent=2)
+        print(f"\n💾 Baseline guardado en: {args.save_baseline}")
+
+    failed = any("error" in r for r in results.values())
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("corpus") != corpus["version"]:
+            print(f"\n⚠️  Baseline medido con el corpus {baseline.get('corpus')}, no {corpus['version']}")
+        regressions = compare_to_baseline(results, baseline, tolerance=args.tolerance)
+        if regressions:
+            print("\n❌ Regresiones:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            failed = True
+        else:
+            print(f"\n✅ Sin regresiones (tolerancia ±{args.tolerance:.0%})")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Busca palabras reales del español que el corrector de typos
+(app/rules/normalization.py) cambiaría por un keyword ("pedido" -> "perdido").
+Correr al ampliar keywords.py y agregar a mano las que sean palabras reales a
+app/rules/palabras_comunes_es.txt. No escribe nada.
+
+Las palabras a revisar salen de un archivo (una por línea) o, sin --words, de
+la lista de frecuencias de wordfreq (solo para desarrollo; no se versiona):
+
+    pip install wordfreq
+    python scripts/check_typo_collisions.py
+    python scripts/check_typo_collisions.py --min-zipf 3.5
+    python scripts/check_typo_collisions.py --words mis_palabras.txt
+"""
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.rules.normalization import MIN_TOKEN_LENGTH, fold_text, load_spanish_wordlist
+
+
+def frequent_words(min_zipf: float):
+    """Palabras plegadas con frecuencia Zipf >= min_zipf, de más a menos frecuente."""
+    from wordfreq import iter_wordlist, zipf_frequency
+
+    for word in iter_wordlist("es", wordlist="large"):
+        if zipf_frequency(word, "es", wordlist="large") < min_zipf:
+            break
+        yield fold_text(word)
+
+
+def find_collisions(words):
+    """(palabra, keyword) para cada palabra que el corrector cambiaría."""
+    from app.rules.normalization import get_typo_index
+
+    index = get_typo_index()
+    collisions = {}
+    for word in words:
+        # Tokens más cortos nunca se corrigen
+        if len(word) < MIN_TOKEN_LENGTH or not word.isascii() or word in collisions:
+            continue
+        target = index.lookup(word)
+        if target:
+            collisions[word] = target
+    return collisions
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Palabras reales que el corrector de typos cambiaría")
+    parser.add_argument("--words", type=Path, help="Archivo con una palabra por línea (default: wordfreq)")
+    parser.add_argument("--min-zipf", type=float, default=3.0, help="Frecuencia Zipf mínima con wordfreq (3.0 = una vez por millón de palabras)")
+    args = parser.parse_args()
+
+    if args.words:
+        words = (fold_text(word) for word in load_spanish_wordlist(args.words))
+    else:
+        words = frequent_words(args.min_zipf)
+
+    collisions = find_collisions(words)
+    for word, target in collisions.items():
+        print(f"{word}\t-> {target}")
+    if collisions:
+        print(f"⚠️  {len(collisions)} palabras; agregar las reales a app/rules/palabras_comunes_es.txt")
+    else:
+        print("✅ Sin colisiones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Cobertura y tiempos de la máquina de estados del Sales Dialogue Manager.
+
+Reproduce las conversaciones del corpus de benchmarks por next_action()
+(con el estado de cada conversación aplicado turno a turno, como el handler
+de WhatsApp) y muestra, por (etapa, transición), cuántas veces se ejercitó y
+cuánto costó el turno en promedio. Las transiciones compiladas que nadie
+ejercitó quedan listadas al final.
+
+Uso:
+    python scripts/dialogue_fsm_report.py
+    python scripts/dialogue_fsm_report.py --iterations 20 --json
+    python scripts/dialogue_fsm_report.py --min-coverage 0.8
+"""
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Agregar backend al path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+CORPUS_PATH = BASE_DIR / "tests" / "data" / "benchmark_corpus_v1.json"
+
+
+def replay_corpus(conversations: List[Dict[str, Any]], iterations: int = 1) -> int:
+    """Pasa cada conversación por next_action(); devuelve la cantidad de turnos."""
+    from app.services.context_service import extract_context_from_history
+    from app.services.intent_service import analyze_intent
+    from app.services.sales_dialogue import next_action
+
+    turns = 0
+    for iteration in range(iterations):
+        for conversation in conversations:
+            state: Dict[str, Any] = {"conversation_id": f"{conversation['id']}_{iteration}"}
+            history: List[Dict[str, str]] = []
+            for text in conversation["turns"]:
+                intent = analyze_intent(text, history).get("intent")
+                context = extract_context_from_history(history)
+                result = next_action(text, intent, state, history, context)
+                state.update(result.get("state_updates") or {})
+                history.append({"text": text, "sender": "customer"})
+                history.append({"text": result.get("reply_text", ""), "sender": "luisa"})
+                turns += 1
+    return turns
+
+
+def format_report(report: Dict[str, Any], turns: int) -> str:
+    lines = [
+        f"{'etapa':<18} {'transición':<22} {'turnos':>8} {'prom µs':>10}",
+        "-" * 62,
+    ]
+    for row in report["transitions"]:
+        if row["hits"]:
+            lines.append(f"{row['stage']:<18} {row['transition']:<22} {row['hits']:>8} {row['avg_us']:>10}")
+    lines.append("")
+    lines.append(f"Turnos: {turns} | Cobertura: {report['covered']}/{report['total']} transiciones")
+    if report["uncovered"]:
+        lines.append("Sin ejercitar:")
+        lines.extend(f"  - {stage} -> {transition}" for stage, transition in report["uncovered"])
+    return "\n".join(lines)
+
+
+def main():
+    """Función principal."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cobertura y tiempos de transiciones de sales_dialogue")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_PATH, help="Corpus de conversaciones")
+    parser.add_argument("--iterations", type=int, default=5, help="Pasadas por el corpus")
+    parser.add_argument("--min-coverage", type=float, default=0.0,
+                        help="Falla (exit 1) si la fracción de transiciones ejercitadas es menor")
+    parser.add_argument("--json", action="store_true", help="Imprimir el reporte en JSON")
+    args = parser.parse_args()
+
+    from app.services.dialogue_fsm import transition_report
+    from app.services.metrics import DIALOGUE_TURN_SECONDS
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    DIALOGUE_TURN_SECONDS.reset()
+    turns = replay_corpus(corpus["conversations"], iterations=args.iterations)
+    report = transition_report()
+    print(json.dumps(report, indent=2, ensure_ascii=False) if args.json else format_report(report, turns))
+
+    coverage = report["covered"] / report["total"]
+    if coverage < args.min_coverage:
+        print(f"\n❌ Cobertura {coverage:.0%} < {args.min_coverage:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Exporta interaction_traces, messages y handoffs a archivos columnares
+(Parquet o Arrow IPC) particionados por día, solo con las filas nuevas desde
+la corrida anterior. El análisis pesado se hace sobre esos archivos (pandas,
+polars, DuckDB...) en vez de sobre luisa.db.
+
+Requiere: pip install -r requirements-analytics.txt
+
+Uso:
+    python scripts/export_analytics.py
+    python scripts/export_analytics.py --format arrow --out /data/luisa
+    python scripts/export_analytics.py --tables interaction_traces --reset
+"""
+import sys
+from pathlib import Path
+
+# Agregar backend al path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.models.database import init_db
+from app.services.analytics_export import EXPORT_TABLES, export_all, reset_export_watermarks
+from app.config import ANALYTICS_EXPORT_DIR
+
+
+def main():
+    """Función principal."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exportación columnar incremental para analítica")
+    parser.add_argument("--out", type=Path, default=ANALYTICS_EXPORT_DIR,
+                        help=f"Directorio destino (default: {ANALYTICS_EXPORT_DIR})")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--tables", nargs="+", choices=list(EXPORT_TABLES), help="Tablas a exportar (default: todas)")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Filas por lote")
+    parser.add_argument("--reset", action="store_true", help="Reiniciar la marca de agua y exportar todo de nuevo")
+    args = parser.parse_args()
+
+    init_db()
+    if args.reset:
+        reset_export_watermarks(args.tables)
+
+    results = export_all(out_dir=args.out, fmt=args.format, tables=args.tables, batch_size=args.batch_size)
+    print(f"📦 Exportación a {args.out} ({args.format}):")
+    for table, stats in results.items():
+        print(f"  - {table}: {stats['rows']} filas nuevas, {stats['files']} archivos (último id {stats['last_id']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
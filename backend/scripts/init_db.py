@@ -11,7 +11,8 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.models.database import init_db
+from app.models.database import init_db, get_connection
+from app.models.migrations import get_schema_version, LATEST_VERSION
 from app.config import DB_PATH
 
 
@@ -21,7 +22,11 @@ def main():
     
     try:
         init_db()
+        conn = get_connection()
+        version = get_schema_version(conn)
+        conn.close()
         print("✅ Database initialized successfully!")
+        print(f"🔢 Schema version: {version} (latest: {LATEST_VERSION})")
         print(f"📊 Database location: {DB_PATH}")
         print("\n📋 Tables created:")
         print("  - conversations (customer conversations)")
@@ -30,7 +35,11 @@ def main():
         print("  - catalog_items (product catalog)")
         print("  - interaction_traces (analytics & traceability)")
         print("  - notifications (WhatsApp notifications)")
-        print("  - conversation_modes (AI/Human mode tracking)")
+        print("  - cache_metadata (Drive asset cache, LRU)")
+        print("  - wa_processed_messages / wa_outbox_dedup / wa_conversations (WhatsApp)")
+        print("  - wa_media_cache (uploaded WhatsApp media ids)")
+        print("  - trace_rollup_minute / trace_rollup_hour / trace_rollup_conversations (trace rollups)")
+        print("  - live_metrics_state (persisted in-memory metrics window)")
         
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
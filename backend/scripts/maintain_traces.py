@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento de interaction_traces: agrega trazas nuevas a los rollups por
+minuto/hora y aplica la retención (borrado en lotes).
+
+La app ya lo corre cada TRACE_MAINTENANCE_INTERVAL_SECONDS; este script sirve
+para cron (con el intervalo en 0) o para una pasada manual.
+
+Uso:
+    python scripts/maintain_traces.py
+    python scripts/maintain_traces.py --retention-days 14
+"""
+import sys
+from pathlib import Path
+
+# Agregar backend al path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.models.database import init_db
+from app.services.trace_rollups import refresh_trace_rollups, prune_traces
+from app.config import TRACE_RETENTION_DAYS
+
+
+def main():
+    """Función principal."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rollups y retención de interaction_traces")
+    parser.add_argument("--retention-days", type=int, default=TRACE_RETENTION_DAYS,
+                        help=f"Días de trazas crudas a conservar (default: {TRACE_RETENTION_DAYS})")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Filas por lote de borrado")
+    args = parser.parse_args()
+
+    init_db()
+    aggregated = refresh_trace_rollups()
+    print(f"📊 Trazas agregadas a rollups: {aggregated}")
+
+    deleted = prune_traces(retention_days=args.retention_days, batch_size=args.batch_size)
+    print(f"🧹 Retención (trazas crudas > {args.retention_days} días):")
+    for table, count in deleted.items():
+        print(f"  - {table}: {count} filas borradas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
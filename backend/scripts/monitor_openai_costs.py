@@ -14,7 +14,7 @@ from datetime import datetime, timedelta
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-from app.models.database import get_connection
+from app.services.trace_rollups import refresh_trace_rollups, get_rollup_totals
 from app.logging_config import logger
 
 # Estimación conservadora de costo por llamada OpenAI (gpt-4o-mini)
@@ -26,7 +26,7 @@ UMBRAL_COSTO_POR_CONVERSACION = 0.05  # $0.05 por conversación
 
 def calculate_openai_metrics(hours: int = 24) -> dict:
     """
-    Calcula métricas de OpenAI desde interaction_traces.
+    Calcula métricas de OpenAI desde los rollups de interaction_traces.
     
     Args:
         hours: Horas hacia atrás para analizar (default: 24)
@@ -34,25 +34,12 @@ def calculate_openai_metrics(hours: int = 24) -> dict:
     Returns:
         Dict con métricas
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     try:
-        # Query: métricas de las últimas N horas
-        cursor.execute("""
-            SELECT 
-                COUNT(DISTINCT conversation_id) as total_conversations,
-                SUM(CASE WHEN openai_called = 1 THEN 1 ELSE 0 END) as total_openai_calls,
-                AVG(CASE WHEN openai_called = 1 THEN openai_latency_ms ELSE NULL END) as avg_openai_latency_ms,
-                SUM(CASE WHEN openai_fallback_used = 1 THEN 1 ELSE 0 END) as total_fallbacks,
-                SUM(CASE WHEN openai_canary_allowed = 0 AND openai_called = 1 THEN 1 ELSE 0 END) as unauthorized_calls
-            FROM interaction_traces
-            WHERE created_at > datetime('now', '-' || ? || ' hours')
-        """, (hours,))
-        
-        row = cursor.fetchone()
+        # Rollups por hora (resolución horaria), sin escanear interaction_traces
+        refresh_trace_rollups()
+        totals = get_rollup_totals(hours=hours)
         
-        if not row or row[0] is None:
+        if not totals["msgs"]:
             return {
                 "total_conversations": 0,
                 "total_openai_calls": 0,
@@ -63,11 +50,14 @@ def calculate_openai_metrics(hours: int = 24) -> dict:
                 "costo_promedio_por_conv": 0.0
             }
         
-        total_conversations = row[0] or 0
-        total_openai_calls = row[1] or 0
-        avg_openai_latency_ms = row[2] or 0.0
-        total_fallbacks = row[3] or 0
-        unauthorized_calls = row[4] or 0
+        total_conversations = totals["conversations"]
+        total_openai_calls = totals["openai_calls"]
+        avg_openai_latency_ms = (
+            totals["openai_latency_sum_ms"] / totals["openai_latency_count"]
+            if totals["openai_latency_count"] else 0.0
+        )
+        total_fallbacks = totals["openai_fallbacks"]
+        unauthorized_calls = totals["openai_unauthorized"]
         
         # Calcular costos
         costo_total_estimado = total_openai_calls * COSTO_ESTIMADO_POR_LLAMADA
@@ -88,8 +78,6 @@ def calculate_openai_metrics(hours: int = 24) -> dict:
         return {
             "error": str(e)
         }
-    finally:
-        conn.close()
 
 
 def main():
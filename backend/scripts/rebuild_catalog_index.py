@@ -16,6 +16,8 @@ BACKEND_DIR = SCRIPT_DIR.parent
 CATALOG_DIR = BACKEND_DIR / "assets" / "catalog"
 INDEX_FILE = BACKEND_DIR / "assets" / "catalog_index.json"
 
+sys.path.insert(0, str(BACKEND_DIR))
+
 
 def extract_slug_from_folder(folder_name: str) -> str:
     """Extrae el slug del nombre de la carpeta (sin el prefijo Ixxx_)"""
@@ -182,9 +184,47 @@ def generate_index():
     print(f"Índice guardado en: {INDEX_FILE}")
     print("=" * 60)
     
+    rebuild_asset_manifest()
+    
     return len(valid_items), len(invalid_items)
 
 
+def rebuild_asset_manifest():
+    """
+    Regenera el manifiesto de assets y los derivados (thumb/medium/WebP).
+    Ambos son incrementales: solo se re-hashean/re-generan archivos modificados.
+    """
+    from app.services.asset_manifest import (
+        build_asset_manifest,
+        load_asset_manifest,
+        save_asset_manifest,
+        ASSET_MANIFEST_PATH
+    )
+    from app.services.asset_derivatives import build_asset_derivatives, ASSET_DERIVATIVES_DIR
+    
+    manifest = build_asset_manifest(load_asset_manifest())
+    stats = build_asset_derivatives(manifest)
+    save_asset_manifest(manifest)
+    
+    invalid = [entry for entry in manifest.values() if not entry.valid]
+    print(f"\n🗂️  Manifiesto de assets: {len(manifest)} archivos")
+    for entry in invalid:
+        print(f"   ⚠️  {entry.image_id}: {entry.path} no es imagen/video válido (placeholder)")
+    print(f"Manifiesto guardado en: {ASSET_MANIFEST_PATH}")
+    print(
+        "   La app en ejecución lo toma en el próximo refresco (ASSET_MANIFEST_REFRESH_INTERVAL_SECONDS) "
+        "o al instante con POST /api/catalog/reload-assets"
+    )
+    
+    print(
+        f"\n🖼️  Derivados: {stats['generated']} generados, {stats['up_to_date']} al día, "
+        f"{stats['removed']} huérfanos eliminados"
+    )
+    if stats["failed"]:
+        print(f"   ⚠️  {stats['failed']} derivados fallaron (ver logs)")
+    print(f"Derivados en: {ASSET_DERIVATIVES_DIR}")
+
+
 if __name__ == "__main__":
     try:
         valid_count, invalid_count = generate_index()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Re-clasifica el histórico de interaction_traces con las reglas actuales.
+
+Después de cambiar keywords o reglas de business_guardrails/triage_service,
+pasa todos los raw_text por las APIs por lotes y compara con lo que quedó
+guardado en la traza: cuántos mensajes cambian de message_type, cuántos pasan
+de negocio a personal (o al revés) y cómo queda la distribución de intents de
+triage. No modifica la base.
+
+Uso:
+    python scripts/rescore_traces.py                       # últimos 90 días
+    python scripts/rescore_traces.py --all --workers 4
+    python scripts/rescore_traces.py --days 30 --examples 20
+"""
+import sqlite3
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Agregar backend al path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.rules.business_guardrails import classify_message_type_batch, is_business_related_batch
+from app.services.triage_service import classify_triage_intent_batch
+
+
+def load_traces(db_path: str, days: Optional[int]) -> List[Tuple[str, Optional[str], Optional[int]]]:
+    """(raw_text, message_type, business_related) de las trazas del rango."""
+    query = """
+        SELECT raw_text, message_type, business_related FROM interaction_traces
+        WHERE raw_text IS NOT NULL
+    """
+    params: Tuple = ()
+    if days is not None:
+        query += " AND created_at >= datetime('now', ?)"
+        params = (f"-{int(days)} days",)
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(query + " ORDER BY id", params).fetchall()
+    finally:
+        conn.close()
+
+
+def rescore(rows: List[Tuple[str, Optional[str], Optional[int]]], workers: int = 0, examples: int = 10) -> Dict[str, Any]:
+    """Clasifica los textos en lote y resume las diferencias con lo guardado."""
+    texts = [raw_text for raw_text, _, _ in rows]
+
+    start = time.perf_counter()
+    message_types = classify_message_type_batch(texts, workers=workers)
+    business = is_business_related_batch(texts, workers=workers)
+    triage = classify_triage_intent_batch(texts, workers=workers)
+    elapsed = time.perf_counter() - start
+
+    type_changes: Counter = Counter()
+    business_flips: Counter = Counter()
+    changed_examples = []
+    for (text, old_type, old_business), new_type, (is_business, *_) in zip(rows, message_types, business):
+        changes = []
+        if old_type and old_type != new_type.value:
+            type_changes[(old_type, new_type.value)] += 1
+            changes.append(f"{old_type} -> {new_type.value}")
+        if old_business is not None and bool(old_business) != is_business:
+            flip = "personal -> business" if is_business else "business -> personal"
+            business_flips[flip] += 1
+            changes.append(flip)
+        if changes and len(changed_examples) < examples:
+            changed_examples.append((text, changes))
+
+    return {
+        "rows": len(rows),
+        "unique_texts": len(set(texts)),
+        "seconds": round(elapsed, 3),
+        "message_type_changes": type_changes,
+        "business_flips": business_flips,
+        "triage_intents": Counter(intent for intent, _, _ in triage),
+        "examples": changed_examples,
+    }
+
+
+def format_report(summary: Dict[str, Any]) -> str:
+    rows = summary["rows"]
+    rate = rows / summary["seconds"] if summary["seconds"] else 0
+    lines = [
+        f"Trazas: {rows} ({summary['unique_texts']} textos distintos) en {summary['seconds']}s ({rate:,.0f} trazas/s)",
+        "",
+        f"Cambios de message_type: {sum(summary['message_type_changes'].values())}",
+    ]
+    lines.extend(
+        f"  {old:<20} -> {new:<20} {count:>6}"
+        for (old, new), count in summary["message_type_changes"].most_common()
+    )
+    lines.append(f"Cambios negocio/personal: {sum(summary['business_flips'].values())}")
+    lines.extend(f"  {flip:<42} {count:>6}" for flip, count in summary["business_flips"].most_common())
+    lines.append("Intents de triage:")
+    lines.extend(
+        f"  {intent:<20} {count:>6} ({count / rows:.1%})"
+        for intent, count in summary["triage_intents"].most_common()
+    )
+    if summary["examples"]:
+        lines.append("Ejemplos:")
+        lines.extend(f"  - {text[:60]!r}: {', '.join(changes)}" for text, changes in summary["examples"])
+    return "\n".join(lines)
+
+
+def main():
+    """Función principal."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-clasifica interaction_traces con las reglas actuales")
+    parser.add_argument("--db", default="luisa.db", help="Ruta a la base SQLite")
+    parser.add_argument("--days", type=int, default=90, help="Últimos N días")
+    parser.add_argument("--all", action="store_true", help="Todas las trazas")
+    parser.add_argument("--workers", type=int, default=0, help="Procesos en paralelo (0 = en línea)")
+    parser.add_argument("--examples", type=int, default=10, help="Ejemplos de cambios a mostrar")
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ Base no encontrada: {args.db}")
+        return 1
+
+    rows = load_traces(args.db, None if args.all else args.days)
+    if not rows:
+        print("❌ No hay trazas para re-clasificar")
+        return 1
+
+    print(format_report(rescore(rows, workers=args.workers, examples=args.examples)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
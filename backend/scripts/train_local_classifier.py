@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Entrena los clasificadores locales (app/services/local_classifier.py).
+
+- intent: textos de interaction_traces con intent mapeable a triage
+- business: interaction_traces.business_related + tests/data/filtering_dataset_v1.json
+
+Separa una partición de validación (por hash del texto), calibra la
+temperatura sobre ella y reporta exactitud, qué fracción se resolvería sin
+LLM con el umbral configurado y el costo por predicción. Guarda el modelo en
+LOCAL_CLASSIFIER_MODEL_DIR (la app lo carga en el próximo arranque).
+
+Uso:
+    python scripts/train_local_classifier.py
+    python scripts/train_local_classifier.py --task business --days 180
+    python scripts/train_local_classifier.py --dry-run
+"""
+import sys
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+# Agregar backend al path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.config import DB_PATH, LOCAL_CLASSIFIER_MIN_CONFIDENCE, LOCAL_CLASSIFIER_MODEL_DIR
+from app.services.local_classifier import (
+    TASKS,
+    evaluate,
+    fit_temperature,
+    load_training_samples,
+    model_path,
+    split_holdout,
+    train_classifier,
+)
+
+FILTERING_DATASET = BASE_DIR / "tests" / "data" / "filtering_dataset_v1.json"
+
+
+def train_task(task: str, args) -> int:
+    texts, labels = load_training_samples(task, args.db, days=args.days, filtering_dataset=FILTERING_DATASET)
+    counts = Counter(labels)
+    print(f"\n🧠 {task}: {len(texts)} ejemplos {dict(counts)}")
+    if len(counts) < 2 or min(counts.values()) < args.min_per_label:
+        print(f"  ⚠️  Datos insuficientes (mínimo {args.min_per_label} por etiqueta, 2 etiquetas); no se entrena")
+        return 1
+
+    train_x, train_y, test_x, test_y = split_holdout(texts, labels, fraction=args.holdout)
+    model = train_classifier(train_x, train_y, epochs=args.epochs)
+    temperature = fit_temperature(model, test_x, test_y)
+    metrics = evaluate(model, test_x, test_y, threshold=args.threshold)
+
+    print(f"  Validación: {metrics}")
+    print(f"  Temperatura: {temperature} | términos: {len(model.weights)}")
+
+    if args.dry_run:
+        return 0
+    model.metadata = {
+        "task": task,
+        "trained_at": datetime.utcnow().isoformat(),
+        "samples": len(texts),
+        "labels": dict(counts),
+        "validation": metrics,
+        "threshold": args.threshold,
+    }
+    path = model_path(task, args.output_dir)
+    model.save(path)
+    print(f"  💾 Modelo guardado en: {path}")
+    return 0
+
+
+def main():
+    """Función principal."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Entrena los clasificadores locales (intent / business)")
+    parser.add_argument("--task", choices=list(TASKS) + ["all"], default="all")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite con interaction_traces")
+    parser.add_argument("--days", type=int, default=90, help="Días de trazas a usar")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fracción para validación y calibración")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--min-per-label", type=int, default=5, help="Ejemplos mínimos por etiqueta")
+    parser.add_argument("--threshold", type=float, default=LOCAL_CLASSIFIER_MIN_CONFIDENCE,
+                        help="Umbral para reportar la fracción resuelta sin LLM")
+    parser.add_argument("--output-dir", type=Path, default=LOCAL_CLASSIFIER_MODEL_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="Entrenar y reportar sin guardar")
+    args = parser.parse_args()
+
+    tasks = TASKS if args.task == "all" else (args.task,)
+    failures = sum(train_task(task, args) for task in tasks)
+    return 1 if failures == len(tasks) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
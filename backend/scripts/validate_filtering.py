@@ -8,13 +8,13 @@ Hard-fail si precisión < 90% o falsos positivos > 5%.
 import sys
 import json
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
 # Agregar backend al path
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-from app.rules.business_guardrails import is_business_related
+from app.rules.business_guardrails import is_business_related_batch
 from app.rules.enhanced_filtering import enhanced_is_business_related
 from app.config import ENHANCED_FILTERING_WITH_LLM
 
@@ -49,15 +49,19 @@ def calculate_metrics(results: list) -> Dict[str, float]:
     }
 
 
-async def validate_sample(sample: Dict[str, str], use_enhanced: bool) -> Dict[str, Any]:
-    """Valida un sample del dataset."""
+async def validate_sample(
+    sample: Dict[str, str],
+    heuristic_result: Tuple[bool, str, float, List[str]],
+    use_enhanced: bool
+) -> Dict[str, Any]:
+    """Valida un sample del dataset (heuristic_result: is_business_related del texto)."""
     text = sample['text']
     expected = sample['expected']
     expected_score_min = sample.get('expected_score_min', 0.0)
     expected_score_max = sample.get('expected_score_max', 1.0)
     
     # Clasificar
-    is_business_heuristic, reason_heuristic, score_heuristic, reasons_list_heuristic = is_business_related(text)
+    is_business_heuristic, reason_heuristic, score_heuristic, reasons_list_heuristic = heuristic_result
     
     if use_enhanced:
         is_business, reason, score, reasons_list = await enhanced_is_business_related(
@@ -102,10 +106,13 @@ async def main():
     print(f"✅ Dataset cargado: {len(samples)} samples (v{dataset.get('version', 'unknown')})")
     print(f"🔍 Usando filtrado mejorado: {ENHANCED_FILTERING_WITH_LLM}\n")
     
+    # Heurísticas de todo el dataset en un lote; LLM solo para los ambiguos
+    heuristic_results = is_business_related_batch(sample['text'] for sample in samples)
+
     # Validar cada sample
     results = []
-    for i, sample in enumerate(samples, 1):
-        result = await validate_sample(sample, ENHANCED_FILTERING_WITH_LLM)
+    for i, (sample, heuristic_result) in enumerate(zip(samples, heuristic_results), 1):
+        result = await validate_sample(sample, heuristic_result, ENHANCED_FILTERING_WITH_LLM)
         results.append(result)
         
         status = "✅" if result['is_correct'] else "❌"
@@ -0,0 +1,113 @@
+"""
+Tests para la exportación columnar incremental (app/services/analytics_export.py).
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.services.analytics_export import (
+    export_table,
+    export_all,
+    get_export_watermark,
+    partition_rows_by_day,
+    reset_export_watermarks,
+)
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+
+
+def _message(conversation_id, text, timestamp):
+    with database.get_db() as conn:
+        conn.execute(
+            "INSERT INTO messages (conversation_id, text, sender, timestamp) VALUES (?, ?, 'customer', ?)",
+            (conversation_id, text, timestamp)
+        )
+
+
+def _watermark(table):
+    with database.get_db() as conn:
+        return get_export_watermark(conn, table)
+
+
+class TestParticiones:
+    """Tests del agrupamiento por día."""
+
+    def test_agrupa_por_dia(self):
+        rows = [
+            (1, "2026-03-01 23:59:59"),
+            (2, "2026-03-02 00:00:00"),
+            (3, "2026-03-01 10:00:00"),
+            (4, None),
+        ]
+        partitions = partition_rows_by_day(rows, 1)
+        assert {day: [r[0] for r in day_rows] for day, day_rows in partitions.items()} == {
+            "2026-03-01": [1, 3],
+            "2026-03-02": [2],
+            "unknown": [4],
+        }
+
+    def test_tabla_invalida(self, temp_db):
+        with pytest.raises(ValueError):
+            export_table("conversations")
+
+    def test_sin_pyarrow_no_avanza(self, temp_db, tmp_path, monkeypatch):
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+        _message("c1", "hola", "2026-03-01 10:00:00")
+        stats = export_table("messages", out_dir=tmp_path / "exports")
+        assert stats == {"rows": 0, "files": 0, "last_id": 0}
+        assert _watermark("messages") == 0
+
+
+class TestExportacion:
+    """Tests de escritura (requieren pyarrow)."""
+
+    def test_parquet_incremental(self, temp_db, tmp_path):
+        pq = pytest.importorskip("pyarrow.parquet")
+        out_dir = tmp_path / "exports"
+        _message("c1", "hola", "2026-03-01 10:00:00")
+        _message("c1", "precio?", "2026-03-01 11:00:00")
+        _message("c2", "buenas", "2026-03-02 09:00:00")
+
+        stats = export_table("messages", out_dir=out_dir, batch_size=2)
+        assert stats["rows"] == 3
+        assert _watermark("messages") == 3
+        files = sorted((out_dir / "messages").rglob("*.parquet"))
+        assert [f.parent.name for f in files] == ["date=2026-03-01", "date=2026-03-02"]
+        table = pq.read_table(out_dir / "messages" / "date=2026-03-01")
+        assert table.column("text").to_pylist() == ["hola", "precio?"]
+        assert str(table.schema.field("timestamp").type) == "timestamp[ms]"
+
+        # Segunda corrida: solo la fila nueva
+        assert export_table("messages", out_dir=out_dir)["rows"] == 0
+        _message("c2", "gracias", "2026-03-02 09:05:00")
+        assert export_table("messages", out_dir=out_dir)["rows"] == 1
+        assert pq.read_table(out_dir / "messages").num_rows == 4
+
+    def test_arrow_ipc_y_reset(self, temp_db, tmp_path):
+        ipc = pytest.importorskip("pyarrow.ipc")
+        out_dir = tmp_path / "exports"
+        _message("c1", "hola", "2026-03-01 10:00:00")
+
+        results = export_all(out_dir=out_dir, fmt="arrow")
+        assert results["messages"]["rows"] == 1
+        assert results["handoffs"]["rows"] == 0
+        path = next((out_dir / "messages").rglob("*.arrow"))
+        arrow_table = ipc.open_file(str(path)).read_all()
+        assert arrow_table.num_rows == 1
+        assert str(arrow_table.schema.field("timestamp").type) == "timestamp[ms]"
+
+        reset_export_watermarks(["messages"])
+        assert _watermark("messages") == 0
+        assert export_table("messages", out_dir=out_dir, fmt="arrow")["rows"] == 1
+        assert len(list((out_dir / "messages").rglob("*.arrow"))) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,180 @@
+"""
+Tests para entrega HTTP de assets: ETag/304, Cache-Control versionado y byte ranges.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services import asset_manifest
+from app.services.asset_delivery import (
+    parse_byte_range,
+    RangeNotSatisfiable,
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+)
+from app.services.asset_manifest import describe_asset_file
+
+VIDEO_BYTES = b"\x00\x00\x00\x18ftypmp42" + bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """App mínima con el router de API y un catálogo temporal con un video."""
+    assets_dir = tmp_path / "assets"
+    catalog_dir = assets_dir / "catalog"
+    (catalog_dir / "I010_video").mkdir(parents=True)
+    (catalog_dir / "I010_video" / "video_1.mp4").write_bytes(VIDEO_BYTES)
+
+    monkeypatch.setattr(asset_manifest, "ASSETS_DIR", assets_dir)
+    monkeypatch.setattr(asset_manifest, "ASSETS_CATALOG_DIR", catalog_dir)
+    monkeypatch.setattr(asset_manifest, "_ASSET_MANIFEST", {})
+    monkeypatch.setattr(asset_manifest, "_MANIFEST_LOADED", False)
+    monkeypatch.setattr(asset_manifest, "ASSET_MANIFEST_PATH", assets_dir / "asset_manifest.json")
+
+    from app.routers import api
+    app = FastAPI()
+    app.include_router(api.router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def entry(client):
+    return asset_manifest.get_asset_entry("I010")
+
+
+class TestParseByteRange:
+    """Tests para el parser de header Range."""
+
+    def test_sin_header(self):
+        assert parse_byte_range(None, 100) is None
+
+    def test_rango_cerrado(self):
+        assert parse_byte_range("bytes=0-9", 100) == (0, 9)
+
+    def test_rango_abierto(self):
+        assert parse_byte_range("bytes=90-", 100) == (90, 99)
+
+    def test_sufijo(self):
+        assert parse_byte_range("bytes=-10", 100) == (90, 99)
+
+    def test_fin_recortado_al_tamano(self):
+        assert parse_byte_range("bytes=50-500", 100) == (50, 99)
+
+    def test_multirango_se_ignora(self):
+        assert parse_byte_range("bytes=0-1,5-6", 100) is None
+
+    def test_sintaxis_invalida_se_ignora(self):
+        assert parse_byte_range("bytes=a-b", 100) is None
+        assert parse_byte_range("items=0-1", 100) is None
+
+    def test_fuera_de_rango(self):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_byte_range("bytes=100-", 100)
+
+
+class TestConditionalRequests:
+    """Tests para validadores condicionales y Cache-Control."""
+
+    def test_if_none_match_304(self, client, entry):
+        response = client.get("/api/assets/I010", headers={"If-None-Match": entry.etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == entry.etag
+
+    def test_if_none_match_distinto_200(self, client):
+        response = client.get("/api/assets/I010", headers={"If-None-Match": '"otro"'})
+        assert response.status_code == 200
+        assert response.content == VIDEO_BYTES
+
+    def test_if_modified_since_304(self, client, entry):
+        last_modified = client.get("/api/assets/I010").headers["last-modified"]
+        response = client.get("/api/assets/I010", headers={"If-Modified-Since": last_modified})
+        assert response.status_code == 304
+
+    def test_url_versionada_inmutable(self, client, entry):
+        response = client.get(f"/api/assets/I010?v={entry.version}")
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+    def test_url_sin_version_revalida(self, client):
+        response = client.get("/api/assets/I010")
+        assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+    def test_version_vieja_revalida(self, client):
+        response = client.get("/api/assets/I010?v=000000000000")
+        assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+
+class TestByteRanges:
+    """Tests para respuestas 206/416."""
+
+    def test_rango_206(self, client):
+        response = client.get("/api/assets/I010", headers={"Range": "bytes=10-19"})
+        assert response.status_code == 206
+        assert response.content == VIDEO_BYTES[10:20]
+        assert response.headers["content-range"] == f"bytes 10-19/{len(VIDEO_BYTES)}"
+        assert response.headers["content-length"] == "10"
+
+    def test_sufijo_206(self, client):
+        response = client.get("/api/assets/I010", headers={"Range": "bytes=-5"})
+        assert response.status_code == 206
+        assert response.content == VIDEO_BYTES[-5:]
+
+    def test_fuera_de_rango_416(self, client):
+        response = client.get("/api/assets/I010", headers={"Range": f"bytes={len(VIDEO_BYTES)}-"})
+        assert response.status_code == 416
+        assert response.headers["content-range"] == f"bytes */{len(VIDEO_BYTES)}"
+
+    def test_if_range_vigente_206(self, client, entry):
+        response = client.get(
+            "/api/assets/I010",
+            headers={"Range": "bytes=0-3", "If-Range": entry.etag}
+        )
+        assert response.status_code == 206
+
+    def test_if_range_obsoleto_200_completo(self, client):
+        response = client.get(
+            "/api/assets/I010",
+            headers={"Range": "bytes=0-3", "If-Range": '"obsoleto"'}
+        )
+        assert response.status_code == 200
+        assert response.content == VIDEO_BYTES
+
+    def test_head_sin_body(self, client):
+        response = client.head("/api/assets/I010", headers={"Range": "bytes=0-3"})
+        assert response.content == b""
+
+
+class TestDescribeAssetFile:
+    """Tests para entradas de archivos fuera del catálogo (cache de Drive)."""
+
+    def test_ruta_fuera_de_assets(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(asset_manifest, "ASSETS_DIR", tmp_path / "assets")
+        cached = tmp_path / "cache" / "abc.bin"
+        cached.parent.mkdir()
+        cached.write_bytes(VIDEO_BYTES)
+
+        entry = describe_asset_file("I010", cached)
+        assert entry.file_path == cached.resolve()
+        assert describe_asset_file("I010", cached) is entry
+
+    def test_mime_de_drive_no_muta_la_entrada(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(asset_manifest, "ASSETS_DIR", tmp_path / "assets")
+        cached = tmp_path / "cache" / "def.bin"
+        cached.parent.mkdir()
+        cached.write_bytes(VIDEO_BYTES)
+
+        sniffed = describe_asset_file("I011", cached)
+        entry = describe_asset_file("I011", cached, "application/octet-stream")
+        assert sniffed.mime_type == "video/mp4"
+        assert entry.mime_type == "application/octet-stream"
+        assert entry.content_hash == sniffed.content_hash
+        assert describe_asset_file("I011", cached, "application/octet-stream") is entry
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,180 @@
+"""
+Tests para derivados pre-generados de imágenes (thumb/medium/WebP).
+"""
+import io
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services import asset_manifest
+from app.services.asset_manifest import build_asset_manifest, AssetManifestEntry
+from app.services.asset_derivatives import (
+    plan_variants,
+    derivative_filename,
+    build_asset_derivatives,
+    attach_asset_derivatives,
+    select_asset_variant,
+    DERIVATIVE_SIZES,
+)
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png_bytes(width=1200, height=900):
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 255)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def fake_assets(tmp_path, monkeypatch):
+    """Catálogo temporal con una imagen PNG grande y un video."""
+    assets_dir = tmp_path / "assets"
+    catalog_dir = assets_dir / "catalog"
+    (catalog_dir / "I001_maquina").mkdir(parents=True)
+    (catalog_dir / "I001_maquina" / "image_1.png").write_bytes(_png_bytes())
+    (catalog_dir / "I002_video").mkdir()
+    (catalog_dir / "I002_video" / "video_1.mp4").write_bytes(b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 32)
+
+    monkeypatch.setattr(asset_manifest, "ASSETS_DIR", assets_dir)
+    monkeypatch.setattr(asset_manifest, "ASSETS_CATALOG_DIR", catalog_dir)
+    monkeypatch.setattr(asset_manifest, "_ASSET_MANIFEST", {})
+    monkeypatch.setattr(asset_manifest, "_MANIFEST_LOADED", False)
+    monkeypatch.setattr(asset_manifest, "ASSET_MANIFEST_PATH", assets_dir / "asset_manifest.json")
+    return assets_dir
+
+
+@pytest.fixture
+def out_dir(fake_assets):
+    return fake_assets / "catalog" / "_derivatives"
+
+
+class TestPlanVariants:
+    """Tests para el plan de variantes y nombres con hash."""
+
+    def test_png_genera_tamanos_y_webp(self, fake_assets):
+        entry = build_asset_manifest()["I001"]
+        keys = [spec[0] for spec in plan_variants(entry)]
+        assert keys == ["thumb", "thumb.webp", "medium", "medium.webp", "full.webp"]
+
+    def test_video_sin_variantes(self, fake_assets):
+        assert plan_variants(build_asset_manifest()["I002"]) == []
+
+    def test_nombre_depende_del_contenido(self, fake_assets):
+        entry = build_asset_manifest()["I001"]
+        spec = plan_variants(entry)[0]
+        name = derivative_filename(entry, spec)
+        assert name.startswith("I001.thumb.") and name.endswith(".png")
+
+        changed = AssetManifestEntry(**{**entry.to_dict(), "content_hash": "0" * 64, "variants": {}})
+        assert derivative_filename(changed, spec) != name
+
+
+class TestBuildDerivatives:
+    """Tests para la generación incremental de derivados."""
+
+    def test_genera_y_enlaza(self, fake_assets, out_dir):
+        manifest = build_asset_manifest()
+        stats = build_asset_derivatives(manifest, out_dir, workers=1)
+        assert stats["generated"] == 5
+        entry = manifest["I001"]
+        assert set(entry.variants) == {"thumb", "thumb.webp", "medium", "medium.webp", "full.webp"}
+        assert entry.variants["full.webp"].mime_type == "image/webp"
+
+        with Image.open(entry.variants["thumb"].file_path) as thumb:
+            assert max(thumb.size) == DERIVATIVE_SIZES["thumb"]
+
+    def test_incremental(self, fake_assets, out_dir):
+        manifest = build_asset_manifest()
+        build_asset_derivatives(manifest, out_dir, workers=1)
+        stats = build_asset_derivatives(manifest, out_dir, workers=1)
+        assert stats["generated"] == 0
+        assert stats["up_to_date"] == 5
+
+    def test_elimina_huerfanos(self, fake_assets, out_dir):
+        manifest = build_asset_manifest()
+        build_asset_derivatives(manifest, out_dir, workers=1)
+        image = fake_assets / "catalog" / "I001_maquina" / "image_1.png"
+        image.write_bytes(_png_bytes(600, 450))
+
+        manifest = build_asset_manifest(manifest)
+        stats = build_asset_derivatives(manifest, out_dir, workers=1)
+        assert stats["generated"] == 5
+        assert stats["removed"] == 5
+        assert len(list(out_dir.iterdir())) == 5
+
+    def test_attach_sin_generar(self, fake_assets, out_dir):
+        build_asset_derivatives(build_asset_manifest(), out_dir, workers=1)
+        fresh = build_asset_manifest()
+        assert fresh["I001"].variants == {}
+        assert attach_asset_derivatives(fresh, out_dir) is True
+        assert len(fresh["I001"].variants) == 5
+
+
+class TestSelectVariant:
+    """Tests para la elección de variante por size/Accept."""
+
+    @pytest.fixture
+    def entry(self, fake_assets, out_dir):
+        manifest = build_asset_manifest()
+        build_asset_derivatives(manifest, out_dir, workers=1)
+        return manifest["I001"]
+
+    def test_sin_parametros_original(self, entry):
+        assert select_asset_variant(entry) is entry
+
+    def test_size_medium(self, entry):
+        assert select_asset_variant(entry, "medium") is entry.variants["medium"]
+
+    def test_accept_webp(self, entry):
+        assert select_asset_variant(entry, "thumb", "image/avif,image/webp,*/*") is entry.variants["thumb.webp"]
+        assert select_asset_variant(entry, None, "image/webp") is entry.variants["full.webp"]
+
+    def test_size_desconocido_es_completo(self, entry):
+        assert select_asset_variant(entry, "gigante") is entry
+
+
+class TestVariantEndpoint:
+    """Tests para GET /api/assets/{image_id}?size=... con negociación por Accept."""
+
+    @pytest.fixture
+    def client(self, fake_assets, out_dir, monkeypatch):
+        from app.services import asset_derivatives
+        monkeypatch.setattr(asset_derivatives, "ASSET_DERIVATIVES_DIR", out_dir)
+        build_asset_derivatives(build_asset_manifest(), out_dir, workers=1)
+
+        from app.routers import api
+        app = FastAPI()
+        app.include_router(api.router)
+        return TestClient(app)
+
+    def test_medium_webp(self, client):
+        entry = asset_manifest.get_asset_entry("I001")
+        response = client.get(
+            f"/api/assets/I001?v={entry.version}&size=medium",
+            headers={"Accept": "image/webp"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert response.headers["vary"] == "Accept"
+        assert response.headers["cache-control"].endswith("immutable")
+        assert response.headers["etag"] == entry.variants["medium.webp"].etag
+
+    def test_thumb_sin_webp(self, client):
+        response = client.get("/api/assets/I001?size=thumb")
+        assert response.headers["content-type"] == "image/png"
+        assert len(response.content) < len(_png_bytes())
+
+    def test_url_incluye_size(self, client):
+        from app.services.asset_service import get_asset_url
+        assert get_asset_url("I001", size="medium").endswith("&size=medium")
+        assert "size" not in get_asset_url("I002", size="medium")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,158 @@
+"""
+Tests para el manifiesto precomputado de assets.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services import asset_manifest
+from app.services.asset_manifest import (
+    build_asset_manifest,
+    build_asset_entry,
+    save_asset_manifest,
+    load_asset_manifest,
+    sniff_mime_type,
+)
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+@pytest.fixture
+def fake_assets(tmp_path, monkeypatch):
+    """Catálogo temporal con una imagen real, un placeholder y una carpeta sin archivo."""
+    assets_dir = tmp_path / "assets"
+    catalog_dir = assets_dir / "catalog"
+    (catalog_dir / "I001_maquina_real").mkdir(parents=True)
+    (catalog_dir / "I001_maquina_real" / "image_1.png").write_bytes(PNG_BYTES)
+    (catalog_dir / "I002_placeholder").mkdir()
+    (catalog_dir / "I002_placeholder" / "image_1.jpg").write_text("PLACEHOLDER")
+    (catalog_dir / "I003_sin_imagen").mkdir()
+
+    monkeypatch.setattr(asset_manifest, "ASSETS_DIR", assets_dir)
+    monkeypatch.setattr(asset_manifest, "ASSETS_CATALOG_DIR", catalog_dir)
+    monkeypatch.setattr(asset_manifest, "_ASSET_MANIFEST", {})
+    monkeypatch.setattr(asset_manifest, "_MANIFEST_LOADED", False)
+    monkeypatch.setattr(asset_manifest, "ASSET_MANIFEST_PATH", assets_dir / "asset_manifest.json")
+    return assets_dir
+
+
+class TestSniffMimeType:
+    """Tests para detección de MIME por magic bytes."""
+
+    def test_png(self):
+        assert sniff_mime_type(PNG_BYTES[:16]) == "image/png"
+
+    def test_jpeg(self):
+        assert sniff_mime_type(b"\xff\xd8\xff\xe0" + b"\x00" * 8) == "image/jpeg"
+
+    def test_mp4(self):
+        assert sniff_mime_type(b"\x00\x00\x00\x18ftypmp42") == "video/mp4"
+
+    def test_placeholder_texto(self):
+        assert sniff_mime_type(b"PLACEHOLDER") is None
+
+
+class TestBuildAssetManifest:
+    """Tests para construcción del manifiesto."""
+
+    def test_indexa_archivos_existentes(self, fake_assets):
+        manifest = build_asset_manifest()
+        assert set(manifest.keys()) == {"I001", "I002"}
+
+    def test_entrada_valida(self, fake_assets):
+        entry = build_asset_manifest()["I001"]
+        assert entry.valid is True
+        assert entry.mime_type == "image/png"
+        assert entry.size == len(PNG_BYTES)
+        assert entry.path == "catalog/I001_maquina_real/image_1.png"
+        assert entry.etag.startswith('"') and entry.etag[1:-1] in entry.content_hash
+
+    def test_placeholder_invalido(self, fake_assets):
+        entry = build_asset_manifest()["I002"]
+        assert entry.valid is False
+        assert entry.mime_type == "image/jpeg"  # MIME por extensión
+
+    def test_reutiliza_entrada_sin_cambios(self, fake_assets):
+        first = build_asset_manifest()
+        second = build_asset_manifest(first)
+        assert second["I001"] is first["I001"]
+
+    def test_rehash_si_cambia_archivo(self, fake_assets):
+        first = build_asset_manifest()
+        image = fake_assets / "catalog" / "I001_maquina_real" / "image_1.png"
+        image.write_bytes(PNG_BYTES + b"\x01")
+        second = build_asset_manifest(first)
+        assert second["I001"].content_hash != first["I001"].content_hash
+
+    def test_roundtrip_json(self, fake_assets):
+        manifest = build_asset_manifest()
+        path = fake_assets / "asset_manifest.json"
+        save_asset_manifest(manifest, path)
+        assert load_asset_manifest(path) == manifest
+
+
+class TestAssetEndpoint:
+    """Tests para GET /api/assets/{image_id} servido desde el manifiesto."""
+
+    @pytest.fixture
+    def client(self, fake_assets, monkeypatch):
+        from app.routers import api
+        from app.services import asset_service
+        monkeypatch.setattr(asset_service, "ASSETS_CATALOG_DIR", fake_assets / "catalog")
+        monkeypatch.setattr(asset_service, "load_catalog_from_filesystem", lambda: {})
+        app = FastAPI()
+        app.include_router(api.router)
+        return TestClient(app)
+
+    def test_sirve_asset_valido(self, client):
+        response = client.get("/api/assets/I001")
+        assert response.status_code == 200
+        assert response.content == PNG_BYTES
+        assert response.headers["content-type"] == "image/png"
+        assert response.headers["etag"] == asset_manifest.get_asset_entry("I001").etag
+
+    def test_placeholder_404(self, client):
+        assert client.get("/api/assets/I002").status_code == 404
+
+    def test_inexistente_404(self, client):
+        assert client.get("/api/assets/I999").status_code == 404
+
+    def test_reload_toma_imagen_reemplazada(self, client, fake_assets):
+        old_etag = client.get("/api/assets/I001").headers["etag"]
+        (fake_assets / "catalog" / "I001_maquina_real" / "image_1.png").write_bytes(PNG_BYTES * 2)
+
+        assert asset_manifest.reload_asset_manifest() == ["I001"]
+        response = client.get("/api/assets/I001")
+        assert response.content == PNG_BYTES * 2
+        assert response.headers["etag"] != old_etag
+
+    def test_reload_toma_imagen_nueva(self, client, fake_assets):
+        assert client.get("/api/assets/I004").status_code == 404
+        (fake_assets / "catalog" / "I004_nueva").mkdir()
+        (fake_assets / "catalog" / "I004_nueva" / "image_1.png").write_bytes(PNG_BYTES)
+
+        assert asset_manifest.reload_asset_manifest() == ["I004"]
+        assert client.get("/api/assets/I004").status_code == 200
+        assert asset_manifest.reload_asset_manifest() == []
+
+    def test_imagen_nueva_sin_reload(self, client, fake_assets):
+        """Entre refrescos del manifiesto, un archivo nuevo se sirve igual."""
+        asset_manifest.init_asset_manifest()
+        (fake_assets / "catalog" / "I004_nueva").mkdir()
+        (fake_assets / "catalog" / "I004_nueva" / "image_1.png").write_bytes(PNG_BYTES)
+        (fake_assets / "catalog" / "I005_placeholder").mkdir()
+        (fake_assets / "catalog" / "I005_placeholder" / "image_1.jpg").write_text("PLACEHOLDER")
+
+        response = client.get("/api/assets/I004")
+        assert response.status_code == 200
+        assert response.content == PNG_BYTES
+        assert client.get("/api/assets/I005").status_code == 404
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
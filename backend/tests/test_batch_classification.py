@@ -0,0 +1,88 @@
+"""
+Tests para las APIs por lotes de guardrails y triage (app/rules/batch.py).
+"""
+import json
+
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.rules import batch
+from app.rules.business_guardrails import (
+    MessageType,
+    classify_message_type,
+    classify_message_type_batch,
+    is_business_related,
+    is_business_related_batch,
+)
+from app.services.triage_service import classify_triage_intent, classify_triage_intent_batch
+
+FILTERING_DATASET = Path(__file__).parent / "data" / "filtering_dataset_v1.json"
+
+EXTRA_TEXTS = [
+    "", "  ", ".", "ok", "Hola", "hola", "HOLA ", "gracias",
+    "ayuda con python y docker", "necesito agujas y bobinas",
+    "mi máquina no funciona", "quiero montar negocio de gorras",
+    "cuál es el horario?", "vendo máquina usada", "cuánto vale la industrial",
+]
+
+
+@pytest.fixture(scope="module")
+def texts():
+    with open(FILTERING_DATASET, encoding="utf-8") as f:
+        samples = json.load(f)["samples"]
+    return [sample["text"] for sample in samples] + EXTRA_TEXTS
+
+
+class TestEquivalencia:
+    """El lote devuelve exactamente lo mismo que las llamadas sueltas, en orden."""
+
+    def test_message_type(self, texts):
+        assert classify_message_type_batch(texts) == [classify_message_type(t) for t in texts]
+
+    def test_business_related(self, texts):
+        assert is_business_related_batch(texts) == [is_business_related(t) for t in texts]
+
+    def test_triage(self, texts):
+        assert classify_triage_intent_batch(texts) == [classify_triage_intent(t) for t in texts]
+
+    def test_acepta_iteradores_y_lista_vacia(self, texts):
+        assert classify_triage_intent_batch(iter(texts)) == classify_triage_intent_batch(texts)
+        assert classify_message_type_batch([]) == []
+
+
+class TestDeduplicacion:
+    """Los textos que normalizan igual se clasifican una sola vez."""
+
+    def test_clasifica_textos_unicos(self):
+        seen = []
+
+        def classify(text):
+            seen.append(text)
+            return len(text)
+
+        assert batch.classify_batch(classify, ["Hola", "hola ", "ok", "HOLA"]) == [4, 4, 2, 4]
+        assert seen == ["hola", "ok"]
+
+    def test_razones_no_compartidas(self):
+        first, second = is_business_related_batch(["necesito agujas", "Necesito agujas"])
+        assert first == second
+        first[3].append("x")
+        assert "x" not in second[3]
+
+
+class TestPool:
+    """Con workers > 1 el resultado es el mismo que en línea."""
+
+    def test_pool_de_procesos(self, texts, monkeypatch):
+        monkeypatch.setattr(batch, "PARALLEL_MIN_TEXTS", 1)
+        expected = classify_message_type_batch(texts)
+        result = classify_message_type_batch(texts, workers=2)
+        assert result == expected
+        assert all(isinstance(r, MessageType) for r in result)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,74 @@
+"""
+Tests para el harness de scripts/benchmark_pipeline.py (medición y baseline).
+"""
+import importlib.util
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location(
+        "benchmark_pipeline", Path(__file__).parent.parent / "scripts" / "benchmark_pipeline.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestCorpus:
+    """Tests del corpus fijo."""
+
+    def test_turnos_con_historial_previo(self, bench):
+        corpus = bench.load_corpus()
+        turns = bench.corpus_turns(corpus)
+        assert len(turns) == sum(len(c["turns"]) for c in corpus["conversations"])
+
+        conversation_id, text, history = turns[1]
+        assert conversation_id == "familiar_precio"
+        assert [m["sender"] for m in history] == ["customer", "luisa"]
+        assert history[0]["text"] == corpus["conversations"][0]["turns"][0]
+
+
+class TestMedicion:
+    """Tests de measure() y de la comparación contra el baseline."""
+
+    def test_measure(self, bench):
+        calls = []
+        result = bench.measure(lambda i: [lambda: calls.append(i)] * 3, iterations=4, warmup=1)
+        assert result["ops"] == 12
+        assert result["ops_per_sec"] > 0
+        assert result["p50_us"] <= result["p99_us"]
+        # warmup (0), 4 iteraciones medidas (1-4) y la pasada de asignaciones (5)
+        assert sorted(set(calls)) == [0, 1, 2, 3, 4, 5]
+
+    def test_regresion_fuera_de_tolerancia(self, bench):
+        baseline = {"benchmarks": {
+            "a": {"ops_per_sec": 1000.0, "p50_us": 100.0, "p99_us": 200.0, "alloc_kib_per_op": 4.0},
+            "b": {"ops_per_sec": 1000.0, "p50_us": 100.0, "p99_us": 200.0, "alloc_kib_per_op": 4.0},
+        }}
+        results = {
+            "a": {"ops_per_sec": 850.0, "p50_us": 115.0, "p99_us": 260.0, "alloc_kib_per_op": 4.5},
+            "b": {"ops_per_sec": 700.0, "p50_us": 100.0, "p99_us": 300.0, "alloc_kib_per_op": 4.0},
+        }
+        regressions = bench.compare_to_baseline(results, baseline, tolerance=0.2)
+        assert len(regressions) == 2
+        assert regressions[0].startswith("b.ops_per_sec")
+        assert regressions[1].startswith("b.p99_us")
+
+    def test_error_cuenta_como_regresion(self, bench):
+        baseline = {"benchmarks": {"a": {"ops_per_sec": 1000.0}}}
+        regressions = bench.compare_to_baseline({"a": {"error": "NameError: x"}}, baseline)
+        assert regressions == ["a: error (NameError: x)"]
+
+    def test_etapa_pura(self, bench):
+        results = bench.run_benchmarks(["classify_message_type"], iterations=1)
+        assert "error" not in results["classify_message_type"]
+        assert results["classify_message_type"]["ops"] >= len(bench.corpus_turns(bench.load_corpus()))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
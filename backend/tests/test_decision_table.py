@@ -0,0 +1,131 @@
+"""
+Tests para la tabla de decisión de build_response (app/rules/decision_table.py).
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.rules.business_guardrails import MessageType
+from app.rules.decision_table import (
+    DecisionTable,
+    Rule,
+    DEFAULT_RULES,
+    REPLY_GENERATE,
+    REPLY_GREETING,
+    REPLY_MESSAGE_TYPE,
+    get_decision_table,
+    set_decision_table,
+)
+from app.services.response_service import build_response, ensure_next_step_question
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+
+
+@pytest.fixture
+def restore_table():
+    yield
+    set_decision_table(None)
+
+
+class TestReglasPorDefecto:
+    """La tabla por defecto reproduce las decisiones que antes estaban en el código."""
+
+    def test_tipos_de_mensaje_terminales(self):
+        table = get_decision_table()
+        route = table.route(MessageType.EMPTY_OR_GIBBERISH)
+        assert (route.reply, route.decision_path) == (REPLY_MESSAGE_TYPE, "->gibberish_handled")
+        assert table.route("non_business", "saludo").reply == REPLY_MESSAGE_TYPE
+        assert table.route(MessageType.BUSINESS_CONSULT).reply == REPLY_GENERATE
+
+    def test_saludo_sin_cache_ni_pregunta(self):
+        route = get_decision_table().route(MessageType.BUSINESS_CONSULT, "saludo")
+        assert route.reply == REPLY_GREETING
+        assert not route.cacheable
+        assert route.next_step_question is None
+
+    def test_motivo_de_bloqueo_del_llm(self):
+        table = get_decision_table()
+        assert table.route(MessageType.BUSINESS_CONSULT, "buscar_maquina_industrial").llm_block is None
+        assert table.route(MessageType.BUSINESS_CONSULT, "envios").llm_block == "blocked_faq"
+        # El tipo de mensaje gana sobre la FAQ
+        assert table.route(MessageType.BUSINESS_FAQ, "envios").llm_block == "blocked_business_faq"
+
+    def test_intent_desconocido_usa_la_ruta_general(self):
+        route = get_decision_table().route(MessageType.BUSINESS_CONSULT, "intent_nuevo", "etapa_nueva")
+        assert route == get_decision_table().route(MessageType.BUSINESS_CONSULT)
+        assert route.cacheable and not route.asset_allowed and route.next_step_question is None
+
+    def test_asset_y_pregunta_de_cierre(self):
+        route = get_decision_table().route(MessageType.BUSINESS_CONSULT, "preguntar_precio")
+        assert route.asset_allowed
+        assert route.next_step_question.startswith("¿Buscas máquina familiar")
+
+    def test_build_response_gibberish(self, temp_db):
+        result = build_response(text="jaja", conversation_id="test_tabla_1", channel="api")
+        assert result["text"]
+        with database.get_db() as conn:
+            row = conn.execute(
+                "SELECT decision_path FROM interaction_traces WHERE conversation_id = ?", ("test_tabla_1",)
+            ).fetchone()
+        assert row["decision_path"].endswith("->gibberish_handled")
+
+    def test_chat_web_usa_la_tabla(self, temp_db, monkeypatch):
+        """/api/chat responde con build_response; generate_response es solo el fallback legacy."""
+        from fastapi.testclient import TestClient
+        import main
+
+        def _legacy(*args, **kwargs):
+            raise AssertionError("generate_response no debe usarse con los módulos nuevos")
+
+        monkeypatch.setattr(main, "generate_response", _legacy)
+        response = TestClient(main.app).post(
+            "/api/chat", json={"conversation_id": "test_tabla_web", "text": "jaja", "sender": "customer"}
+        )
+        assert response.status_code == 200
+        with database.get_db() as conn:
+            row = conn.execute(
+                "SELECT decision_path FROM interaction_traces WHERE conversation_id = ?", ("test_tabla_web",)
+            ).fetchone()
+        assert row["decision_path"].endswith("->gibberish_handled")
+
+
+class TestCompilacion:
+    """Tests de precedencia, validación y reemplazo en caliente."""
+
+    def test_la_regla_mas_especifica_gana(self):
+        table = DecisionTable([
+            Rule("pregunta_envios_cierre", intent="envios", stage="cierre", values={"next_step_question": "¿C?"}),
+            Rule("pregunta_envios", intent="envios", values={"next_step_question": "¿A?"}),
+            Rule("pregunta_envios_2", intent="envios", values={"next_step_question": "¿B?"}),
+        ])
+        assert table.route(None, "envios").next_step_question == "¿B?"
+        route = table.route(None, "envios", "cierre")
+        assert route.next_step_question == "¿C?"
+        assert route.rules == ("pregunta_envios", "pregunta_envios_2", "pregunta_envios_cierre")
+
+    def test_campo_desconocido(self):
+        with pytest.raises(ValueError):
+            DecisionTable([Rule("mala", intent="envios", values={"no_existe": True})])
+
+    def test_reemplazo_en_caliente(self, restore_table):
+        assert "¿A qué ciudad" in ensure_next_step_question("Enviamos a todo el país.", "envios", {})
+
+        rules = DEFAULT_RULES + [Rule("envios_etapa", intent="envios", stage="cierre",
+                                      values={"next_step_question": "¿Confirmamos el envío?"})]
+        set_decision_table(DecisionTable(rules))
+        text = ensure_next_step_question("Enviamos a todo el país.", "envios", {"etapa_funnel": "cierre"})
+        assert text.endswith("¿Confirmamos el envío?")
+
+        set_decision_table(None)
+        assert get_decision_table().route(None, "envios", "cierre").next_step_question.startswith("¿A qué ciudad")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,103 @@
+"""
+Tests para la máquina de estados del Sales Dialogue Manager
+(app/services/dialogue_fsm.py y sales_dialogue.next_action).
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import sales_dialogue
+from app.services.dialogue_fsm import (
+    Feature,
+    TurnFeatures,
+    STAGE_TRANSITIONS,
+    TRANSITIONS,
+    TRIAGE_TRANSITIONS,
+    GUARDS,
+    guard_mask,
+    transition_for,
+    transition_report,
+)
+from app.services.metrics import DIALOGUE_TURN_SECONDS
+from app.services.sales_dialogue import next_action
+
+
+def _turn(text, intent="otro", stage="discovery", last_intent=None, **state):
+    state = {"stage": stage, "conversation_id": "test_fsm", **state}
+    if last_intent:
+        state["last_intent"] = last_intent
+    return next_action(text, intent, state, [], {})
+
+
+class TestTabla:
+    """La tabla compilada cubre todas las combinaciones y respeta las prioridades."""
+
+    def test_cubre_etapas_y_guardas_con_handler(self):
+        assert len(TRANSITIONS) == len(STAGE_TRANSITIONS) * 2 ** len(GUARDS)
+        transitions = set(TRANSITIONS.values()) | set(TRIAGE_TRANSITIONS.values())
+        assert transitions <= set(sales_dialogue._HANDLERS)
+
+    def test_prioridades(self):
+        assert transition_for("pricing", Feature.PHOTO | Feature.SUPPORT) == "photo_request"
+        assert transition_for("pricing", Feature.SUPPORT | Feature.CHANGED) == "support_request"
+        assert transition_for("visit", Feature.CHANGED | Feature.PRICE | Feature.HOURS) == "pricing"
+        assert transition_for("visit", Feature.CHANGED | Feature.HOURS) == "intent_change_hours"
+        assert transition_for("visit", Feature.CHANGED) == "default"
+        # En discovery el cambio de tema no interrumpe
+        assert transition_for("discovery", Feature.CHANGED | Feature.PRICE) == "discovery"
+        assert transition_for("etapa_vieja", 0) == "default"
+
+    def test_guardas_por_intencion_y_texto(self):
+        assert guard_mask(TurnFeatures("hola"), "otro", None) == 0
+        assert guard_mask(TurnFeatures("hola"), "garantia", None) == Feature.SUPPORT
+        # Cambio de tema solo con una intención previa
+        assert guard_mask(TurnFeatures("y el precio?"), "otro", None) == 0
+        assert guard_mask(TurnFeatures("y el precio?"), "otro", "x") == Feature.CHANGED | Feature.PRICE
+        assert guard_mask(TurnFeatures("hola"), "preguntar_horarios", "x") & Feature.CHANGED
+
+    def test_cada_grupo_se_busca_una_vez(self):
+        features = TurnFeatures("quiero ver fotos")
+        assert features.has(Feature.PHOTO)
+        features.text = "otro texto"  # una segunda búsqueda ya no coincidiría
+        assert features.has(Feature.PHOTO)
+        assert not features.has(Feature.SUPPORT)
+        assert TurnFeatures("para gorras y ropa").use_case() == "ropa"
+
+
+class TestNextAction:
+    """Transiciones de next_action por etapa."""
+
+    @pytest.mark.parametrize("stage,text,intent,path,next_stage", [
+        ("pricing", "hola", "otro", "pricing_handled", None),
+        ("pricing", "hola", "garantia", "support_request_handled", "support"),
+        ("photos", "hola", "preguntar_horarios", "intent_change_handled", "visit"),
+        ("handoff_schedule", "hola", "otro", "handoff_schedule_handled", None),
+        ("visit", "voy hoy", "otro", "visit_scheduled", "handoff_schedule"),
+        ("triage", "necesito un repuesto", "otro", "spare_parts_handled", "support"),
+        ("etapa_vieja", "hola", "otro", "default_handled", "discovery"),
+    ])
+    def test_transiciones(self, stage, text, intent, path, next_stage):
+        result = _turn(text, intent, stage, last_intent="preguntar_precio")
+        assert result["decision_path"] == path
+        assert result["state_updates"].get("stage") == next_stage
+
+    def test_precio_en_otra_etapa_responde_precios(self):
+        result = _turn("hola", "preguntar_precio", "shipping", last_intent="otro", slots={"product_type": "industrial"})
+        assert result["decision_path"] == "pricing_handled"
+        assert "KINGTER" in result["reply_text"]
+
+    def test_reporte_de_cobertura(self):
+        DIALOGUE_TURN_SECONDS.reset()
+        _turn("hola", "otro", "pricing", last_intent="preguntar_precio")
+        report = transition_report()
+        rows = {(r["stage"], r["transition"]): r for r in report["transitions"]}
+        assert rows[("pricing", "pricing")]["hits"] == 1
+        assert rows[("pricing", "pricing")]["avg_us"] > 0
+        assert ("photos", "photos") in report["uncovered"]
+        assert report["covered"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,161 @@
+"""
+Tests para el cache de assets de Drive contra un servidor Drive falso local.
+"""
+import asyncio
+import pytest
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.services.drive_cache import DriveAssetCache, DriveDownloadError, cache_key_for
+
+FILES = {
+    "file_a": b"A" * 1000,
+    "file_b": b"B" * 1000,
+    "file_c": b"C" * 1000,
+}
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    """Responde GET /files/{id}?alt=media como la API de Drive v3."""
+    requests = []
+    delay = 0.0
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        file_id = path.rsplit("/", 1)[-1]
+        FakeDriveHandler.requests.append((file_id, query, self.headers.get("Authorization")))
+        time.sleep(FakeDriveHandler.delay)
+
+        content = FILES.get(file_id)
+        if content is None or "alt=media" not in query:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_drive():
+    FakeDriveHandler.requests = []
+    FakeDriveHandler.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeDriveHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/drive/v3"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+
+
+def make_cache(tmp_path, api_url, max_bytes=10_000):
+    return DriveAssetCache(
+        cache_dir=tmp_path / "cache",
+        max_bytes=max_bytes,
+        api_url=api_url,
+        token_provider=lambda: "test-token"
+    )
+
+
+class TestDriveAssetCache:
+    """Tests de descarga, hits y errores."""
+
+    def test_descarga_y_cachea(self, tmp_path, temp_db, fake_drive):
+        cache = make_cache(tmp_path, fake_drive)
+        path = asyncio.run(cache.get("file_a", "image/png"))
+        assert path.read_bytes() == FILES["file_a"]
+        assert path.name == cache_key_for("file_a")
+        assert FakeDriveHandler.requests == [("file_a", "alt=media", "Bearer test-token")]
+
+    def test_hit_no_descarga(self, tmp_path, temp_db, fake_drive):
+        cache = make_cache(tmp_path, fake_drive)
+        asyncio.run(cache.get("file_a", "image/png"))
+        asyncio.run(cache.get("file_a", "image/png"))
+        assert len(FakeDriveHandler.requests) == 1
+
+    def test_registra_metadata(self, tmp_path, temp_db, fake_drive):
+        cache = make_cache(tmp_path, fake_drive)
+        asyncio.run(cache.get("file_a", "image/png"))
+        with database.get_db() as conn:
+            row = conn.execute("SELECT * FROM cache_metadata").fetchone()
+        assert row["drive_file_id"] == "file_a"
+        assert row["mime_type"] == "image/png"
+        assert row["size_bytes"] == 1000
+        assert row["last_accessed_at"] is not None
+
+    def test_error_no_deja_temporales(self, tmp_path, temp_db, fake_drive):
+        cache = make_cache(tmp_path, fake_drive)
+        with pytest.raises(DriveDownloadError):
+            asyncio.run(cache.get("no_existe", "image/png"))
+        assert list((tmp_path / "cache").iterdir()) == []
+
+    def test_expirado_se_descarga_de_nuevo(self, tmp_path, temp_db, fake_drive):
+        cache = make_cache(tmp_path, fake_drive)
+        asyncio.run(cache.get("file_a", "image/png"))
+        with database.get_db() as conn:
+            conn.execute("UPDATE cache_metadata SET expires_at = '2000-01-01T00:00:00'")
+        asyncio.run(cache.get("file_a", "image/png"))
+        assert len(FakeDriveHandler.requests) == 2
+
+
+class TestSingleFlight:
+    """Requests concurrentes por el mismo archivo comparten una descarga."""
+
+    def test_una_descarga_para_requests_concurrentes(self, tmp_path, temp_db, fake_drive):
+        FakeDriveHandler.delay = 0.2
+        cache = make_cache(tmp_path, fake_drive)
+
+        async def run():
+            return await asyncio.gather(*[cache.get("file_a", "image/png") for _ in range(5)])
+
+        paths = asyncio.run(run())
+        assert len(set(paths)) == 1
+        assert len(FakeDriveHandler.requests) == 1
+        assert cache.downloads == 1
+
+
+class TestLRUEviction:
+    """Tests del presupuesto de bytes con desalojo LRU."""
+
+    def test_desaloja_menos_reciente(self, tmp_path, temp_db, fake_drive):
+        cache = make_cache(tmp_path, fake_drive, max_bytes=2000)
+
+        async def run():
+            path_a = await cache.get("file_a", "image/png")
+            path_b = await cache.get("file_b", "image/png")
+            await cache.get("file_a", "image/png")  # A pasa a ser el más reciente
+            path_c = await cache.get("file_c", "image/png")
+            return path_a, path_b, path_c
+
+        path_a, path_b, path_c = asyncio.run(run())
+        assert path_a.exists()
+        assert not path_b.exists()
+        assert path_c.exists()
+        with database.get_db() as conn:
+            ids = {r["drive_file_id"] for r in conn.execute("SELECT drive_file_id FROM cache_metadata")}
+        assert ids == {"file_a", "file_c"}
+
+    def test_no_desaloja_el_recien_descargado(self, tmp_path, temp_db, fake_drive):
+        cache = make_cache(tmp_path, fake_drive, max_bytes=500)
+        path = asyncio.run(cache.get("file_a", "image/png"))
+        assert path.exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,150 @@
+"""
+Tests para la ventana de métricas en memoria y /api/ops/snapshot.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.services import live_metrics
+from app.services.live_metrics import LiveMetrics
+from app.services.trace_service import InteractionTracer
+from app.services.ops_service import get_ops_snapshot
+
+
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+
+
+@pytest.fixture
+def clean_metrics():
+    live_metrics.reset_live_metrics()
+    yield
+    live_metrics.reset_live_metrics()
+
+
+def _record(metrics, latency_ms=100.0, now=T0, **kwargs):
+    metrics.record(channel="whatsapp", decision_path="msg_x->business_ok", latency_ms=latency_ms, now=now, **kwargs)
+
+
+class TestVentana:
+    """Tests de la ventana deslizante por minuto."""
+
+    def test_percentiles_y_tasas(self):
+        metrics = LiveMetrics(window_minutes=60)
+        for latency in range(10, 1010, 10):
+            _record(metrics, latency_ms=float(latency))
+        snapshot = metrics.snapshot(now=T0)
+        assert snapshot["counts"]["msgs"] == 100
+        assert snapshot["rates_per_min"]["msgs"] == round(100 / 60, 3)
+        assert 500 <= snapshot["latency_ms"]["p50"] <= 500 * 1.13
+        assert 950 <= snapshot["latency_ms"]["p95"] <= 950 * 1.13
+        assert 990 <= snapshot["latency_ms"]["p99"] <= 990 * 1.13
+
+    def test_minutos_viejos_expiran(self):
+        metrics = LiveMetrics(window_minutes=5)
+        _record(metrics, latency_ms=5000.0, now=T0, error=True)
+        _record(metrics, latency_ms=10.0, now=T0 + 4 * 60)
+        assert metrics.snapshot(now=T0 + 4 * 60)["counts"]["errors"] == 1
+
+        snapshot = metrics.snapshot(now=T0 + 5 * 60)
+        assert snapshot["counts"] == {"msgs": 1, "personal": 0, "handoffs": 0, "openai_calls": 0, "errors": 0}
+        assert snapshot["latency_ms"]["p99"] <= 10 * 1.13
+
+        snapshot = metrics.snapshot(now=T0 + 3600)
+        assert snapshot["counts"]["msgs"] == 0
+        assert snapshot["latency_ms"]["p50"] == 0.0
+
+    def test_series_por_etapa(self):
+        metrics = LiveMetrics()
+        _record(metrics, latency_ms=900.0, stages={"openai": 800.0, "whatsapp_send": None})
+        series = metrics.snapshot(detail=True, now=T0)["series"]
+        assert [(s["decision_path"], s["channel"], s["stage"]) for s in series] == [
+            ("msg_x->business_ok", "whatsapp", "openai"),
+            ("msg_x->business_ok", "whatsapp", "total"),
+        ]
+        assert series[0]["count"] == 1
+
+    def test_series_acotadas(self):
+        metrics = LiveMetrics(window_minutes=5, max_series=3)
+        for i in range(10):
+            metrics.record(channel="api", decision_path=f"path_{i}", latency_ms=1.0, now=T0)
+        paths = {s["decision_path"] for s in metrics.snapshot(detail=True, now=T0)["series"]}
+        assert paths == {"path_0", "path_1", "path_2", "other"}
+
+        # Al expirar, los decision_path liberan cupo
+        metrics.record(channel="api", decision_path="path_nuevo", latency_ms=1.0, now=T0 + 600)
+        paths = {s["decision_path"] for s in metrics.snapshot(detail=True, now=T0 + 600)["series"]}
+        assert paths == {"path_nuevo"}
+
+
+class TestPersistencia:
+    """Tests de la continuidad entre reinicios."""
+
+    def test_estado_ida_y_vuelta(self):
+        metrics = LiveMetrics(window_minutes=60)
+        _record(metrics, latency_ms=200.0, now=T0 - 120, handoff=True)
+        _record(metrics, latency_ms=300.0, now=T0)
+
+        restored = LiveMetrics(window_minutes=60)
+        assert restored.load_state(metrics.to_state(), now=T0 + 60) == 2
+        assert restored.snapshot(now=T0 + 60) == metrics.snapshot(now=T0 + 60)
+
+    def test_no_restaura_slots_vencidos(self):
+        metrics = LiveMetrics(window_minutes=60)
+        _record(metrics, now=T0)
+        restored = LiveMetrics(window_minutes=60)
+        assert restored.load_state(metrics.to_state(), now=T0 + 2 * 3600) == 0
+        assert restored.snapshot(now=T0 + 2 * 3600)["counts"]["msgs"] == 0
+
+    def test_persistir_y_restaurar_en_db(self, temp_db, clean_metrics):
+        live_metrics.get_live_metrics().record(channel="api", decision_path="p", latency_ms=50.0)
+        live_metrics.persist_live_metrics()
+
+        live_metrics.reset_live_metrics()
+        assert live_metrics.restore_live_metrics() == 1
+        assert live_metrics.get_live_snapshot()["counts"]["msgs"] == 1
+
+
+class TestOpsSnapshot:
+    """Tests de get_ops_snapshot leyendo la ventana en memoria."""
+
+    def test_desde_tracer(self, temp_db, clean_metrics):
+        for latency in range(10, 210, 10):
+            tracer = InteractionTracer(conversation_id="c1", channel="whatsapp", decision_path="business_ok")
+            tracer._latency_ms = float(latency)
+            tracer.save()
+        tracer = InteractionTracer(
+            conversation_id="c2", channel="whatsapp", is_personal=1, routed_team="comercial",
+            error_message="boom", openai_called=True, openai_latency_ms=700.0
+        )
+        tracer._latency_ms = 900.0
+        tracer.save()
+
+        snapshot = get_ops_snapshot()
+        assert snapshot["total_msgs_60m"] == 21
+        assert snapshot["pct_handoff"] == round(100 / 21, 2)
+        assert snapshot["pct_personal"] == round(100 / 21, 2)
+        assert snapshot["pct_openai"] == round(100 / 21, 2)
+        assert snapshot["errores_count"] == 1
+        assert 200 <= snapshot["p95_latency_ms"] <= 200 * 1.13
+        assert snapshot["p50_latency_ms"] <= snapshot["p95_latency_ms"] <= snapshot["p99_latency_ms"]
+
+        stages = {s["stage"] for s in get_ops_snapshot(detail=True)["series"]}
+        assert stages == {"total", "openai"}
+
+    def test_vacio(self, clean_metrics):
+        snapshot = get_ops_snapshot()
+        assert snapshot["total_msgs_60m"] == 0
+        assert "series" not in snapshot
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
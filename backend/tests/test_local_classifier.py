@@ -0,0 +1,198 @@
+"""
+Tests para el clasificador local (app/services/local_classifier.py) y su uso
+antes de las llamadas al LLM.
+"""
+import asyncio
+import sqlite3
+import time
+
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.rules import enhanced_filtering
+from app.services import local_classifier, openai_classifier
+from app.services.local_classifier import (
+    TASK_BUSINESS,
+    TASK_INTENT,
+    LinearTextClassifier,
+    classify_locally,
+    extract_terms,
+    fit_temperature,
+    load_training_samples,
+    model_path,
+    reset_local_classifiers,
+    split_holdout,
+    train_classifier,
+)
+from app.services.metrics import LOCAL_CLASSIFIER_DECISIONS
+
+FILTERING_DATASET = Path(__file__).parent / "data" / "filtering_dataset_v1.json"
+
+INTENT_SAMPLES = {
+    "buy_machine": [
+        "quiero comprar una maquina industrial", "cuanto vale la maquina familiar",
+        "precio de la fileteadora", "busco maquina para confeccion",
+        "me interesa una maquina recta industrial", "tienen maquinas familiares disponibles",
+    ],
+    "spare_parts": [
+        "necesito agujas para mi maquina", "venden bobinas", "busco repuestos para singer",
+        "tienen prensatelas", "necesito una correa para la maquina", "repuesto del pedal",
+    ],
+    "tech_support": [
+        "mi maquina no enhebra", "la maquina hace ruido", "necesito reparacion",
+        "se me daño la maquina", "quiero usar la garantia", "la maquina salta puntadas",
+    ],
+}
+
+
+def _intent_data():
+    texts, labels = [], []
+    for label, samples in INTENT_SAMPLES.items():
+        texts.extend(samples)
+        labels.extend([label] * len(samples))
+    return texts, labels
+
+
+@pytest.fixture(scope="module")
+def intent_model():
+    return train_classifier(*_intent_data())
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch, intent_model):
+    """Modelos entrenados en un directorio temporal, como los deja el script."""
+    intent_model.save(model_path(TASK_INTENT, tmp_path))
+    train_classifier(*load_training_samples(TASK_BUSINESS, filtering_dataset=FILTERING_DATASET)).save(
+        model_path(TASK_BUSINESS, tmp_path)
+    )
+    monkeypatch.setattr(local_classifier, "LOCAL_CLASSIFIER_MODEL_DIR", tmp_path)
+    monkeypatch.setattr(local_classifier, "LOCAL_CLASSIFIER_MIN_CONFIDENCE", 0.5)
+    reset_local_classifiers()
+    LOCAL_CLASSIFIER_DECISIONS.reset()
+    yield tmp_path
+    reset_local_classifiers()
+
+
+class TestModelo:
+    """Vectorización, entrenamiento y persistencia."""
+
+    def test_terminos_sin_tildes(self):
+        terms = extract_terms("Máquina")
+        assert terms["w:maquina"] == 1
+        assert terms["c: ma"] == 1
+        assert terms["c:ina "] == 1
+
+    def test_predice_y_probabilidades_suman_uno(self, intent_model):
+        probs = intent_model.predict_proba("necesito agujas y bobinas")
+        assert set(probs) == set(INTENT_SAMPLES)
+        assert sum(probs.values()) == pytest.approx(1.0)
+        assert intent_model.predict("necesito agujas y bobinas")[0] == "spare_parts"
+        assert intent_model.predict("mi maquina hace mucho ruido")[0] == "tech_support"
+
+    def test_temperatura_reduce_confianza_fuera_de_dominio(self, intent_model):
+        model = LinearTextClassifier.from_dict(intent_model.to_dict())
+        texts, labels = _intent_data()
+        fit_temperature(model, texts, labels)
+        assert 0.25 <= model.temperature <= 10
+        _, confidence = model.predict("zzz")
+        assert confidence < 0.6
+
+    def test_guardar_y_cargar(self, tmp_path, intent_model):
+        path = tmp_path / "m.json"
+        intent_model.save(path)
+        loaded = LinearTextClassifier.load(path)
+        text = "busco repuestos para mi maquina"
+        assert loaded.predict_proba(text) == pytest.approx(intent_model.predict_proba(text))
+        assert not path.with_suffix(".tmp").exists()
+
+    def test_version_incompatible(self, intent_model):
+        data = {**intent_model.to_dict(), "version": 99}
+        with pytest.raises(ValueError):
+            LinearTextClassifier.from_dict(data)
+
+    def test_particion_deterministica(self):
+        texts, labels = _intent_data()
+        first = split_holdout(texts, labels, fraction=0.3)
+        assert first == split_holdout(texts, labels, fraction=0.3)
+        assert len(first[0]) + len(first[2]) == len(texts)
+
+    def test_prediccion_barata(self, intent_model):
+        start = time.perf_counter()
+        for _ in range(200):
+            intent_model.predict("hola, quiero saber el precio de una maquina industrial")
+        assert (time.perf_counter() - start) / 200 < 0.005
+
+
+class TestDatosDeEntrenamiento:
+    """Muestras desde interaction_traces y el dataset de filtrado."""
+
+    def test_trazas_y_dataset(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+        database.init_db()
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.executemany(
+            "INSERT INTO interaction_traces (request_id, conversation_id, channel, customer_phone_hash, "
+            "raw_text, business_related, intent) VALUES (?, 'c1', 'api', 'h', ?, ?, ?)",
+            [
+                ("t1", "necesito agujas", 1, "buscar_repuestos"),
+                ("t2", "hola mami", 0, "otro"),
+                ("t3", "", 1, "preguntar_precio"),
+            ]
+        )
+        conn.commit()
+        conn.close()
+
+        assert load_training_samples(TASK_INTENT, database.DB_PATH) == (["necesito agujas"], ["spare_parts"])
+        texts, labels = load_training_samples(TASK_BUSINESS, database.DB_PATH, filtering_dataset=FILTERING_DATASET)
+        assert texts[:2] == ["necesito agujas", "hola mami"]
+        assert labels[:2] == ["business", "personal"]
+        assert len(texts) > 2 and set(labels) == {"business", "personal"}
+
+
+class TestEscalamiento:
+    """classify_locally responde solo con confianza suficiente; si no, se llama al LLM."""
+
+    def test_sin_modelo_escala(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(local_classifier, "LOCAL_CLASSIFIER_MODEL_DIR", tmp_path / "vacio")
+        reset_local_classifiers()
+        assert classify_locally(TASK_INTENT, "necesito agujas") is None
+        reset_local_classifiers()
+
+    def test_umbral(self, model_dir, monkeypatch):
+        assert classify_locally(TASK_INTENT, "necesito agujas y bobinas")[0] == "spare_parts"
+        assert classify_locally(TASK_INTENT, "   ") is None
+        monkeypatch.setattr(local_classifier, "LOCAL_CLASSIFIER_MIN_CONFIDENCE", 1.01)
+        assert classify_locally(TASK_INTENT, "necesito agujas y bobinas") is None
+        assert LOCAL_CLASSIFIER_DECISIONS.value(TASK_INTENT, "local") == 1
+        assert LOCAL_CLASSIFIER_DECISIONS.value(TASK_INTENT, "escalated") == 1
+
+    def test_classify_ambiguous_message_no_llama_a_openai(self, model_dir, monkeypatch):
+        def no_http():
+            raise AssertionError("no debería llamar a OpenAI")
+        monkeypatch.setattr("app.services.http_pool.get_http_client", no_http)
+        output = openai_classifier.classify_ambiguous_message("busco repuestos, agujas y bobinas")
+        assert output.intent == "spare_parts"
+        assert 0.5 <= output.confidence <= 1.0
+
+    def test_filtrado_ambiguo_usa_modelo_local(self, model_dir, monkeypatch):
+        async def no_llm(text):
+            raise AssertionError("no debería llamar al LLM")
+        monkeypatch.setattr(enhanced_filtering, "classify_with_llm", no_llm)
+        monkeypatch.setattr(enhanced_filtering, "is_ambiguous_message", lambda text, is_business: True)
+        is_business, reason, score, reasons = asyncio.run(
+            enhanced_filtering.enhanced_is_business_related(
+                "necesito una maquina industrial", (False, "heuristic", 0.1, [])
+            )
+        )
+        assert is_business
+        assert reason == "heuristic_ambiguous_local_business"
+        assert 0.5 <= score <= 1.0
+        assert reasons == ["local_classifier"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
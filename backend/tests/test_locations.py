@@ -0,0 +1,115 @@
+"""
+Tests para la extracción de ubicación con el gazetteer de municipios
+(app/rules/locations.py).
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.rules.keywords import ALIAS_MUNICIPIOS, MUNICIPIOS_AMBIGUOS, MUNICIPIOS_COLOMBIA
+from app.rules.locations import (
+    LocationClass,
+    LocationTrie,
+    extract_location,
+    extract_location_from_history,
+)
+from app.rules.normalization import fold_text
+from app.services.context_service import extract_context_from_history
+from app.services.handoff_service import should_handoff
+from app.services.sales_dialogue import _extract_city_from_text
+
+
+class TestGazetteer:
+    """Consistencia de los datos en keywords.py."""
+
+    def test_alias_y_ambiguos_existen(self):
+        keys = {fold_text(name) for names in MUNICIPIOS_COLOMBIA.values() for name in names}
+        assert set(ALIAS_MUNICIPIOS.values()) <= keys
+        assert MUNICIPIOS_AMBIGUOS <= keys
+
+    def test_todos_los_municipios_se_encuentran(self):
+        for department, names in MUNICIPIOS_COLOMBIA.items():
+            for name in names:
+                location = extract_location(f"vivo en {name}")
+                assert location is not None and location.key == fold_text(name), name
+
+
+class TestExtraccion:
+    """Municipio canónico y clase en una pasada."""
+
+    @pytest.mark.parametrize("text,city,location_class", [
+        ("estoy en Montería", "Montería", LocationClass.MONTERIA),
+        ("MONTERIA", "Montería", LocationClass.MONTERIA),
+        ("envío a Cereté", "Cereté", LocationClass.OTHER),
+        ("me la mandan a medellin?", "Medellín", LocationClass.OTHER),
+        ("soy de santa cruz de lorica", "Lorica", LocationClass.OTHER),
+        ("vivo en una vereda de Montería", "Montería", LocationClass.RURAL),
+        ("estoy en un corregimiento", None, LocationClass.RURAL),
+    ])
+    def test_clase(self, text, city, location_class):
+        location = extract_location(text)
+        assert location.city == city
+        assert location.location_class == location_class
+
+    def test_coincidencia_mas_larga(self):
+        assert extract_location("soy de Ciénaga de Oro").city == "Ciénaga de Oro"
+        assert extract_location("San Andrés de Sotavento").city == "San Andrés de Sotavento"
+        assert extract_location("vivo en Ciénaga, Magdalena").city == "Ciénaga"
+
+    def test_tolera_typos(self):
+        assert extract_location("vivo en monteira").city == "Montería"
+        assert extract_location("envio a barranquila").city == "Barranquilla"
+
+    def test_palabras_completas(self):
+        assert extract_location("buena calidad") is None
+        assert extract_location("hola, quiero una maquina") is None
+
+    def test_ambiguos_necesitan_pista(self):
+        assert extract_location("me regalas el plato") is None
+        assert extract_location("quiero la maquina union") is None
+        assert extract_location("ya tengo apartado el pedido") is None
+        assert extract_location("vivo en plato").city == "Plato"
+
+    def test_primer_municipio_y_departamento(self):
+        location = extract_location("soy de Sahagún pero trabajo en Montería")
+        assert (location.city, location.department) == ("Sahagún", "Córdoba")
+        assert extract_location("vivo en Buenavista").department == "Córdoba"
+
+    def test_historial_usa_mensaje_mas_reciente_del_cliente(self):
+        history = [
+            {"sender": "customer", "text": "estoy en Cali"},
+            {"sender": "luisa", "text": "¿Vas a venir a Montería a la tienda?"},
+            {"sender": "customer", "text": "no, mejor envío a Sincelejo"},
+        ]
+        assert extract_location_from_history(history).city == "Sincelejo"
+        assert extract_location_from_history(history[:2]).city == "Cali"
+
+    def test_trie(self):
+        trie = LocationTrie()
+        trie.add("santa marta", 1)
+        trie.add("santa", 2)
+        assert trie.longest_match(["en", "santa", "marta"], 1) == (1, 2)
+        assert trie.longest_match(["santa", "rosa"], 0) == (2, 1)
+        assert trie.longest_match(["en"], 0) == (None, 0)
+
+
+class TestConsumidores:
+    """sales_dialogue, context_service y handoff usan el gazetteer."""
+
+    def test_sales_dialogue(self):
+        assert _extract_city_from_text("envío a santa marta") == "Santa Marta"
+
+    def test_contexto(self):
+        context = extract_context_from_history([{"sender": "customer", "text": "soy de Planeta Rica"}])
+        assert context["ciudad"] == "planeta rica"
+        assert context["clase_ubicacion"] == "other"
+
+    def test_handoff_geografico(self):
+        assert should_handoff("estoy en Chinú, me la pueden enviar?", {}).should_handoff is True
+        assert "ubicación remota" in should_handoff("vivo en una vereda", {}).reason
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
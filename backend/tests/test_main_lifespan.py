@@ -0,0 +1,95 @@
+"""
+Tests para el lifespan de main.py (el entrypoint que corre el Dockerfile):
+arranca y cancela los loops en segundo plano que también arranca app/main.py.
+"""
+import asyncio
+
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import main
+from app import startup
+from app.models import database
+from app.services import status_ingest
+from app.services.webhook_parser import StatusEvent
+
+
+def _background_loops(monkeypatch, whatsapp_enabled):
+    monkeypatch.setattr(main, "WHATSAPP_ENABLED", whatsapp_enabled)
+    monkeypatch.setattr(main, "WARMUP_ENABLED", False)
+
+    async def run():
+        async with main.lifespan(main.app):
+            running = {
+                task.get_coro().__name__: task
+                for task in asyncio.all_tasks()
+                if task is not asyncio.current_task()
+            }
+        # Sin ceder el loop: el apagado ya esperó a que terminaran
+        return set(running), [name for name, task in running.items() if not task.done()]
+
+    return asyncio.run(run())
+
+
+class TestLoops:
+    """Loops de WhatsApp solo con WHATSAPP_ENABLED; todos se cancelan al apagar."""
+
+    def test_whatsapp_habilitado(self, monkeypatch):
+        started, still_running = _background_loops(monkeypatch, True)
+        assert "run_notification_worker_loop" in started
+        assert "run_outbound_dispatch_loop" in started
+        assert "run_status_flush_loop" in started
+        assert still_running == []
+
+    def test_whatsapp_deshabilitado(self, monkeypatch):
+        started, _ = _background_loops(monkeypatch, False)
+        assert "run_notification_worker_loop" not in started
+        assert "run_asset_manifest_refresh_loop" in started
+        assert "run_outbound_dispatch_loop" not in started
+        assert "run_status_flush_loop" not in started
+
+
+class TestApagado:
+    """Al apagar no se pierde lo que quedó en memoria."""
+
+    def test_espera_a_que_los_loops_terminen(self, monkeypatch):
+        finished = []
+
+        async def loop_with_cleanup():
+            try:
+                await asyncio.sleep(3600)
+            finally:
+                # Lo que haría un loop a mitad de una transacción
+                await asyncio.sleep(0)
+                finished.append(True)
+
+        async def run():
+            task = asyncio.create_task(loop_with_cleanup())
+            await asyncio.sleep(0)
+            await startup.stop_background_tasks([task])
+            return task
+
+        task = asyncio.run(run())
+        assert task.cancelled()
+        assert finished == [True]
+
+    def test_flush_de_statuses_pendientes(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+        monkeypatch.setattr(status_ingest, "_pending", {})
+        database.init_db()
+        status_ingest.record_statuses([
+            StatusEvent(message_id="wamid.1", status="delivered", recipient_id="573001", timestamp="1760000000")
+        ])
+
+        _background_loops(monkeypatch, False)
+        assert status_ingest.pending_status_count() == 0
+        with database.get_db() as conn:
+            row = conn.execute("SELECT delivered_at FROM wa_message_status WHERE wamid = 'wamid.1'").fetchone()
+        assert row["delivered_at"] == 1760000000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,177 @@
+"""
+Tests para la exposición Prometheus de GET /metrics y su instrumentación.
+"""
+import asyncio
+import json
+import pytest
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from app.models import database
+from app.services import metrics, whatsapp_service
+from app.services.metrics import (
+    Counter,
+    Histogram,
+    render_metrics,
+    CACHE_LOOKUPS,
+    DB_QUERY_SECONDS,
+    RATE_LIMIT_REJECTIONS,
+    WHATSAPP_SEND_SECONDS,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset_metrics()
+    yield
+    metrics.reset_metrics()
+
+
+@pytest.fixture
+def scratch_registry(monkeypatch):
+    """Registro aislado para métricas creadas dentro del test."""
+    monkeypatch.setattr(metrics, "_REGISTRY", [])
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+
+
+class GraphStatusHandler(BaseHTTPRequestHandler):
+    """Responde /messages con el status configurado."""
+    status = 200
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if GraphStatusHandler.status == 200:
+            data = {"messages": [{"id": "wamid.1"}]}
+        else:
+            data = {"error": {"message": "Parámetro inválido"}}
+        raw = json.dumps(data).encode()
+        self.send_response(GraphStatusHandler.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_graph(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GraphStatusHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    monkeypatch.setattr(whatsapp_service, "WHATSAPP_API_BASE", f"http://127.0.0.1:{server.server_address[1]}/v18.0")
+    monkeypatch.setattr(whatsapp_service, "WHATSAPP_ENABLED", True)
+    monkeypatch.setattr(whatsapp_service, "WHATSAPP_ACCESS_TOKEN", "test-token")
+    monkeypatch.setattr(whatsapp_service, "WHATSAPP_PHONE_NUMBER_ID", "123456")
+    yield GraphStatusHandler
+    server.shutdown()
+    server.server_close()
+
+
+class TestExposicion:
+    """Tests del formato de texto y del tope de series."""
+
+    def test_histograma_acumulado(self, scratch_registry):
+        histogram = Histogram("test_seconds", "Prueba.", labels=["stage"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value, "intent")
+        text = render_metrics()
+        assert "# TYPE test_seconds histogram" in text
+        assert 'test_seconds_bucket{stage="intent",le="0.1"} 1' in text
+        assert 'test_seconds_bucket{stage="intent",le="1"} 3' in text
+        assert 'test_seconds_bucket{stage="intent",le="+Inf"} 4' in text
+        assert 'test_seconds_count{stage="intent"} 4' in text
+        assert 'test_seconds_sum{stage="intent"} 4.25' in text
+
+    def test_contador_y_escape(self, scratch_registry):
+        counter = Counter("test_total", "Prueba.", labels=["cache"])
+        counter.inc('a"b')
+        counter.inc('a"b', amount=2)
+        assert 'test_total{cache="a\\"b"} 3' in render_metrics()
+
+    def test_cardinalidad_acotada(self, scratch_registry):
+        counter = Counter("test_total", "Prueba.", labels=["scope"], max_series=2)
+        for scope in ["a", "b", "c", "d"]:
+            counter.inc(scope)
+        counter.inc("a")
+        assert counter.value("a") == 2
+        assert counter.value("other") == 2
+        assert counter.value("c") == 0
+
+    def test_suprimidas(self, scratch_registry):
+        counter = Counter("test_total", "Prueba.")
+        histogram = Histogram("test_seconds", "Prueba.")
+        with metrics.suppressed():
+            counter.inc()
+            histogram.observe(0.1)
+        counter.inc()
+        assert counter.value() == 1
+        assert histogram.count() == 0
+
+    def test_labels_incorrectos(self, scratch_registry):
+        with pytest.raises(ValueError):
+            Counter("test_total", "Prueba.", labels=["a", "b"]).inc("solo_uno")
+
+
+class TestInstrumentacion:
+    """Tests de los puntos instrumentados."""
+
+    def test_rate_limit_por_ambito(self):
+        from app.services.rate_limit import allow
+        allow("wa:573001112233", limit_per_minute=1)
+        allow("wa:573001112233", limit_per_minute=1)
+        assert RATE_LIMIT_REJECTIONS.value("wa") == 1
+        assert "573001112233" not in render_metrics()
+
+    def test_db_por_funcion(self, temp_db):
+        database.get_conversation("c1")
+        assert DB_QUERY_SECONDS.count("get_conversation") == 1
+
+    def test_cache_de_respuestas(self, monkeypatch):
+        from app.services import cache_service
+        monkeypatch.setattr(cache_service, "CACHE_ENABLED", True)
+        cache = cache_service.LRUCache()
+        cache.get("¿cuánto cuesta la singer?")
+        cache.set("¿cuánto cuesta la singer?", "Cuesta $1.800.000")
+        cache.get("¿cuánto cuesta la singer?")
+        assert CACHE_LOOKUPS.value("response", "miss") == 1
+        assert CACHE_LOOKUPS.value("response", "hit") == 1
+
+    def test_envio_whatsapp_por_codigo(self, temp_db, fake_graph):
+        fake_graph.status = 200
+        assert asyncio.run(whatsapp_service.send_whatsapp_message("573001112233", "hola"))[0] is True
+        fake_graph.status = 400
+        assert asyncio.run(whatsapp_service.send_whatsapp_message("573001112233", "otro texto"))[0] is False
+        assert WHATSAPP_SEND_SECONDS.count("ok") == 1
+        assert WHATSAPP_SEND_SECONDS.count("http_400") == 1
+
+
+class TestEndpoint:
+    """Tests de GET /metrics."""
+
+    def test_metrics_endpoint(self, temp_db):
+        from app.main import create_app
+        from app.services.rate_limit import allow
+        allow("chat:c1", limit_per_minute=0)
+
+        response = TestClient(create_app()).get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'luisa_rate_limit_rejections_total{scope="chat"} 1' in response.text
+        assert "# TYPE luisa_webhook_ack_seconds histogram" in response.text
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,125 @@
+"""
+Tests para migraciones versionadas con PRAGMA user_version.
+"""
+import pytest
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.migrations import (
+    migrate,
+    get_schema_version,
+    add_column_if_missing,
+    MIGRATIONS,
+    LATEST_VERSION,
+)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    connection = sqlite3.connect(tmp_path / "test.db")
+    yield connection
+    connection.close()
+
+
+def _tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+class TestMigrate:
+    """Tests del runner de migraciones."""
+
+    def test_db_nueva_queda_en_ultima_version(self, conn):
+        applied = migrate(conn)
+        assert applied == len(MIGRATIONS)
+        assert get_schema_version(conn) == LATEST_VERSION
+        assert {
+            "conversations", "messages", "handoffs", "catalog_items", "cache_metadata",
+            "interaction_traces", "notifications", "wa_processed_messages",
+            "wa_outbox_dedup", "wa_conversations", "wa_media_cache",
+        } <= _tables(conn)
+
+    def test_numeracion_consecutiva(self):
+        assert [version for version, _, _ in MIGRATIONS] == list(range(1, LATEST_VERSION + 1))
+
+    def test_arranque_en_caliente_es_una_lectura(self, conn):
+        migrate(conn)
+        statements = []
+        conn.set_trace_callback(statements.append)
+        assert migrate(conn) == 0
+        assert statements == ["PRAGMA user_version"]
+
+    def test_db_legacy_se_actualiza(self, conn):
+        # Esquema creado por el init_db legacy de main.py (sin columnas nuevas)
+        conn.execute("""
+            CREATE TABLE conversations (
+                conversation_id TEXT PRIMARY KEY,
+                customer_name TEXT,
+                status TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("INSERT INTO conversations (conversation_id, status) VALUES ('c1', 'active')")
+        conn.execute("""
+            CREATE TABLE interaction_traces (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                request_id TEXT,
+                conversation_id TEXT,
+                raw_text TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+
+        migrate(conn)
+        assert {"customer_phone", "conversation_mode", "mode_updated_at_epoch", "channel"} <= _columns(conn, "conversations")
+        assert {"message_type", "classification_score", "openai_fallback_used"} <= _columns(conn, "interaction_traces")
+        row = conn.execute("SELECT conversation_mode FROM conversations WHERE conversation_id = 'c1'").fetchone()
+        assert row == ("AI_ACTIVE",)
+
+    def test_solo_aplica_pendientes(self, conn):
+        migrate(conn, MIGRATIONS[:2])
+        assert get_schema_version(conn) == 2
+        assert "wa_media_cache" not in _tables(conn)
+
+        assert migrate(conn) == LATEST_VERSION - 2
+        assert "wa_media_cache" in _tables(conn)
+
+    def test_fallo_revierte_todo(self, conn):
+        def _crear_tabla(cursor):
+            cursor.execute("CREATE TABLE nueva (id INTEGER)")
+
+        def _fallar(cursor):
+            raise RuntimeError("migración rota")
+
+        with pytest.raises(RuntimeError):
+            migrate(conn, [(1, "crear", _crear_tabla), (2, "fallar", _fallar)])
+
+        assert get_schema_version(conn) == 0
+        assert "nueva" not in _tables(conn)
+
+    def test_modo_wal(self, conn):
+        migrate(conn)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+class TestAddColumnIfMissing:
+    """Tests del helper idempotente de columnas."""
+
+    def test_idempotente(self, conn):
+        conn.execute("CREATE TABLE t (id INTEGER)")
+        cursor = conn.cursor()
+        add_column_if_missing(cursor, "t", "nombre", "TEXT")
+        add_column_if_missing(cursor, "t", "nombre", "TEXT")
+        assert _columns(conn, "t") == {"id", "nombre"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,131 @@
+"""
+Tests para la normalización de texto (app/rules/normalization.py): plegado de
+tildes y corrección de errores de tipeo contra el vocabulario de keywords.
+"""
+import ast
+
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.rules import keywords
+from app.rules.business_guardrails import classify_message_type, MessageType
+from app.rules.keywords import contains_any, normalize_text, MAQUINA_INDUSTRIAL, PRECIO
+from app.rules.normalization import (
+    PROTECTED_WORDS,
+    TypoIndex,
+    correct_token,
+    edit_distance,
+    fold_keywords,
+    fold_text,
+    get_typo_index,
+    load_spanish_wordlist,
+)
+from app.services.handoff_service import should_handoff
+from app.services.triage_service import classify_triage_intent
+
+KEYWORDS_PY = Path(__file__).parent.parent / "app" / "rules" / "keywords.py"
+
+
+class TestPlegado:
+    """Minúsculas y sin tildes."""
+
+    def test_fold_text(self):
+        assert fold_text("Máquina ÑOÑA Güey Acción") == "maquina nona guey accion"
+        assert fold_text("  hola  ") == "  hola  "
+
+    def test_fold_keywords_sin_repetidos(self):
+        assert fold_keywords(["máquina", "maquina", "Envío", "envio"]) == ["maquina", "envio"]
+
+    def test_keywords_ya_plegados(self):
+        """Todo literal de set en keywords.py está escrito sin tildes ni mayúsculas."""
+        tree = ast.parse(KEYWORDS_PY.read_text(encoding="utf-8"))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Set):
+                for element in node.elts:
+                    assert fold_text(element.value) == element.value, element.value
+        for key in keywords.CIUDADES_MAP:
+            assert fold_text(key) == key
+
+
+class TestCorreccion:
+    """Errores de tipeo hacia palabras del vocabulario."""
+
+    @pytest.mark.parametrize("typo,expected", [
+        ("maqina", "maquina"),
+        ("presio", "precio"),
+        ("fileteadra", "fileteadora"),
+        ("maqiuna", "maquina"),
+        ("reparasion", "reparacion"),
+    ])
+    def test_corrige(self, typo, expected):
+        assert correct_token(typo) == expected
+
+    @pytest.mark.parametrize("word", [
+        "queda", "tienes", "martes", "cuenta", "comparar", "familia",
+        "pedido", "planea", "garantiza", "asesora", "calientes",
+    ])
+    def test_no_toca_palabras_validas(self, word):
+        assert correct_token(word) == word
+
+    def test_lista_de_palabras_comunes(self):
+        words = load_spanish_wordlist()
+        assert {"pedido", "planea", "calientes"} <= words
+        assert "presio" not in words and "maqina" not in words
+        # Plegadas, como los tokens que llegan al corrector
+        assert all(word == fold_text(word) and word.isalpha() for word in words)
+
+    def test_no_toca_vocabulario_ni_protegidas(self):
+        index = get_typo_index()
+        assert all(index.lookup(word) is None for word in index.vocabulary)
+        assert all(index.lookup(word) is None for word in PROTECTED_WORDS)
+        assert TypoIndex(["perdido"], ["pedido"]).lookup("pedido") is None
+
+    def test_no_cambia_flexiones(self):
+        assert correct_token("productos") == "productos"
+        assert correct_token("maneja") == "maneja"
+
+    def test_ambiguo_no_corrige(self):
+        assert TypoIndex(["casado", "cansado"], min_target_length=5).lookup("casdo") == "casado"
+        assert TypoIndex(["pecado", "pesado"]).lookup("pezado") is None
+
+    def test_solo_sustituciones_confundibles(self):
+        assert TypoIndex(["precio"]).lookup("presio") == "precio"
+        assert TypoIndex(["partes"]).lookup("martes") is None
+
+    def test_edit_distance(self):
+        assert edit_distance("maqina", "maquina") == 1
+        assert edit_distance("maqiuna", "maquina") == 1
+        assert edit_distance("usando", "cuando") == 2
+
+    def test_memorizado(self):
+        correct_token.cache_clear()
+        correct_token("presio")
+        correct_token("presio")
+        assert correct_token.cache_info().hits == 1
+
+
+class TestReglas:
+    """Las reglas de keywords matchean con tildes, mayúsculas y typos."""
+
+    def test_normalize_text(self):
+        assert normalize_text("  Quiero una MÁQINA industrial ") == "quiero una maquina industrial"
+        assert normalize_text("cel 3001234567, correo ana@gmail.com") == "cel 3001234567, correo ana@gmail.com"
+
+    def test_contains_any(self):
+        assert contains_any("Cuál es el presio?", PRECIO)
+        assert contains_any("una máquina INDUSTRIAL", MAQUINA_INDUSTRIAL)
+
+    def test_pedido_no_es_reclamo(self):
+        """"pedido" no se corrige a "perdido" (PROBLEMAS): no dispara handoff."""
+        assert should_handoff("quiero hacer un pedido", {}).should_handoff is False
+
+    def test_guardrails_y_triage(self):
+        assert classify_message_type("tienen fileteadra?") == MessageType.BUSINESS_CONSULT
+        assert classify_triage_intent("cual es el presio de la fileteadra")[0] == "buy_machine"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,182 @@
+"""
+Tests para la entrega de notificaciones internas (app/services/notification_worker.py).
+"""
+import asyncio
+import json
+import pytest
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.services import notification_worker
+from app.services.handoff_service import process_handoff
+from app.services.notification_worker import build_batches, deliver_pending_notifications
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(notification_worker, "HANDOFF_LOG_PATH", tmp_path / "handoffs.jsonl")
+    database.init_db()
+    return tmp_path
+
+
+class FakeSend:
+    """send() falso: devuelve los resultados programados y registra los envíos."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.sent = []
+
+    async def __call__(self, destination, text):
+        self.sent.append((destination, text))
+        return self.results.pop(0) if self.results else (True, f"wamid.{len(self.sent)}")
+
+
+def _notify(text, destination="+573001112233"):
+    return database.save_notification("wa_573009", "comercial", text, destination)
+
+
+def _rows():
+    with database.get_db() as conn:
+        return [dict(r) for r in conn.execute("SELECT * FROM notifications ORDER BY id")]
+
+
+def _make_due():
+    with database.get_db() as conn:
+        conn.execute("UPDATE notifications SET next_attempt_at = 0")
+
+
+def _log(tmp_path):
+    return [json.loads(line) for line in (tmp_path / "handoffs.jsonl").read_text(encoding="utf-8").splitlines()]
+
+
+class TestHandoff:
+    """process_handoff encola la notificación y la registra en el log."""
+
+    def test_encola_y_registra_sin_imprimir(self, temp_db, capsys):
+        triggered, notification_text, _ = process_handoff(
+            conversation_id="wa_573009",
+            text="mi máquina no funciona, necesito reparación",
+            context={},
+            customer_phone="573009"
+        )
+        assert triggered and notification_text
+        assert capsys.readouterr().out == ""
+
+        rows = _rows()
+        assert [(r["delivery_status"], r["attempts"]) for r in rows] == [("pending", 0)]
+        entry = _log(temp_db)[0]
+        assert entry["event"] == "handoff"
+        assert entry["notification_id"] == rows[0]["id"]
+        assert entry["team"] == "tecnica"
+        assert not list(temp_db.glob("handoff_*.json"))
+
+
+class TestEntrega:
+    """Tests del lote por destino, reintentos y lease."""
+
+    def test_un_mensaje_por_destino(self, temp_db):
+        _notify("caso 1")
+        _notify("caso 2")
+        _notify("caso técnico", destination="+573004445566")
+        send = FakeSend()
+
+        assert asyncio.run(deliver_pending_notifications(send)) == 3
+        assert [destination for destination, _ in send.sent] == ["+573001112233", "+573004445566"]
+        assert "caso 1" in send.sent[0][1] and "caso 2" in send.sent[0][1]
+        assert {r["delivery_status"] for r in _rows()} == {"sent"}
+        assert all(r["sent_at"] for r in _rows())
+        assert [e["event"] for e in _log(temp_db)] == ["notification_sent"] * 3
+
+        # Nada pendiente
+        assert asyncio.run(deliver_pending_notifications(send)) == 0
+
+    def test_lote_respeta_limite_de_caracteres(self):
+        rows = [{"destination_number": "+57", "notification_text": "x" * 60} for _ in range(3)]
+        assert [len(batch) for _, batch in build_batches(rows, max_chars=150)] == [2, 1]
+
+    def test_reintento_con_backoff_y_fallo_final(self, temp_db, monkeypatch):
+        monkeypatch.setattr(notification_worker, "NOTIFICATION_MAX_ATTEMPTS", 2)
+        _notify("caso 1")
+        send = FakeSend((False, "Timeout"), (False, "Timeout"))
+
+        asyncio.run(deliver_pending_notifications(send))
+        row = _rows()[0]
+        assert (row["delivery_status"], row["attempts"], row["error"]) == ("retry", 1, "Timeout")
+        assert row["next_attempt_at"] > time.time()
+        # Todavía no vence el backoff
+        assert asyncio.run(deliver_pending_notifications(send)) == 0
+
+        _make_due()
+        asyncio.run(deliver_pending_notifications(send))
+        row = _rows()[0]
+        assert (row["delivery_status"], row["attempts"]) == ("failed", 2)
+        assert _log(temp_db)[-1]["event"] == "notification_failed"
+
+    def test_excepcion_en_envio_se_reintenta(self, temp_db):
+        _notify("caso 1")
+
+        async def broken(destination, text):
+            raise RuntimeError("sin red")
+
+        asyncio.run(deliver_pending_notifications(broken))
+        assert _rows()[0]["delivery_status"] == "retry"
+
+    def test_lease_vencido_se_retoma(self, temp_db):
+        notification_id = _notify("caso 1")
+        # Simula un proceso que murió con la notificación tomada
+        with database.get_db() as conn:
+            conn.execute(
+                "UPDATE notifications SET delivery_status = 'sending', next_attempt_at = ? WHERE id = ?",
+                (time.time() + 60, notification_id)
+            )
+        send = FakeSend()
+        assert asyncio.run(deliver_pending_notifications(send)) == 0
+
+        _make_due()
+        assert asyncio.run(deliver_pending_notifications(send)) == 1
+        assert _rows()[0]["delivery_status"] == "sent"
+
+    def test_textos_iguales_no_son_duplicados(self, temp_db, monkeypatch):
+        """El anti-spam de outbox no aplica: dos handoffs iguales son dos casos."""
+        from app.services import whatsapp_service
+        monkeypatch.setattr(whatsapp_service, "WHATSAPP_ENABLED", True)
+        monkeypatch.setattr(whatsapp_service, "WHATSAPP_ACCESS_TOKEN", "token")
+        monkeypatch.setattr(whatsapp_service, "WHATSAPP_PHONE_NUMBER_ID", "123")
+        posts = []
+
+        async def fake_post(payload, **kwargs):
+            posts.append(payload["text"]["body"])
+            return True, f"wamid.{len(posts)}"
+
+        monkeypatch.setattr(whatsapp_service, "_post_whatsapp_payload", fake_post)
+        for _ in range(2):
+            _notify("🔔 Nuevo caso: cliente pide asesoría")
+            asyncio.run(deliver_pending_notifications())
+        assert len(posts) == 2
+        assert [row["delivery_status"] for row in _rows()] == ["sent", "sent"]
+
+    def test_fallo_transitorio_no_pasa_a_la_cola_de_salida(self, temp_db, monkeypatch):
+        """Los reintentos son de este worker: nada queda "sent" sin entregarse."""
+        from app.services import outbound_queue, whatsapp_service
+        monkeypatch.setattr(whatsapp_service, "WHATSAPP_ENABLED", True)
+        monkeypatch.setattr(whatsapp_service, "WHATSAPP_ACCESS_TOKEN", "token")
+        monkeypatch.setattr(whatsapp_service, "WHATSAPP_PHONE_NUMBER_ID", "123")
+        monkeypatch.setattr(outbound_queue, "_BUCKETS", {})
+
+        async def timeout(payload, phone_number_id):
+            return outbound_queue.SendResult(outbound_queue.SEND_RETRY, "Timeout", error_code="timeout")
+
+        monkeypatch.setattr(whatsapp_service, "post_whatsapp_payload_once", timeout)
+        _notify("caso 1")
+        asyncio.run(deliver_pending_notifications())
+        assert [(r["delivery_status"], r["error"]) for r in _rows()] == [("retry", "Timeout")]
+        assert outbound_queue.get_outbound_queue_stats() == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
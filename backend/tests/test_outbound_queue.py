@@ -0,0 +1,222 @@
+"""
+Tests para la cola de salida de WhatsApp (app/services/outbound_queue.py).
+"""
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+
+from app.models import database
+from app.services import http_pool, outbound_queue, whatsapp_service
+from app.services.outbound_queue import (
+    SendResult,
+    SEND_OK,
+    SEND_RETRY,
+    SEND_FATAL,
+    SEND_QUEUED,
+    TokenBucket,
+    backoff_delay,
+    dispatch_due,
+    dispatch_send,
+    get_outbound_queue_stats,
+    parse_retry_after,
+)
+from app.services.trace_service import trace_interaction
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(outbound_queue, "_BUCKETS", {})
+    database.init_db()
+
+
+class FakePost:
+    """post() falso: devuelve los resultados programados y registra los envíos."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.sent = []
+
+    async def __call__(self, payload, phone_number_id):
+        self.sent.append(payload["text"]["body"])
+        return self.results.pop(0) if self.results else SendResult(SEND_OK, f"wamid.{len(self.sent)}")
+
+
+def _payload(text, to="573001112233"):
+    return {"messaging_product": "whatsapp", "to": to, "type": "text", "text": {"body": text}}
+
+
+def _make_due():
+    with database.get_db() as conn:
+        conn.execute("UPDATE wa_outbound_queue SET next_attempt_at = 0 WHERE status = 'pending'")
+
+
+def _rows():
+    with database.get_db() as conn:
+        return [dict(r) for r in conn.execute("SELECT * FROM wa_outbound_queue ORDER BY id")]
+
+
+class TestRitmo:
+    """Tests del token bucket, backoff y Retry-After."""
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        now = bucket.updated
+        assert bucket.take(now) == 0
+        assert bucket.take(now) == 0
+        assert bucket.take(now) == pytest.approx(0.1)
+        bucket.give_back()
+        assert bucket.take(now + 0.1) == pytest.approx(0)
+
+        bucket.pause(5, now=now)
+        assert bucket.take(now + 1) == pytest.approx(4)
+
+    def test_backoff_con_jitter_y_retry_after(self, monkeypatch):
+        monkeypatch.setattr(outbound_queue, "WHATSAPP_SEND_BACKOFF_BASE_SECONDS", 2)
+        monkeypatch.setattr(outbound_queue, "WHATSAPP_SEND_BACKOFF_MAX_SECONDS", 30)
+        delays = [backoff_delay(2) for _ in range(50)]
+        assert all(4 <= d <= 8 for d in delays)
+        assert len(set(delays)) > 1
+        assert all(backoff_delay(10) <= 30 for _ in range(10))
+        assert backoff_delay(0, retry_after=60) == 60
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after("7") == 7
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("mañana") is None
+        assert 0 <= parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") <= 0.001
+
+
+class TestDispatch:
+    """Tests del envío en línea, la cola persistida y el orden por destinatario."""
+
+    def test_envio_en_linea(self, temp_db):
+        post = FakePost()
+        assert asyncio.run(dispatch_send(_payload("hola"), "pnid", post)) == (True, "wamid.1")
+        assert _rows() == []
+
+    def test_fallo_transitorio_se_encola_y_respeta_fifo(self, temp_db):
+        post = FakePost(SendResult(SEND_RETRY, "Timeout", error_code="timeout"))
+
+        async def conversation():
+            first = await dispatch_send(_payload("uno"), "pnid", post)
+            second = await dispatch_send(_payload("dos"), "pnid", post)
+            other = await dispatch_send(_payload("otro", to="573009999999"), "pnid", post)
+            return first, second, other
+
+        first, second, other = asyncio.run(conversation())
+        assert first == (True, SEND_QUEUED) and second == (True, SEND_QUEUED)
+        assert other == (True, "wamid.2")
+        # "dos" no se intentó: espera detrás de "uno"
+        assert post.sent == ["uno", "otro"]
+        rows = _rows()
+        assert [(r["attempts"], r["last_error"]) for r in rows] == [(1, "timeout"), (0, None)]
+        assert rows[0]["next_attempt_at"] > time.time()
+
+        # Nada vencido todavía
+        assert asyncio.run(dispatch_due(post)) == 0
+
+        _make_due()
+        assert asyncio.run(dispatch_due(post)) == 1
+        _make_due()
+        assert asyncio.run(dispatch_due(post)) == 1
+        assert post.sent == ["uno", "otro", "uno", "dos"]
+        assert _rows() == []
+
+    def test_reintentos_agotados_actualizan_traza(self, temp_db):
+        retry = SendResult(SEND_RETRY, "Too many", error_code="http_429", retry_after=1, throttled=True)
+        post = FakePost(retry, retry, retry)
+
+        async def interaction():
+            with trace_interaction("wa_573001112233", "whatsapp") as tracer:
+                result = await dispatch_send(_payload("hola"), "pnid", post, max_retries=2)
+            return tracer.request_id, result
+
+        request_id, result = asyncio.run(interaction())
+        assert result == (True, SEND_QUEUED)
+        # El 429 pausó el bucket del número
+        assert outbound_queue.get_bucket("pnid").take() > outbound_queue.MAX_INLINE_WAIT_SECONDS
+
+        for _ in range(2):
+            outbound_queue._BUCKETS.clear()
+            _make_due()
+            asyncio.run(dispatch_due(post))
+        assert post.sent == ["hola"] * 3
+        assert get_outbound_queue_stats() == {"failed": 1}
+
+        with database.get_db() as conn:
+            trace = conn.execute(
+                "SELECT whatsapp_send_success, whatsapp_send_error_code FROM interaction_traces WHERE request_id = ?",
+                (request_id,)
+            ).fetchone()
+        assert tuple(trace) == (0, "http_429")
+
+    def test_error_fatal_no_se_encola(self, temp_db):
+        post = FakePost(SendResult(SEND_FATAL, "Número inválido", error_code="http_400"))
+        assert asyncio.run(dispatch_send(_payload("hola"), "pnid", post)) == (False, "Número inválido")
+        assert _rows() == []
+
+    def test_sin_cola_nunca_encola(self, temp_db):
+        timeout = SendResult(SEND_RETRY, "Timeout", error_code="timeout")
+        post = FakePost(timeout, timeout)
+
+        async def sends():
+            failed = await dispatch_send(_payload("uno"), "pnid", post, allow_queue=False)
+            await dispatch_send(_payload("dos"), "pnid", post)
+            behind = await dispatch_send(_payload("tres"), "pnid", post, allow_queue=False)
+            return failed, behind
+
+        failed, behind = asyncio.run(sends())
+        assert failed == (False, "Timeout")
+        # Detrás de un envío pendiente: falla en vez de encolarse
+        assert behind == (False, "fifo")
+        assert [r["payload"].count("dos") for r in _rows()] == [1]
+
+    def test_pendientes_sobreviven_reinicio(self, temp_db, monkeypatch):
+        post = FakePost(SendResult(SEND_RETRY, "Timeout", error_code="timeout"))
+        asyncio.run(dispatch_send(_payload("hola"), "pnid", post))
+        # "Reinicio": buckets nuevos, la fila sigue en la base
+        monkeypatch.setattr(outbound_queue, "_BUCKETS", {})
+        _make_due()
+        assert asyncio.run(dispatch_due(post)) == 1
+        assert _rows() == []
+
+
+class TestClasificacionGraph:
+    """Tests de post_whatsapp_payload_once contra respuestas simuladas de la Graph API."""
+
+    def _post(self, monkeypatch, status, body, headers=None):
+        def handler(request):
+            return httpx.Response(status, json=body, headers=headers or {})
+        transport = httpx.MockTransport(handler)
+        monkeypatch.setattr(http_pool, "_client_kwargs", lambda: {"transport": transport})
+        return asyncio.run(whatsapp_service.post_whatsapp_payload_once(_payload("hola"), "pnid"))
+
+    def test_ok(self, monkeypatch):
+        outcome = self._post(monkeypatch, 200, {"messages": [{"id": "wamid.X"}]})
+        assert (outcome.status, outcome.result) == (SEND_OK, "wamid.X")
+
+    def test_429_con_retry_after(self, monkeypatch):
+        outcome = self._post(monkeypatch, 429, {"error": {"message": "Too many"}}, {"Retry-After": "30"})
+        assert (outcome.status, outcome.retry_after, outcome.throttled) == (SEND_RETRY, 30, True)
+
+    def test_limite_de_throughput_de_meta(self, monkeypatch):
+        outcome = self._post(monkeypatch, 400, {"error": {"message": "Rate limit", "code": 130429}})
+        assert outcome.status == SEND_RETRY and outcome.throttled
+
+    def test_validacion_es_fatal(self, monkeypatch):
+        outcome = self._post(monkeypatch, 400, {"error": {"message": "Invalid parameter", "code": 100}})
+        assert (outcome.status, outcome.error_code) == (SEND_FATAL, "http_400")
+
+    def test_5xx_se_reintenta(self, monkeypatch):
+        assert self._post(monkeypatch, 503, {}).status == SEND_RETRY
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
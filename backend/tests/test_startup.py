@@ -0,0 +1,87 @@
+"""
+Tests para el perfil de arranque (fases medidas, imports diferidos).
+"""
+import json
+import os
+import subprocess
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from app import startup
+from app.startup import startup_phase, record_phase, mark_startup_complete, get_startup_report
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def clean_profile():
+    startup.reset_startup_profile()
+    yield
+    startup.reset_startup_profile()
+
+
+class TestStartupProfile:
+    """Tests del registro de fases."""
+
+    def test_registra_fases_en_orden(self, clean_profile):
+        with startup_phase("init_db"):
+            pass
+        with startup_phase("catalog"):
+            pass
+        report = get_startup_report()
+        assert [p["phase"] for p in report["phases"]] == ["init_db", "catalog"]
+        assert report["complete"] is False
+
+    def test_fase_con_error_se_registra(self, clean_profile):
+        with pytest.raises(ValueError):
+            with startup_phase("rota"):
+                raise ValueError("x")
+        assert get_startup_report()["phases"][0]["phase"] == "rota"
+
+    def test_fase_previa_adelanta_el_inicio(self, clean_profile):
+        import time
+        start = time.perf_counter() - 0.5
+        record_phase("imports", start)
+        report = mark_startup_complete()
+        assert report["complete"] is True
+        assert report["total_ms"] >= 500
+        assert report["phases"][0]["ms"] >= 500
+
+
+class TestAppStartup:
+    """Tests del arranque de la app modular."""
+
+    def test_health_incluye_desglose(self, clean_profile, monkeypatch, tmp_path):
+        from app.models import database
+        monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+
+        from app.main import create_app
+        with TestClient(create_app()) as client:
+            data = client.get("/health").json()
+
+        phases = [p["phase"] for p in data["startup"]["phases"]]
+        assert data["startup"]["complete"] is True
+        assert "init_db" in phases and "asset_manifest" in phases
+
+    def test_import_no_carga_integraciones_opcionales(self, tmp_path):
+        env = {**os.environ, "DB_PATH": str(tmp_path / "test.db"), "WHATSAPP_ENABLED": "false"}
+        code = (
+            "import sys, json; import app.main; "
+            "print(json.dumps([m for m in ('httpx', 'PIL', 'google.auth', 'app.routers.whatsapp') "
+            "if m in sys.modules]))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True, timeout=60
+        )
+        assert result.returncode == 0, result.stderr
+        assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,116 @@
+"""
+Tests para la ingesta de statuses de WhatsApp (app/services/status_ingest.py)
+y el reporte de entrega de trace_analysis.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.services import status_ingest
+from app.services.status_ingest import flush_statuses, parse_meta_timestamp, record_statuses
+from app.services.trace_analysis import analyze_range
+from app.services.trace_rollups import histogram_quantile
+from app.services.webhook_parser import StatusEvent
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setattr(database, "DB_PATH", db_path)
+    monkeypatch.setattr(status_ingest, "_pending", {})
+    database.init_db()
+    return db_path
+
+
+def _status(wamid, status, timestamp, **kwargs):
+    return StatusEvent(message_id=wamid, status=status, recipient_id="573001", timestamp=str(timestamp), **kwargs)
+
+
+def _stored(wamid):
+    with database.get_db() as conn:
+        row = conn.execute("SELECT * FROM wa_message_status WHERE wamid = ?", (wamid,)).fetchone()
+    return dict(row) if row else None
+
+
+def _trace(request_id, wamid, inbound_at, created_at="2026-03-01 12:00:00"):
+    database.save_trace(
+        request_id=request_id, conversation_id="wa_573001", channel="whatsapp",
+        customer_phone_hash=None, raw_text="precio?", normalized_text="precio?",
+        business_related=True, intent="precio", routed_team=None, selected_asset_id=None,
+        openai_called=False, prompt_version=None, cache_hit=False, response_text="¿Cuál?",
+        latency_ms=120.0, latency_us=120000, whatsapp_send_success=1,
+        whatsapp_message_id=wamid, inbound_at=inbound_at,
+    )
+    with database.get_db() as conn:
+        conn.execute("UPDATE interaction_traces SET created_at = ? WHERE request_id = ?", (created_at, request_id))
+
+
+class TestIngesta:
+    """Tests del buffer en memoria y el flush en lote."""
+
+    def test_flush_conserva_el_timestamp_mas_temprano(self, temp_db):
+        record_statuses([
+            _status("wamid.1", "delivered", 1000),
+            _status("wamid.1", "sent", 998),
+            _status("wamid.1", "delivered", 1005),  # reenvío de Meta
+            _status("wamid.2", "failed", 1001, error_code=131047, error_title="Re-engagement message"),
+            _status("wamid.3", "deleted", 1001),  # status desconocido: se ignora
+        ])
+        assert status_ingest.pending_status_count() == 2
+        assert flush_statuses() == 2
+        assert status_ingest.pending_status_count() == 0
+
+        first = _stored("wamid.1")
+        assert (first["sent_at"], first["delivered_at"], first["read_at"]) == (998, 1000, None)
+        assert _stored("wamid.2")["error_code"] == 131047
+        assert _stored("wamid.3") is None
+
+        # Un flush posterior completa la fila sin pisar lo anterior
+        record_statuses([_status("wamid.1", "read", 1030), _status("wamid.1", "sent", 999)])
+        flush_statuses()
+        first = _stored("wamid.1")
+        assert (first["sent_at"], first["delivered_at"], first["read_at"]) == (998, 1000, 1030)
+
+    def test_pide_flush_al_llenarse(self, temp_db, monkeypatch):
+        monkeypatch.setattr(status_ingest, "WHATSAPP_STATUS_FLUSH_BATCH", 2)
+        assert not record_statuses([_status("wamid.1", "sent", 1)])
+        assert record_statuses([_status("wamid.2", "sent", 1)])
+
+    def test_timestamp_invalido(self):
+        assert parse_meta_timestamp("1700000000") == 1700000000.0
+        assert parse_meta_timestamp("") is None
+        assert parse_meta_timestamp(None) is None
+
+
+class TestReporteDeEntrega:
+    """La entrega se une a interaction_traces por whatsapp_message_id."""
+
+    def test_tasas_y_latencia_percibida(self, temp_db):
+        _trace("r1", "wamid.1", inbound_at=1000)
+        _trace("r2", "wamid.2", inbound_at=1000)
+        _trace("r3", "wamid.3", inbound_at=1000)  # sin statuses todavía
+        _trace("r4", None, inbound_at=1000)  # envío encolado sin wamid
+        record_statuses([
+            _status("wamid.1", "sent", 1002),
+            _status("wamid.1", "delivered", 1004),
+            _status("wamid.1", "read", 1060),
+            _status("wamid.2", "failed", 1003, error_code=131026),
+        ])
+        flush_statuses()
+
+        summary = analyze_range(temp_db)
+        assert summary.delivery == {"sent": 3, "with_status": 2, "delivered": 1, "read": 1, "failed": 1}
+        assert dict(summary.delivery_errors) == {"131026": 1}
+        assert 4 <= histogram_quantile(summary.delivery_hist["delivered"], 0.5) <= 4 * 1.13
+        assert 60 <= histogram_quantile(summary.delivery_hist["read"], 0.5) <= 60 * 1.13
+
+        split = analyze_range(temp_db, partitions=3)
+        assert split.delivery == summary.delivery
+        assert split.delivery_hist == summary.delivery_hist
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,134 @@
+"""
+Tests para el análisis de trazas por rango (app/services/trace_analysis.py).
+"""
+import json
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.services import trace_analysis
+from app.services.trace_analysis import analyze_range, split_range, TracePartial
+from app.services.trace_rollups import histogram_quantile
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setattr(database, "DB_PATH", db_path)
+    database.init_db()
+    return db_path
+
+
+def _trace(created_at, latency_ms=100.0, **kwargs):
+    fields = dict(
+        request_id="r", conversation_id="c1", channel="whatsapp",
+        customer_phone_hash=None, raw_text="quiero una máquina", normalized_text="quiero una máquina",
+        business_related=True, intent="venta_maquina", routed_team=None, selected_asset_id=None,
+        openai_called=False, prompt_version=None, cache_hit=False, response_text="¿Para qué uso?",
+        latency_ms=latency_ms, latency_us=int(latency_ms * 1000),
+    )
+    fields.update(kwargs)
+    database.save_trace(**fields)
+    with database.get_db() as conn:
+        conn.execute(
+            "UPDATE interaction_traces SET created_at = ? WHERE id = (SELECT MAX(id) FROM interaction_traces)",
+            (created_at,)
+        )
+
+
+@pytest.fixture
+def month_of_traces(temp_db):
+    """60 trazas repartidas en enero, con algunos casos a revisar."""
+    for i in range(60):
+        day = i % 30 + 1
+        _trace(
+            f"2026-01-{day:02d} {i % 24:02d}:00:00",
+            latency_ms=float(10 * (i + 1)),
+            openai_called=i % 3 == 0,
+            message_type="business_consult" if i % 2 else "non_business",
+        )
+    _trace("2026-01-15 12:00:00", intent="saludo", raw_text="Hola!", openai_called=True, selected_asset_id="img_1")
+    _trace("2026-01-16 12:00:00", routed_team="tecnica", raw_text="Addi no me aprobó", response_text="Ya te ayudo.")
+    _trace("2026-01-17 12:00:00", stage_timings=json.dumps({"intent": 2000, "llm": 50000}), latency_ms=80.0)
+    _trace("2026-02-01 00:00:00", latency_ms=99999.0)
+    return temp_db
+
+
+class TestRango:
+    """Tests del filtrado por rango y de las particiones."""
+
+    def test_split_range_contiguo(self):
+        ranges = split_range("2026-01-01 00:00:00", "2026-01-31 00:00:00", 7)
+        assert len(ranges) == 7
+        assert ranges[0][0] == "2026-01-01 00:00:00"
+        assert ranges[-1][1] == "2026-01-31 00:00:00"
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+    def test_rango_exclusivo(self, month_of_traces):
+        summary = analyze_range(month_of_traces, "2026-01-01 00:00:00", "2026-02-01 00:00:00")
+        assert summary.counts["total"] == 63
+        assert summary.latency["max"] == 600.0
+
+        everything = analyze_range(month_of_traces)
+        assert everything.counts["total"] == 64
+
+    def test_rango_vacio(self, month_of_traces):
+        assert analyze_range(month_of_traces, "2025-01-01 00:00:00", "2025-02-01 00:00:00").counts["total"] == 0
+
+    def test_base_vacia(self, temp_db):
+        assert analyze_range(temp_db).counts["total"] == 0
+
+
+class TestAgregacion:
+    """Tests de los conteos, sketches y ejemplos acotados."""
+
+    def test_particiones_equivalen_a_una(self, month_of_traces):
+        single = analyze_range(month_of_traces, partitions=1)
+        split = analyze_range(month_of_traces, partitions=13)
+        assert split.counts == single.counts
+        assert split.latency_hist == single.latency_hist
+        assert split.message_types == single.message_types
+        assert split.findings["wasteful_openai"]["count"] == single.findings["wasteful_openai"]["count"]
+        assert split.long_responses == single.long_responses
+
+    def test_paralelo_equivale_a_secuencial(self, month_of_traces):
+        sequential = analyze_range(month_of_traces, partitions=4)
+        parallel = analyze_range(month_of_traces, workers=2, partitions=4)
+        assert parallel.counts == sequential.counts
+        assert parallel.latency_hist == sequential.latency_hist
+        assert parallel.stages == sequential.stages
+
+    def test_percentiles_desde_sketch(self, month_of_traces):
+        summary = analyze_range(month_of_traces, "2026-01-01 00:00:00", "2026-02-01 00:00:00")
+        assert sum(summary.latency_hist.values()) == 63
+        p50 = histogram_quantile(summary.latency_hist, 0.5)
+        assert 300 <= p50 <= 300 * 1.13
+
+    def test_hallazgos_con_ejemplos_acotados(self, month_of_traces, monkeypatch):
+        monkeypatch.setattr(trace_analysis, "EXAMPLES_LIMIT", 2)
+        summary = analyze_range(month_of_traces, partitions=5)
+
+        # El saludo con OpenAI es innecesario; "Addi" a técnica es falso positivo
+        assert summary.findings["wasteful_openai"]["count"] == 1
+        assert summary.findings["false_positives"]["count"] == 1
+        assert summary.findings["no_question"]["count"] == 1
+        assert summary.findings["assets_in_greetings"]["examples"][0]["selected_asset_id"] == "img_1"
+        assert all(len(f["examples"]) <= 2 for f in summary.findings.values())
+        assert summary.message_types["business_consult"] == [30, 10]
+
+    def test_merge_de_etapas(self):
+        a, b = TracePartial(), TracePartial()
+        a.add_stage("llm", 500.0)
+        b.add_stage("llm", 700.0)
+        b.add_stage("intent", 3.0)
+        a.merge(b)
+        assert a.stages["llm"]["count"] == 2
+        assert a.stages["llm"]["sum_ms"] == 1200.0
+        assert set(a.stages) == {"llm", "intent"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,202 @@
+"""
+Tests para rollups por minuto/hora y retención de interaction_traces.
+"""
+import importlib.util
+import pytest
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.services import trace_rollups
+from app.services.trace_rollups import (
+    refresh_trace_rollups,
+    prune_traces,
+    get_rollup_totals,
+    histogram_quantile,
+    latency_bucket,
+    LATENCY_BUCKETS_MS,
+)
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+
+
+def _trace(conversation_id="c1", latency_ms=100.0, created_at=None, **kwargs):
+    fields = dict(
+        request_id="r", conversation_id=conversation_id, channel="whatsapp",
+        customer_phone_hash=None, raw_text="hola", normalized_text="hola",
+        business_related=True, intent="saludo", routed_team=None, selected_asset_id=None,
+        openai_called=False, prompt_version=None, cache_hit=False, response_text="ok",
+        latency_ms=latency_ms, latency_us=int(latency_ms * 1000),
+    )
+    fields.update(kwargs)
+    database.save_trace(**fields)
+    if created_at:
+        with database.get_db() as conn:
+            conn.execute(
+                "UPDATE interaction_traces SET created_at = ? WHERE id = (SELECT MAX(id) FROM interaction_traces)",
+                (created_at,)
+            )
+
+
+def _count(table):
+    with database.get_db() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+class TestHistogram:
+    """Tests del histograma logarítmico de latencias."""
+
+    def test_bucket_contiene_valor(self):
+        for value in [0.5, 1, 7.3, 120, 999, 45000]:
+            index = latency_bucket(value)
+            assert LATENCY_BUCKETS_MS[index] >= value
+            assert index == 0 or LATENCY_BUCKETS_MS[index - 1] < value
+
+    def test_desborde_en_ultimo_bucket(self):
+        assert latency_bucket(10 ** 9) == len(LATENCY_BUCKETS_MS) - 1
+
+    def test_cuantil_error_acotado(self):
+        values = list(range(1, 1001))
+        histogram = {}
+        for value in values:
+            index = latency_bucket(value)
+            histogram[index] = histogram.get(index, 0) + 1
+        p95 = histogram_quantile(histogram, 0.95)
+        assert 950 <= p95 <= 950 * 1.13
+
+    def test_vacio(self):
+        assert histogram_quantile({}, 0.95) == 0.0
+
+
+class TestRefreshRollups:
+    """Tests de la agregación incremental."""
+
+    def test_agrega_y_avanza_marca(self, temp_db):
+        for _ in range(3):
+            _trace()
+        assert refresh_trace_rollups() == 3
+        assert refresh_trace_rollups() == 0
+
+        _trace(conversation_id="c2", openai_called=True, openai_latency_ms=800.0)
+        assert refresh_trace_rollups() == 1
+
+        totals = get_rollup_totals(minutes=60)
+        assert totals["msgs"] == 4
+        assert totals["openai_calls"] == 1
+        assert totals["latency_count"] == 4
+
+    def test_lotes_acumulan_en_el_mismo_bucket(self, temp_db):
+        for _ in range(5):
+            _trace(latency_ms=50.0)
+        assert refresh_trace_rollups(batch_size=2) == 5
+        assert _count("trace_rollup_minute") == 1
+        totals = get_rollup_totals(minutes=5)
+        assert totals["msgs"] == 5
+        assert sum(totals["latency_hist"].values()) == 5
+
+    def test_ventana_excluye_buckets_viejos(self, temp_db):
+        _trace(created_at="2020-01-01 10:00:00")
+        _trace()
+        refresh_trace_rollups()
+        assert get_rollup_totals(minutes=60)["msgs"] == 1
+        assert get_rollup_totals(hours=24)["msgs"] == 1
+
+    def test_conversaciones_distintas_entre_horas(self, temp_db):
+        from datetime import datetime, timedelta
+        previous_hour = (datetime.utcnow() - timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+        _trace(conversation_id="c1", created_at=previous_hour)
+        _trace(conversation_id="c1")
+        _trace(conversation_id="c2")
+        refresh_trace_rollups()
+        assert get_rollup_totals(hours=3)["conversations"] == 2
+
+
+class TestEnviosFallidos:
+    """Los envíos que fallan en la cola de salida llegan a los rollups una sola vez."""
+
+    def _fail_deferred(self, request_id):
+        from app.services import outbound_queue
+        row = {"id": 0, "attempts": 3, "enqueued_at": time.time(), "trace_request_id": request_id}
+        outbound_queue._finish(row, False, "http_429")
+
+    def test_fallo_en_linea(self, temp_db):
+        _trace(request_id="r1", whatsapp_send_success=0, whatsapp_send_error_code="http_400")
+        _trace(request_id="r2", whatsapp_send_success=1)
+        refresh_trace_rollups()
+        assert get_rollup_totals(minutes=60)["send_failures"] == 1
+
+    def test_fallo_diferido_despues_de_agregar(self, temp_db):
+        _trace(request_id="r1", whatsapp_send_error_code="queued")
+        refresh_trace_rollups()
+        assert get_rollup_totals(minutes=60)["send_failures"] == 0
+
+        self._fail_deferred("r1")
+        assert get_rollup_totals(minutes=60)["send_failures"] == 1
+        assert get_rollup_totals(hours=1)["send_failures"] == 1
+        # Ni un refresh ni otro cierre lo cuentan de nuevo
+        refresh_trace_rollups()
+        self._fail_deferred("r1")
+        assert get_rollup_totals(minutes=60)["send_failures"] == 1
+
+    def test_fallo_diferido_antes_de_agregar(self, temp_db):
+        _trace(request_id="r1", whatsapp_send_error_code="queued")
+        self._fail_deferred("r1")
+        refresh_trace_rollups()
+        assert get_rollup_totals(minutes=60)["send_failures"] == 1
+
+
+class TestPruneTraces:
+    """Tests de la retención en lotes."""
+
+    def test_borra_solo_viejas_y_agregadas(self, temp_db):
+        for _ in range(5):
+            _trace(created_at="2020-01-01 10:00:00")
+        refresh_trace_rollups()
+        _trace(created_at="2020-01-01 10:00:00")  # vieja pero sin agregar
+        _trace()
+
+        deleted = prune_traces(retention_days=30, batch_size=2)
+        assert deleted["interaction_traces"] == 5
+        assert _count("interaction_traces") == 2
+
+    def test_rollups_fuera_de_retencion(self, temp_db, monkeypatch):
+        _trace(created_at="2020-01-01 10:00:00")
+        refresh_trace_rollups()
+        deleted = prune_traces(retention_days=30)
+        assert deleted["trace_rollup_minute"] == 1
+        assert deleted["trace_rollup_hour"] == 1
+        assert deleted["trace_rollup_conversations"] == 1
+
+
+class TestReportsFromRollups:
+    """Tests del reporte de costos leyendo rollups."""
+
+    def test_costos_openai(self, temp_db):
+        spec = importlib.util.spec_from_file_location(
+            "monitor_openai_costs", Path(__file__).parent.parent / "scripts" / "monitor_openai_costs.py"
+        )
+        monitor = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(monitor)
+
+        _trace(conversation_id="c1", openai_called=True, openai_latency_ms=400.0, openai_canary_allowed=1)
+        _trace(conversation_id="c1", openai_called=True, openai_latency_ms=600.0, openai_canary_allowed=0)
+        _trace(conversation_id="c2", openai_fallback_used=1)
+
+        metrics = monitor.calculate_openai_metrics(hours=24)
+        assert metrics["total_conversations"] == 2
+        assert metrics["total_openai_calls"] == 2
+        assert metrics["avg_openai_latency_ms"] == 500.0
+        assert metrics["unauthorized_calls"] == 1
+        assert metrics["total_fallbacks"] == 1
+        assert metrics["costo_promedio_por_conv"] == round(2 * monitor.COSTO_ESTIMADO_POR_LLAMADA / 2, 4)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
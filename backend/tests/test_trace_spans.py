@@ -0,0 +1,144 @@
+"""
+Tests para los spans por etapa de trace_service y su reporte en analyze_traces.
+"""
+import asyncio
+import importlib.util
+import json
+import pytest
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.services import live_metrics, metrics, trace_service
+from app.services.metrics import STAGE_SECONDS
+from app.services.trace_service import InteractionTracer, span, trace_interaction, traced
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setattr(database, "DB_PATH", db_path)
+    database.init_db()
+    return db_path
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset_metrics()
+    live_metrics.reset_live_metrics()
+    yield
+    metrics.reset_metrics()
+    live_metrics.reset_live_metrics()
+
+
+def _stored_timings(conversation_id: str):
+    with database.get_db() as conn:
+        row = conn.execute(
+            "SELECT stage_timings FROM interaction_traces WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+    return json.loads(row[0]) if row[0] else None
+
+
+class TestSpans:
+    """Tests de la medición de etapas."""
+
+    def test_spans_se_guardan_compactos(self, temp_db):
+        with trace_interaction("c1", "api") as tracer:
+            with tracer.span("intent"):
+                pass
+            with span("context"):
+                pass
+            with tracer.span("intent"):
+                pass
+
+        timings = _stored_timings("c1")
+        assert set(timings) == {"intent", "context"}
+        assert all(isinstance(us, int) for us in timings.values())
+        assert STAGE_SECONDS.count("intent") == 2
+        assert STAGE_SECONDS.count("context") == 1
+
+    def test_sin_muestreo_solo_metrics(self, temp_db, monkeypatch):
+        monkeypatch.setattr(trace_service, "TRACE_SPAN_SAMPLE_RATE", 0.0)
+        with trace_interaction("c2", "api") as tracer:
+            with tracer.span("intent"):
+                pass
+
+        assert _stored_timings("c2") is None
+        assert tracer.stage_timings == {}
+        assert STAGE_SECONDS.count("intent") == 1
+
+    def test_span_fuera_de_interaccion(self):
+        with span("asset"):
+            pass
+        assert STAGE_SECONDS.count("asset") == 1
+
+    def test_span_con_excepcion(self):
+        tracer = InteractionTracer(conversation_id="c3").start()
+        with pytest.raises(RuntimeError):
+            with tracer.span("llm"):
+                raise RuntimeError("timeout")
+        assert "llm" in tracer.stage_timings
+
+    def test_decorador_sync_y_async(self, temp_db):
+        @traced("guardrail")
+        def clasificar(texto):
+            return texto.upper()
+
+        @traced("send")
+        async def enviar(texto):
+            return len(texto)
+
+        with trace_interaction("c4", "whatsapp") as tracer:
+            assert clasificar("hola") == "HOLA"
+            assert asyncio.run(enviar("hola")) == 4
+
+        assert set(tracer.stage_timings) == {"guardrail", "send"}
+        assert clasificar.__name__ == "clasificar"
+
+    def test_etapas_en_ventana_en_memoria(self, temp_db):
+        with trace_interaction("c5", "api") as tracer:
+            tracer.decision_path = "business_ok"
+            with tracer.span("intent"):
+                time.sleep(0.002)
+
+        stages = {s["stage"] for s in live_metrics.get_live_snapshot(detail=True)["series"]}
+        assert "intent" in stages
+
+
+class TestReporteEtapas:
+    """Tests del desglose por etapa de analyze_traces.py."""
+
+    def _analyzer(self, db_path):
+        spec = importlib.util.spec_from_file_location(
+            "analyze_traces", Path(__file__).parent.parent / "scripts" / "analyze_traces.py"
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module.TraceAnalyzer(db_path)
+
+    def test_desglose(self, temp_db):
+        for i, (intent_us, llm_us) in enumerate([(10_000, 600_000), (30_000, 800_000)]):
+            tracer = InteractionTracer(conversation_id=f"c{i}", channel="api")
+            tracer._latency_ms = 1000.0
+            tracer._spans = {"intent": intent_us, "llm": llm_us}
+            tracer.save()
+        tracer = InteractionTracer(conversation_id="c_sin", channel="api")
+        tracer._latency_ms = 5.0
+        tracer.save()
+
+        analyzer = self._analyzer(temp_db)
+        stages = analyzer.analyze_stages()
+        assert stages["traced_count"] == 2
+        assert [s["stage"] for s in stages["stages"]] == ["llm", "intent"]
+        llm = stages["stages"][0]
+        assert llm["avg_ms"] == 700.0
+        assert llm["share_percent"] == 70.0
+        assert stages["unaccounted_percent"] == 28.0
+        assert "7️⃣ Desglose por Etapa" in analyzer.generate_report()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
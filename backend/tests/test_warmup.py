@@ -0,0 +1,177 @@
+"""
+Tests para el warm-up del arranque, el pool HTTP compartido y la readiness en /health.
+"""
+import asyncio
+import pytest
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from app import startup
+from app.models import database
+from app.services import warmup
+from app.services.http_pool import get_async_http_client, prewarm_connections
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Responde 204 y registra el puerto cliente de cada request."""
+    protocol_version = "HTTP/1.1"
+    client_ports = []
+
+    def _reply(self):
+        KeepAliveHandler.client_ports.append(self.client_address[1])
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_HEAD = _reply
+    do_GET = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_origin():
+    KeepAliveHandler.client_ports = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+
+
+@pytest.fixture(autouse=True)
+def no_upstreams(monkeypatch):
+    """Sin conexiones reales a Graph/OpenAI aunque otro test haya recargado la config."""
+    monkeypatch.setattr(warmup, "WHATSAPP_ENABLED", False)
+    monkeypatch.setattr(warmup, "OPENAI_ENABLED", False)
+
+
+@pytest.fixture
+def clean_profile():
+    startup.reset_startup_profile()
+    yield
+    startup.reset_startup_profile()
+
+
+class TestHttpPool:
+    """Tests de clientes compartidos por event loop."""
+
+    def test_mismo_cliente_en_el_loop(self):
+        async def run():
+            return get_async_http_client() is get_async_http_client()
+        assert asyncio.run(run()) is True
+
+    def test_cliente_distinto_por_loop(self):
+        clients = []
+
+        async def run():
+            clients.append(get_async_http_client())
+        asyncio.run(run())
+        asyncio.run(run())
+        assert clients[0] is not clients[1]
+
+    def test_prewarm_deja_conexion_reutilizable(self, local_origin):
+        async def run():
+            connected = await prewarm_connections([local_origin], timeout=2.0)
+            await get_async_http_client().get(local_origin + "/messages")
+            return connected
+
+        assert asyncio.run(run()) == {local_origin: True}
+        # HEAD async, HEAD sync y el GET posterior reusa la conexión async del warm-up
+        assert len(KeepAliveHandler.client_ports) == 3
+        assert KeepAliveHandler.client_ports[0] == KeepAliveHandler.client_ports[2]
+
+    def test_prewarm_origen_caido(self):
+        result = asyncio.run(prewarm_connections(["http://127.0.0.1:9"], timeout=0.5))
+        assert result == {"http://127.0.0.1:9": False}
+
+
+class TestRunWarmup:
+    """Tests de las etapas del warm-up."""
+
+    def test_etapas_medidas(self, temp_db, clean_profile):
+        report = asyncio.run(warmup.run_warmup())
+        assert report["catalog"]["ok"] and report["rules"]["ok"] and report["db"]["ok"]
+        assert "pipeline" in report
+        phases = [p["phase"] for p in startup.get_startup_report()["phases"]]
+        assert phases == ["warmup.catalog", "warmup.rules", "warmup.db", "warmup.pipeline"]
+
+    def test_pipeline_no_deja_rastro(self, temp_db, clean_profile):
+        asyncio.run(warmup.run_warmup())
+        with database.get_db() as conn:
+            for table in ("conversations", "messages", "interaction_traces"):
+                count = conn.execute(
+                    f"SELECT COUNT(*) FROM {table} WHERE conversation_id LIKE '__warmup__%'"
+                ).fetchone()[0]
+                assert count == 0, table
+
+    def test_pipeline_no_cuenta_en_metricas(self, temp_db, clean_profile):
+        from app.services.live_metrics import get_live_snapshot, reset_live_metrics
+        from app.services.metrics import STAGE_SECONDS, reset_metrics
+
+        reset_metrics()
+        reset_live_metrics()
+        report = asyncio.run(warmup.run_warmup())
+        assert report["pipeline"]["ok"] is True
+        assert get_live_snapshot()["counts"]["msgs"] == 0
+        assert STAGE_SECONDS.count("guardrail") == 0
+
+    def test_upstreams_apagados_y_restaurados(self, monkeypatch):
+        from app.services import response_service, whatsapp_service
+        monkeypatch.setattr(response_service, "OPENAI_ENABLED", True)
+        monkeypatch.setattr(whatsapp_service, "WHATSAPP_ENABLED", True)
+
+        with warmup._upstreams_disabled():
+            assert response_service.OPENAI_ENABLED is False
+            assert whatsapp_service.WHATSAPP_ENABLED is False
+        assert response_service.OPENAI_ENABLED is True
+        assert whatsapp_service.WHATSAPP_ENABLED is True
+
+    def test_etapa_fallida_no_detiene_el_resto(self, temp_db, clean_profile, monkeypatch):
+        def _boom():
+            raise RuntimeError("catálogo roto")
+        monkeypatch.setattr(warmup, "_warm_catalog", _boom)
+
+        report = asyncio.run(warmup.run_warmup())
+        assert report["catalog"] == {"ok": False, "error": "RuntimeError"}
+        assert report["db"]["ok"] is True
+
+    def test_origenes_segun_integraciones(self, monkeypatch):
+        assert warmup._upstream_origins() == []
+        monkeypatch.setattr(warmup, "WHATSAPP_ENABLED", True)
+        assert warmup._upstream_origins() == ["https://graph.facebook.com"]
+
+
+class TestHealthReadiness:
+    """Tests de /health antes y después del warm-up."""
+
+    def test_503_hasta_terminar_warmup(self, temp_db, clean_profile):
+        from app.main import create_app
+        app = create_app()
+
+        response = TestClient(app).get("/health")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming_up"
+
+        with TestClient(app) as client:
+            response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["startup"]["warmup"]["rules"]["ok"] is True
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
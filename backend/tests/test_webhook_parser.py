@@ -0,0 +1,109 @@
+"""
+Tests para el decodificador del webhook (app/services/webhook_parser.py)
+y la idempotencia en lote.
+"""
+import json
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.services.webhook_parser import decode_webhook
+
+
+def _value(messages=(), statuses=(), contacts=(), phone_number_id="PNID"):
+    return {
+        "value": {
+            "messaging_product": "whatsapp",
+            "metadata": {"phone_number_id": phone_number_id},
+            "contacts": list(contacts),
+            "messages": list(messages),
+            "statuses": list(statuses),
+        },
+        "field": "messages",
+    }
+
+
+def _text(message_id, phone, body):
+    return {"from": phone, "id": message_id, "timestamp": "1700000000", "type": "text", "text": {"body": body}}
+
+
+BATCHED_BODY = {
+    "object": "whatsapp_business_account",
+    "entry": [
+        {"id": "WABA", "changes": [
+            _value(
+                messages=[_text("wamid.1", "573001", "Hola"), _text("wamid.2", "573002", "precio?")],
+                contacts=[
+                    {"wa_id": "573001", "profile": {"name": "Ana"}},
+                    {"wa_id": "573002", "profile": {"name": "Luis"}},
+                ],
+            ),
+            _value(statuses=[{
+                "id": "wamid.out", "status": "failed", "recipient_id": "573009", "timestamp": "1700000001",
+                "errors": [{"code": 131047, "title": "Re-engagement message"}],
+            }]),
+        ]},
+        {"id": "WABA", "changes": [
+            _value(messages=[
+                {"from": "573003", "id": "wamid.3", "type": "image", "image": {"id": "media"}},
+                _text("wamid.4", "573003", "la quiero"),
+            ], phone_number_id="PNID2"),
+        ]},
+    ],
+}
+
+
+class TestDecodeWebhook:
+    """Tests del decodificador en una sola pasada."""
+
+    def test_todos_los_mensajes_y_statuses(self):
+        batch = decode_webhook(json.dumps(BATCHED_BODY).encode())
+        assert [m.message_id for m in batch.messages] == ["wamid.1", "wamid.2", "wamid.3", "wamid.4"]
+        assert [m.message_id for m in batch.text_messages] == ["wamid.1", "wamid.2", "wamid.4"]
+        assert batch.event_kind == "mixed"
+
+        assert batch.messages[1].contact_name == "Luis"
+        assert batch.messages[1].text == "precio?"
+        assert batch.messages[3].phone_number_id == "PNID2"
+
+        status = batch.statuses[0]
+        assert (status.message_id, status.status, status.recipient_id) == ("wamid.out", "failed", "573009")
+        assert status.error_code == 131047
+
+    def test_bytes_y_dict_equivalentes(self):
+        assert decode_webhook(BATCHED_BODY) == decode_webhook(json.dumps(BATCHED_BODY))
+
+    def test_json_invalido(self):
+        with pytest.raises(ValueError):
+            decode_webhook(b"invalid json")
+
+    def test_estructura_inesperada_no_falla(self):
+        body = {"entry": [None, {"changes": "x"}, {"changes": [{"value": {"messages": [None, _text("wamid.9", "57", "hola")]}}]}]}
+        batch = decode_webhook(body)
+        assert [m.message_id for m in batch.text_messages] == ["wamid.9"]
+        assert decode_webhook({"entry": []}).event_kind == "unknown"
+
+
+class TestIdempotenciaEnLote:
+    """Tests de mark_wa_messages_processed."""
+
+    def test_solo_nuevos(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+        database.init_db()
+        database.mark_wa_message_processed("wamid.1", "573001", "Hola")
+
+        new_ids = database.mark_wa_messages_processed([
+            ("wamid.1", "573001", "Hola"),
+            ("wamid.2", "573002", "precio?"),
+            ("wamid.2", "573002", "precio?"),
+            ("", "573003", "sin id"),
+        ])
+        assert new_ids == {"wamid.2"}
+        assert database.is_wa_message_processed("wamid.2")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,172 @@
+"""
+Tests para envío de imágenes/videos por WhatsApp con cache de media_id,
+contra una Graph API falsa local.
+"""
+import asyncio
+import json
+import pytest
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models import database
+from app.services import asset_manifest, whatsapp_service
+from app.services.whatsapp_service import send_whatsapp_media
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 256
+MP4_BYTES = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 256
+
+
+class FakeGraphHandler(BaseHTTPRequestHandler):
+    """Simula POST /{phone_number_id}/media y /{phone_number_id}/messages."""
+    uploads = []
+    messages = []
+    rejected_media_ids = set()
+    upload_delay = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        if self.path.endswith("/media"):
+            time.sleep(FakeGraphHandler.upload_delay)
+            FakeGraphHandler.uploads.append(body)
+            self._json(200, {"id": f"media_{len(FakeGraphHandler.uploads)}"})
+        elif self.path.endswith("/messages"):
+            payload = json.loads(body)
+            FakeGraphHandler.messages.append(payload)
+            media = payload.get(payload["type"], {})
+            if media.get("id") in FakeGraphHandler.rejected_media_ids:
+                self._json(400, {"error": {"message": "Media ID inválido"}})
+            else:
+                self._json(200, {"messages": [{"id": f"wamid.{len(FakeGraphHandler.messages)}"}]})
+        else:
+            self._json(404, {})
+
+    def _json(self, status, data):
+        raw = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_graph(monkeypatch):
+    FakeGraphHandler.uploads = []
+    FakeGraphHandler.messages = []
+    FakeGraphHandler.rejected_media_ids = set()
+    FakeGraphHandler.upload_delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGraphHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(whatsapp_service, "WHATSAPP_API_BASE", f"http://127.0.0.1:{server.server_address[1]}/v18.0")
+    monkeypatch.setattr(whatsapp_service, "WHATSAPP_ENABLED", True)
+    monkeypatch.setattr(whatsapp_service, "WHATSAPP_ACCESS_TOKEN", "test-token")
+    monkeypatch.setattr(whatsapp_service, "WHATSAPP_PHONE_NUMBER_ID", "123456")
+    yield FakeGraphHandler
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_assets(tmp_path, monkeypatch):
+    """DB temporal + catálogo con una imagen, un video y un placeholder."""
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+
+    assets_dir = tmp_path / "assets"
+    catalog_dir = assets_dir / "catalog"
+    for folder, name, content in [
+        ("I001_maquina", "image_1.png", PNG_BYTES),
+        ("I002_video", "video_1.mp4", MP4_BYTES),
+        ("I003_placeholder", "image_1.png", b"PLACEHOLDER"),
+    ]:
+        (catalog_dir / folder).mkdir(parents=True)
+        (catalog_dir / folder / name).write_bytes(content)
+
+    monkeypatch.setattr(asset_manifest, "ASSETS_DIR", assets_dir)
+    monkeypatch.setattr(asset_manifest, "ASSETS_CATALOG_DIR", catalog_dir)
+    monkeypatch.setattr(asset_manifest, "_ASSET_MANIFEST", {})
+    monkeypatch.setattr(asset_manifest, "_MANIFEST_LOADED", False)
+    monkeypatch.setattr(asset_manifest, "ASSET_MANIFEST_PATH", assets_dir / "asset_manifest.json")
+    return assets_dir
+
+
+class TestSendWhatsAppMedia:
+    """Tests de envío de media y reutilización del media_id."""
+
+    def test_envia_imagen(self, fake_assets, fake_graph):
+        success, wamid = asyncio.run(send_whatsapp_media("+573001112233", "I001", caption="Union UN300"))
+        assert success is True
+        assert wamid.startswith("wamid.")
+        assert len(fake_graph.uploads) == 1
+        assert PNG_BYTES in fake_graph.uploads[0]
+
+        payload = fake_graph.messages[0]
+        assert payload["to"] == "573001112233"
+        assert payload["type"] == "image"
+        assert payload["image"] == {"id": "media_1", "caption": "Union UN300"}
+
+    def test_video(self, fake_assets, fake_graph):
+        success, _ = asyncio.run(send_whatsapp_media("+573001112233", "I002"))
+        assert success is True
+        assert fake_graph.messages[0]["type"] == "video"
+
+    def test_sube_una_vez(self, fake_assets, fake_graph):
+        for _ in range(3):
+            asyncio.run(send_whatsapp_media("+573001112233", "I001"))
+        assert len(fake_graph.uploads) == 1
+        assert [m["image"]["id"] for m in fake_graph.messages] == ["media_1"] * 3
+
+    def test_uploads_concurrentes_comparten_subida(self, fake_assets, fake_graph):
+        fake_graph.upload_delay = 0.2
+
+        async def run():
+            return await asyncio.gather(*[
+                send_whatsapp_media(f"+57300111223{i}", "I001") for i in range(4)
+            ])
+
+        results = asyncio.run(run())
+        assert all(success for success, _ in results)
+        assert len(fake_graph.uploads) == 1
+
+    def test_media_id_expirado_se_resube(self, fake_assets, fake_graph):
+        entry = asset_manifest.get_asset_entry("I001")
+        database.save_wa_media_id(entry.content_hash, "123456", "media_viejo", "image/png", ttl_seconds=3600)
+        fake_graph.rejected_media_ids = {"media_viejo"}
+
+        success, _ = asyncio.run(send_whatsapp_media("+573001112233", "I001", retry_count=0))
+        assert success is True
+        assert len(fake_graph.uploads) == 1
+        assert database.get_wa_media_id(entry.content_hash, "123456") == "media_1"
+
+    def test_cache_expirado_no_se_usa(self, fake_assets, fake_graph):
+        entry = asset_manifest.get_asset_entry("I001")
+        database.save_wa_media_id(entry.content_hash, "123456", "media_viejo", "image/png", ttl_seconds=-1)
+
+        asyncio.run(send_whatsapp_media("+573001112233", "I001"))
+        assert fake_graph.messages[0]["image"]["id"] == "media_1"
+
+    def test_placeholder_no_se_envia(self, fake_assets, fake_graph):
+        success, error = asyncio.run(send_whatsapp_media("+573001112233", "I003"))
+        assert success is False
+        assert fake_graph.uploads == [] and fake_graph.messages == []
+
+    def test_deshabilitado(self, fake_assets, fake_graph, monkeypatch):
+        monkeypatch.setattr(whatsapp_service, "WHATSAPP_ENABLED", False)
+        success, _ = asyncio.run(send_whatsapp_media("+573001112233", "I001"))
+        assert success is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -36,6 +36,9 @@ def test_post_webhook_message_success(app_with_whatsapp_enabled):
     Payload: Webhook con messages (sin statuses)
     Expected: Status 200, {"status": "ok", "queued": true}
     """
+    from app.services.metrics import WEBHOOK_ACK_SECONDS, WEBHOOK_QUEUE_WAIT_SECONDS
+    acks_before = WEBHOOK_ACK_SECONDS.count("queued")
+    waits_before = WEBHOOK_QUEUE_WAIT_SECONDS.count()
     client = TestClient(app_with_whatsapp_enabled)
     
     payload = {
@@ -72,15 +75,91 @@ def test_post_webhook_message_success(app_with_whatsapp_enabled):
     data = response.json()
     assert data["status"] == "ok"
     assert data.get("queued") == True  # Mensaje encolado para procesamiento
+    # ACK y espera en cola quedan en /metrics (TestClient corre el background al responder)
+    assert WEBHOOK_ACK_SECONDS.count("queued") == acks_before + 1
+    assert WEBHOOK_QUEUE_WAIT_SECONDS.count() == waits_before + 1
+
+
+def test_post_webhook_batch_all_messages_queued(app_with_whatsapp_enabled):
+    """
+    POST con varios entries/changes: se encolan todos los mensajes de texto
+    y un reenvío del mismo batch queda deduplicado.
+    """
+    client = TestClient(app_with_whatsapp_enabled)
+    
+    def change(messages):
+        return {
+            "value": {
+                "messaging_product": "whatsapp",
+                "metadata": {"phone_number_id": "PHONE_NUMBER_ID"},
+                "messages": messages
+            },
+            "field": "messages"
+        }
+    
+    payload = {
+        "object": "whatsapp_business_account",
+        "entry": [
+            {"id": "WABA", "changes": [change([
+                {"from": "573000000001", "id": "wamid.batch_1", "timestamp": "1", "type": "text", "text": {"body": "Hola"}},
+                {"from": "573000000002", "id": "wamid.batch_2", "timestamp": "1", "type": "text", "text": {"body": "Precio?"}}
+            ])]},
+            {"id": "WABA", "changes": [change([
+                {"from": "573000000003", "id": "wamid.batch_3", "timestamp": "2", "type": "text", "text": {"body": "Buenas"}}
+            ])]}
+        ]
+    }
+    
+    response = client.post("/whatsapp/webhook", json=payload)
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "queued": True, "queued_count": 3}
+    
+    response = client.post("/whatsapp/webhook", json=payload)
+    assert response.json() == {"status": "ok", "dedup": True}
+
+
+def test_post_webhook_rate_limited_messages_redelivered(app_with_whatsapp_enabled, monkeypatch):
+    """
+    Lote mixto con un número limitado: 429 para que Meta reenvíe, y solo los
+    mensajes encolados quedan marcados como procesados.
+    """
+    from app.routers import whatsapp
+    client = TestClient(app_with_whatsapp_enabled)
+    
+    payload = {
+        "object": "whatsapp_business_account",
+        "entry": [{"id": "WABA", "changes": [{
+            "value": {
+                "messaging_product": "whatsapp",
+                "metadata": {"phone_number_id": "PHONE_NUMBER_ID"},
+                "messages": [
+                    {"from": "573000000011", "id": "wamid.rl_1", "timestamp": "1", "type": "text", "text": {"body": "Hola"}},
+                    {"from": "573000000012", "id": "wamid.rl_2", "timestamp": "1", "type": "text", "text": {"body": "Precio?"}}
+                ]
+            },
+            "field": "messages"
+        }]}]
+    }
+    
+    monkeypatch.setattr(whatsapp, "rl_allow", lambda key, limit_per_minute: not key.endswith("012"))
+    response = client.post("/whatsapp/webhook", json=payload)
+    assert response.status_code == 429
+    assert response.json() == {"status": "rate_limited", "queued_count": 1}
+    
+    # Reenvío de Meta con el límite ya liberado: solo falta el limitado
+    monkeypatch.setattr(whatsapp, "rl_allow", lambda key, limit_per_minute: True)
+    response = client.post("/whatsapp/webhook", json=payload)
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "queued": True, "queued_count": 1}
 
 
 def test_post_webhook_statuses_ignored(app_with_whatsapp_enabled):
     """
-    Prueba 2: POST con solo statuses (sin messages) se ignora.
+    Prueba 2: POST con solo statuses (sin messages) no encola procesamiento.
     
     Payload: Webhook con statuses (sin messages)
-    Expected: Status 200, {"status": "ok"} (sin "queued")
-    Logs: decision_path="ignore_status_event"
+    Expected: Status 200, {"status": "ok"} (sin "queued"); el status queda en el buffer de status_ingest
+    Logs: decision_path="status_event_recorded"
     """
     client = TestClient(app_with_whatsapp_enabled)
     
@@ -116,6 +195,9 @@ def test_post_webhook_statuses_ignored(app_with_whatsapp_enabled):
     data = response.json()
     assert data["status"] == "ok"
     assert "queued" not in data  # NO encolado (ignorado)
+    
+    from app.services import status_ingest
+    assert "wamid.status_123" in status_ingest._pending
 
 
 def test_post_webhook_empty_entry(app_with_whatsapp_enabled):